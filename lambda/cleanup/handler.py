@@ -5,29 +5,68 @@ Scanne EC2, RDS, S3 et Lambda pour supprimer le non-conforme.
 
 import os
 import json
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-
-import boto3
-from botocore.exceptions import ClientError
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from shared.api_accounting import api_accounting
+from shared.config import check_tags
+from shared.config_inventory import config_inventory, discover, embedded_tags
+from shared.discovery import ec2_instances, paginate, rds_instances
+from shared.policy import get_policy
+from shared.profiling import sampled_profile
+from shared.ratelimit import limited_client, rate_limiter
+from shared.s3_tags import S3TagFetcher
+from shared.tag_cache import TagCache, lambda_marker, rds_marker
+from shared.tagset import TagSet
+from shared.workers import bounded_map
+from s3_purge import purge_bucket
 
 # --- CONFIGURATION ---
-REQUIRED_TAGS = ["Owner", "Squad", "CostCenter", "Environment"]
 GRACE_PERIOD_HOURS = int(os.environ.get("GRACE_PERIOD_HOURS", "24"))
 DRY_RUN = os.environ.get("DRY_RUN", "true").lower() == "true"
 SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN", "")
 
-# --- CLIENTS AWS ---
-ec2_client = boto3.client('ec2')
-rds_client = boto3.client('rds')
-s3_client = boto3.client('s3')
-lambda_client = boto3.client('lambda')
-sns_client = boto3.client('sns')
+# Concurrence : vérifications de tags (appels list_tags) et suppressions par service
+# DELETE_CONCURRENCY='{"ec2": 8, "rds": 2}' surcharge les valeurs par défaut
+TAG_CHECK_CONCURRENCY = int(os.environ.get("TAG_CHECK_CONCURRENCY", "8"))
+DELETE_CONCURRENCY = {
+    "ec2": 8, "rds": 2, "s3": 2, "lambda": 4,
+    **json.loads(os.environ.get("DELETE_CONCURRENCY") or "{}"),
+}
 
+# Marge laissée avant le timeout Lambda pour sauvegarder les checkpoints de purge S3
+DEADLINE_MARGIN_SECONDS = 60
+# Échéance (time.monotonic) de l'invocation en cours, None hors Lambda
+invocation_deadline: Optional[float] = None
 
+# --- CLIENTS AWS ---
+ec2_client = limited_client('ec2')
+rds_client = limited_client('rds')
+s3_client = limited_client('s3')
+lambda_client = limited_client('lambda')
+sns_client = limited_client('sns')
+cloudwatch_client = limited_client('cloudwatch')
+# Cache bucket → région conservé entre les invocations à chaud
+s3_tags = S3TagFetcher(s3_client)
+# Tags RDS / Lambda gardés entre les runs tant que le marqueur de changement est inchangé.
+# Seuls des tags conformes sont servis par le cache : avant une suppression, on relit toujours.
+tag_cache = TagCache("cleanup")
+
+
+@sampled_profile
 def lambda_handler(event, context):
     """Point d'entrée principal de la Lambda."""
-    print(f"🚀 Démarrage du cleanup - DRY_RUN={DRY_RUN}")
+    global invocation_deadline
+    policy_version = get_policy().version
+    print(f"🚀 Démarrage du cleanup - DRY_RUN={DRY_RUN} - politique {policy_version}")
+    # Instantané Config rechargé à chaque invocation (INVENTORY_SOURCE=config)
+    config_inventory.reset()
+    tag_cache.begin()
+
+    if context is not None:
+        remaining = context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+        invocation_deadline = time.monotonic() + max(0.0, remaining)
 
     global_results = {
         "ec2": {}, "rds": {}, "s3": {}, "lambda": {},
@@ -39,8 +78,21 @@ def lambda_handler(event, context):
     global_results["s3"] = cleanup_s3_buckets()
     global_results["lambda"] = cleanup_lambda_functions()
 
+    # Erreurs par ressource : le reste du service a quand même été traité
+    for service in ['ec2', 'rds', 's3', 'lambda']:
+        for err in global_results[service].get('errors', []):
+            global_results["errors"].append({"service": service, **err})
+
+    cache_stats = tag_cache.flush()
+    print(f"🏷️  Cache de tags : {json.dumps(cache_stats)}")
+
     send_notification(global_results)
 
+    api_stats = rate_limiter.pop_stats()
+    print(f"⏱️  Rate limiting : {json.dumps(api_stats, default=str)}")
+    api_calls = api_accounting.pop_summary()
+    print(f"📡 Appels API : {json.dumps(api_calls, default=str)}")
+
     return {
         'statusCode': 200,
         'body': json.dumps({
@@ -54,13 +106,112 @@ def lambda_handler(event, context):
             's3_scanned': global_results['s3'].get('scanned', 0),
             's3_non_compliant': global_results['s3'].get('non_compliant', 0),
             's3_deleted': global_results['s3'].get('deleted', 0),
+            's3_purge_partial': global_results['s3'].get('purge_partial', 0),
+            's3_purge_lifecycle': global_results['s3'].get('purge_lifecycle', 0),
             'lambda_scanned': global_results['lambda'].get('scanned', 0),
             'lambda_non_compliant': global_results['lambda'].get('non_compliant', 0),
             'lambda_deleted': global_results['lambda'].get('deleted', 0),
+            'api_wait_seconds': api_stats['wait_seconds'],
+            'api_throttles': api_stats['throttles'],
+            'api_calls': api_calls['calls'],
+            'policy_version': policy_version,
+            'api_call_errors': api_calls['errors'],
+            'inventory': config_inventory.stats,
+            'errors': global_results['errors'],
         }, default=str)
     }
 
 
+# ========================================
+# MOTEUR DE CLEANUP
+# Découverte paginée → vérification des tags (pool borné) → suppression (pool borné par service)
+# Découverte live ou, avec INVENTORY_SOURCE=config, inventaire AWS Config (tags joints).
+# Config peut avoir plusieurs heures de retard : une ressource non conforme d'après
+# ses tags joints est relue en live avant d'être supprimée.
+# Une erreur sur une ressource est consignée dans le rapport sans interrompre les autres.
+# ========================================
+
+def run_cleanup(service: str, res: Dict[str, Any], discover: Callable[[], Iterator[Dict]],
+                check: Callable[[Dict], str], delete: Callable[[Dict], Optional[str]],
+                resource_id: Callable[[Dict], str]) -> Dict[str, Any]:
+    """
+    Exécute le pipeline de cleanup d'un service.
+
+    check() renvoie un statut : "compliant", "in_grace_period", "delete"
+    ou le nom d'un compteur de ressources ignorées (ex: "already_terminated").
+    """
+    res.setdefault("errors", [])
+
+    def record_error(item, stage: str, error: BaseException):
+        rid = resource_id(item) if item is not None else None
+        res["errors"].append({"resource_id": rid, "stage": stage, "error": str(error)})
+        print(f"❌ {service.upper()} {rid or ''} ({stage}) : {error}")
+
+    def discovered() -> Iterator[Dict]:
+        try:
+            yield from discover()
+        except Exception as e:
+            # La pagination a échoué : on garde ce qui a déjà été découvert
+            record_error(None, "discovery", e)
+
+    def to_delete() -> Iterator[Dict]:
+        for outcome in bounded_map(check, discovered(), TAG_CHECK_CONCURRENCY):
+            res["scanned"] += 1
+            if outcome.error:
+                record_error(outcome.item, "check", outcome.error)
+                continue
+            status = outcome.result
+            if status == "compliant":
+                continue
+            if status not in ("in_grace_period", "delete"):
+                res[status] = res.get(status, 0) + 1
+                continue
+            res["non_compliant"] += 1
+            if status == "in_grace_period":
+                res["in_grace_period"] = res.get("in_grace_period", 0) + 1
+            elif DRY_RUN:
+                print(f"🔍 DRY_RUN : {resource_id(outcome.item)} serait supprimé")
+            else:
+                yield outcome.item
+
+    for outcome in bounded_map(delete, to_delete(), DELETE_CONCURRENCY.get(service, 1)):
+        if outcome.error:
+            record_error(outcome.item, "delete", outcome.error)
+        else:
+            # delete() peut renvoyer un statut intermédiaire (ex: purge S3 reprise au prochain run)
+            status = outcome.result or "deleted"
+            res[status] = res.get(status, 0) + 1
+    return res
+
+
+# --- EC2 ---
+
+def discover_ec2_instances() -> Iterator[Dict]:
+    return ec2_instances(ec2_client)
+
+
+def live_ec2_tags(instance: Dict) -> TagSet:
+    resp = ec2_client.describe_tags(Filters=[{'Name': 'resource-id', 'Values': [instance['InstanceId']]}])
+    return TagSet(resp.get('Tags'))
+
+
+def check_ec2_instance(instance: Dict) -> str:
+    if instance.get('State', {}).get('Name') in ['terminated', 'terminating']:
+        return "already_terminated"
+    compliant, _ = check_tags(TagSet(instance.get('Tags')), 'ec2')
+    if compliant:
+        return "compliant"
+    if is_within_grace_period(instance.get('LaunchTime')):
+        return "in_grace_period"
+    if embedded_tags(instance) is not None and check_tags(live_ec2_tags(instance), 'ec2')[0]:
+        return "compliant"
+    return "delete"
+
+
+def delete_ec2_instance(instance: Dict):
+    ec2_client.terminate_instances(InstanceIds=[instance['InstanceId']])
+
+
 def cleanup_ec2_instances() -> Dict[str, Any]:
     """Nettoie les instances EC2 non conformes."""
     print("🖥️  Scan EC2...")
@@ -68,35 +219,47 @@ def cleanup_ec2_instances() -> Dict[str, Any]:
         "scanned": 0, "already_terminated": 0,
         "non_compliant": 0, "deleted": 0, "in_grace_period": 0
     }
-    try:
-        paginator = ec2_client.get_paginator('describe_instances')
-        for page in paginator.paginate():
-            for reservation in page['Reservations']:
-                for instance in reservation['Instances']:
-                    instance_id = instance['InstanceId']
-                    state = instance.get('State', {}).get('Name')
-                    res["scanned"] += 1
-
-                    if state in ['terminated', 'terminating']:
-                        res["already_terminated"] += 1
-                        continue
-
-                    compliant, _ = check_required_tags(instance.get('Tags', []))
-                    if not compliant:
-                        res["non_compliant"] += 1
-                        launch_time = instance.get('LaunchTime')
-                        if is_within_grace_period(launch_time):
-                            res["in_grace_period"] += 1
-                            continue
-
-                        if not DRY_RUN:
-                            ec2_client.terminate_instances(
-                                InstanceIds=[instance_id]
-                            )
-                            res["deleted"] += 1
-    except Exception as e:
-        res["errors"] = str(e)
-    return res
+    return run_cleanup(
+        "ec2", res, lambda: discover('ec2', discover_ec2_instances), check_ec2_instance,
+        delete_ec2_instance, lambda i: i['InstanceId'],
+    )
+
+
+# --- RDS ---
+
+def discover_rds_instances() -> Iterator[Dict]:
+    return rds_instances(rds_client)
+
+
+def live_rds_tags(db: Dict) -> TagSet:
+    return TagSet(rds_client.list_tags_for_resource(ResourceName=db['DBInstanceArn']).get('TagList'))
+
+
+def check_rds_instance(db: Dict) -> str:
+    if db['DBInstanceStatus'] in ['deleting', 'deleted']:
+        return "already_deleted"
+    tags = embedded_tags(db)
+    from_config = tags is not None
+    if not from_config:
+        tags = tag_cache.get_or_fetch(
+            db['DBInstanceArn'], rds_marker(db), lambda: live_rds_tags(db),
+            accept=lambda cached: check_tags(cached, 'rds')[0],
+        )
+    compliant, _ = check_tags(tags, 'rds')
+    if compliant:
+        return "compliant"
+    if is_within_grace_period(db.get('InstanceCreateTime')):
+        return "in_grace_period"
+    if from_config and check_tags(live_rds_tags(db), 'rds')[0]:
+        return "compliant"
+    return "delete"
+
+
+def delete_rds_instance(db: Dict):
+    rds_client.delete_db_instance(
+        DBInstanceIdentifier=db['DBInstanceIdentifier'],
+        SkipFinalSnapshot=True
+    )
 
 
 def cleanup_rds_instances() -> Dict[str, Any]:
@@ -106,95 +269,130 @@ def cleanup_rds_instances() -> Dict[str, Any]:
         "scanned": 0, "already_deleted": 0,
         "non_compliant": 0, "deleted": 0, "in_grace_period": 0
     }
-    try:
-        response = rds_client.describe_db_instances()
-        for db in response['DBInstances']:
-            res["scanned"] += 1
-            if db['DBInstanceStatus'] in ['deleting', 'deleted']:
-                res["already_deleted"] += 1
-                continue
+    return run_cleanup(
+        "rds", res, lambda: discover('rds', discover_rds_instances), check_rds_instance,
+        delete_rds_instance, lambda db: db['DBInstanceIdentifier'],
+    )
 
-            t_resp = rds_client.list_tags_for_resource(
-                ResourceName=db['DBInstanceArn']
-            )
-            compliant, _ = check_required_tags(t_resp.get('TagList', []))
-
-            if not compliant:
-                res["non_compliant"] += 1
-                create_time = db.get('InstanceCreateTime')
-                if is_within_grace_period(create_time):
-                    res["in_grace_period"] += 1
-                    continue
-                if not DRY_RUN:
-                    rds_client.delete_db_instance(
-                        DBInstanceIdentifier=db['DBInstanceIdentifier'],
-                        SkipFinalSnapshot=True
-                    )
-                    res["deleted"] += 1
-    except Exception as e:
-        res["errors"] = str(e)
-    return res
+
+# --- S3 ---
+
+def discover_s3_buckets() -> Iterator[Dict]:
+    # ListBuckets n'est paginable que sur les versions récentes de botocore
+    if s3_client.can_paginate('list_buckets'):
+        for page in paginate(s3_client, 'list_buckets'):
+            yield from page.get('Buckets', [])
+    else:
+        yield from s3_client.list_buckets()['Buckets']
+
+
+def live_s3_tags(bucket: Dict) -> Optional[TagSet]:
+    """Tags du bucket lus dans sa région, None si le bucket n'existe plus."""
+    # Une erreur d'accès n'est surtout pas un bucket sans tags (il serait supprimé) :
+    # elle remonte en erreur de check
+    fetched = s3_tags.fetch(bucket['Name'], bucket.get('BucketRegion'))
+    if fetched.status == "error":
+        raise RuntimeError(f"tags illisibles ({fetched.region}) : {fetched.error}")
+    if fetched.status == "not_found":
+        return None
+    return fetched.tags
+
+
+def check_s3_bucket(bucket: Dict) -> str:
+    tags = embedded_tags(bucket)
+    from_config = tags is not None
+    if not from_config:
+        tags = live_s3_tags(bucket)
+        if tags is None:
+            return "already_deleted"
+    compliant, _ = check_tags(tags, 's3')
+    if compliant:
+        return "compliant"
+    if is_within_grace_period(bucket.get('CreationDate')):
+        return "in_grace_period"
+    if from_config:
+        tags = live_s3_tags(bucket)
+        if tags is None:
+            return "already_deleted"
+        if check_tags(tags, 's3')[0]:
+            return "compliant"
+    return "delete"
+
+
+def delete_s3_bucket(bucket: Dict) -> Optional[str]:
+    # Purge et suppression via le client de la région du bucket (pas de redirection)
+    client = s3_tags.client(s3_tags.region_of(bucket['Name'], bucket.get('BucketRegion')))
+    purge = purge_bucket(client, bucket['Name'], deadline=invocation_deadline, cloudwatch_client=cloudwatch_client)
+    print(f"🪣  Purge {bucket['Name']} : {purge['status']}, {purge['deleted']} versions supprimées")
+    if purge['errors']:
+        raise RuntimeError(f"purge incomplète : {purge['errors'][0]['error']}")
+    if purge['status'] != "complete":
+        # Reprise au prochain run (checkpoint) ou expiration lifecycle en cours
+        return f"purge_{purge['status']}"
+    client.delete_bucket(Bucket=bucket['Name'])
+    return None
 
 
 def cleanup_s3_buckets() -> Dict[str, Any]:
     """Nettoie les buckets S3 non conformes."""
     print("🪣  Scan S3...")
-    res = {"scanned": 0, "non_compliant": 0, "deleted": 0}
-    try:
-        for b in s3_client.list_buckets()['Buckets']:
-            name = b['Name']
-            res["scanned"] += 1
-            try:
-                tags_resp = s3_client.get_bucket_tagging(Bucket=name)
-                tags = tags_resp.get('TagSet', [])
-            except ClientError:
-                tags = []
-
-            compliant, _ = check_required_tags(tags)
-            if not compliant:
-                res["non_compliant"] += 1
-                if is_within_grace_period(b.get('CreationDate')):
-                    continue
-                if not DRY_RUN:
-                    delete_all_objects_in_bucket(name)
-                    s3_client.delete_bucket(Bucket=name)
-                    res["deleted"] += 1
-    except Exception as e:
-        res["errors"] = str(e)
-    return res
+    res = {"scanned": 0, "already_deleted": 0, "non_compliant": 0, "deleted": 0, "in_grace_period": 0}
+    return run_cleanup(
+        "s3", res, lambda: discover('s3', discover_s3_buckets), check_s3_bucket,
+        delete_s3_bucket, lambda b: b['Name'],
+    )
+
+
+# --- LAMBDA ---
+
+def list_lambda_functions() -> Iterator[Dict]:
+    for page in paginate(lambda_client, 'list_functions'):
+        yield from page['Functions']
+
+
+def discover_lambda_functions() -> Iterator[Dict]:
+    for f in discover('lambda', list_lambda_functions):
+        # Ne jamais se supprimer soi-même
+        if f['FunctionName'] != os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+            yield f
+
+
+def live_lambda_tags(f: Dict) -> TagSet:
+    return TagSet(lambda_client.list_tags(Resource=f['FunctionArn']).get('Tags'))
+
+
+def check_lambda_function(f: Dict) -> str:
+    tags = embedded_tags(f)
+    from_config = tags is not None
+    if not from_config:
+        tags = tag_cache.get_or_fetch(
+            f['FunctionArn'], lambda_marker(f), lambda: live_lambda_tags(f),
+            accept=lambda cached: check_tags(cached, 'lambda')[0],
+        )
+    compliant, _ = check_tags(tags, 'lambda')
+    if compliant:
+        return "compliant"
+    if from_config and check_tags(live_lambda_tags(f), 'lambda')[0]:
+        return "compliant"
+    return "delete"
+
+
+def delete_lambda_function(f: Dict):
+    lambda_client.delete_function(FunctionName=f['FunctionName'])
 
 
 def cleanup_lambda_functions() -> Dict[str, Any]:
     """Nettoie les fonctions Lambda non conformes."""
     print("⚡ Scan Lambda...")
     res = {"scanned": 0, "non_compliant": 0, "deleted": 0}
-    try:
-        for f in lambda_client.list_functions()['Functions']:
-            name = f['FunctionName']
-            if name == os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
-                continue
-            res["scanned"] += 1
-
-            t_resp = lambda_client.list_tags(Resource=f['FunctionArn'])
-            tags = t_resp.get('Tags', {})
-            fmt_tags = [{'Key': k, 'Value': v} for k, v in tags.items()]
-
-            compliant, _ = check_required_tags(fmt_tags)
-            if not compliant:
-                res["non_compliant"] += 1
-                if not DRY_RUN:
-                    lambda_client.delete_function(FunctionName=name)
-                    res["deleted"] += 1
-    except Exception as e:
-        res["errors"] = str(e)
-    return res
+    return run_cleanup(
+        "lambda", res, discover_lambda_functions, check_lambda_function,
+        delete_lambda_function, lambda f: f['FunctionName'],
+    )
 
 
-def check_required_tags(tags: List[Dict]) -> tuple[bool, List[str]]:
-    """Vérifie la présence des tags obligatoires."""
-    keys = [t.get('Key') for t in tags] if tags else []
-    missing = [t for t in REQUIRED_TAGS if t not in keys]
-    return len(missing) == 0, missing
+# Ancien nom, conservé pour les appelants existants (même règle que scanner/controller)
+check_required_tags = check_tags
 
 
 def is_within_grace_period(creation_time: datetime) -> bool:
@@ -206,23 +404,6 @@ def is_within_grace_period(creation_time: datetime) -> bool:
     return now - creation_time < delta
 
 
-def delete_all_objects_in_bucket(bucket_name: str):
-    """Vide un bucket S3 de tous ses objets et versions."""
-    paginator = s3_client.get_paginator('list_object_versions')
-    for page in paginator.paginate(Bucket=bucket_name):
-        versions = page.get('Versions', [])
-        markers = page.get('DeleteMarkers', [])
-        objs = [
-            {'Key': v['Key'], 'VersionId': v['VersionId']}
-            for v in versions + markers
-        ]
-        if objs:
-            s3_client.delete_objects(
-                Bucket=bucket_name,
-                Delete={'Objects': objs}
-            )
-
-
 def send_notification(res: Dict):
     """Envoie le rapport final via SNS."""
     if not SNS_TOPIC_ARN:
@@ -231,7 +412,10 @@ def send_notification(res: Dict):
     msg = f"Rapport Cleanup AWS ({mode})\n\n"
     for s in ['ec2', 'rds', 's3', 'lambda']:
         msg += f"- {s.upper()}: {res[s].get('scanned', 0)} vus, "
-        msg += f"{res[s].get('deleted', 0)} supprimés\n"
+        msg += f"{res[s].get('deleted', 0)} supprimés, "
+        msg += f"{len(res[s].get('errors', []))} erreurs\n"
+    for err in res.get('errors', [])[:20]:
+        msg += f"\n❌ {err['service'].upper()} {err['resource_id'] or ''} ({err['stage']}) : {err['error']}"
     sns_client.publish(
         TopicArn=SNS_TOPIC_ARN,
         Subject="AWS Governance Report",
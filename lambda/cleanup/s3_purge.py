@@ -0,0 +1,371 @@
+"""
+🪣 PURGE S3 HAUT DÉBIT
+Vide un bucket (objets, versions, delete markers) avant sa suppression.
+
+- Sharding par préfixe : le listing avec Delimiter="/" renvoie les clés du niveau
+  courant + les sous-préfixes (CommonPrefixes), chacun devient un shard listé en
+  parallèle. Au-delà de PURGE_SHARD_DEPTH niveaux, un shard liste tout son sous-arbre.
+  La couverture est exacte : chaque clé appartient à un seul shard. Un sous-arbre
+  qui tient dans une page (sonde sans Delimiter) n'est pas découpé.
+- Un shard paginé est relu après ses suppressions jusqu'à ce qu'une passe soit vide.
+- Listing et suppression découplés : les listers alimentent un pool de suppression
+  (delete_objects par lots de 1000, Quiet) avec un nombre de lots en vol borné.
+- SlowDown : les clés en erreur retryable sont renvoyées avec backoff exponentiel
+  et le débit DeleteObjects du rate limiter est réduit.
+- Checkpoint : si le temps de la Lambda est écoulé, les shards non terminés sont
+  sauvegardés et repris à l'invocation suivante.
+- Très gros buckets (NumberOfObjects CloudWatch > PURGE_LIFECYCLE_THRESHOLD) :
+  une règle lifecycle d'expiration est posée au lieu de supprimer clé par clé.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from botocore.exceptions import ClientError
+
+from shared.ratelimit import limited_client, rate_limiter
+
+PURGE_LIST_WORKERS = int(os.environ.get("PURGE_LIST_WORKERS", "4"))
+PURGE_DELETE_WORKERS = int(os.environ.get("PURGE_DELETE_WORKERS", "8"))
+PURGE_SHARD_DEPTH = int(os.environ.get("PURGE_SHARD_DEPTH", "2"))
+PURGE_LIFECYCLE_THRESHOLD = int(os.environ.get("PURGE_LIFECYCLE_THRESHOLD", "5000000"))
+PURGE_CHECKPOINT_BUCKET = os.environ.get("PURGE_CHECKPOINT_BUCKET", "")
+PURGE_CHECKPOINT_PREFIX = os.environ.get("PURGE_CHECKPOINT_PREFIX", "governance/purge-checkpoints/")
+
+DELETE_BATCH_SIZE = 1000  # maximum accepté par delete_objects
+MAX_SLOWDOWN_RETRIES = 6
+RETRYABLE_DELETE_CODES = {"SlowDown", "InternalError", "ServiceUnavailable", "RequestTimeout"}
+LIFECYCLE_RULE_ID = "governance-purge"
+
+
+class Shard(NamedTuple):
+    prefix: str
+    depth: int
+
+
+# ========================================
+# CHECKPOINTS
+# ========================================
+
+class InMemoryCheckpointStore:
+    """Survit aux invocations à chaud uniquement — suffisant pour les tests."""
+
+    def __init__(self):
+        self._items: Dict[str, Dict] = {}
+
+    def load(self, bucket: str) -> Optional[Dict]:
+        return self._items.get(bucket)
+
+    def save(self, bucket: str, checkpoint: Dict):
+        self._items[bucket] = checkpoint
+
+    def clear(self, bucket: str):
+        self._items.pop(bucket, None)
+
+
+class S3CheckpointStore:
+    """Un objet JSON par bucket purgé, dans un bucket de gouvernance dédié."""
+
+    def __init__(self, bucket: str, prefix: str = PURGE_CHECKPOINT_PREFIX, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or limited_client("s3")
+
+    def _key(self, bucket: str) -> str:
+        return f"{self.prefix}{bucket}.json"
+
+    def load(self, bucket: str) -> Optional[Dict]:
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(bucket))["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(body)
+
+    def save(self, bucket: str, checkpoint: Dict):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(bucket), Body=json.dumps(checkpoint).encode())
+
+    def clear(self, bucket: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(bucket))
+
+
+def get_checkpoint_store():
+    if PURGE_CHECKPOINT_BUCKET:
+        return S3CheckpointStore(PURGE_CHECKPOINT_BUCKET)
+    return InMemoryCheckpointStore()
+
+
+# ========================================
+# MOTEUR DE PURGE
+# ========================================
+
+class BucketPurger:
+    """Purge un bucket avec des listers par shard et un pool de suppression partagé."""
+
+    def __init__(self, s3_client, bucket: str, list_workers: int = PURGE_LIST_WORKERS,
+                 delete_workers: int = PURGE_DELETE_WORKERS, shard_depth: int = PURGE_SHARD_DEPTH,
+                 deadline: Optional[float] = None, sleep=time.sleep):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.list_workers = max(1, list_workers)
+        self.delete_workers = max(1, delete_workers)
+        self.shard_depth = shard_depth
+        self.deadline = deadline
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._futures = set()
+        # Borne la mémoire : au plus 2 lots de 1000 clés en attente par worker de suppression
+        self._delete_slots = threading.BoundedSemaphore(self.delete_workers * 2)
+        self._shards: Dict[str, Shard] = {}
+        self._listed: Dict[str, bool] = {}
+        self._failed: set = set()
+        self.deleted = 0
+        self.slowdowns = 0
+        self.errors: List[Dict[str, str]] = []
+
+    def _expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _track(self, future):
+        with self._lock:
+            self._futures.add(future)
+
+    def _schedule(self, shard: Shard):
+        with self._lock:
+            # Reprise : un parent relisté redécouvre des enfants déjà présents dans le checkpoint
+            if shard.prefix in self._shards:
+                return
+            self._shards[shard.prefix] = shard
+            self._listed[shard.prefix] = False
+        self._track(self._list_pool.submit(self._list_shard, shard))
+
+    def _submit(self, shard: Shard, page: Dict) -> List:
+        objs = [
+            {"Key": v["Key"], "VersionId": v["VersionId"]}
+            for v in page.get("Versions", []) + page.get("DeleteMarkers", [])
+        ]
+        futures = []
+        for i in range(0, len(objs), DELETE_BATCH_SIZE):
+            self._delete_slots.acquire()
+            future = self._delete_pool.submit(self._delete_batch, shard, objs[i:i + DELETE_BATCH_SIZE])
+            self._track(future)
+            futures.append(future)
+        return futures
+
+    def _list_shard(self, shard: Shard):
+        if self._expired():
+            return
+        kwargs = {"Bucket": self.bucket, "Prefix": shard.prefix}
+        if shard.depth < self.shard_depth:
+            # Sonde : un sous-arbre qui tient dans une page n'est pas découpé
+            try:
+                probe = self.s3.list_object_versions(**kwargs)
+            except Exception as e:
+                self._record_error(shard, "list", str(e))
+                return
+            submitted = self._submit(shard, probe)
+            if not probe.get("IsTruncated"):
+                self._mark_listed(shard)
+                return
+            # Ces versions ne doivent pas réapparaître dans le listing par préfixe
+            wait(submitted)
+            kwargs["Delimiter"] = "/"
+
+        while True:
+            if self._expired():
+                return
+            submitted, pages, broken = [], 0, False
+            try:
+                for page in self.s3.get_paginator("list_object_versions").paginate(**kwargs):
+                    pages += 1
+                    for cp in page.get("CommonPrefixes", []):
+                        self._schedule(Shard(cp["Prefix"], shard.depth + 1))
+                    submitted += self._submit(shard, page)
+                    if self._expired():
+                        return
+            except Exception as e:
+                if not submitted:
+                    self._record_error(shard, "list", str(e))
+                    return
+                broken = True
+            if not submitted or (pages == 1 and not broken):
+                break
+            # Passe de vérification après une pagination : on attend nos lots puis on
+            # relit le shard. Un marqueur (dernière version listée) supprimé entre deux
+            # pages peut tronquer le listing ; ce qui est supprimé n'apparaît plus ensuite.
+            wait(submitted)
+            if shard.prefix in self._failed:
+                # Suppressions en échec : le shard sera repris au prochain run
+                return
+        self._mark_listed(shard)
+
+    def _mark_listed(self, shard: Shard):
+        with self._lock:
+            self._listed[shard.prefix] = True
+
+    def _delete_batch(self, shard: Shard, objs: List[Dict[str, str]]):
+        try:
+            pending, attempt = objs, 0
+            while pending:
+                resp = self.s3.delete_objects(Bucket=self.bucket, Delete={"Objects": pending, "Quiet": True})
+                errors = resp.get("Errors", [])
+                retry = [{k: e[k] for k in ("Key", "VersionId") if e.get(k)}
+                         for e in errors if e.get("Code") in RETRYABLE_DELETE_CODES]
+                for e in errors:
+                    if e.get("Code") not in RETRYABLE_DELETE_CODES:
+                        self._record_error(shard, "delete", f"{e['Key']}: {e.get('Code')} {e.get('Message', '')}")
+                with self._lock:
+                    self.deleted += len(pending) - len(errors)
+                if not retry:
+                    return
+                attempt += 1
+                if attempt > MAX_SLOWDOWN_RETRIES:
+                    self._record_error(shard, "delete", f"{len(retry)} clés toujours en SlowDown")
+                    return
+                # SlowDown par clé (réponse 200) : botocore ne le voit pas, on ralentit nous-mêmes
+                with self._lock:
+                    self.slowdowns += 1
+                rate_limiter.bucket("s3", "DeleteObjects").slow_down()
+                self._sleep(min(20.0, 0.2 * 2 ** attempt))
+                pending = retry
+        except Exception as e:
+            self._record_error(shard, "delete", str(e))
+        finally:
+            self._delete_slots.release()
+
+    def _record_error(self, shard: Shard, stage: str, error: str):
+        with self._lock:
+            self._failed.add(shard.prefix)
+            self.errors.append({"prefix": shard.prefix, "stage": stage, "error": error})
+
+    def run(self, shards: List[Shard]) -> List[Shard]:
+        """Purge les shards donnés, renvoie ceux à reprendre (non terminés ou en erreur)."""
+        self._list_pool = ThreadPoolExecutor(self.list_workers)
+        self._delete_pool = ThreadPoolExecutor(self.delete_workers)
+        try:
+            for shard in shards:
+                self._schedule(shard)
+            # Les listers ajoutent leurs sous-shards avant de se terminer :
+            # l'ensemble des futures ne se vide qu'une fois tout le travail fini
+            while True:
+                with self._lock:
+                    self._futures = {f for f in self._futures if not f.done()}
+                    running = set(self._futures)
+                if not running:
+                    break
+                wait(running, return_when=FIRST_COMPLETED)
+        finally:
+            self._list_pool.shutdown()
+            self._delete_pool.shutdown()
+
+        return [
+            self._shards[prefix] for prefix, listed in self._listed.items()
+            if not listed or prefix in self._failed
+        ]
+
+
+def estimate_bucket_objects(bucket: str, cloudwatch_client=None) -> Optional[int]:
+    """Nombre d'objets (métrique S3 quotidienne NumberOfObjects), None si indisponible."""
+    cloudwatch_client = cloudwatch_client or limited_client("cloudwatch")
+    now = datetime.now(timezone.utc)
+    try:
+        resp = cloudwatch_client.get_metric_statistics(
+            Namespace="AWS/S3",
+            MetricName="NumberOfObjects",
+            Dimensions=[
+                {"Name": "BucketName", "Value": bucket},
+                {"Name": "StorageType", "Value": "AllStorageTypes"},
+            ],
+            StartTime=now - timedelta(days=3),
+            EndTime=now,
+            Period=86400,
+            Statistics=["Average"],
+        )
+    except ClientError:
+        return None
+    points = sorted(resp.get("Datapoints", []), key=lambda p: p["Timestamp"])
+    return int(points[-1]["Average"]) if points else None
+
+
+def apply_expiration_lifecycle(s3_client, bucket: str) -> bool:
+    """Pose les règles d'expiration (idempotent). Renvoie False si déjà en place."""
+    try:
+        rules = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket).get("Rules", [])
+        if any(r.get("ID") == LIFECYCLE_RULE_ID for r in rules):
+            return False
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchLifecycleConfiguration":
+            raise
+    s3_client.put_bucket_lifecycle_configuration(
+        Bucket=bucket,
+        LifecycleConfiguration={"Rules": [
+            {
+                "ID": LIFECYCLE_RULE_ID,
+                "Filter": {"Prefix": ""},
+                "Status": "Enabled",
+                "Expiration": {"Days": 1},
+                "NoncurrentVersionExpiration": {"NoncurrentDays": 1},
+                "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": 1},
+            },
+            {
+                # Expiration Days et ExpiredObjectDeleteMarker ne peuvent pas cohabiter dans une règle
+                "ID": f"{LIFECYCLE_RULE_ID}-markers",
+                "Filter": {"Prefix": ""},
+                "Status": "Enabled",
+                "Expiration": {"ExpiredObjectDeleteMarker": True},
+            },
+        ]},
+    )
+    return True
+
+
+def bucket_is_empty(s3_client, bucket: str) -> bool:
+    resp = s3_client.list_object_versions(Bucket=bucket, MaxKeys=1)
+    return not resp.get("Versions") and not resp.get("DeleteMarkers")
+
+
+def purge_bucket(s3_client, bucket: str, deadline: Optional[float] = None, store=None,
+                 cloudwatch_client=None, **purger_kwargs) -> Dict[str, Any]:
+    """
+    Vide le bucket. Statuts renvoyés :
+    - "complete"  : bucket vide, prêt pour delete_bucket
+    - "partial"   : temps écoulé ou erreurs, checkpoint sauvegardé pour la prochaine invocation
+    - "lifecycle" : bucket trop gros, règle d'expiration posée (suppression lors d'un prochain run)
+    """
+    store = store or _default_store
+    checkpoint = store.load(bucket)
+
+    if checkpoint is None:
+        estimated = estimate_bucket_objects(bucket, cloudwatch_client)
+        if estimated is not None and estimated > PURGE_LIFECYCLE_THRESHOLD:
+            applied = apply_expiration_lifecycle(s3_client, bucket)
+            return {"status": "lifecycle", "estimated_objects": estimated, "lifecycle_applied": applied,
+                    "deleted": 0, "errors": []}
+        checkpoint = {"pending": [["", 0]], "deleted": 0, "invocations": 0}
+
+    purger = BucketPurger(s3_client, bucket, deadline=deadline, **purger_kwargs)
+    remaining = purger.run([Shard(p, d) for p, d in checkpoint["pending"]])
+    deleted = checkpoint["deleted"] + purger.deleted
+    result = {"deleted": deleted, "slowdowns": purger.slowdowns, "errors": purger.errors,
+              "invocations": checkpoint["invocations"] + 1}
+
+    if remaining:
+        store.save(bucket, {"pending": [[s.prefix, s.depth] for s in remaining],
+                            "deleted": deleted, "invocations": result["invocations"]})
+        return {**result, "status": "partial", "remaining_shards": len(remaining)}
+
+    store.clear(bucket)
+    if not bucket_is_empty(s3_client, bucket):
+        # Objets écrits pendant la purge : on repartira de la racine au prochain run
+        return {**result, "status": "partial", "remaining_shards": 1}
+    return {**result, "status": "complete"}
+
+
+_default_store = get_checkpoint_store()
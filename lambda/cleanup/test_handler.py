@@ -47,6 +47,8 @@ INCOMPLETE_TAGS = [
 
 # Chemin vers le dossier qui contient handler.py
 HANDLER_DIR = os.path.dirname(os.path.abspath(__file__))
+# Dossier lambda/ : le module "shared" (layer Lambda) y est a la racine
+LAMBDA_DIR = os.path.dirname(HANDLER_DIR)
 
 
 def load_handler():
@@ -59,6 +61,8 @@ def load_handler():
     """
     if HANDLER_DIR not in sys.path:
         sys.path.insert(0, HANDLER_DIR)
+    if LAMBDA_DIR not in sys.path:
+        sys.path.append(LAMBDA_DIR)
 
     if "handler" in sys.modules:
         return importlib.reload(sys.modules["handler"])
@@ -333,3 +337,113 @@ def test_mix_conformes_et_non_conformes():
     assert body.get("s3_scanned", 0) >= 2
 
     print(f"\nResultat complet : {json.dumps(body, indent=2)}")
+
+
+# ========================================
+# TESTS MOTEUR (pagination + isolation des erreurs)
+# ========================================
+
+@mock_aws
+def test_rds_pagination_au_dela_de_la_premiere_page():
+    """describe_db_instances renvoie 100 instances par page : toutes doivent etre vues."""
+    rds = boto3.client("rds", region_name=REGION)
+    for i in range(105):
+        rds.create_db_instance(
+            DBInstanceIdentifier=f"db-{i}",
+            DBInstanceClass="db.t3.micro",
+            Engine="postgres",
+            MasterUsername="dbadmin",
+            MasterUserPassword="password123",
+            AllocatedStorage=20,
+        )
+
+    with patch.dict(os.environ, {"DRY_RUN": "true"}):
+        handler = load_handler()
+        # Quota RDS par defaut (8 req/s) : on l'eleve pour garder un test rapide
+        handler.rate_limiter.configure({"rds": 1000})
+        try:
+            result = handler.lambda_handler({}, None)
+        finally:
+            handler.rate_limiter.configure({})
+    body = json.loads(result["body"])
+
+    assert body["rds_scanned"] == 105
+    assert body["rds_non_compliant"] == 105
+
+
+@mock_aws
+def test_erreur_sur_une_ressource_n_interrompt_pas_le_service():
+    """Un echec de suppression est consigne dans le rapport, les autres instances sont terminees."""
+    ec2 = boto3.client("ec2", region_name=REGION)
+    resp = ec2.run_instances(ImageId="ami-12345678", MinCount=3, MaxCount=3)
+    ids = [i["InstanceId"] for i in resp["Instances"]]
+
+    handler = load_handler()
+    real_terminate = handler.ec2_client.terminate_instances
+
+    def flaky_terminate(InstanceIds):
+        if InstanceIds == [ids[0]]:
+            raise RuntimeError("UnauthorizedOperation")
+        return real_terminate(InstanceIds=InstanceIds)
+
+    with patch.object(handler.ec2_client, "terminate_instances", side_effect=flaky_terminate):
+        result = handler.lambda_handler({}, None)
+    body = json.loads(result["body"])
+
+    assert body["ec2_non_compliant"] == 3
+    assert body["ec2_deleted"] == 2
+    assert body["errors"] == [{
+        "service": "ec2", "resource_id": ids[0], "stage": "delete", "error": "UnauthorizedOperation",
+    }]
+
+
+@mock_aws
+def test_tags_config_en_retard_relus_avant_suppression():
+    """Tags Config non conformes mais tags live corriges depuis : rien n'est supprime."""
+    ec2 = boto3.client("ec2", region_name=REGION)
+    rds = boto3.client("rds", region_name=REGION)
+    s3 = boto3.client("s3", region_name=REGION)
+    lam = boto3.client("lambda", region_name=REGION)
+    iam = boto3.client("iam", region_name=REGION)
+
+    instance = ec2.run_instances(
+        ImageId="ami-12345678", MinCount=1, MaxCount=1,
+        TagSpecifications=[{"ResourceType": "instance", "Tags": COMPLIANT_TAGS}],
+    )["Instances"][0]
+    db = rds.create_db_instance(
+        DBInstanceIdentifier="db-corrigee", DBInstanceClass="db.t3.micro", Engine="postgres",
+        MasterUsername="dbadmin", MasterUserPassword="password123", AllocatedStorage=20,
+        Tags=COMPLIANT_TAGS,
+    )["DBInstance"]
+    s3.create_bucket(Bucket="bucket-corrige", CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_tagging(Bucket="bucket-corrige", Tagging={"TagSet": COMPLIANT_TAGS})
+    s3.create_bucket(Bucket="bucket-toujours-nu", CreateBucketConfiguration={"LocationConstraint": REGION})
+    role = iam.create_role(
+        RoleName="test-role",
+        AssumeRolePolicyDocument=json.dumps({"Version": "2012-10-17", "Statement": []}),
+    )["Role"]["Arn"]
+    function = lam.create_function(
+        FunctionName="function-corrigee", Runtime="python3.11", Role=role, Handler="index.handler",
+        Code={"ZipFile": b"fake code"}, Tags={t["Key"]: t["Value"] for t in COMPLIANT_TAGS},
+    )
+
+    handler = load_handler()
+    from shared.config_inventory import EMBEDDED_TAGS
+    from shared.tagset import TagSet
+    stale = TagSet(INCOMPLETE_TAGS)
+
+    assert handler.check_ec2_instance({
+        "InstanceId": instance["InstanceId"], "State": {"Name": "running"},
+        "Tags": INCOMPLETE_TAGS, EMBEDDED_TAGS: stale,
+    }) == "compliant"
+    assert handler.check_rds_instance({
+        "DBInstanceIdentifier": "db-corrigee", "DBInstanceArn": db["DBInstanceArn"],
+        "DBInstanceStatus": "available", EMBEDDED_TAGS: stale,
+    }) == "compliant"
+    assert handler.check_s3_bucket({"Name": "bucket-corrige", "BucketRegion": REGION, EMBEDDED_TAGS: stale}) == "compliant"
+    assert handler.check_lambda_function({
+        "FunctionName": "function-corrigee", "FunctionArn": function["FunctionArn"], EMBEDDED_TAGS: stale,
+    }) == "compliant"
+    # Tags live toujours incomplets ou bucket disparu : la decision Config est confirmee
+    assert handler.check_s3_bucket({"Name": "bucket-toujours-nu", "BucketRegion": REGION, EMBEDDED_TAGS: stale}) == "delete"
+    assert handler.check_s3_bucket({"Name": "bucket-disparu", "BucketRegion": REGION, EMBEDDED_TAGS: stale}) == "already_deleted"
@@ -0,0 +1,163 @@
+"""
+Tests unitaires du moteur de purge S3 (s3_purge.py).
+
+Verifie que :
+- Toutes les versions et delete markers sont supprimes, quel que soit le prefixe
+- Un timeout sauvegarde un checkpoint et la purge reprend a l'invocation suivante
+- Les erreurs SlowDown par cle sont reessayees
+- Un bucket trop gros recoit une regle lifecycle au lieu d'etre purge
+- Un marqueur de pagination supprime entre deux pages relance le listing du shard
+"""
+
+import os
+import sys
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+from moto.core.botocore_stubber import BotocoreStubber
+
+HANDLER_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.dirname(HANDLER_DIR)
+for path in (HANDLER_DIR, LAMBDA_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import s3_purge  # noqa: E402
+
+REGION = "eu-west-1"
+BUCKET = "bucket-a-purger"
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+
+
+@pytest.fixture(autouse=True)
+def moto_serialise(monkeypatch):
+    """Le backend S3 de moto n'est pas thread-safe (listing et suppression concurrents)."""
+    lock = threading.Lock()
+    process_request = BotocoreStubber.process_request
+
+    def locked(self, request):
+        with lock:
+            return process_request(self, request)
+
+    monkeypatch.setattr(BotocoreStubber, "process_request", locked)
+
+
+def create_versioned_bucket(keys):
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_versioning(Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"})
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"v1")
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"v2")
+    # Un delete marker en plus
+    s3.delete_object(Bucket=BUCKET, Key=keys[0])
+    return s3
+
+
+KEYS = ["racine.txt", "logs/2026/01/a.log", "logs/2026/02/b.log", "data/x.csv", "data/y/z.csv", "flat-key"]
+
+
+@mock_aws
+def test_purge_complete_toutes_versions_et_prefixes():
+    s3 = create_versioned_bucket(KEYS)
+    result = s3_purge.purge_bucket(s3, BUCKET, store=s3_purge.InMemoryCheckpointStore())
+
+    assert result["status"] == "complete"
+    # 2 versions par cle + 1 delete marker
+    assert result["deleted"] == len(KEYS) * 2 + 1
+    assert s3_purge.bucket_is_empty(s3, BUCKET)
+    s3.delete_bucket(Bucket=BUCKET)
+
+
+@mock_aws
+def test_timeout_sauvegarde_un_checkpoint_puis_reprend():
+    s3 = create_versioned_bucket(KEYS)
+    store = s3_purge.InMemoryCheckpointStore()
+
+    first = s3_purge.purge_bucket(s3, BUCKET, deadline=time.monotonic() - 1, store=store)
+    assert first["status"] == "partial"
+    assert store.load(BUCKET)["pending"] == [["", 0]]
+
+    second = s3_purge.purge_bucket(s3, BUCKET, store=store)
+    assert second["status"] == "complete"
+    assert second["invocations"] == 2
+    assert store.load(BUCKET) is None
+    assert s3_purge.bucket_is_empty(s3, BUCKET)
+
+
+class SlowDownOnce:
+    """Client S3 qui renvoie SlowDown pour toutes les cles au premier delete_objects."""
+
+    def __init__(self, client):
+        self._client = client
+        self.calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def delete_objects(self, Bucket, Delete):
+        self.calls += 1
+        if self.calls == 1:
+            return {"Errors": [
+                {"Key": o["Key"], "VersionId": o["VersionId"], "Code": "SlowDown", "Message": "Reduce your request rate"}
+                for o in Delete["Objects"]
+            ]}
+        return self._client.delete_objects(Bucket=Bucket, Delete=Delete)
+
+
+@mock_aws
+def test_slowdown_par_cle_est_reessaye():
+    s3 = create_versioned_bucket(["a", "b"])
+    flaky = SlowDownOnce(s3)
+    result = s3_purge.purge_bucket(
+        flaky, BUCKET, store=s3_purge.InMemoryCheckpointStore(), sleep=lambda _: None,
+    )
+
+    assert result["status"] == "complete"
+    assert result["slowdowns"] == 1
+    assert result["errors"] == []
+    assert s3_purge.bucket_is_empty(s3, BUCKET)
+
+
+class FakeCloudWatch:
+    def get_metric_statistics(self, **kwargs):
+        return {"Datapoints": [{"Timestamp": 1, "Average": 50_000_000.0}]}
+
+
+@mock_aws
+def test_gros_bucket_bascule_sur_lifecycle():
+    s3 = create_versioned_bucket(["a"])
+    result = s3_purge.purge_bucket(
+        s3, BUCKET, store=s3_purge.InMemoryCheckpointStore(), cloudwatch_client=FakeCloudWatch(),
+    )
+
+    assert result["status"] == "lifecycle"
+    rules = s3.get_bucket_lifecycle_configuration(Bucket=BUCKET)["Rules"]
+    assert {r["ID"] for r in rules} == {"governance-purge", "governance-purge-markers"}
+    # Deuxieme passage : regle deja en place, pas de nouvel appel
+    again = s3_purge.purge_bucket(
+        s3, BUCKET, store=s3_purge.InMemoryCheckpointStore(), cloudwatch_client=FakeCloudWatch(),
+    )
+    assert again["lifecycle_applied"] is False
+
+
+@mock_aws
+def test_marqueur_de_pagination_supprime_relance_le_shard(monkeypatch):
+    """moto exige que la derniere version listee existe encore pour servir la page suivante."""
+    monkeypatch.setenv("MOTO_S3_DEFAULT_MAX_KEYS", "5")
+    keys = [f"logs/{i:03d}.log" for i in range(40)]
+    s3 = create_versioned_bucket(keys)
+    result = s3_purge.purge_bucket(s3, BUCKET, store=s3_purge.InMemoryCheckpointStore(), shard_depth=0)
+
+    assert result["status"] == "complete"
+    assert result["errors"] == []
+    assert result["deleted"] == len(keys) * 2 + 1
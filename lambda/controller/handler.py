@@ -2,12 +2,21 @@
 Controller - Évalue, vérifie la conformité et notifie.
 Reçoit une action : evaluate | check_compliance | notify
 Notifie via SNS (email) + Slack webhook (visible immédiatement)
+
+Trois formes d'événement :
+- par ressource : {"action", "resource"} → résultat de l'action
+- par lot (pipeline Distributed Map) : {"action", "resources": [...], "failed": [...]}
+  → {"items": ressources enrichies du résultat, "failed": échecs cumulés}
+- événement EventBridge de changement de tags (aws.tag, CloudTrail, Config) :
+  réveille l'exécution en attente sur la ressource si elle est devenue conforme
+- {"action": "query_tag_index", ...} : ressources par tags / tags manquants,
+  servies par l'index du scanner (shared/tag_index.py), sans appel AWS
 """
 
 import os
 import json
+import time
 import urllib.request
-import boto3
 from datetime import datetime
 from botocore.exceptions import ClientError
 
@@ -18,19 +27,45 @@ logger = Logger(service="governance-controller")
 tracer = Tracer(service="governance-controller")
 metrics = Metrics(namespace="TagGovernance", service="governance-controller")
 
-from shared.config import REQUIRED_TAGS, check_tags
+from shared.config import check_tags, evaluate_tags
+from shared.policy import get_policy
+from shared.idempotency import get_store, key_from_event, run_idempotent
+from shared.s3_tags import S3TagFetcher
+from shared.tag_cache import TAG_CACHE_TABLE, get_tag_cache_store
+from shared.tag_index import TagIndexReader
+from shared.tagset import TagSet
+from shared.api_accounting import add_api_call_metrics, api_accounting
+from shared.profiling import sampled_profile
+from shared.ratelimit import add_rate_limit_metrics, limited_client
+from shared.wait_tokens import get_wait_store
 
 REGION = os.environ.get("AWS_REGION", "eu-west-1")
 SNS_TOPIC_ARN = os.environ["SNS_TOPIC_ARN"]
 ADMIN_EMAIL = os.environ["ADMIN_EMAIL"]
 SLACK_SECRET_NAME = os.environ.get("SLACK_SECRET_NAME", "")
 
-ec2 = boto3.client("ec2", region_name=REGION)
-rds = boto3.client("rds", region_name=REGION)
-s3 = boto3.client("s3", region_name=REGION)
-lmb = boto3.client("lambda", region_name=REGION)
-sns = boto3.client("sns", region_name=REGION)
-secretsmanager = boto3.client("secretsmanager", region_name=REGION)
+ec2 = limited_client("ec2", region_name=REGION)
+rds = limited_client("rds", region_name=REGION)
+s3 = limited_client("s3", region_name=REGION)
+lmb = limited_client("lambda", region_name=REGION)
+sns = limited_client("sns", region_name=REGION)
+secretsmanager = limited_client("secretsmanager", region_name=REGION)
+# Cache bucket → région conservé entre les invocations à chaud
+s3_tags = S3TagFetcher(s3, REGION)
+sfn = limited_client("stepfunctions", region_name=REGION)
+
+# Store d'idempotence — un retry Step Functions relit le résultat au lieu de renvoyer les notifications
+idempotency_store = get_store()
+
+# Jetons des exécutions en attente de correction des tags (AwaitTagFixJ0 / AwaitTagFixJ2)
+wait_store = get_wait_store()
+
+# Cache de tags des scanners (TAG_CACHE_TABLE) : ses marqueurs ne voient pas un
+# simple changement de tags, chaque événement supprime donc l'entrée concernée
+tag_cache_store = get_tag_cache_store() if TAG_CACHE_TABLE else None
+
+# Index inversé des tags tenu par le scanner (TAG_INDEX_URI), segments gardés à chaud
+tag_index = TagIndexReader()
 
 # Cache du webhook en mémoire — évite un appel Secrets Manager à chaque invocation
 _slack_webhook_url: str | None = None
@@ -53,28 +88,27 @@ def get_slack_webhook_url() -> str:
         return ""
 
 
-def get_current_tags(resource_type: str, resource_id: str, resource_arn: str) -> list:
+def get_current_tags(resource_type: str, resource_id: str, resource_arn: str, region: str = "") -> TagSet:
     try:
         if resource_type == "ec2":
             resp = ec2.describe_instances(InstanceIds=[resource_id])
-            return resp["Reservations"][0]["Instances"][0].get("Tags", [])
+            return TagSet(resp["Reservations"][0]["Instances"][0].get("Tags"))
         elif resource_type == "rds":
             resp = rds.list_tags_for_resource(ResourceName=resource_arn)
-            return resp.get("TagList", [])
+            return TagSet(resp.get("TagList"))
         elif resource_type == "s3":
-            try:
-                resp = s3.get_bucket_tagging(Bucket=resource_id)
-                return resp.get("TagSet", [])
-            except ClientError as e:
-                if e.response["Error"]["Code"] in ("NoSuchTagSet", "NoSuchBucket"):
-                    return []
-                raise
+            # Région du bucket : celle du payload du scanner, sinon résolue une fois
+            # (cache à chaud) ; pas de tags ≠ accès refusé
+            fetched = s3_tags.fetch(resource_id, region or None)
+            if fetched.status == "error":
+                raise RuntimeError(f"GetBucketTagging {fetched.region} : {fetched.error}")
+            return fetched.tags
         elif resource_type == "lambda":
             resp = lmb.list_tags(Resource=resource_arn)
-            return [{"Key": k, "Value": v} for k, v in resp.get("Tags", {}).items()]
+            return TagSet(resp.get("Tags"))
     except Exception as e:
         logger.error("Erreur récupération tags", extra={"resource_id": resource_id, "error": str(e)})
-    return []
+    return TagSet()
 
 
 # ========================================
@@ -109,6 +143,7 @@ def notify_slack(resource: dict, step: str):
                 {"title": "Type",           "value": resource["resource_type"].upper(),        "short": True},
                 {"title": "Étape",          "value": step,                                     "short": True},
                 {"title": "Tags manquants", "value": ", ".join(resource.get("missing_tags", [])) or "—", "short": False},
+                {"title": "Tags invalides", "value": ", ".join(resource.get("invalid_tags", [])) or "—", "short": False},
                 {"title": "Owner",          "value": resource.get("owner") or "INCONNU",       "short": True},
                 {"title": "Région",         "value": resource.get("region", REGION),           "short": True},
             ],
@@ -155,20 +190,27 @@ def action_check_compliance(resource: dict) -> dict:
         resource_type=resource["resource_type"],
         resource_id=resource["resource_id"],
         resource_arn=resource["resource_arn"],
+        region=resource.get("region", ""),
     )
-    compliant, missing = check_tags(tags)
+    result = evaluate_tags(tags, resource["resource_type"])
 
     logger.info("Check conformité", extra={
         "resource_id": resource["resource_id"],
-        "compliant": compliant,
-        "missing_tags": missing,
+        "compliant": result.compliant,
+        "missing_tags": result.missing,
+        "invalid_tags": result.invalid,
     })
 
-    if compliant:
+    if result.compliant:
         metrics.add_metric(name="TagsCorrectedByOwner", unit=MetricUnit.Count, value=1)
         notify_slack(resource, step="RESUME")
 
-    return {"compliant": compliant, "missing_tags": missing}
+    return {
+        "compliant": result.compliant,
+        "missing_tags": result.missing,
+        "invalid_tags": result.invalid,
+        "policy_version": get_policy().version,
+    }
 
 
 @tracer.capture_method
@@ -181,7 +223,8 @@ def action_notify(resource: dict, step: str) -> dict:
             f"[GOUVERNANCE AWS] Ressource non conforme détectée\n\n"
             f"Ressource      : {resource['resource_type'].upper()} {resource['resource_id']}\n"
             f"Région         : {resource['region']}\n"
-            f"Tags manquants : {', '.join(resource['missing_tags'])}\n\n"
+            f"Tags manquants : {', '.join(resource['missing_tags'])}\n"
+            f"Tags invalides : {', '.join(resource.get('invalid_tags', [])) or '—'}\n\n"
             f"⚠️  La ressource a été mise en pause.\n"
             f"Ajoutez les tags manquants dans les 48h pour la réactiver automatiquement.\n"
             f"Sans action, une relance sera envoyée à J+2 puis suppression à J+4."
@@ -190,7 +233,8 @@ def action_notify(resource: dict, step: str) -> dict:
             f"[GOUVERNANCE AWS] ⚠️  RAPPEL — Ressource toujours non conforme\n\n"
             f"Ressource      : {resource['resource_type'].upper()} {resource['resource_id']}\n"
             f"Région         : {resource['region']}\n"
-            f"Tags manquants : {', '.join(resource['missing_tags'])}\n\n"
+            f"Tags manquants : {', '.join(resource['missing_tags'])}\n"
+            f"Tags invalides : {', '.join(resource.get('invalid_tags', [])) or '—'}\n\n"
             f"🔴 Sans action dans les 48h, la ressource sera supprimée définitivement."
         ),
         "FAILURE": (
@@ -223,20 +267,215 @@ def action_notify(resource: dict, step: str) -> dict:
     return {"notified": True, "step": step, "target": notify_target}
 
 
-@logger.inject_lambda_context(log_event=True)
-@tracer.capture_lambda_handler
-@metrics.log_metrics
-def lambda_handler(event, context):
-    action = event.get("action")
-    resource = event.get("resource", event)
+# ========================================
+# RÉVEIL ANTICIPÉ SUR CORRECTION DES TAGS
+# ========================================
+
+def parse_resource_arn(arn: str) -> tuple[str, str]:
+    """ARN → (resource_type, resource_id) au format des payloads du scanner."""
+    parts = arn.split(":", 5)
+    service, rest = parts[2], parts[5]
+    if service == "ec2":
+        return "ec2", rest.split("/", 1)[-1]
+    if service == "rds":
+        return "rds", rest.split(":", 1)[-1]
+    if service == "lambda":
+        return "lambda", rest.split(":")[1]
+    return service, rest
+
+
+def tag_change_arns(event: dict) -> list:
+    """ARN des ressources concernées par un événement de changement de tags."""
+    detail = event.get("detail", {})
+    if event.get("detail-type") != "AWS API Call via CloudTrail":
+        # aws.tag "Tag Change on Resource" et Config : ARN dans "resources"
+        arns = event.get("resources") or [detail.get("configurationItem", {}).get("ARN")]
+        return [a for a in arns if a]
+
+    params = detail.get("requestParameters") or {}
+    name = detail.get("eventName")
+    if name in ("CreateTags", "DeleteTags"):
+        items = params.get("resourcesSet", {}).get("items", [])
+        return [
+            f"arn:aws:ec2:{event.get('region', REGION)}:{event.get('account')}:instance/{i['resourceId']}"
+            for i in items if i.get("resourceId", "").startswith("i-")
+        ]
+    if name in ("AddTagsToResource", "RemoveTagsFromResource"):
+        return [params["resourceName"]] if params.get("resourceName") else []
+    if name in ("PutBucketTagging", "DeleteBucketTagging"):
+        return [f"arn:aws:s3:::{params['bucketName']}"] if params.get("bucketName") else []
+    if name in ("TagResource", "UntagResource"):
+        return [params["resource"]] if params.get("resource") else []
+    return []
+
+
+def wake_execution(resource_arn: str, waiter: dict, reason: str) -> bool:
+    """SendTaskSuccess sur le jeton enregistré. Renvoie False si l'attente est déjà terminée."""
+    try:
+        sfn.send_task_success(
+            taskToken=waiter["token"],
+            output=json.dumps({"woken_by": reason, "compliant": True}),
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("TaskTimedOut", "TaskDoesNotExist", "InvalidToken"):
+            raise
+        logger.info("Jeton d'attente expiré", extra={"resource_arn": resource_arn, "error": e.response["Error"]["Code"]})
+        wait_store.delete(resource_arn, waiter["token"])
+        return False
+    wait_store.delete(resource_arn, waiter["token"])
+    logger.info("Exécution réveillée", extra={"resource_arn": resource_arn, "reason": reason, "state_name": waiter.get("state_name")})
+    metrics.add_metric(name="EarlyResume", unit=MetricUnit.Count, value=1)
+    return True
+
+
+@tracer.capture_method
+def action_await_tag_fix(resource: dict, event: dict) -> dict:
+    """
+    Début d'une attente waitForTaskToken : enregistre le jeton sous l'ARN.
+    Si les tags ont déjà été corrigés (avant l'enregistrement), réveil immédiat.
+    """
+    resource_arn = resource["resource_arn"]
+    waiter = {"token": event["task_token"], "state_name": event.get("state_name", "")}
+    wait_store.put(resource_arn, waiter["token"], event.get("execution_id", ""), waiter["state_name"])
+
+    tags = get_current_tags(resource["resource_type"], resource["resource_id"], resource_arn, resource.get("region", ""))
+    compliant, _ = check_tags(tags, resource["resource_type"])
+    woken = compliant and wake_execution(resource_arn, waiter, "already_compliant")
+    return {"registered": True, "woken": bool(woken)}
 
-    logger.info("Action reçue", extra={"action": action, "resource_id": resource.get("resource_id")})
+
+@tracer.capture_method
+def handle_tag_change_event(event: dict) -> dict:
+    woken = 0
+    arns = tag_change_arns(event)
+    for resource_arn in arns:
+        if tag_cache_store is not None:
+            try:
+                tag_cache_store.delete(resource_arn)
+            except Exception as e:
+                logger.warning("Invalidation du cache de tags impossible", extra={"resource_arn": resource_arn, "error": str(e)})
+        waiter = wait_store.get(resource_arn)
+        if not waiter:
+            continue
+        resource_type, resource_id = parse_resource_arn(resource_arn)
+        if event.get("source") == "aws.tag" and "tags" in event.get("detail", {}):
+            # L'événement porte déjà les tags complets : pas d'appel API
+            tags = TagSet(event["detail"]["tags"])
+        else:
+            tags = get_current_tags(resource_type, resource_id, resource_arn)
+        result = evaluate_tags(tags, resource_type)
+        if not result.compliant:
+            logger.info("Tags modifiés mais toujours non conformes", extra={
+                "resource_arn": resource_arn, "missing_tags": result.missing, "invalid_tags": result.invalid,
+            })
+            continue
+        woken += wake_execution(resource_arn, waiter, "tag_change")
+
+    return {"tag_change_arns": len(arns), "woken": woken}
+
+
+@tracer.capture_method
+def query_tag_index(event: dict) -> dict:
+    """
+    ARN des ressources qui portent tous les tags "tags", manquent toutes les clés
+    "missing" (au sens de la politique) et ont le type / compte / région donnés.
+    "values": clé → répartition des ressources par valeur de ce tag.
+    État du dernier scan (summary.updated_at), pas des tags à l'instant.
+    """
+    start = time.perf_counter()
+    arns = tag_index.query(
+        event.get("tags"), event.get("missing", []),
+        resource_type=event.get("resource_type"), account=event.get("account"), region=event.get("region"),
+    )
+    limit = int(event.get("limit", 1000))
+    result = {"count": len(arns), "resources": arns[:limit], "truncated": len(arns) > limit,
+              "index": tag_index.summary()}
+    if event.get("values"):
+        result["values"] = tag_index.values(event["values"])
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    metrics.add_metric(name="TagIndexQueryMs", unit=MetricUnit.Milliseconds, value=elapsed_ms)
+    logger.info("Requête sur l'index de tags", extra={"count": len(arns), "elapsed_ms": elapsed_ms})
+    return result
+
+
+# Clé sous laquelle le résultat est rangé sur chaque ressource d'un lot
+# (mêmes noms que les ResultPath du pipeline par ressource)
+BATCH_RESULT_KEYS = {"evaluate": "evaluation", "check_compliance": "compliance"}
+
+
+def process_resource(event: dict, resource: dict) -> dict:
+    action = event.get("action")
 
     if action == "evaluate":
-        return action_evaluate(resource)
+        run = lambda: action_evaluate(resource)
     elif action == "check_compliance":
-        return action_check_compliance(resource)
+        run = lambda: action_check_compliance(resource)
     elif action == "notify":
-        return action_notify(resource, step=event.get("step", "J0"))
+        step = event.get("step", "J0")
+        action = f"notify:{step}"
+        run = lambda: action_notify(resource, step=step)
+    elif action == "await_tag_fix":
+        # Pas de rejeu : un retry de la tâche porte un nouveau jeton, qui doit remplacer
+        # l'ancien dans wait_store (l'enregistrement est idempotent par nature)
+        return action_await_tag_fix(resource, event)
     else:
         raise ValueError(f"Action inconnue : {action}")
+
+    key = key_from_event(event, resource.get("resource_id", ""), action)
+    return run_idempotent(idempotency_store, key, run)
+
+
+@tracer.capture_method
+def process_batch(event: dict) -> dict:
+    """Applique l'action à chaque ressource du lot — un échec n'arrête pas les autres."""
+    action = event.get("action")
+    if action not in ("evaluate", "check_compliance", "notify"):
+        raise ValueError(f"Action inconnue : {action}")
+    result_key = event.get("result_key") or BATCH_RESULT_KEYS.get(action) or f"notify_{event.get('step', 'J0').lower()}"
+
+    items, failed = [], list(event.get("failed", []))
+    for resource in event["resources"]:
+        if event.get("error") and not resource.get("error"):
+            # Échec global du lot (Catch) : l'erreur est portée par l'événement
+            resource = {**resource, "error": event["error"]}
+        try:
+            result = process_resource(event, resource)
+        except Exception as e:
+            logger.exception("Échec sur une ressource du lot", extra={"action": action, "resource_id": resource.get("resource_id")})
+            failed.append({**resource, "error": str(e), "failed_action": action})
+            continue
+        items.append({**resource, result_key: result})
+
+    metrics.add_metric(name="BatchItemsProcessed", unit=MetricUnit.Count, value=len(items))
+    metrics.add_metric(name="BatchItemsFailed", unit=MetricUnit.Count, value=len(failed) - len(event.get("failed", [])))
+    return {"items": items, "failed": failed}
+
+
+@sampled_profile
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+def lambda_handler(event, context):
+    action = event.get("action")
+    policy_version = get_policy().version
+    logger.append_keys(policy_version=policy_version)
+    metrics.add_metadata(key="policy_version", value=policy_version)
+
+    if "detail-type" in event:
+        logger.info("Événement de changement de tags", extra={"source": event.get("source"), "detail_type": event["detail-type"]})
+        result = handle_tag_change_event(event)
+    elif action == "query_tag_index":
+        result = query_tag_index(event)
+    elif "resources" in event:
+        logger.info("Lot reçu", extra={"action": action, "batch_size": len(event["resources"])})
+        result = process_batch(event)
+    else:
+        resource = event.get("resource", event)
+        logger.info("Action reçue", extra={"action": action, "resource_id": resource.get("resource_id")})
+        result = process_resource(event, resource)
+
+    add_rate_limit_metrics(metrics)
+    api_calls = api_accounting.pop_summary()
+    logger.info("Bilan des appels API", extra={"api_calls": api_calls})
+    add_api_call_metrics(metrics, api_calls)
+    return result
@@ -0,0 +1,227 @@
+"""
+Tests unitaires du controller en mode lot (pipeline Distributed Map).
+
+Verifie que :
+- check_compliance range le resultat sous result_key pour chaque ressource,
+  ce qui permet au pipeline de separer conformes et non conformes par filtre JSONPath
+- L'erreur d'un Catch global est reportee sur chaque ressource notifiee
+- Un evenement de changement de tags reveille l'execution en attente (SendTaskSuccess)
+  seulement si la ressource est devenue conforme
+- Un retry de await_tag_fix enregistre le nouveau jeton (pas de rejeu idempotent)
+- query_tag_index repond depuis l'index du scanner, sans appel AWS
+
+Le handler est charge sous un nom unique : plusieurs Lambdas ont un handler.py.
+"""
+
+import os
+import sys
+import json
+import importlib.util
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+HANDLER_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.dirname(HANDLER_DIR)
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+REGION = "eu-west-1"
+
+
+class LambdaContext:
+    function_name = "governance-controller"
+    memory_limit_in_mb = 256
+    invoked_function_arn = f"arn:aws:lambda:{REGION}:123456789012:function:governance-controller"
+    aws_request_id = "test-request"
+
+
+COMPLIANT_TAGS = [
+    {"Key": "Owner", "Value": "test@entreprise.com"},
+    {"Key": "Squad", "Value": "Data"},
+    {"Key": "CostCenter", "Value": "CC-123"},
+    {"Key": "Environment", "Value": "dev"},
+]
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("AWS_REGION", REGION)
+    monkeypatch.setenv("ADMIN_EMAIL", "admin@entreprise.com")
+    monkeypatch.setenv("POWERTOOLS_TRACE_DISABLED", "1")
+    monkeypatch.delenv("IDEMPOTENCY_TABLE", raising=False)
+    monkeypatch.delenv("IDEMPOTENCY_SQLITE_PATH", raising=False)
+    with mock_aws():
+        topic = boto3.client("sns", region_name=REGION).create_topic(Name="governance")["TopicArn"]
+        monkeypatch.setenv("SNS_TOPIC_ARN", topic)
+        spec = importlib.util.spec_from_file_location("controller_handler", os.path.join(HANDLER_DIR, "handler.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
+
+
+def bucket(name):
+    return {
+        "resource_id": name,
+        "resource_type": "s3",
+        "resource_arn": f"arn:aws:s3:::{name}",
+        "region": REGION,
+        "missing_tags": ["Owner"],
+    }
+
+
+def test_check_compliance_par_lot(controller):
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.create_bucket(Bucket="corrige", CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_tagging(Bucket="corrige", Tagging={"TagSet": COMPLIANT_TAGS})
+    s3.create_bucket(Bucket="toujours-pas", CreateBucketConfiguration={"LocationConstraint": REGION})
+
+    result = controller.process_batch({
+        "action": "check_compliance",
+        "result_key": "compliance_j2",
+        "resources": [bucket("corrige"), bucket("toujours-pas")],
+        "failed": [],
+    })
+
+    verdicts = {r["resource_id"]: r["compliance_j2"]["compliant"] for r in result["items"]}
+    assert verdicts == {"corrige": True, "toujours-pas": False}
+    assert result["failed"] == []
+
+
+def test_notify_failure_reporte_l_erreur_du_lot(controller, monkeypatch):
+    published = []
+    monkeypatch.setattr(controller.sns, "publish", lambda **kwargs: published.append(kwargs))
+
+    result = controller.process_batch({
+        "action": "notify",
+        "step": "FAILURE",
+        "resources": [bucket("a"), bucket("b")],
+        "error": {"Error": "States.TaskFailed"},
+    })
+
+    assert [r["notify_failure"]["step"] for r in result["items"]] == ["FAILURE", "FAILURE"]
+    assert all("States.TaskFailed" in p["Message"] for p in published)
+
+
+def test_action_inconnue_refusee(controller):
+    with pytest.raises(ValueError):
+        controller.process_batch({"action": "freeze", "resources": []})
+
+
+class FakeStepFunctions:
+    def __init__(self, error_code=None):
+        self.error_code = error_code
+        self.successes = []
+
+    def send_task_success(self, taskToken, output):
+        if self.error_code:
+            raise ClientError({"Error": {"Code": self.error_code, "Message": ""}}, "SendTaskSuccess")
+        self.successes.append((taskToken, json.loads(output)))
+
+
+def tag_event(arn, tags):
+    return {
+        "source": "aws.tag",
+        "detail-type": "Tag Change on Resource",
+        "resources": [arn],
+        "detail": {"service": "s3", "resource-type": "bucket", "tags": tags},
+    }
+
+
+def test_changement_de_tags_reveille_l_execution(controller, monkeypatch):
+    fake = FakeStepFunctions()
+    monkeypatch.setattr(controller, "sfn", fake)
+    controller.wait_store.put("arn:aws:s3:::corrige", "token-1", "exec-1", "AwaitTagFixJ0")
+
+    # Tags incomplets : on continue d'attendre
+    partial = controller.handle_tag_change_event(tag_event("arn:aws:s3:::corrige", {"Owner": "a@b.c"}))
+    assert partial == {"tag_change_arns": 1, "woken": 0}
+    assert fake.successes == []
+
+    tags = {t["Key"]: t["Value"] for t in COMPLIANT_TAGS}
+    result = controller.handle_tag_change_event(tag_event("arn:aws:s3:::corrige", tags))
+    assert result == {"tag_change_arns": 1, "woken": 1}
+    assert fake.successes == [("token-1", {"woken_by": "tag_change", "compliant": True})]
+    assert controller.wait_store.get("arn:aws:s3:::corrige") is None
+
+
+def test_ressource_deja_conforme_a_l_enregistrement(controller, monkeypatch):
+    """Tags corriges entre le gel et l'enregistrement du jeton : reveil immediat."""
+    fake = FakeStepFunctions()
+    monkeypatch.setattr(controller, "sfn", fake)
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.create_bucket(Bucket="corrige", CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_tagging(Bucket="corrige", Tagging={"TagSet": COMPLIANT_TAGS})
+
+    result = controller.process_resource(
+        {"action": "await_tag_fix", "task_token": "token-1", "state_name": "AwaitTagFixJ0"}, bucket("corrige"),
+    )
+    assert result == {"registered": True, "woken": True}
+    assert fake.successes[0][1]["woken_by"] == "already_compliant"
+
+
+def test_retry_de_l_attente_enregistre_le_nouveau_jeton(controller, monkeypatch):
+    """Un retry de la tache waitForTaskToken apporte un nouveau jeton : pas de rejeu du resultat."""
+    monkeypatch.setattr(controller, "sfn", FakeStepFunctions())
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.create_bucket(Bucket="non-corrige", CreateBucketConfiguration={"LocationConstraint": REGION})
+    event = {"action": "await_tag_fix", "execution_id": "exec-1", "state_name": "AwaitTagFixJ0"}
+
+    first = controller.process_resource({**event, "task_token": "token-1"}, bucket("non-corrige"))
+    retried = controller.process_resource({**event, "task_token": "token-2"}, bucket("non-corrige"))
+
+    assert first == retried == {"registered": True, "woken": False}
+    assert controller.wait_store.get("arn:aws:s3:::non-corrige")["token"] == "token-2"
+
+
+def test_jeton_expire_nettoye(controller, monkeypatch):
+    monkeypatch.setattr(controller, "sfn", FakeStepFunctions(error_code="TaskTimedOut"))
+    controller.wait_store.put("arn:aws:s3:::corrige", "token-1")
+
+    tags = {t["Key"]: t["Value"] for t in COMPLIANT_TAGS}
+    assert controller.handle_tag_change_event(tag_event("arn:aws:s3:::corrige", tags))["woken"] == 0
+    assert controller.wait_store.get("arn:aws:s3:::corrige") is None
+
+
+def test_arns_depuis_cloudtrail(controller):
+    ec2_event = {
+        "detail-type": "AWS API Call via CloudTrail", "region": REGION, "account": "123456789012",
+        "detail": {"eventName": "CreateTags", "requestParameters": {"resourcesSet": {"items": [
+            {"resourceId": "i-0abc"}, {"resourceId": "vol-0def"},
+        ]}}},
+    }
+    s3_event = {
+        "detail-type": "AWS API Call via CloudTrail",
+        "detail": {"eventName": "PutBucketTagging", "requestParameters": {"bucketName": "logs"}},
+    }
+    assert controller.tag_change_arns(ec2_event) == [f"arn:aws:ec2:{REGION}:123456789012:instance/i-0abc"]
+    assert controller.tag_change_arns(s3_event) == ["arn:aws:s3:::logs"]
+    assert controller.parse_resource_arn("arn:aws:rds:eu-west-1:123456789012:db:orders") == ("rds", "orders")
+    assert controller.parse_resource_arn("arn:aws:lambda:eu-west-1:123456789012:function:job") == ("lambda", "job")
+
+
+def test_requete_sur_l_index_de_tags(controller, monkeypatch):
+    from shared.tag_index import InMemoryTagIndexStore, TagIndexReader, TagIndexUpdater
+
+    store = InMemoryTagIndexStore()
+    updater = TagIndexUpdater(store)
+    updater.begin("scan")
+    updater.add("arn:aws:s3:::logs", {"Squad": "Data"}, ["CostCenter"], type="s3", account="111")
+    updater.add("arn:aws:s3:::web", {"Squad": "Growth"}, ["CostCenter"], type="s3", account="222")
+    updater.add("arn:aws:s3:::lake", {"Squad": "Data", "CostCenter": "CC-1"}, [], type="s3", account="111")
+    updater.flush()
+    monkeypatch.setattr(controller, "tag_index", TagIndexReader(store))
+
+    result = controller.lambda_handler({"action": "query_tag_index", "missing": ["CostCenter"], "account": "222",
+                                        "values": "Squad"}, LambdaContext())
+    assert result["resources"] == ["arn:aws:s3:::web"] and result["count"] == 1
+    assert result["values"] == {"Data": 2, "Growth": 1}
+    assert result["index"]["resources"] == 3
+
+    owned = controller.query_tag_index({"tags": {"Squad": "Data"}, "limit": 1})
+    assert owned["count"] == 2 and owned["truncated"] and owned["resources"] == ["arn:aws:s3:::lake"]
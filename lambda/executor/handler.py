@@ -1,16 +1,23 @@
 """
 Executor - Actions destructives : freeze, resume, delete.
 Reçoit une action : freeze | resume | delete
+
+Comme le controller, accepte une ressource ({"resource"}) ou un lot
+({"resources", "failed"}) pour le pipeline Distributed Map.
 """
 
 import os
-import boto3
 from datetime import datetime
 from botocore.exceptions import ClientError
 
 from aws_lambda_powertools import Logger, Tracer, Metrics
 from aws_lambda_powertools.metrics import MetricUnit
 
+from shared.idempotency import get_store, key_from_event, run_idempotent
+from shared.api_accounting import add_api_call_metrics, api_accounting
+from shared.profiling import sampled_profile
+from shared.ratelimit import add_rate_limit_metrics, limited_client
+
 logger = Logger(service="governance-executor")
 tracer = Tracer(service="governance-executor")
 metrics = Metrics(namespace="TagGovernance", service="governance-executor")
@@ -18,10 +25,13 @@ metrics = Metrics(namespace="TagGovernance", service="governance-executor")
 REGION = os.environ.get("AWS_REGION", "eu-west-1")
 DRY_RUN = os.environ.get("DRY_RUN", "true").lower() == "true"
 
-ec2 = boto3.client("ec2", region_name=REGION)
-rds = boto3.client("rds", region_name=REGION)
-s3 = boto3.client("s3", region_name=REGION)
-lmb = boto3.client("lambda", region_name=REGION)
+ec2 = limited_client("ec2", region_name=REGION)
+rds = limited_client("rds", region_name=REGION)
+s3 = limited_client("s3", region_name=REGION)
+lmb = limited_client("lambda", region_name=REGION)
+
+# Store d'idempotence — un retry de FreezeResource ne recrée pas de snapshot RDS
+idempotency_store = get_store()
 
 
 # ========================================
@@ -187,16 +197,13 @@ DELETE_MAP = {
 }
 
 
-@logger.inject_lambda_context(log_event=True)
-@tracer.capture_lambda_handler
-@metrics.log_metrics
-def lambda_handler(event, context):
+BATCH_RESULT_KEYS = {"freeze": "freeze_result", "resume": "resume_result", "delete": "delete_result"}
+
+
+def process_resource(event: dict, resource: dict) -> dict:
     action = event.get("action")
-    resource = event.get("resource", event)
     resource_type = resource.get("resource_type")
 
-    logger.info("Action reçue", extra={"action": action, "resource_type": resource_type, "resource_id": resource.get("resource_id")})
-
     dispatch = {"freeze": FREEZE_MAP, "resume": RESUME_MAP, "delete": DELETE_MAP}.get(action)
 
     if not dispatch:
@@ -206,6 +213,60 @@ def lambda_handler(event, context):
     if not handler_fn:
         raise ValueError(f"Type de ressource non supporté : {resource_type}")
 
-    handler_fn(resource)
+    def run():
+        handler_fn(resource)
+        return {"action": action, "resource_id": resource["resource_id"], "dry_run": DRY_RUN, "status": "ok"}
+
+    key = key_from_event(event, resource["resource_id"], action)
+    return run_idempotent(idempotency_store, key, run)
+
 
-    return {"action": action, "resource_id": resource["resource_id"], "dry_run": DRY_RUN, "status": "ok"}
+@tracer.capture_method
+def process_batch(event: dict) -> dict:
+    """Applique l'action à chaque ressource du lot — un échec n'arrête pas les autres."""
+    action = event.get("action")
+    if action not in BATCH_RESULT_KEYS:
+        raise ValueError(f"Action inconnue : {action}")
+    result_key = event.get("result_key") or BATCH_RESULT_KEYS[action]
+
+    items, failed = [], list(event.get("failed", []))
+    for resource in event["resources"]:
+        try:
+            result = process_resource(event, resource)
+        except Exception as e:
+            logger.exception("Échec sur une ressource du lot", extra={"action": action, "resource_id": resource.get("resource_id")})
+            failed.append({**resource, "error": str(e), "failed_action": action})
+            continue
+        items.append({**resource, result_key: result})
+
+    metrics.add_metric(name="BatchItemsProcessed", unit=MetricUnit.Count, value=len(items))
+    metrics.add_metric(name="BatchItemsFailed", unit=MetricUnit.Count, value=len(failed) - len(event.get("failed", [])))
+    return {"items": items, "failed": failed}
+
+
+@sampled_profile
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+def lambda_handler(event, context):
+    action = event.get("action")
+    # Version de la politique qui a déclaré la ressource non conforme (payload du scanner)
+    resources = event.get("resources") or [event.get("resource", event)]
+    policy_version = next((r.get("policy_version") for r in resources if r.get("policy_version")), "")
+    if policy_version:
+        logger.append_keys(policy_version=policy_version)
+        metrics.add_metadata(key="policy_version", value=policy_version)
+
+    if "resources" in event:
+        logger.info("Lot reçu", extra={"action": action, "batch_size": len(event["resources"])})
+        result = process_batch(event)
+    else:
+        resource = event.get("resource", event)
+        logger.info("Action reçue", extra={"action": action, "resource_type": resource.get("resource_type"), "resource_id": resource.get("resource_id")})
+        result = process_resource(event, resource)
+
+    add_rate_limit_metrics(metrics)
+    api_calls = api_accounting.pop_summary()
+    logger.info("Bilan des appels API", extra={"api_calls": api_calls})
+    add_api_call_metrics(metrics, api_calls)
+    return result
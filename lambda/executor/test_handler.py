@@ -0,0 +1,92 @@
+"""
+Tests unitaires de l'executor en mode lot (pipeline Distributed Map).
+
+Verifie que :
+- Chaque ressource du lot recoit son resultat sous la cle de l'action
+- Une ressource en erreur passe dans "failed" sans bloquer les autres
+- Un retry du lot rejoue les ressources deja traitees (idempotence par ressource)
+- Le mode par ressource reste inchange
+
+Le handler est charge sous un nom unique : plusieurs Lambdas ont un handler.py.
+"""
+
+import os
+import sys
+import importlib.util
+
+import pytest
+from moto import mock_aws
+
+HANDLER_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.dirname(HANDLER_DIR)
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+REGION = "eu-west-1"
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("DRY_RUN", "true")
+    monkeypatch.setenv("POWERTOOLS_TRACE_DISABLED", "1")
+    monkeypatch.delenv("IDEMPOTENCY_TABLE", raising=False)
+    monkeypatch.delenv("IDEMPOTENCY_SQLITE_PATH", raising=False)
+    with mock_aws():
+        spec = importlib.util.spec_from_file_location("executor_handler", os.path.join(HANDLER_DIR, "handler.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
+
+
+def resource(resource_id, resource_type="ec2"):
+    return {
+        "resource_id": resource_id,
+        "resource_type": resource_type,
+        "resource_arn": f"arn:aws:{resource_type}:{REGION}:123456789012:{resource_id}",
+    }
+
+
+def batch_event(action, resources, failed=None):
+    return {
+        "action": action,
+        "resources": resources,
+        "failed": failed or [],
+        "execution_id": "arn:aws:states:eu-west-1:123456789012:execution:pipeline-batch/run:lot-1",
+        "state_name": "FreezeBatch",
+    }
+
+
+def test_lot_resultat_par_ressource_et_echecs_isoles(executor):
+    event = batch_event("freeze", [resource("i-1"), resource("x-1", "dynamodb"), resource("i-2")],
+                        failed=[{"resource_id": "old", "error": "avant"}])
+    result = executor.process_batch(event)
+
+    assert [r["resource_id"] for r in result["items"]] == ["i-1", "i-2"]
+    assert result["items"][0]["freeze_result"]["status"] == "ok"
+    # Les echecs des etapes precedentes sont conserves, le nouveau est ajoute
+    assert [r["resource_id"] for r in result["failed"]] == ["old", "x-1"]
+    assert result["failed"][1]["failed_action"] == "freeze"
+    assert "non supporté" in result["failed"][1]["error"]
+
+
+def test_retry_du_lot_rejoue_les_ressources_traitees(executor):
+    event = batch_event("freeze", [resource("i-1")])
+    first = executor.process_batch(event)
+    again = executor.process_batch(event)
+
+    assert "idempotent_replay" not in first["items"][0]["freeze_result"]
+    assert again["items"][0]["freeze_result"]["idempotent_replay"] is True
+
+
+def test_result_key_explicite(executor):
+    event = {**batch_event("resume", [resource("i-1")]), "result_key": "resumed_j2"}
+    result = executor.process_batch(event)
+    assert result["items"][0]["resumed_j2"]["action"] == "resume"
+
+
+def test_mode_par_ressource_inchange(executor):
+    result = executor.process_resource({"action": "delete"}, resource("i-1"))
+    assert result == {"action": "delete", "resource_id": "i-1", "dry_run": True, "status": "ok"}
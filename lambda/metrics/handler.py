@@ -4,44 +4,82 @@ Lambda de collecte de metriques pour le dashboard Grafana
 Cette fonction :
 1. Scanne les ressources AWS (EC2, RDS, S3, Lambda) pour la conformite des tags
 2. Interroge Cost Explorer pour les couts par tag
-3. Publie des metriques CloudWatch custom dans les namespaces :
-   - TagCompliance  : pourcentage de conformite + ressources non conformes
-   - ResourceCount  : nombre de ressources par type
-   - AutoShutdown   : economies estimees
-   - CostExplorer   : couts par Squad, CostCenter, service
-4. Executee toutes les 6 heures via EventBridge
+3. Avec CUR_URI, joint le Cost and Usage Report a l'inventaire (shared/cost_attribution.py)
+4. Publie des metriques CloudWatch custom dans les namespaces :
+   - TagCompliance   : pourcentage de conformite + ressources non conformes
+   - ResourceCount   : nombre de ressources par type
+   - AutoShutdown    : economies estimees
+   - CostExplorer    : couts par Squad, CostCenter, service
+   - CostAttribution : depense des ressources non conformes (compte, type, tag manquant)
+5. Executee toutes les 6 heures via EventBridge
 """
 
-import boto3
 import os
 import json
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any
+
+from shared.api_accounting import API_CALL_METRICS, api_accounting
+from shared.config import evaluate_tags
+from shared.config_inventory import ConfigInventory, discover, embedded_tags
+from shared.cost_attribution import CUR_URI, attribute_costs
+from shared.discovery import ec2_instances, paginate, rds_instances
+from shared.inventory_export import InventoryExport
+from shared.policy import get_policy
+from shared.profiling import sampled_profile
+from shared.ratelimit import limited_client, rate_limiter
+from shared.s3_tags import S3TagFetcher
+from shared.tag_cache import TagCache, lambda_marker, rds_marker
+from shared.tagset import TagSet
 
 # Configuration
-REQUIRED_TAGS = ["Owner", "Squad", "CostCenter", "Environment"]
 REGION = os.environ.get("AWS_REGION", "eu-west-1")
+# Nombre maximum de points par appel PutMetricData (limite AWS : 1000)
+PUT_METRIC_DATA_BATCH = 1000
 
 # Clients AWS
-ec2_client = boto3.client('ec2', region_name=REGION)
-rds_client = boto3.client('rds', region_name=REGION)
-s3_client = boto3.client('s3', region_name=REGION)
-lambda_client = boto3.client('lambda', region_name=REGION)
-cloudwatch = boto3.client('cloudwatch', region_name=REGION)
-ce_client = boto3.client('ce', region_name="us-east-1")
-
-
+ec2_client = limited_client('ec2', region_name=REGION)
+rds_client = limited_client('rds', region_name=REGION)
+s3_client = limited_client('s3', region_name=REGION)
+lambda_client = limited_client('lambda', region_name=REGION)
+cloudwatch = limited_client('cloudwatch', region_name=REGION)
+ce_client = limited_client('ce', region_name="us-east-1")
+sts_client = limited_client('sts', region_name=REGION)
+# Cache bucket -> region conserve entre les invocations a chaud
+s3_tags = S3TagFetcher(s3_client, REGION)
+# Tags RDS / Lambda gardes entre les collectes tant que le marqueur de changement est inchange.
+# Seuls des tags conformes sont servis par le cache : un ajout de tags ne change pas le marqueur
+tag_cache = TagCache("metrics")
+# Instantane Parquet de la collecte (INVENTORY_EXPORT_URI), pour l'analyse FinOps
+inventory_export = InventoryExport("metrics")
+
+# Inventaire AWS Config (INVENTORY_SOURCE=config) : avec un agregateur, toute
+# l'organisation est comptee, pas seulement le compte de la Lambda
+config_inventory = ConfigInventory(local_only=False)
+
+
+@sampled_profile
 def lambda_handler(event, context):
     """Point d'entree principal"""
 
     print("Demarrage de la collecte de metriques")
 
-    results = {}
+    # Politique rafraichie au plus une fois par TTL, figee pour toute la collecte
+    policy_version = get_policy().version
+    results = {"policy_version": policy_version}
+    # Instantane Config recharge a chaque invocation (INVENTORY_SOURCE=config)
+    config_inventory.reset()
+    tag_cache.begin()
 
     # 1. Metriques de conformite des tags
     compliance_data = collect_tag_compliance()
-    publish_tag_compliance_metrics(compliance_data)
+    publish_tag_compliance_metrics(compliance_data, policy_version)
     results["tag_compliance"] = compliance_data["summary"]
+    results["inventory"] = config_inventory.stats
+    cache_stats = tag_cache.flush()
+    publish_tag_cache_metrics(cache_stats)
+    results["tag_cache"] = cache_stats
+    results["inventory_export"] = export_inventory(compliance_data["resources"], policy_version)
 
     # 2. Metriques de comptage des ressources
     resource_counts = compliance_data["counts"]
@@ -61,6 +99,22 @@ def lambda_handler(event, context):
     else:
         results["cost_data"] = "unavailable (Cost Allocation Tags not yet active)"
 
+    # 5. Depense non conforme, invisible dans Cost Explorer (CUR_URI)
+    if CUR_URI:
+        results["cost_attribution"] = collect_cost_attribution(compliance_data["resources"])
+
+    # 6. Temps d'attente du rate limiter (quotas API partages avec scanner/cleanup)
+    api_stats = rate_limiter.pop_stats()
+    publish_rate_limit_metrics(api_stats)
+    results["api_rate_limit"] = {"wait_seconds": api_stats["wait_seconds"], "throttles": api_stats["throttles"]}
+
+    # 7. Bilan des appels API de l'invocation (les publications ci-dessus comprises)
+    api_calls = api_accounting.pop_summary()
+    print(f"Appels API : {json.dumps(api_calls, default=str)}")
+    if API_CALL_METRICS:
+        publish_api_call_metrics(api_calls)
+    results["api_calls"] = {k: api_calls[k] for k in ("calls", "errors", "retries", "throttles", "slowest_operation")}
+
     print(f"Collecte terminee : {json.dumps(results, default=str)}")
 
     return {
@@ -73,23 +127,24 @@ def lambda_handler(event, context):
 # COLLECTE DES DONNEES
 # ========================================
 
-def check_required_tags(tags: List[Dict[str, str]]) -> Tuple[bool, List[str]]:
-    """Verifie si tous les tags obligatoires sont presents"""
-    if not tags:
-        return False, REQUIRED_TAGS
+# Decouverte live (Describe/List). Avec INVENTORY_SOURCE=config, discover() sert les
+# memes enregistrements depuis AWS Config (tags joints) sauf pour les types non enregistres.
 
-    tag_keys = [tag.get('Key') for tag in tags]
-    missing_tags = [tag for tag in REQUIRED_TAGS if tag not in tag_keys]
+def discover_ec2_instances():
+    return ec2_instances(ec2_client)
 
-    return len(missing_tags) == 0, missing_tags
 
+def discover_rds_instances():
+    return rds_instances(rds_client)
 
-def get_tag_value(tags: List[Dict[str, str]], key: str) -> str:
-    """Recupere la valeur d'un tag par sa cle"""
-    for tag in tags:
-        if tag.get('Key') == key:
-            return tag.get('Value', '')
-    return ''
+
+def discover_s3_buckets():
+    return s3_client.list_buckets()['Buckets']
+
+
+def discover_lambda_functions():
+    for page in paginate(lambda_client, 'list_functions'):
+        yield from page['Functions']
 
 
 def collect_tag_compliance() -> Dict[str, Any]:
@@ -99,76 +154,95 @@ def collect_tag_compliance() -> Dict[str, Any]:
     counts = {"EC2": 0, "RDS": 0, "S3": 0, "Lambda": 0}
     total = 0
     compliant = 0
+    unreadable = 0
 
     # --- EC2 ---
     try:
-        paginator = ec2_client.get_paginator('describe_instances')
-        for page in paginator.paginate():
-            for reservation in page['Reservations']:
-                for instance in reservation['Instances']:
-                    state = instance.get('State', {}).get('Name')
-                    if state in ['terminated', 'terminating']:
-                        continue
-                    counts["EC2"] += 1
-                    total += 1
-                    tags = instance.get('Tags', [])
-                    is_ok, missing = check_required_tags(tags)
-                    if is_ok:
-                        compliant += 1
-                    all_resources.append({
-                        "type": "EC2",
-                        "id": instance['InstanceId'],
-                        "name": get_tag_value(tags, 'Name'),
-                        "compliant": is_ok,
-                        "missing_tags": missing,
-                        "tags": tags
-                    })
+        for instance in discover("ec2", discover_ec2_instances, config_inventory):
+            state = instance.get('State', {}).get('Name')
+            if state in ['terminated', 'terminating']:
+                continue
+            counts["EC2"] += 1
+            total += 1
+            tags = TagSet(instance.get('Tags'))
+            is_ok, missing, invalid = evaluate_tags(tags, "ec2")
+            if is_ok:
+                compliant += 1
+            all_resources.append({
+                "type": "EC2",
+                "id": instance['InstanceId'],
+                "region": instance.get('_region') or REGION,
+                "name": tags.get('Name'),
+                "compliant": is_ok,
+                "missing_tags": missing,
+                "invalid_tags": invalid,
+                "tags": tags
+            })
     except Exception as e:
         print(f"Erreur scan EC2 : {e}")
 
     # --- RDS ---
     try:
-        paginator = rds_client.get_paginator('describe_db_instances')
-        for page in paginator.paginate():
-            for db in page['DBInstances']:
-                counts["RDS"] += 1
-                total += 1
-                tags_response = rds_client.list_tags_for_resource(ResourceName=db['DBInstanceArn'])
-                tags = tags_response.get('TagList', [])
-                is_ok, missing = check_required_tags(tags)
-                if is_ok:
-                    compliant += 1
-                all_resources.append({
-                    "type": "RDS",
-                    "id": db['DBInstanceIdentifier'],
-                    "name": db['DBInstanceIdentifier'],
-                    "compliant": is_ok,
-                    "missing_tags": missing,
-                    "tags": tags
-                })
+        for db in discover("rds", discover_rds_instances, config_inventory):
+            counts["RDS"] += 1
+            total += 1
+            tags = embedded_tags(db)
+            if tags is None:
+                tags = tag_cache.get_or_fetch(
+                    db['DBInstanceArn'], rds_marker(db),
+                    lambda: TagSet(rds_client.list_tags_for_resource(ResourceName=db['DBInstanceArn']).get('TagList')),
+                    accept=lambda cached: evaluate_tags(cached, "rds").compliant,
+                )
+            is_ok, missing, invalid = evaluate_tags(tags, "rds")
+            if is_ok:
+                compliant += 1
+            all_resources.append({
+                "type": "RDS",
+                "id": db['DBInstanceIdentifier'],
+                "arn": db['DBInstanceArn'],
+                "region": db.get('_region') or REGION,
+                "name": db['DBInstanceIdentifier'],
+                "compliant": is_ok,
+                "missing_tags": missing,
+                "invalid_tags": invalid,
+                "tags": tags
+            })
     except Exception as e:
         print(f"Erreur scan RDS : {e}")
 
     # --- S3 ---
+    # Tags lus par region de bucket, en parallele. Un bucket illisible (AccessDenied...)
+    # n'entre pas dans le taux de conformite : il est compte a part
     try:
-        response = s3_client.list_buckets()
-        for bucket in response['Buckets']:
+        buckets = list(discover("s3", discover_s3_buckets, config_inventory))
+        fetched = {b.bucket: b for b in s3_tags.fetch_many(b for b in buckets if embedded_tags(b) is None)}
+        for bucket in buckets:
+            tags = embedded_tags(bucket)
+            if tags is None:
+                result = fetched[bucket['Name']]
+                if result.status == "error":
+                    unreadable += 1
+                    print(f"Tags S3 illisibles {bucket['Name']} ({result.region}) : {result.error}")
+                    continue
+                if result.status == "not_found":
+                    continue
+                tags = result.tags
+                region = result.region
+            else:
+                region = bucket.get('_region') or bucket.get('BucketRegion')
             counts["S3"] += 1
             total += 1
-            try:
-                tags_response = s3_client.get_bucket_tagging(Bucket=bucket['Name'])
-                tags = tags_response.get('TagSet', [])
-            except Exception:
-                tags = []
-            is_ok, missing = check_required_tags(tags)
+            is_ok, missing, invalid = evaluate_tags(tags, "s3")
             if is_ok:
                 compliant += 1
             all_resources.append({
                 "type": "S3",
                 "id": bucket['Name'],
+                "region": region or REGION,
                 "name": bucket['Name'],
                 "compliant": is_ok,
                 "missing_tags": missing,
+                "invalid_tags": invalid,
                 "tags": tags
             })
     except Exception as e:
@@ -176,27 +250,33 @@ def collect_tag_compliance() -> Dict[str, Any]:
 
     # --- Lambda ---
     try:
-        paginator = lambda_client.get_paginator('list_functions')
-        for page in paginator.paginate():
-            for func in page['Functions']:
-                # Ne pas compter les Lambdas de governance elles-memes
-                if func['FunctionName'] == os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
-                    continue
-                counts["Lambda"] += 1
-                total += 1
-                tags_response = lambda_client.list_tags(Resource=func['FunctionArn'])
-                tags = [{'Key': k, 'Value': v} for k, v in tags_response.get('Tags', {}).items()]
-                is_ok, missing = check_required_tags(tags)
-                if is_ok:
-                    compliant += 1
-                all_resources.append({
-                    "type": "Lambda",
-                    "id": func['FunctionName'],
-                    "name": func['FunctionName'],
-                    "compliant": is_ok,
-                    "missing_tags": missing,
-                    "tags": tags
-                })
+        for func in discover("lambda", discover_lambda_functions, config_inventory):
+            # Ne pas compter les Lambdas de governance elles-memes
+            if func['FunctionName'] == os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+                continue
+            counts["Lambda"] += 1
+            total += 1
+            tags = embedded_tags(func)
+            if tags is None:
+                tags = tag_cache.get_or_fetch(
+                    func['FunctionArn'], lambda_marker(func),
+                    lambda: TagSet(lambda_client.list_tags(Resource=func['FunctionArn']).get('Tags')),
+                    accept=lambda cached: evaluate_tags(cached, "lambda").compliant,
+                )
+            is_ok, missing, invalid = evaluate_tags(tags, "lambda")
+            if is_ok:
+                compliant += 1
+            all_resources.append({
+                "type": "Lambda",
+                "id": func['FunctionName'],
+                "arn": func['FunctionArn'],
+                "region": func.get('_region') or REGION,
+                "name": func['FunctionName'],
+                "compliant": is_ok,
+                "missing_tags": missing,
+                "invalid_tags": invalid,
+                "tags": tags
+            })
     except Exception as e:
         print(f"Erreur scan Lambda : {e}")
 
@@ -209,11 +289,38 @@ def collect_tag_compliance() -> Dict[str, Any]:
             "total": total,
             "compliant": compliant,
             "non_compliant": total - compliant,
+            "unreadable": unreadable,
             "percentage": round(percentage, 1)
         }
     }
 
 
+def export_inventory(resources: List[Dict], policy_version: str):
+    """
+    Ecrit l'instantane Parquet de la collecte, renvoie son emplacement.
+    Le compte est celui de la Lambda (les ressources d'un agregateur Config y
+    sont rattachees aussi). Un echec (pyarrow absent, S3 inaccessible)
+    n'interrompt pas la collecte.
+    """
+    if not inventory_export.enabled:
+        return None
+    try:
+        inventory_export.begin(policy_version, sts_client.get_caller_identity()["Account"])
+        for resource in resources:
+            inventory_export.add(
+                resource["type"].lower(), resource["id"], resource["tags"],
+                (resource["compliant"], resource["missing_tags"], resource["invalid_tags"]),
+                arn=resource.get("arn", ""), region=resource.get("region", ""),
+            )
+        location = inventory_export.write()
+    except Exception as e:
+        print(f"Export de l'inventaire impossible : {e}")
+        return None
+    if location:
+        print(f"Inventaire exporte : {location} ({len(inventory_export.rows)} ressources)")
+    return location
+
+
 def calculate_autoshutdown_savings(resources: List[Dict]) -> float:
     """
     Estime les economies liees aux ressources avec AutoShutdown=true.
@@ -231,7 +338,7 @@ def calculate_autoshutdown_savings(resources: List[Dict]) -> float:
     savings = 0.0
 
     for resource in resources:
-        auto_shutdown = get_tag_value(resource.get("tags", []), "AutoShutdown")
+        auto_shutdown = TagSet.of(resource.get("tags")).get("AutoShutdown")
         if auto_shutdown != "true":
             continue
 
@@ -332,12 +439,43 @@ def collect_cost_explorer_data() -> Dict[str, Any]:
     return result
 
 
+def collect_cost_attribution(resources: List[Dict]) -> Dict[str, Any]:
+    """
+    Joint les fichiers CUR de la periode a l'inventaire collecte et publie la
+    depense non conforme. Un echec (pyarrow absent, CUR illisible) est signale
+    sans interrompre la collecte.
+    """
+    try:
+        data = attribute_costs(resources, CUR_URI)
+    except ImportError:
+        print("pyarrow absent : attribution des couts CUR ignoree")
+        return {"status": "unavailable (pyarrow missing)"}
+    except Exception as e:
+        print(f"Attribution des couts CUR impossible : {e}")
+        return {"status": f"error: {e}"}
+    publish_cost_attribution_metrics(data)
+    return {k: v for k, v in data.items() if k not in ("top_non_compliant", "by_account_type")}
+
+
 # ========================================
 # PUBLICATION DES METRIQUES CLOUDWATCH
 # ========================================
 
-def publish_tag_compliance_metrics(data: Dict[str, Any]):
-    """Publie les metriques de conformite des tags"""
+def put_metric_data(namespace: str, metric_data: List[Dict[str, Any]]):
+    """PutMetricData par paquets de PUT_METRIC_DATA_BATCH points (un appel par paquet)"""
+
+    for i in range(0, len(metric_data), PUT_METRIC_DATA_BATCH):
+        cloudwatch.put_metric_data(
+            Namespace=namespace,
+            MetricData=metric_data[i:i + PUT_METRIC_DATA_BATCH]
+        )
+
+
+def publish_tag_compliance_metrics(data: Dict[str, Any], policy_version: str = ""):
+    """
+    Publie les metriques de conformite des tags. Le pourcentage global est aussi
+    publie par version de politique : un changement de regles explique un saut.
+    """
 
     summary = data["summary"]
 
@@ -353,6 +491,15 @@ def publish_tag_compliance_metrics(data: Dict[str, Any]):
                     {'Name': 'Scope', 'Value': 'Global'}
                 ]
             },
+            {
+                'MetricName': 'CompliancePercentage',
+                'Value': summary["percentage"],
+                'Unit': 'Percent',
+                'Dimensions': [
+                    {'Name': 'Scope', 'Value': 'Global'},
+                    {'Name': 'PolicyVersion', 'Value': policy_version or 'unknown'}
+                ]
+            },
             {
                 'MetricName': 'TotalResources',
                 'Value': summary["total"],
@@ -371,21 +518,19 @@ def publish_tag_compliance_metrics(data: Dict[str, Any]):
         ]
     )
 
-    # Metriques par type de ressource
-    for resource in data["resources"]:
-        if not resource["compliant"]:
-            cloudwatch.put_metric_data(
-                Namespace='TagCompliance',
-                MetricData=[{
-                    'MetricName': 'NonCompliantResources',
-                    'Value': 1,
-                    'Unit': 'Count',
-                    'Dimensions': [
-                        {'Name': 'ResourceType', 'Value': resource["type"]},
-                        {'Name': 'ResourceId', 'Value': resource["id"]}
-                    ]
-                }]
-            )
+    # Metriques par ressource non conforme
+    put_metric_data('TagCompliance', [
+        {
+            'MetricName': 'NonCompliantResources',
+            'Value': 1,
+            'Unit': 'Count',
+            'Dimensions': [
+                {'Name': 'ResourceType', 'Value': resource["type"]},
+                {'Name': 'ResourceId', 'Value': resource["id"]}
+            ]
+        }
+        for resource in data["resources"] if not resource["compliant"]
+    ])
 
     print(f"TagCompliance : {summary['percentage']}% conforme ({summary['compliant']}/{summary['total']})")
 
@@ -404,11 +549,7 @@ def publish_resource_count_metrics(counts: Dict[str, int]):
             ]
         })
 
-    if metric_data:
-        cloudwatch.put_metric_data(
-            Namespace='ResourceCount',
-            MetricData=metric_data
-        )
+    put_metric_data('ResourceCount', metric_data)
 
     print(f"ResourceCount : {counts}")
 
@@ -434,48 +575,131 @@ def publish_autoshutdown_metrics(savings: float):
 def publish_cost_explorer_metrics(data: Dict[str, Any]):
     """Publie les metriques de couts depuis Cost Explorer"""
 
+    metric_data = []
+
     # Couts par Squad
     for item in data.get("by_squad", []):
-        cloudwatch.put_metric_data(
-            Namespace='CostExplorer',
-            MetricData=[{
-                'MetricName': 'CostBySquad',
-                'Value': item["cost"],
-                'Unit': 'None',
-                'Dimensions': [
-                    {'Name': 'Squad', 'Value': item["squad"]}
-                ]
-            }]
-        )
+        metric_data.append({
+            'MetricName': 'CostBySquad',
+            'Value': item["cost"],
+            'Unit': 'None',
+            'Dimensions': [
+                {'Name': 'Squad', 'Value': item["squad"]}
+            ]
+        })
 
     # Couts par CostCenter
     for item in data.get("by_cost_center", []):
-        cloudwatch.put_metric_data(
-            Namespace='CostExplorer',
-            MetricData=[{
-                'MetricName': 'CostByCostCenter',
-                'Value': item["cost"],
-                'Unit': 'None',
-                'Dimensions': [
-                    {'Name': 'CostCenter', 'Value': item["cost_center"]}
-                ]
-            }]
-        )
+        metric_data.append({
+            'MetricName': 'CostByCostCenter',
+            'Value': item["cost"],
+            'Unit': 'None',
+            'Dimensions': [
+                {'Name': 'CostCenter', 'Value': item["cost_center"]}
+            ]
+        })
 
     # Couts par Service (Top 10)
     for item in data.get("by_service", []):
-        cloudwatch.put_metric_data(
-            Namespace='CostExplorer',
-            MetricData=[{
-                'MetricName': 'TopCostResources',
-                'Value': item["cost"],
-                'Unit': 'None',
-                'Dimensions': [
-                    {'Name': 'Service', 'Value': item["service"]}
-                ]
-            }]
-        )
+        metric_data.append({
+            'MetricName': 'TopCostResources',
+            'Value': item["cost"],
+            'Unit': 'None',
+            'Dimensions': [
+                {'Name': 'Service', 'Value': item["service"]}
+            ]
+        })
+
+    put_metric_data('CostExplorer', metric_data)
 
     print(f"CostExplorer : {len(data.get('by_squad', []))} squads, "
           f"{len(data.get('by_cost_center', []))} cost centers, "
           f"{len(data.get('by_service', []))} services")
+
+
+def publish_cost_attribution_metrics(data: Dict[str, Any]):
+    """Publie la depense attribuee par le CUR : non conforme par compte / type et par tag manquant"""
+
+    metric_data = [
+        {'MetricName': 'AttributedCost', 'Value': data["attributed_cost"], 'Unit': 'None'},
+        {'MetricName': 'NonCompliantCost', 'Value': data["non_compliant_cost"], 'Unit': 'None'},
+        # Ressources facturees absentes de l'inventaire (types non scannes, autres comptes)
+        {'MetricName': 'UnattributedCost', 'Value': data["unmatched_cost"], 'Unit': 'None'},
+    ]
+    for item in data["by_account_type"]:
+        metric_data.append({
+            'MetricName': 'NonCompliantCost',
+            'Value': item["cost"],
+            'Unit': 'None',
+            'Dimensions': [
+                {'Name': 'Account', 'Value': item["account"] or 'unknown'},
+                {'Name': 'ResourceType', 'Value': item["type"]},
+            ]
+        })
+    for tag, cost in data["by_missing_tag"].items():
+        metric_data.append({
+            'MetricName': 'NonCompliantCostByMissingTag',
+            'Value': cost,
+            'Unit': 'None',
+            'Dimensions': [{'Name': 'TagKey', 'Value': tag}]
+        })
+
+    put_metric_data('CostAttribution', metric_data)
+
+    print(f"CostAttribution : ${data['non_compliant_cost']} non conformes sur ${data['attributed_cost']} attribues "
+          f"({data['files']} fichiers CUR, {data['rows']} lignes)")
+
+
+def publish_rate_limit_metrics(stats: Dict[str, Any]):
+    """Publie le temps passe a attendre le rate limiter et le nombre de throttles"""
+
+    cloudwatch.put_metric_data(
+        Namespace='TagGovernance',
+        MetricData=[
+            {
+                'MetricName': 'ApiRateLimitWaitMs',
+                'Value': stats["wait_seconds"] * 1000,
+                'Unit': 'Milliseconds',
+                'Dimensions': [{'Name': 'service', 'Value': 'governance-metrics'}]
+            },
+            {
+                'MetricName': 'ApiThrottles',
+                'Value': stats["throttles"],
+                'Unit': 'Count',
+                'Dimensions': [{'Name': 'service', 'Value': 'governance-metrics'}]
+            }
+        ]
+    )
+
+    print(f"RateLimit : {stats['wait_seconds']}s d'attente, {stats['throttles']} throttles")
+
+
+def publish_tag_cache_metrics(stats: Dict[str, Any]):
+    """Publie le taux de reussite du cache de tags (appels ListTags evites)"""
+
+    dimensions = [{'Name': 'service', 'Value': 'governance-metrics'}]
+    cloudwatch.put_metric_data(
+        Namespace='TagGovernance',
+        MetricData=[
+            {'MetricName': 'TagCacheHits', 'Value': stats["hits"], 'Unit': 'Count', 'Dimensions': dimensions},
+            {'MetricName': 'TagCacheMisses', 'Value': stats["misses"], 'Unit': 'Count', 'Dimensions': dimensions},
+            {'MetricName': 'TagCacheHitRate', 'Value': stats["hit_rate"], 'Unit': 'Percent', 'Dimensions': dimensions},
+        ]
+    )
+
+    print(f"Cache de tags : {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']}%)")
+
+
+def publish_api_call_metrics(summary: Dict[str, Any]):
+    """Publie le bilan des appels API de l'invocation (API_CALL_METRICS=true)"""
+
+    dimensions = [{'Name': 'service', 'Value': 'governance-metrics'}]
+    cloudwatch.put_metric_data(
+        Namespace='TagGovernance',
+        MetricData=[
+            {'MetricName': 'ApiCalls', 'Value': summary["calls"], 'Unit': 'Count', 'Dimensions': dimensions},
+            {'MetricName': 'ApiCallErrors', 'Value': summary["errors"], 'Unit': 'Count', 'Dimensions': dimensions},
+            {'MetricName': 'ApiCallRetries', 'Value': summary["retries"], 'Unit': 'Count', 'Dimensions': dimensions},
+            {'MetricName': 'ApiCallLatencyMs', 'Value': summary["latency_ms_total"], 'Unit': 'Milliseconds', 'Dimensions': dimensions},
+        ]
+    )
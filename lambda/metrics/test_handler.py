@@ -0,0 +1,188 @@
+"""
+Tests unitaires de la Lambda de metriques (budget d'appels API).
+
+Verifie que :
+- Le nombre d'appels PutMetricData ne depend pas de la taille de la flotte
+  (les points par ressource non conforme partent par paquets)
+- Le bilan des appels API est renvoye dans le resultat de l'invocation
+- L'inventaire AWS Config produit les memes enregistrements que le scan live
+- Le cache de tags ne sert que des tags conformes : une ressource corrigee depuis
+  la collecte precedente n'est plus comptee non conforme
+- Avec CUR_URI, la depense des buckets non conformes est publiee (CostAttribution)
+
+Le handler est charge sous un nom unique : plusieurs Lambdas ont un handler.py.
+"""
+
+import os
+import sys
+import json
+import importlib.util
+
+import boto3
+import pytest
+from moto import mock_aws
+
+HANDLER_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.dirname(HANDLER_DIR)
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.api_accounting import api_budget  # noqa: E402
+from shared.tag_cache import InMemoryTagCacheStore, TagCache  # noqa: E402
+
+REGION = "eu-west-1"
+
+# Appels PutMetricData attendus quelle que soit la flotte : conformite globale,
+# ressources non conformes, comptage par type, auto-shutdown, Cost Explorer, rate limiter
+PUT_METRIC_DATA_BUDGET = 6
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("AWS_REGION", REGION)
+    with mock_aws():
+        spec = importlib.util.spec_from_file_location("metrics_handler", os.path.join(HANDLER_DIR, "handler.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.api_accounting.pop_summary()
+        yield module
+
+
+def create_buckets(count):
+    s3 = boto3.client("s3", region_name=REGION)
+    for i in range(count):
+        s3.create_bucket(Bucket=f"bucket-{i:04d}", CreateBucketConfiguration={"LocationConstraint": REGION})
+
+
+@pytest.mark.parametrize("buckets", [3, 40])
+def test_put_metric_data_independant_de_la_flotte(metrics, buckets):
+    create_buckets(buckets)
+
+    with api_budget({"cloudwatch.PutMetricData": PUT_METRIC_DATA_BUDGET, "s3.GetBucketTagging": buckets}) as used:
+        response = metrics.lambda_handler({}, None)
+
+    body = json.loads(response["body"])
+    assert body["tag_compliance"]["non_compliant"] == buckets
+    assert body["policy_version"] == "2026-10-19"
+    assert used["s3.GetBucketTagging"] == buckets
+    # Bilan de l'invocation : toutes les lectures de tags sans tags (NoSuchTagSet) sont comptees
+    assert body["api_calls"]["calls"] == sum(used.values())
+    assert body["api_calls"]["errors"] == buckets
+
+
+def test_paquets_de_1000_points(metrics):
+    data = [{"MetricName": "M", "Value": 1, "Unit": "Count"}] * 2500
+
+    with api_budget({"cloudwatch.PutMetricData": 3}) as used:
+        metrics.put_metric_data("Test", data)
+
+    assert used == {"cloudwatch.PutMetricData": 3}
+
+
+def config_responses(s3, ec2):
+    """Reponses Config equivalentes a la flotte moto (comme les renverrait le recorder)."""
+    results = []
+    for bucket in s3.list_buckets()["Buckets"]:
+        try:
+            tags = s3.get_bucket_tagging(Bucket=bucket["Name"])["TagSet"]
+        except s3.exceptions.ClientError:
+            tags = []
+        results.append({"resourceId": bucket["Name"], "resourceName": bucket["Name"], "resourceType": "AWS::S3::Bucket",
+                        "arn": f"arn:aws:s3:::{bucket['Name']}", "accountId": "123456789012", "awsRegion": REGION,
+                        "tags": [{"key": t["Key"], "value": t["Value"]} for t in tags]})
+    for reservation in ec2.describe_instances()["Reservations"]:
+        for instance in reservation["Instances"]:
+            results.append({"resourceId": instance["InstanceId"], "resourceType": "AWS::EC2::Instance",
+                            "accountId": "123456789012", "awsRegion": REGION,
+                            "tags": [{"key": t["Key"], "value": t["Value"]} for t in instance.get("Tags", [])],
+                            "configuration": {"state": {"name": instance["State"]["Name"]}}})
+    return {
+        "describe_configuration_recorders": {"ConfigurationRecorders": [{"name": "default", "recordingGroup": {
+            "allSupported": False, "resourceTypes": ["AWS::S3::Bucket", "AWS::EC2::Instance"]}}]},
+        "describe_configuration_recorder_status": {"ConfigurationRecordersStatus": [{"name": "default", "recording": True}]},
+        "select_resource_config": [{"Results": [json.dumps(r) for r in results[:3]], "NextToken": "page-2"},
+                                   {"Results": [json.dumps(r) for r in results[3:]]}],
+    }
+
+
+def test_inventaire_config_identique_au_scan_live(metrics, monkeypatch):
+    from shared import config_inventory as config_inventory_module
+    from shared.test_config_inventory import RecordedConfigClient
+
+    s3 = boto3.client("s3", region_name=REGION)
+    ec2 = boto3.client("ec2", region_name=REGION)
+    create_buckets(4)
+    s3.put_bucket_tagging(Bucket="bucket-0001", Tagging={"TagSet": [
+        {"Key": "Owner", "Value": "alice@example.com"}, {"Key": "Squad", "Value": "data"},
+        {"Key": "CostCenter", "Value": "CC-1234"}, {"Key": "Environment", "Value": "dev"}]})
+    ec2.run_instances(ImageId="ami-12345678", MinCount=2, MaxCount=2, TagSpecifications=[
+        {"ResourceType": "instance", "Tags": [{"Key": "Owner", "Value": "bob@example.com"}]}])
+
+    live = metrics.collect_tag_compliance()
+
+    monkeypatch.setattr(config_inventory_module, "INVENTORY_SOURCE", "config")
+    metrics.config_inventory._client = RecordedConfigClient(config_responses(s3, ec2))
+    metrics.config_inventory.reset()
+    with api_budget({"s3.GetBucketTagging": 0, "ec2.DescribeInstances": 0}):
+        from_config = metrics.collect_tag_compliance()
+
+    key = lambda r: (r["type"], r["id"])  # noqa: E731
+    assert sorted(from_config["resources"], key=key) == sorted(live["resources"], key=key)
+    assert from_config["summary"] == live["summary"]
+    assert metrics.config_inventory.stats["fallbacks"] == ["rds", "lambda"]
+
+
+def test_attribution_des_couts_cur(metrics, monkeypatch, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    create_buckets(2)
+    boto3.client("s3", region_name=REGION).put_bucket_tagging(Bucket="bucket-0001", Tagging={"TagSet": [
+        {"Key": "Owner", "Value": "alice@example.com"}, {"Key": "Squad", "Value": "data"},
+        {"Key": "CostCenter", "Value": "CC-1234"}, {"Key": "Environment", "Value": "dev"}]})
+    pq.write_table(pa.table({
+        "line_item_resource_id": ["bucket-0000", "bucket-0001", "bucket-0000"],
+        "line_item_usage_account_id": ["123456789012"] * 3,
+        "line_item_product_code": ["AmazonS3"] * 3,
+        "line_item_unblended_cost": [12.0, 3.0, 0.5],
+    }), tmp_path / "cur.parquet")
+    monkeypatch.setattr(metrics, "CUR_URI", str(tmp_path))
+
+    body = json.loads(metrics.lambda_handler({}, None)["body"])
+    assert body["cost_attribution"]["non_compliant_cost"] == 12.5
+    assert body["cost_attribution"]["by_missing_tag"]["Owner"] == 12.5
+
+    published = boto3.client("cloudwatch", region_name=REGION).list_metrics(Namespace="CostAttribution")["Metrics"]
+    by_type = [m for m in published if m["MetricName"] == "NonCompliantCost" and m["Dimensions"]]
+    assert by_type[0]["Dimensions"] == [{"Name": "Account", "Value": "123456789012"},
+                                        {"Name": "ResourceType", "Value": "s3"}]
+
+
+def test_cache_de_tags_relit_les_non_conformes(metrics, monkeypatch):
+    iam = boto3.client("iam", region_name=REGION)
+    role = iam.create_role(RoleName="fn", AssumeRolePolicyDocument="{}")["Role"]["Arn"]
+    lam = boto3.client("lambda", region_name=REGION)
+    function = lam.create_function(FunctionName="corrigee", Runtime="python3.11", Role=role,
+                                   Handler="index.handler", Code={"ZipFile": b"code"})
+    cache = TagCache("metrics", InMemoryTagCacheStore(), ttl_seconds=3600, full_refresh_seconds=0)
+    monkeypatch.setattr(metrics, "tag_cache", cache)
+
+    def collect():
+        cache.begin()
+        data = metrics.collect_tag_compliance()
+        return data, cache.flush()
+
+    data, _ = collect()
+    assert data["summary"]["non_compliant"] == 1
+
+    # Le tagging ne change pas le marqueur (RevisionId) : seul accept() force la relecture
+    lam.tag_resource(Resource=function["FunctionArn"], Tags={
+        "Owner": "test@entreprise.com", "Squad": "Data", "CostCenter": "CC-123", "Environment": "dev",
+    })
+    data, stats = collect()
+    assert data["summary"]["non_compliant"] == 0 and stats["misses"] == 1
+
+    data, stats = collect()
+    assert data["summary"]["non_compliant"] == 0 and stats["hits"] == 1
@@ -1,11 +1,32 @@
 """
-Scanner - Détecte les ressources non conformes et lance une Step Function par ressource.
+Scanner - Détecte les ressources non conformes et lance le pipeline d'escalade.
+
+PIPELINE_MODE :
+- "per_resource" (défaut) : une exécution Step Functions par ressource
+- "batch" : une exécution du pipeline par lots pour jusqu'à BATCH_EXECUTION_SIZE
+  ressources, découpées en lots de PIPELINE_BATCH_SIZE par le Distributed Map
+
+SCAN_MODE :
+- "single" (défaut) : une invocation scanne tous les services
+- "fanout" : l'invocation planifiée devient coordinateur ; elle découpe le scan en
+  shards (un par service, SCAN_SHARDS pour partager un service en plusieurs parts)
+  et se réinvoque en asynchrone pour chacun (voir shared/fanout.py). Le dernier
+  worker terminé agrège les résultats partiels et publie le bilan.
+
+LAUNCH_MODE :
+- "direct" (défaut) : le scan lance le pipeline pour chaque ressource non conforme
+- "queue" : le scan met les payloads en file (voir shared/remediation_queue.py) ;
+  l'événement {"remediation_drain": true}, planifié, les reprend par priorité et
+  lance au plus REMEDIATION_LAUNCH_RATE exécutions par seconde
 """
 
 import os
 import json
-import boto3
+import time
+import uuid
+import functools
 from datetime import datetime
+from typing import Optional
 
 from aws_lambda_powertools import Logger, Tracer, Metrics
 from aws_lambda_powertools.metrics import MetricUnit
@@ -14,124 +35,232 @@ logger = Logger(service="governance-scanner")
 tracer = Tracer(service="governance-scanner")
 metrics = Metrics(namespace="TagGovernance", service="governance-scanner")
 
-from shared.config import REQUIRED_TAGS, check_tags, get_tag_value
+from shared.config import evaluate_tags
+from shared.config_inventory import config_inventory, discover, embedded_tags
+from shared.discovery import ec2_instances, paginate, rds_instances
+from shared.fanout import LambdaInvoker, Shard, get_shard_store, plan_shards
+from shared.inventory_export import InventoryExport, resource_arn
+from shared.policy import get_policy
+from shared.remediation_queue import get_remediation_queue
+from shared.s3_tags import S3TagFetcher
+from shared.tag_cache import TagCache, lambda_marker, rds_marker
+from shared.tag_index import TagIndexUpdater
+from shared.tagset import TagSet
+from shared.api_accounting import add_api_call_metrics, api_accounting
+from shared.profiling import sampled_profile
+from shared.ratelimit import TokenBucket, add_rate_limit_metrics, limited_client
 
 REGION = os.environ.get("AWS_REGION", "eu-west-1")
 STATE_MACHINE_ARN = os.environ["STATE_MACHINE_ARN"]
+BATCH_STATE_MACHINE_ARN = os.environ.get("BATCH_STATE_MACHINE_ARN", "")
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "per_resource")
+PIPELINE_BATCH_SIZE = int(os.environ.get("PIPELINE_BATCH_SIZE", "25"))
+PIPELINE_MAX_CONCURRENCY = int(os.environ.get("PIPELINE_MAX_CONCURRENCY", "10"))
+# L'entrée d'une exécution est limitée à 256 Ko (~500 octets par ressource)
+BATCH_EXECUTION_SIZE = int(os.environ.get("BATCH_EXECUTION_SIZE", "400"))
+SCAN_MODE = os.environ.get("SCAN_MODE", "single")
+# Nombre de parts par service en mode fanout, ex. {"s3": 4, "lambda": 2} (défaut : 1)
+SCAN_SHARDS = json.loads(os.environ.get("SCAN_SHARDS") or "{}")
+# Segment de l'index de tags du mode single (en fanout : un par shard)
+SINGLE_SCAN_SEGMENT = "scan"
+LAUNCH_MODE = os.environ.get("LAUNCH_MODE", "direct")
+# Mode queue : exécutions lancées par seconde, et au plus par invocation de vidage
+REMEDIATION_LAUNCH_RATE = float(os.environ.get("REMEDIATION_LAUNCH_RATE", "2"))
+REMEDIATION_DRAIN_MAX = int(os.environ.get("REMEDIATION_DRAIN_MAX", "200"))
+# Mode fanout : reprises de l'enregistrement d'un shard (chacune fait déjà plusieurs tentatives)
+SHARD_RECORD_ROUNDS = int(os.environ.get("SHARD_RECORD_ROUNDS", "5"))
 
-ec2 = boto3.client("ec2", region_name=REGION)
-rds = boto3.client("rds", region_name=REGION)
-s3 = boto3.client("s3", region_name=REGION)
-lmb = boto3.client("lambda", region_name=REGION)
-sfn = boto3.client("stepfunctions", region_name=REGION)
-sts = boto3.client("sts")
+ec2 = limited_client("ec2", region_name=REGION)
+rds = limited_client("rds", region_name=REGION)
+s3 = limited_client("s3", region_name=REGION)
+lmb = limited_client("lambda", region_name=REGION)
+sfn = limited_client("stepfunctions", region_name=REGION)
+sts = limited_client("sts")
+# Cache bucket → région conservé entre les invocations à chaud
+s3_tags = S3TagFetcher(s3, REGION)
+# Tags RDS / Lambda gardés entre les scans tant que le marqueur de changement est inchangé.
+# Seuls des tags conformes sont servis par le cache : un ajout de tags ne change pas le
+# marqueur, une ressource non conforme est donc relue à chaque scan.
+tag_cache = TagCache("scanner")
+# Instantané Parquet de toutes les ressources évaluées (INVENTORY_EXPORT_URI)
+inventory_export = InventoryExport("scanner")
+# Index inversé des tags (TAG_INDEX_URI) : un segment par shard, mis à jour à chaque scan
+tag_index = TagIndexUpdater()
 
+# Mode fanout : résultats partiels des workers, invocation asynchrone des shards
+shard_store = get_shard_store()
+invoker = None  # LambdaInvoker créé à la première utilisation ; InProcessInvoker en test
 
-def get_account_id() -> str:
-    return sts.get_caller_identity()["Account"]
-
+# Mode queue : file de remédiation priorisée, débit de lancement lissé (pas de rafale)
+remediation_queue = get_remediation_queue()
+launch_rate = TokenBucket(REMEDIATION_LAUNCH_RATE, burst=1)
 
 
+@functools.lru_cache(maxsize=1)
+def get_account_id() -> str:
+    """Compte de la Lambda : un seul GetCallerIdentity par conteneur (appelé pour chaque ressource)."""
+    return sts.get_caller_identity()["Account"]
 
 
-def build_payload(resource_id: str, resource_type: str, resource_arn: str, tags: list, missing: list) -> dict:
+def build_payload(resource_id: str, resource_type: str, resource_arn: str, tags: TagSet, missing: list,
+                  invalid: list, region: str = "", instance_type: str = "") -> dict:
     return {
         "resource_id": resource_id,
         "resource_type": resource_type,
         "resource_arn": resource_arn,
-        "owner": get_tag_value(tags, "Owner"),
-        "squad": get_tag_value(tags, "Squad"),
+        "owner": tags.get("Owner"),
+        "squad": tags.get("Squad"),
+        # Priorité de la file de remédiation : environnement et gabarit (coût estimé)
+        "environment": tags.get("Environment"),
+        "instance_type": instance_type,
         "missing_tags": missing,
+        "invalid_tags": invalid,
+        "policy_version": get_policy().version,
         "account_id": get_account_id(),
-        "region": REGION,
+        "region": region or REGION,
         "detected_at": datetime.utcnow().isoformat() + "Z",
     }
 
 
+# Découverte live (Describe/List). Avec INVENTORY_SOURCE=config, discover() sert les
+# mêmes enregistrements depuis AWS Config, tags joints, et ne repasse ici que pour
+# les types non enregistrés.
+
+def discover_ec2_instances():
+    return ec2_instances(ec2)
+
+
+def discover_rds_instances():
+    return rds_instances(rds)
+
+
+def discover_s3_buckets():
+    return s3.list_buckets().get("Buckets", [])
+
+
+def discover_lambda_functions():
+    for page in paginate(lmb, "list_functions"):
+        yield from page["Functions"]
+
+
 @tracer.capture_method
-def scan_ec2() -> list:
+def scan_ec2(shard: Optional[Shard] = None) -> list:
     resources = []
-    paginator = ec2.get_paginator("describe_instances")
-    for page in paginator.paginate():
-        for reservation in page["Reservations"]:
-            for instance in reservation["Instances"]:
-                if instance.get("State", {}).get("Name") in ["terminated", "terminating"]:
-                    continue
-                tags = instance.get("Tags", [])
-                compliant, missing = check_tags(tags)
-                if not compliant:
-                    resources.append(build_payload(
-                        resource_id=instance["InstanceId"],
-                        resource_type="ec2",
-                        resource_arn=f"arn:aws:ec2:{REGION}:{get_account_id()}:instance/{instance['InstanceId']}",
-                        tags=tags,
-                        missing=missing,
-                    ))
+    for instance in discover("ec2", discover_ec2_instances):
+        if instance.get("State", {}).get("Name") in ["terminated", "terminating"]:
+            continue
+        if shard and not shard.owns(instance["InstanceId"]):
+            continue
+        tags = TagSet(instance.get("Tags"))
+        result = evaluate_tags(tags, "ec2")
+        record_resource("ec2", instance["InstanceId"], tags, result, region=REGION)
+        if not result.compliant:
+            resources.append(build_payload(
+                resource_id=instance["InstanceId"],
+                resource_type="ec2",
+                resource_arn=f"arn:aws:ec2:{REGION}:{get_account_id()}:instance/{instance['InstanceId']}",
+                tags=tags,
+                missing=result.missing,
+                invalid=result.invalid,
+                instance_type=instance.get("InstanceType", ""),
+            ))
     return resources
 
 
 @tracer.capture_method
-def scan_rds() -> list:
+def scan_rds(shard: Optional[Shard] = None) -> list:
     resources = []
-    paginator = rds.get_paginator("describe_db_instances")
-    for page in paginator.paginate():
-        for db in page["DBInstances"]:
-            if db["DBInstanceStatus"] in ["deleting", "deleted"]:
-                continue
-            tags_resp = rds.list_tags_for_resource(ResourceName=db["DBInstanceArn"])
-            tags = tags_resp.get("TagList", [])
-            compliant, missing = check_tags(tags)
-            if not compliant:
-                resources.append(build_payload(
-                    resource_id=db["DBInstanceIdentifier"],
-                    resource_type="rds",
-                    resource_arn=db["DBInstanceArn"],
-                    tags=tags,
-                    missing=missing,
-                ))
+    for db in discover("rds", discover_rds_instances):
+        if db["DBInstanceStatus"] in ["deleting", "deleted"]:
+            continue
+        if shard and not shard.owns(db["DBInstanceIdentifier"]):
+            continue
+        tags = embedded_tags(db)
+        if tags is None:
+            tags = tag_cache.get_or_fetch(
+                db["DBInstanceArn"], rds_marker(db),
+                lambda: TagSet(rds.list_tags_for_resource(ResourceName=db["DBInstanceArn"]).get("TagList")),
+                accept=lambda cached: evaluate_tags(cached, "rds").compliant,
+            )
+        result = evaluate_tags(tags, "rds")
+        record_resource("rds", db["DBInstanceIdentifier"], tags, result, arn=db["DBInstanceArn"], region=REGION)
+        if not result.compliant:
+            resources.append(build_payload(
+                resource_id=db["DBInstanceIdentifier"],
+                resource_type="rds",
+                resource_arn=db["DBInstanceArn"],
+                tags=tags,
+                missing=result.missing,
+                invalid=result.invalid,
+                instance_type=db.get("DBInstanceClass", ""),
+            ))
     return resources
 
 
 @tracer.capture_method
-def scan_s3() -> list:
+def scan_s3(shard: Optional[Shard] = None) -> list:
     resources = []
-    for bucket in s3.list_buckets().get("Buckets", []):
-        name = bucket["Name"]
-        try:
-            tags = s3.get_bucket_tagging(Bucket=name).get("TagSet", [])
-        except s3.exceptions.ClientError:
-            tags = []
-        compliant, missing = check_tags(tags)
-        if not compliant:
+    buckets = {bucket["Name"]: bucket for bucket in discover("s3", discover_s3_buckets)
+               if not shard or shard.owns(bucket["Name"])}
+    found = {name: (embedded_tags(bucket), bucket.get("BucketRegion"))
+             for name, bucket in buckets.items() if embedded_tags(bucket) is not None}
+    # Lecture des tags par région du bucket, en parallèle ; une erreur d'accès n'est
+    # pas un bucket sans tags : il est ignoré plutôt que mis dans le pipeline
+    unreadable = 0
+    for fetched in s3_tags.fetch_many(bucket for name, bucket in buckets.items() if name not in found):
+        if fetched.status == "error":
+            unreadable += 1
+            logger.warning("Tags S3 illisibles", extra={"bucket": fetched.bucket, "region": fetched.region, "error": fetched.error})
+        elif fetched.status != "not_found":
+            found[fetched.bucket] = (fetched.tags, fetched.region)
+    if unreadable:
+        metrics.add_metric(name="S3TagReadErrors", unit=MetricUnit.Count, value=unreadable)
+
+    for name in buckets:
+        if name not in found:
+            continue
+        tags, region = found[name]
+        result = evaluate_tags(tags, "s3")
+        record_resource("s3", name, tags, result, region=region or REGION)
+        if not result.compliant:
             resources.append(build_payload(
                 resource_id=name,
                 resource_type="s3",
                 resource_arn=f"arn:aws:s3:::{name}",
                 tags=tags,
-                missing=missing,
+                missing=result.missing,
+                invalid=result.invalid,
+                region=region,
             ))
     return resources
 
 
 @tracer.capture_method
-def scan_lambda() -> list:
+def scan_lambda(shard: Optional[Shard] = None) -> list:
     resources = []
-    paginator = lmb.get_paginator("list_functions")
-    for page in paginator.paginate():
-        for func in page["Functions"]:
-            if func["FunctionName"] == os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
-                continue
-            tags_resp = lmb.list_tags(Resource=func["FunctionArn"])
-            tags = [{"Key": k, "Value": v} for k, v in tags_resp.get("Tags", {}).items()]
-            compliant, missing = check_tags(tags)
-            if not compliant:
-                resources.append(build_payload(
-                    resource_id=func["FunctionName"],
-                    resource_type="lambda",
-                    resource_arn=func["FunctionArn"],
-                    tags=tags,
-                    missing=missing,
-                ))
+    for func in discover("lambda", discover_lambda_functions):
+        if func["FunctionName"] == os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+            continue
+        if shard and not shard.owns(func["FunctionName"]):
+            continue
+        tags = embedded_tags(func)
+        if tags is None:
+            tags = tag_cache.get_or_fetch(
+                func["FunctionArn"], lambda_marker(func),
+                lambda: TagSet(lmb.list_tags(Resource=func["FunctionArn"]).get("Tags")),
+                accept=lambda cached: evaluate_tags(cached, "lambda").compliant,
+            )
+        result = evaluate_tags(tags, "lambda")
+        record_resource("lambda", func["FunctionName"], tags, result, arn=func["FunctionArn"], region=REGION)
+        if not result.compliant:
+            resources.append(build_payload(
+                resource_id=func["FunctionName"],
+                resource_type="lambda",
+                resource_arn=func["FunctionArn"],
+                tags=tags,
+                missing=result.missing,
+                invalid=result.invalid,
+            ))
     return resources
 
 
@@ -148,19 +277,39 @@ def launch_state_machine(payload: dict):
     logger.info("State machine lancée", extra={"resource_id": payload["resource_id"], "execution_name": name})
 
 
-@logger.inject_lambda_context(log_event=True)
-@tracer.capture_lambda_handler
-@metrics.log_metrics
-def lambda_handler(event, context):
-    non_compliant = []
-    non_compliant += scan_ec2()
-    non_compliant += scan_rds()
-    non_compliant += scan_s3()
-    non_compliant += scan_lambda()
+@tracer.capture_method
+def launch_batch_pipeline(resources: list) -> int:
+    """Lance le pipeline par lots, renvoie le nombre de ressources prises en charge."""
+    launched = 0
+    # Suffixe aléatoire : plusieurs appels dans la même seconde (vidage de la file)
+    started = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    for offset in range(0, len(resources), BATCH_EXECUTION_SIZE):
+        chunk = resources[offset:offset + BATCH_EXECUTION_SIZE]
+        name = f"governance-batch-{started}-{offset // BATCH_EXECUTION_SIZE}"
+        try:
+            sfn.start_execution(
+                stateMachineArn=BATCH_STATE_MACHINE_ARN,
+                name=name,
+                input=json.dumps({
+                    "resources": chunk,
+                    "batch_size": PIPELINE_BATCH_SIZE,
+                    "max_concurrency": PIPELINE_MAX_CONCURRENCY,
+                }),
+            )
+        except Exception as e:
+            logger.error("Échec lancement pipeline par lots", extra={"execution_name": name, "resources": len(chunk), "error": str(e)})
+            continue
+        launched += len(chunk)
+        logger.info("Pipeline par lots lancé", extra={"execution_name": name, "resources": len(chunk)})
+    return launched
 
-    metrics.add_metric(name="NonCompliantResources", unit=MetricUnit.Count, value=len(non_compliant))
-    logger.info(f"{len(non_compliant)} ressources non conformes détectées")
 
+SCANNERS = {"ec2": scan_ec2, "rds": scan_rds, "s3": scan_s3, "lambda": scan_lambda}
+
+
+def launch_pipelines(non_compliant: list) -> int:
+    if PIPELINE_MODE == "batch":
+        return launch_batch_pipeline(non_compliant)
     launched = 0
     for resource in non_compliant:
         try:
@@ -168,7 +317,308 @@ def lambda_handler(event, context):
             launched += 1
         except Exception as e:
             logger.error("Échec lancement state machine", extra={"resource_id": resource["resource_id"], "error": str(e)})
+    return launched
+
+
+def dispatch_pipelines(non_compliant: list) -> int:
+    """Lance le pipeline (LAUNCH_MODE=direct) ou met en file (queue) ; renvoie le nombre pris en charge."""
+    if LAUNCH_MODE != "queue":
+        return launch_pipelines(non_compliant)
+    enqueued = remediation_queue.put_many(non_compliant)
+    metrics.add_metric(name="RemediationEnqueued", unit=MetricUnit.Count, value=enqueued)
+    add_queue_depth_metric()
+    return enqueued
+
+
+def add_queue_depth_metric():
+    try:
+        metrics.add_metric(name="RemediationQueueDepth", unit=MetricUnit.Count, value=remediation_queue.depth())
+    except Exception as e:
+        logger.warning("Profondeur de la file de remédiation illisible", extra={"error": str(e)})
+
+
+@tracer.capture_method
+def run_drain(policy_version: str) -> dict:
+    """Reprend la file par priorité et lance les exécutions au débit REMEDIATION_LAUNCH_RATE."""
+    items = remediation_queue.take(REMEDIATION_DRAIN_MAX)
+    if PIPELINE_MODE == "batch":
+        groups = [items[offset:offset + BATCH_EXECUTION_SIZE] for offset in range(0, len(items), BATCH_EXECUTION_SIZE)]
+    else:
+        groups = [[item] for item in items]
+
+    launched, failed, latencies = 0, [], []
+    for group in groups:
+        launch_rate.acquire()
+        if PIPELINE_MODE == "batch":
+            ok = launch_batch_pipeline([item.payload for item in group]) == len(group)
+        else:
+            try:
+                launch_state_machine(group[0].payload)
+                ok = True
+            except Exception as e:
+                logger.error("Échec lancement state machine", extra={"resource_id": group[0].payload["resource_id"], "error": str(e)})
+                ok = False
+        if not ok:
+            failed += group  # rendu à la file, repris au prochain vidage
+            continue
+        remediation_queue.ack(group)
+        launched += len(group)
+        now = time.time()
+        latencies += [now - item.enqueued_at for item in group]
+    remediation_queue.release(failed)
 
     metrics.add_metric(name="StateMachinesLaunched", unit=MetricUnit.Count, value=launched)
+    metrics.add_metric(name="RemediationLaunchFailures", unit=MetricUnit.Count, value=len(failed))
+    if latencies:
+        # Latence de lancement : de la première mise en file au démarrage de l'exécution
+        metrics.add_metric(name="RemediationLaunchLatencyAvg", unit=MetricUnit.Seconds,
+                           value=round(sum(latencies) / len(latencies), 1))
+        metrics.add_metric(name="RemediationLaunchLatencyMax", unit=MetricUnit.Seconds, value=round(max(latencies), 1))
+    add_queue_depth_metric()
+    logger.info(f"{launched} exécutions lancées depuis la file",
+                extra={"taken": len(items), "failed": len(failed)})
+    api_calls = finish_invocation()
+    return {
+        "launch_mode": "queue",
+        "taken": len(items),
+        "launched": launched,
+        "failed": len(failed),
+        "launch_latency_max": round(max(latencies), 1) if latencies else 0.0,
+        "policy_version": policy_version,
+        "api_calls": api_calls["calls"],
+    }
+
+
+def begin_inventory(policy_version: str, segment: str):
+    """Remet à zéro l'instantané Parquet et recharge le segment de l'index de tags."""
+    account = get_account_id() if inventory_export.enabled or tag_index.enabled else ""
+    inventory_export.begin(policy_version, account)
+    tag_index.begin(segment)
 
-    return {"non_compliant": len(non_compliant), "launched": launched}
+
+def record_resource(resource_type: str, resource_id: str, tags: TagSet, result, arn: str = "", region: str = ""):
+    """Ressource évaluée → instantané Parquet et index de tags (chacun s'il est activé)."""
+    inventory_export.add(resource_type, resource_id, tags, result, arn=arn, region=region)
+    if tag_index.enabled:
+        account = inventory_export.account
+        tag_index.add(arn or resource_arn(resource_type, resource_id, region, account), tags, result.missing,
+                      type=resource_type, account=account, region=region)
+
+
+def export_inventory(suffix: str = ""):
+    """Écrit l'instantané Parquet du run ; un échec n'interrompt pas le scan."""
+    try:
+        location = inventory_export.write(suffix)
+    except Exception as e:
+        logger.warning("Export de l'inventaire impossible", extra={"error": str(e)})
+        return
+    if location:
+        metrics.add_metric(name="InventoryExportRows", unit=MetricUnit.Count, value=len(inventory_export.rows))
+        logger.info("Inventaire exporté", extra={"location": location, "rows": len(inventory_export.rows)})
+
+
+def prune_tag_index(segments: list):
+    """Supprime les segments d'un autre découpage (changement de mode ou de SCAN_SHARDS)."""
+    if not tag_index.enabled:
+        return
+    try:
+        stale = tag_index.store.prune(segments)
+    except Exception as e:
+        logger.warning("Purge de l'index de tags impossible", extra={"error": str(e)})
+        return
+    if stale:
+        logger.info("Segments d'index obsolètes supprimés", extra={"segments": stale})
+
+
+def flush_tag_index(complete: bool = True):
+    """Écrit le segment de l'index ; un échec n'interrompt pas le scan."""
+    try:
+        stats = tag_index.flush(complete)
+    except Exception as e:
+        logger.warning("Mise à jour de l'index de tags impossible", extra={"error": str(e)})
+        return
+    if stats:
+        metrics.add_metric(name="TagIndexChanges", unit=MetricUnit.Count, value=stats["changed"] + stats["removed"])
+        logger.info("Index de tags mis à jour", extra={"tag_index": stats})
+
+
+def add_tag_cache_metrics(cache_stats: dict):
+    metrics.add_metric(name="TagCacheHits", unit=MetricUnit.Count, value=cache_stats["hits"])
+    metrics.add_metric(name="TagCacheMisses", unit=MetricUnit.Count, value=cache_stats["misses"])
+    metrics.add_metric(name="TagCacheHitRate", unit=MetricUnit.Percent, value=cache_stats["hit_rate"])
+
+
+def finish_invocation() -> dict:
+    """Métriques communes de fin d'invocation (quotas, appels API) ; renvoie le bilan des appels."""
+    add_rate_limit_metrics(metrics)
+    api_calls = api_accounting.pop_summary()
+    logger.info("Bilan des appels API", extra={"api_calls": api_calls})
+    add_api_call_metrics(metrics, api_calls)
+    return api_calls
+
+
+# --- Mode fanout ---
+
+def get_invoker():
+    global invoker
+    if invoker is None:
+        invoker = LambdaInvoker(lmb, os.environ["AWS_LAMBDA_FUNCTION_NAME"])
+    return invoker
+
+
+@tracer.capture_method
+def run_coordinator(policy_version: str) -> dict:
+    """Découpe le scan en shards et invoque un worker asynchrone par shard."""
+    run_id = f"scan-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    shards = plan_shards(list(SCANNERS), SCAN_SHARDS)
+    shard_store.start(run_id, [shard.shard_id for shard in shards])
+    prune_tag_index([shard.shard_id for shard in shards])
+    invoked = 0
+    for shard in shards:
+        try:
+            get_invoker().invoke({"scan_run_id": run_id, "scan_shard": shard._asdict()})
+            invoked += 1
+        except Exception as e:
+            # Compté comme terminé en erreur : l'agrégation n'attend pas un worker jamais lancé
+            logger.error("Échec invocation du worker", extra={"shard": shard.shard_id, "error": str(e)})
+            if shard_store.complete(run_id, shard.shard_id, {"error": f"invoke: {e}"}) == 0:
+                aggregate_run(run_id)
+    metrics.add_metric(name="ScanShardsInvoked", unit=MetricUnit.Count, value=invoked)
+    logger.info("Scan réparti lancé", extra={"run_id": run_id, "shards": [s.shard_id for s in shards]})
+    api_calls = finish_invocation()
+    return {
+        "scan_mode": "fanout",
+        "run_id": run_id,
+        "shards": len(shards),
+        "invoked": invoked,
+        "policy_version": policy_version,
+        "api_calls": api_calls["calls"],
+    }
+
+
+@tracer.capture_method
+def run_worker(run_id: str, shard: Shard, policy_version: str) -> dict:
+    """Scanne un shard, lance le pipeline pour ses ressources et enregistre le résultat partiel."""
+    logger.append_keys(run_id=run_id, shard=shard.shard_id)
+    config_inventory.reset()
+    tag_cache.begin()
+    begin_inventory(policy_version, shard.shard_id)
+
+    result = {"non_compliant": 0, "launched": 0, "error": ""}
+    try:
+        non_compliant = SCANNERS[shard.service](shard)
+        result["non_compliant"] = len(non_compliant)
+        result["launched"] = dispatch_pipelines(non_compliant)
+    except Exception as e:
+        logger.exception("Échec du shard")
+        result["error"] = str(e)
+
+    add_tag_cache_metrics(tag_cache.flush())
+    export_inventory(f"-{shard.shard_id}")
+    # Shard en échec : ressources non revues gardées plutôt que retirées de l'index
+    flush_tag_index(complete=not result["error"])
+    api_calls = finish_invocation()
+    result["api_calls"] = api_calls["calls"]
+    result["policy_version"] = policy_version
+
+    response = {"scan_mode": "worker", "run_id": run_id, "shard": shard.shard_id, **result}
+    try:
+        remaining = record_shard(run_id, shard.shard_id, result)
+    except Exception:
+        # Surtout pas d'exception : le retry asynchrone rescannerait le shard et relancerait
+        # un pipeline par ressource non conforme. Le run reste sans bilan, signalé par la métrique.
+        logger.exception("Enregistrement du shard impossible")
+        metrics.add_metric(name="ScanShardRecordErrors", unit=MetricUnit.Count, value=1)
+        response["recorded"] = False
+        return response
+    if remaining is None:
+        logger.warning("Shard déjà enregistré (invocation rejouée)")
+    elif remaining <= 0:
+        response["summary"] = aggregate_run(run_id)
+    return response
+
+
+def record_shard(run_id: str, shard_id: str, result: dict) -> Optional[int]:
+    """
+    Enregistre le résultat du shard, en reprenant sans rescanner si le compteur du run
+    reste disputé (nombreux shards terminés en même temps).
+    """
+    rounds = max(1, SHARD_RECORD_ROUNDS)
+    for attempt in range(rounds):
+        try:
+            return shard_store.complete(run_id, shard_id, result)
+        except Exception as e:
+            if attempt == rounds - 1:
+                raise
+            logger.warning("Enregistrement du shard repris", extra={"attempt": attempt + 1, "error": str(e)})
+
+
+def aggregate_run(run_id: str) -> dict:
+    """Somme les résultats partiels d'un run et publie le bilan (dernier worker terminé)."""
+    partials = shard_store.results(run_id)
+    summary = {
+        "run_id": run_id,
+        "shards": len(partials),
+        "non_compliant": sum(p.get("non_compliant", 0) for p in partials.values()),
+        "launched": sum(p.get("launched", 0) for p in partials.values()),
+        "api_calls": sum(p.get("api_calls", 0) for p in partials.values()),
+        "failed_shards": sorted(shard_id for shard_id, p in partials.items() if p.get("error")),
+    }
+    metrics.add_metric(name="NonCompliantResources", unit=MetricUnit.Count, value=summary["non_compliant"])
+    if LAUNCH_MODE != "queue":
+        metrics.add_metric(name="StateMachinesLaunched", unit=MetricUnit.Count, value=summary["launched"])
+    metrics.add_metric(name="ScanShardErrors", unit=MetricUnit.Count, value=len(summary["failed_shards"]))
+    logger.info(f"{summary['non_compliant']} ressources non conformes détectées (scan réparti)", extra={"summary": summary})
+    return summary
+
+
+@sampled_profile
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+def lambda_handler(event, context):
+    # Politique rafraîchie au plus une fois par TTL ; version jointe aux logs et aux métriques
+    policy_version = get_policy().version
+    logger.append_keys(policy_version=policy_version)
+    metrics.add_metadata(key="policy_version", value=policy_version)
+
+    if event.get("remediation_drain"):
+        return run_drain(policy_version)
+    if "scan_shard" in event:
+        return run_worker(event["scan_run_id"], Shard(**event["scan_shard"]), policy_version)
+    if SCAN_MODE == "fanout":
+        return run_coordinator(policy_version)
+
+    # Instantané Config rechargé à chaque invocation (INVENTORY_SOURCE=config)
+    config_inventory.reset()
+    tag_cache.begin()
+    begin_inventory(policy_version, SINGLE_SCAN_SEGMENT)
+
+    non_compliant = []
+    for scan in SCANNERS.values():
+        non_compliant += scan()
+
+    cache_stats = tag_cache.flush()
+    add_tag_cache_metrics(cache_stats)
+    export_inventory()
+    flush_tag_index()
+    prune_tag_index([SINGLE_SCAN_SEGMENT])
+
+    metrics.add_metric(name="NonCompliantResources", unit=MetricUnit.Count, value=len(non_compliant))
+    logger.info(f"{len(non_compliant)} ressources non conformes détectées",
+                extra={"inventory": config_inventory.stats, "tag_cache": cache_stats})
+
+    launched = dispatch_pipelines(non_compliant)
+
+    if LAUNCH_MODE != "queue":
+        metrics.add_metric(name="StateMachinesLaunched", unit=MetricUnit.Count, value=launched)
+    api_calls = finish_invocation()
+
+    return {
+        "non_compliant": len(non_compliant),
+        "launched": launched,
+        "pipeline_mode": PIPELINE_MODE,
+        "launch_mode": LAUNCH_MODE,
+        "policy_version": policy_version,
+        "api_calls": api_calls["calls"],
+    }
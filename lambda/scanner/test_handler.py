@@ -0,0 +1,283 @@
+"""
+Tests unitaires du scanner en mode réparti (SCAN_MODE=fanout) et en mode file
+(LAUNCH_MODE=queue).
+
+Vérifie que :
+- Le coordinateur invoque un worker par shard, sans scanner lui-même
+- Les shards d'un même service se partagent les ressources sans doublon
+- Le dernier worker agrège les résultats partiels en un seul bilan
+- Un shard rejoué (retry asynchrone) n'est pas compté deux fois
+- Un compteur de run disputé est repris sans rescanner ni relancer les pipelines
+- En mode file, le scan ne lance rien ; le vidage lance par priorité, au plus
+  REMEDIATION_DRAIN_MAX exécutions
+- Chaque worker écrit l'instantané Parquet de son shard (INVENTORY_EXPORT_URI)
+- Le cache de tags ne sert que des tags conformes : une ressource corrigée depuis
+  le scan précédent n'est plus signalée
+- L'index de tags suit les ressources d'un scan à l'autre ; passer en fanout
+  remplace le segment du mode single par un segment par shard
+
+Les invocations asynchrones sont remplacées par InProcessInvoker.
+Le handler est chargé sous un nom unique : plusieurs Lambdas ont un handler.py.
+"""
+
+import os
+import sys
+import json
+import importlib.util
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+HANDLER_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.dirname(HANDLER_DIR)
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+import shared.fanout as fanout_module  # noqa: E402
+from shared.fanout import DynamoDBShardStore, InMemoryShardStore, InProcessInvoker  # noqa: E402
+from shared.ratelimit import TokenBucket  # noqa: E402
+from shared.remediation_queue import InMemoryRemediationQueue  # noqa: E402
+from shared.tag_cache import InMemoryTagCacheStore, TagCache  # noqa: E402
+
+REGION = "eu-west-1"
+
+
+class LambdaContext:
+    function_name = "governance-scanner"
+    memory_limit_in_mb = 256
+    invoked_function_arn = f"arn:aws:lambda:{REGION}:123456789012:function:governance-scanner"
+    aws_request_id = "test-request"
+
+
+CONTEXT = LambdaContext()
+
+COMPLIANT_TAGS = [
+    {"Key": "Owner", "Value": "test@entreprise.com"},
+    {"Key": "Squad", "Value": "Data"},
+    {"Key": "CostCenter", "Value": "CC-123"},
+    {"Key": "Environment", "Value": "dev"},
+    {"Key": "AutoShutdown", "Value": "true"},
+]
+
+
+@pytest.fixture
+def scanner(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("AWS_REGION", REGION)
+    monkeypatch.setenv("POWERTOOLS_TRACE_DISABLED", "1")
+    monkeypatch.setenv("POWERTOOLS_METRICS_NAMESPACE", "TagGovernance")
+    monkeypatch.delenv("TAG_POLICY_SOURCE", raising=False)
+    with mock_aws():
+        iam = boto3.client("iam", region_name=REGION)
+        role = iam.create_role(RoleName="sfn", AssumeRolePolicyDocument="{}")["Role"]["Arn"]
+        machine = boto3.client("stepfunctions", region_name=REGION).create_state_machine(
+            name="governance", roleArn=role,
+            definition=json.dumps({"StartAt": "Done", "States": {"Done": {"Type": "Succeed"}}}),
+        )["stateMachineArn"]
+        monkeypatch.setenv("STATE_MACHINE_ARN", machine)
+        spec = importlib.util.spec_from_file_location("scanner_handler", os.path.join(HANDLER_DIR, "handler.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.tag_cache.ttl_seconds = 0
+        yield module
+
+
+def create_fleet():
+    s3 = boto3.client("s3", region_name=REGION)
+    for i in range(9):
+        name = f"bucket-{i:02d}"
+        s3.create_bucket(Bucket=name, CreateBucketConfiguration={"LocationConstraint": REGION})
+        if i % 3 == 0:
+            s3.put_bucket_tagging(Bucket=name, Tagging={"TagSet": COMPLIANT_TAGS})
+    boto3.client("ec2", region_name=REGION).run_instances(
+        ImageId="ami-12345678", MinCount=2, MaxCount=2, InstanceType="t3.micro")
+
+
+def fanout(scanner, monkeypatch, shards):
+    monkeypatch.setattr(scanner, "SCAN_MODE", "fanout")
+    monkeypatch.setattr(scanner, "SCAN_SHARDS", shards)
+    monkeypatch.setattr(scanner, "shard_store", InMemoryShardStore())
+    invoker = InProcessInvoker(scanner.lambda_handler, CONTEXT)
+    monkeypatch.setattr(scanner, "invoker", invoker)
+    return invoker
+
+
+def test_scan_reparti_agrege_par_le_dernier_worker(scanner, monkeypatch):
+    create_fleet()
+    invoker = fanout(scanner, monkeypatch, {"s3": 3})
+    coordinator = scanner.lambda_handler({}, CONTEXT)
+    assert coordinator["shards"] == 6 and coordinator["invoked"] == 6
+    assert len(invoker.pending) == 6  # rien n'est scanné par le coordinateur
+
+    workers = invoker.run_pending()
+    s3_ids = [w for w in workers if w["shard"].startswith("s3-")]
+    assert sum(w["non_compliant"] for w in s3_ids) == 6  # chaque bucket dans un seul shard
+
+    summaries = [w["summary"] for w in workers if "summary" in w]
+    assert len(summaries) == 1  # seul le dernier worker agrège
+    assert summaries[0]["non_compliant"] == 8  # 6 buckets + 2 instances sans tags
+    assert summaries[0]["launched"] == 8
+    assert summaries[0]["shards"] == 6 and summaries[0]["failed_shards"] == []
+
+
+def test_shard_rejoue_compte_une_fois(scanner, monkeypatch):
+    create_fleet()
+    invoker = fanout(scanner, monkeypatch, {})
+    scanner.lambda_handler({}, CONTEXT)
+    replay = dict(invoker.pending[0])
+
+    invoker.run_pending()
+    again = scanner.lambda_handler(replay, CONTEXT)
+
+    assert "summary" not in again
+    assert len(scanner.shard_store.results(replay["scan_run_id"])) == 4
+
+
+def test_compteur_dispute_sans_second_lancement(scanner, monkeypatch):
+    """Plus de conflits sur #run que COMPLETE_ATTEMPTS : reprise, pas de rescan ni de relance."""
+    create_fleet()
+    invoker = fanout(scanner, monkeypatch, {})
+    client = boto3.client("dynamodb", region_name=REGION)
+    client.create_table(
+        TableName="scan-shards", BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "run_id", "KeyType": "HASH"}, {"AttributeName": "shard_id", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "run_id", "AttributeType": "S"},
+                              {"AttributeName": "shard_id", "AttributeType": "S"}],
+    )
+    monkeypatch.setattr(scanner, "shard_store", DynamoDBShardStore("scan-shards", client=client))
+    monkeypatch.setattr(fanout_module.time, "sleep", lambda seconds: None)
+
+    # Un autre worker modifie le compteur entre lecture et transaction, à chaque fois
+    conflicts = {"left": fanout_module.COMPLETE_ATTEMPTS + 2}
+    transact = client.transact_write_items
+
+    def contended(**kwargs):
+        if conflicts["left"]:
+            conflicts["left"] -= 1
+            raise ClientError({"Error": {"Code": "TransactionCanceledException", "Message": ""},
+                               "CancellationReasons": [{"Code": "None"}, {"Code": "ConditionalCheckFailed"}]},
+                              "TransactWriteItems")
+        return transact(**kwargs)
+
+    monkeypatch.setattr(client, "transact_write_items", contended)
+    dispatched = []
+    dispatch = scanner.dispatch_pipelines
+    monkeypatch.setattr(scanner, "dispatch_pipelines", lambda resources: dispatched.append(len(resources)) or dispatch(resources))
+
+    scanner.lambda_handler({}, CONTEXT)
+    workers = invoker.run_pending()
+
+    assert conflicts["left"] == 0
+    assert len(dispatched) == 4 and sum(dispatched) == 8  # un lancement par shard, pas de rescan
+    summaries = [w["summary"] for w in workers if "summary" in w]
+    assert len(summaries) == 1 and summaries[0]["launched"] == 8
+
+
+def test_mode_file_lance_par_priorite(scanner, monkeypatch):
+    create_fleet()
+    boto3.client("ec2", region_name=REGION).run_instances(
+        ImageId="ami-12345678", MinCount=1, MaxCount=1, InstanceType="m5.large")
+    queue = InMemoryRemediationQueue()
+    monkeypatch.setattr(scanner, "LAUNCH_MODE", "queue")
+    monkeypatch.setattr(scanner, "remediation_queue", queue)
+    monkeypatch.setattr(scanner, "launch_rate", TokenBucket(1000))
+    monkeypatch.setattr(scanner, "REMEDIATION_DRAIN_MAX", 2)
+
+    scan = scanner.lambda_handler({}, CONTEXT)
+    assert scan["non_compliant"] == 9 and scan["launched"] == 9
+    assert queue.depth() == 9
+
+    sfn = boto3.client("stepfunctions", region_name=REGION)
+    assert sfn.list_executions(stateMachineArn=os.environ["STATE_MACHINE_ARN"])["executions"] == []
+
+    drain = scanner.lambda_handler({"remediation_drain": True}, CONTEXT)
+    assert drain["taken"] == 2 and drain["launched"] == 2 and drain["failed"] == 0
+    assert queue.depth() == 7
+    started = sfn.list_executions(stateMachineArn=os.environ["STATE_MACHINE_ARN"])["executions"]
+    inputs = [json.loads(sfn.describe_execution(executionArn=e["executionArn"])["input"]) for e in started]
+    # Les instances (coût estimé) passent avant les buckets, sans tags et sans coût
+    assert sorted(i["instance_type"] for i in inputs) == ["m5.large", "t3.micro"]
+
+
+def test_instantane_par_shard(scanner, monkeypatch, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    create_fleet()
+    monkeypatch.setattr(scanner.inventory_export, "uri", str(tmp_path))
+    invoker = fanout(scanner, monkeypatch, {"s3": 2})
+    scanner.lambda_handler({}, CONTEXT)
+    invoker.run_pending()
+
+    files = sorted(str(p) for p in tmp_path.rglob("*.parquet"))
+    assert len(files) == 3  # un fichier par shard non vide : ec2, s3 x2 (rds et lambda vides)
+    table = pq.ParquetDataset(files).read()
+    assert sorted(table.column("type").to_pylist()) == ["ec2"] * 2 + ["s3"] * 9
+    assert set(table.column("account").to_pylist()) == {"123456789012"}
+    assert table.column("compliant").to_pylist().count(True) == 3
+
+
+def test_index_de_tags_suivi_entre_scans(scanner, monkeypatch):
+    from shared.tag_index import InMemoryTagIndexStore, TagIndexReader
+
+    store = InMemoryTagIndexStore()
+    monkeypatch.setattr(scanner.tag_index, "_store", store)
+    reader = TagIndexReader(store, ttl_seconds=0)
+    create_fleet()
+    scanner.lambda_handler({}, CONTEXT)
+    assert store.segments() == ["scan"]
+    assert len(reader.query({"Squad": "Data"}, resource_type="s3")) == 3
+    assert len(reader.query(missing=["Owner"], account="123456789012")) == 8
+
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.delete_bucket(Bucket="bucket-01")
+    s3.put_bucket_tagging(Bucket="bucket-02", Tagging={"TagSet": COMPLIANT_TAGS})
+    scanner.lambda_handler({}, CONTEXT)
+    assert "arn:aws:s3:::bucket-02" in reader.query({"Squad": "Data"})
+    assert len(reader.query(missing=["Owner"])) == 6
+
+    invoker = fanout(scanner, monkeypatch, {})
+    scanner.lambda_handler({}, CONTEXT)
+    invoker.run_pending()
+    assert store.segments() == ["ec2-0-of-1", "lambda-0-of-1", "rds-0-of-1", "s3-0-of-1"]
+    assert reader.summary()["resources"] == 10
+
+
+def test_cache_de_tags_relit_les_non_conformes(scanner, monkeypatch):
+    iam = boto3.client("iam", region_name=REGION)
+    role = iam.create_role(RoleName="fn", AssumeRolePolicyDocument="{}")["Role"]["Arn"]
+    lam = boto3.client("lambda", region_name=REGION)
+    function = lam.create_function(FunctionName="corrigee", Runtime="python3.11", Role=role,
+                                   Handler="index.handler", Code={"ZipFile": b"code"})
+    cache = TagCache("scanner", InMemoryTagCacheStore(), ttl_seconds=3600, full_refresh_seconds=0)
+    monkeypatch.setattr(scanner, "tag_cache", cache)
+
+    def scan():
+        cache.begin()
+        resources = scanner.scan_lambda()
+        return resources, cache.flush()
+
+    resources, _ = scan()
+    assert [r["resource_id"] for r in resources] == ["corrigee"]
+
+    # Le tagging ne change pas le marqueur (RevisionId) : seul accept() force la relecture
+    lam.tag_resource(Resource=function["FunctionArn"], Tags={t["Key"]: t["Value"] for t in COMPLIANT_TAGS})
+    resources, stats = scan()
+    assert resources == [] and stats["misses"] == 1
+
+    resources, stats = scan()
+    assert resources == [] and stats["hits"] == 1
+
+
+def test_compte_lu_une_fois_par_conteneur(scanner, monkeypatch):
+    create_fleet()
+    calls = []
+    identity = scanner.sts.get_caller_identity
+    monkeypatch.setattr(scanner.sts, "get_caller_identity", lambda: calls.append(1) or identity())
+
+    resources = scanner.scan_ec2() + scanner.scan_s3()
+    assert len(resources) == 8
+    assert {r["account_id"] for r in resources} == {"123456789012"}
+    assert len(calls) == 1
@@ -0,0 +1,195 @@
+"""
+Comptabilité des appels API AWS par invocation, branchée sur les événements botocore.
+
+Installée par limited_client() sur tous les clients des Lambdas de gouvernance
+(à côté du limiteur de débit). Pour chaque opération "service.Operation" :
+
+- before-call / after-call : nombre d'appels, latence (retries compris),
+  histogramme de latence, erreurs (code d'erreur AWS)
+- after-call-error : exceptions sans réponse (timeout, connexion)
+- ResponseMetadata.RetryAttempts : retries effectués par botocore
+- needs-retry : réponses de throttling (chaque tentative)
+
+En fin d'invocation, pop_summary() renvoie le bilan depuis l'appel précédent :
+les handlers le journalisent et, si API_CALL_METRICS=true, en publient les totaux.
+
+Budget dans les tests :
+    with api_budget({"cloudwatch.PutMetricData": 5, "total": 100}) as used:
+        lambda_handler({}, None)
+lève ApiBudgetExceeded si une opération (ou le total) dépasse sa limite.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from shared.ratelimit import THROTTLE_CODES
+
+API_CALL_METRICS = os.environ.get("API_CALL_METRICS", "false").lower() == "true"
+
+# Bornes supérieures des classes de l'histogramme (ms) — la dernière est ouverte
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_CONTEXT_KEY = "api_accounting_start"
+
+
+def _bucket_label(latency_ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f"le_{bound}"
+    return f"gt_{LATENCY_BUCKETS_MS[-1]}"
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {"calls": 0, "errors": 0, "retries": 0, "throttles": 0,
+            "latency_ms_total": 0.0, "latency_ms_max": 0.0, "histogram": {}, "error_codes": {}}
+
+
+class ApiBudgetExceeded(AssertionError):
+    """Un budget d'appels API est dépassé (AssertionError : lisible dans pytest)."""
+
+
+class ApiAccounting:
+    """Compteurs par opération, partagés par tous les clients installés (thread-safe)."""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        # Compteurs cumulés depuis le démarrage (jamais remis à zéro) : base des budgets
+        self._totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> Dict[str, Any]:
+        entry = self._stats.get(key)
+        if entry is None:
+            entry = self._stats[key] = _empty_stats()
+        return entry
+
+    # --- Handlers botocore ---
+
+    def _before_call(self, model, context=None, **kwargs):
+        if context is not None:
+            context[_CONTEXT_KEY] = self._clock()
+
+    def _record_call(self, model, context, error_code: Optional[str], retries: int):
+        key = f"{model.service_model.service_name}.{model.name}"
+        started = (context or {}).pop(_CONTEXT_KEY, None)
+        latency_ms = (self._clock() - started) * 1000 if started is not None else 0.0
+        with self._lock:
+            entry = self._entry(key)
+            entry["calls"] += 1
+            entry["retries"] += retries
+            entry["latency_ms_total"] += latency_ms
+            entry["latency_ms_max"] = max(entry["latency_ms_max"], latency_ms)
+            label = _bucket_label(latency_ms)
+            entry["histogram"][label] = entry["histogram"].get(label, 0) + 1
+            if error_code:
+                entry["errors"] += 1
+                entry["error_codes"][error_code] = entry["error_codes"].get(error_code, 0) + 1
+            self._totals[key] = self._totals.get(key, 0) + 1
+
+    def _after_call(self, model, parsed=None, context=None, **kwargs):
+        parsed = parsed or {}
+        error_code = parsed.get("Error", {}).get("Code") if "Error" in parsed else None
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        self._record_call(model, context, error_code, retries)
+
+    def _after_call_error(self, model, exception=None, context=None, **kwargs):
+        self._record_call(model, context, type(exception).__name__, 0)
+
+    def _needs_retry(self, operation, response=None, **kwargs):
+        if response and response[1].get("Error", {}).get("Code", "") in THROTTLE_CODES:
+            key = f"{operation.service_model.service_name}.{operation.name}"
+            with self._lock:
+                self._entry(key)["throttles"] += 1
+        return None
+
+    def install(self, client):
+        """Branche la comptabilité sur un client boto3 et renvoie le client."""
+        events = client.meta.events
+        events.register("before-call.*.*", self._before_call, unique_id=f"accounting-before-{id(self)}")
+        events.register("after-call.*.*", self._after_call, unique_id=f"accounting-after-{id(self)}")
+        events.register("after-call-error.*.*", self._after_call_error, unique_id=f"accounting-error-{id(self)}")
+        events.register("needs-retry.*.*", self._needs_retry, unique_id=f"accounting-retry-{id(self)}")
+        return client
+
+    # --- Bilan ---
+
+    def pop_summary(self) -> Dict[str, Any]:
+        """Bilan depuis le dernier appel (les compteurs survivent aux invocations à chaud)."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        operations = {}
+        for key, entry in sorted(stats.items()):
+            calls = entry["calls"]
+            operations[key] = {
+                "calls": calls,
+                "errors": entry["errors"],
+                "retries": entry["retries"],
+                "throttles": entry["throttles"],
+                "latency_ms_avg": round(entry["latency_ms_total"] / calls, 2) if calls else 0.0,
+                "latency_ms_max": round(entry["latency_ms_max"], 2),
+                "latency_ms_total": round(entry["latency_ms_total"], 2),
+                "histogram": entry["histogram"],
+                **({"error_codes": entry["error_codes"]} if entry["error_codes"] else {}),
+            }
+        slowest = max(operations, key=lambda k: operations[k]["latency_ms_total"], default=None)
+        return {
+            "calls": sum(o["calls"] for o in operations.values()),
+            "errors": sum(o["errors"] for o in operations.values()),
+            "retries": sum(o["retries"] for o in operations.values()),
+            "throttles": sum(o["throttles"] for o in operations.values()),
+            "latency_ms_total": round(sum(o["latency_ms_total"] for o in operations.values()), 2),
+            "slowest_operation": slowest,
+            "operations": operations,
+        }
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._totals)
+
+    @contextmanager
+    def budget(self, limits: Dict[str, int]) -> Iterator[Dict[str, int]]:
+        """
+        Vérifie qu'un bloc reste dans son budget d'appels. Clés : "service.Operation",
+        "service" (toutes ses opérations) ou "total". Le dict renvoyé contient les
+        appels effectués par opération (rempli à la sortie du bloc).
+        """
+        before = self.totals()
+        used: Dict[str, int] = {}
+        yield used
+        after = self.totals()
+        used.update({k: n - before.get(k, 0) for k, n in after.items() if n - before.get(k, 0)})
+
+        over = []
+        for key, limit in limits.items():
+            if key == "total":
+                count = sum(used.values())
+            elif "." in key:
+                count = used.get(key, 0)
+            else:
+                count = sum(n for op, n in used.items() if op.split(".", 1)[0] == key)
+            if count > limit:
+                over.append(f"{key} : {count} appels > budget {limit}")
+        if over:
+            raise ApiBudgetExceeded("; ".join(over) + f" (appels : {used})")
+
+
+# Instance partagée par tous les clients d'une même Lambda
+api_accounting = ApiAccounting()
+
+
+def api_budget(limits: Dict[str, int]):
+    return api_accounting.budget(limits)
+
+
+def add_api_call_metrics(metrics, summary: Dict[str, Any]) -> None:
+    """Totaux du bilan dans un Metrics powertools (si API_CALL_METRICS=true)."""
+    if not API_CALL_METRICS:
+        return
+    metrics.add_metric(name="ApiCalls", unit="Count", value=summary["calls"])
+    metrics.add_metric(name="ApiCallErrors", unit="Count", value=summary["errors"])
+    metrics.add_metric(name="ApiCallRetries", unit="Count", value=summary["retries"])
+    metrics.add_metric(name="ApiCallLatencyMs", unit="Milliseconds", value=summary["latency_ms_total"])
@@ -1,14 +1,20 @@
-REQUIRED_TAGS = ["Owner", "Squad", "CostCenter", "Environment"]
+from shared.policy import ANY, PolicyResult, get_policy
+from shared.tagset import TagSet
 
+# Pas de liste de tags obligatoires figée à l'import : la politique est rechargée
+# à chaud (PolicyStore), get_policy().required donne toujours la version active.
 
-def check_tags(tags: list) -> tuple[bool, list]:
-    keys = [t.get("Key") for t in tags] if tags else []
-    missing = [t for t in REQUIRED_TAGS if t not in keys]
-    return len(missing) == 0, missing
 
+def evaluate_tags(tags, resource_type: str = ANY) -> PolicyResult:
+    """Tags sous toute forme (TagSet, liste AWS, dict, None) → (conforme, manquants, invalides)."""
+    return get_policy().evaluate(tags, resource_type)
 
-def get_tag_value(tags: list, key: str) -> str:
-    for t in tags:
-        if t.get("Key") == key:
-            return t.get("Value", "")
-    return ""
+
+def check_tags(tags, resource_type: str = ANY) -> tuple[bool, list]:
+    """(conforme, manquants) — une valeur invalide rend aussi la ressource non conforme."""
+    result = evaluate_tags(tags, resource_type)
+    return result.compliant, result.missing
+
+
+def get_tag_value(tags, key: str) -> str:
+    return TagSet.of(tags).get(key, "")
@@ -0,0 +1,246 @@
+"""
+Inventaire via les requêtes avancées AWS Config (alternative aux Describe/List).
+
+Quand AWS Config enregistre les ressources, une seule requête SQL
+(select_resource_config, ou select_aggregate_resource_config avec un agrégateur
+multi-comptes / multi-régions) renvoie type, identifiant, ARN, tags et les
+quelques propriétés utiles de toutes les ressources, par pages de 100 : quelques
+appels au lieu d'un Describe paginé par service et d'un ListTags par ressource.
+
+INVENTORY_SOURCE=config active ce mode (défaut : live). discover() renvoie les
+enregistrements au format des API Describe/List du service (InstanceId + State,
+DBInstanceArn + DBInstanceStatus, Name + CreationDate, FunctionArn…) : les
+handlers les traitent comme ceux du scan live. Les tags déjà connus sont joints
+sous EMBEDDED_TAGS (TagSet) pour éviter l'appel ListTags.
+
+Repli automatique sur le scan live :
+- pour les types que le recorder n'enregistre pas (ou, avec un agrégateur,
+  absents des résultats)
+- pour tous les types si le recorder est arrêté ou si la requête échoue
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from shared.tagset import TagSet
+
+INVENTORY_SOURCE = os.environ.get("INVENTORY_SOURCE", "live").lower()
+CONFIG_AGGREGATOR_NAME = os.environ.get("CONFIG_AGGREGATOR_NAME", "")
+
+# Type court des handlers → type AWS Config
+CONFIG_RESOURCE_TYPES = {
+    "ec2": "AWS::EC2::Instance",
+    "rds": "AWS::RDS::DBInstance",
+    "s3": "AWS::S3::Bucket",
+    "lambda": "AWS::Lambda::Function",
+}
+SHORT_TYPES = {config_type: short for short, config_type in CONFIG_RESOURCE_TYPES.items()}
+
+# Clé des tags joints à un enregistrement issu de Config (TagSet)
+EMBEDDED_TAGS = "_tags"
+PAGE_SIZE = 100  # maximum accepté par les requêtes avancées
+
+SELECT_FIELDS = (
+    "resourceId, resourceName, resourceType, arn, accountId, awsRegion, resourceCreationTime, tags, "
+    "configuration.instanceType, configuration.state.name, configuration.launchTime, "
+    "configuration.dBInstanceStatus, configuration.dBInstanceClass, configuration.instanceCreateTime"
+)
+
+
+def embedded_tags(record: Dict[str, Any]) -> Optional[TagSet]:
+    """Tags joints par l'inventaire Config, None pour un enregistrement du scan live."""
+    return record.get(EMBEDDED_TAGS)
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _tags(item: Dict[str, Any]) -> TagSet:
+    # Config renvoie [{"key", "value"}] (minuscules), parfois {clé: valeur}
+    tags = item.get("tags") or []
+    if isinstance(tags, dict):
+        return TagSet(tags)
+    return TagSet({t.get("key"): t.get("value") for t in tags})
+
+
+def to_describe_record(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Résultat de requête Config → enregistrement au format de l'API Describe/List du service."""
+    short = SHORT_TYPES.get(item.get("resourceType"))
+    if short is None:
+        return None
+    configuration = item.get("configuration") or {}
+    tags = _tags(item)
+    created = _timestamp(item.get("resourceCreationTime"))
+    if short == "ec2":
+        record = {
+            "InstanceId": item["resourceId"],
+            "InstanceType": configuration.get("instanceType", ""),
+            "State": {"Name": (configuration.get("state") or {}).get("name", "")},
+            "LaunchTime": _timestamp(configuration.get("launchTime")) or created,
+            "Tags": tags.to_aws(),
+        }
+    elif short == "rds":
+        # resourceId Config = DbiResourceId ; l'identifiant d'instance est resourceName
+        record = {
+            "DBInstanceIdentifier": item.get("resourceName") or item["resourceId"],
+            "DBInstanceArn": item["arn"],
+            "DBInstanceStatus": configuration.get("dBInstanceStatus", ""),
+            "DBInstanceClass": configuration.get("dBInstanceClass", ""),
+            "InstanceCreateTime": _timestamp(configuration.get("instanceCreateTime")) or created,
+        }
+    elif short == "s3":
+        record = {"Name": item.get("resourceName") or item["resourceId"], "CreationDate": created,
+                  "BucketRegion": item.get("awsRegion", "")}
+    else:
+        record = {"FunctionName": item.get("resourceName") or item["resourceId"], "FunctionArn": item["arn"]}
+    record[EMBEDDED_TAGS] = tags
+    record["_account_id"] = item.get("accountId", "")
+    record["_region"] = item.get("awsRegion", "")
+    return record
+
+
+class ConfigInventory:
+    """
+    Instantané de l'inventaire Config, chargé à la première demande puis réutilisé
+    jusqu'au reset() (un par invocation).
+
+    local_only : avec un agrégateur, ne garde que le compte / la région de la Lambda
+    (scanner et cleanup n'agissent que sur leurs propres ressources ; metrics compte
+    toute l'organisation).
+    """
+
+    def __init__(self, client=None, aggregator: str = CONFIG_AGGREGATOR_NAME, local_only: bool = True,
+                 account_id: Optional[str] = None, region: Optional[str] = None,
+                 resource_types: Iterable[str] = tuple(CONFIG_RESOURCE_TYPES)):
+        self._client = client
+        self.aggregator = aggregator
+        self.local_only = local_only
+        self.account_id = account_id
+        self.region = region or os.environ.get("AWS_REGION", "")
+        self.resource_types = list(resource_types)
+        self._records: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self.stats = {"queries": 0, "pages": 0, "records": 0, "fallbacks": []}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from shared.ratelimit import limited_client
+
+            self._client = limited_client("config")
+        return self._client
+
+    def reset(self):
+        self._records = None
+        self.stats = {"queries": 0, "pages": 0, "records": 0, "fallbacks": []}
+
+    # --- Requêtes ---
+
+    def select(self, expression: str) -> Iterator[Dict[str, Any]]:
+        """Résultats décodés d'une requête avancée, toutes pages confondues."""
+        params: Dict[str, Any] = {"Expression": expression, "Limit": PAGE_SIZE}
+        if self.aggregator:
+            params["ConfigurationAggregatorName"] = self.aggregator
+            call = self.client.select_aggregate_resource_config
+        else:
+            call = self.client.select_resource_config
+        self.stats["queries"] += 1
+        while True:
+            resp = call(**params)
+            self.stats["pages"] += 1
+            for raw in resp.get("Results", []):
+                yield json.loads(raw)
+            if not resp.get("NextToken"):
+                return
+            params["NextToken"] = resp["NextToken"]
+
+    def recorded_types(self) -> Optional[Set[str]]:
+        """
+        Types courts enregistrés par le recorder du compte. None : inconnu (agrégateur),
+        les types absents des résultats repasseront alors par le scan live.
+        """
+        if self.aggregator:
+            return None
+        recorders = self.client.describe_configuration_recorders().get("ConfigurationRecorders", [])
+        statuses = self.client.describe_configuration_recorder_status().get("ConfigurationRecordersStatus", [])
+        if not recorders or not any(s.get("recording") for s in statuses):
+            return set()
+        recorded = set()
+        for recorder in recorders:
+            group = recorder.get("recordingGroup") or {"allSupported": True}
+            strategy = (group.get("recordingStrategy") or {}).get("useOnly", "")
+            if strategy == "EXCLUSION_BY_RESOURCE_TYPES":
+                excluded = set((group.get("exclusionByResourceTypes") or {}).get("resourceTypes", []))
+                recorded |= {s for s, t in CONFIG_RESOURCE_TYPES.items() if t not in excluded}
+            elif group.get("allSupported"):
+                recorded |= set(CONFIG_RESOURCE_TYPES)
+            else:
+                types = set(group.get("resourceTypes", []))
+                recorded |= {s for s, t in CONFIG_RESOURCE_TYPES.items() if t in types}
+        return recorded
+
+    def load(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{type court: enregistrements} pour les types servis par Config (les autres sont absents)."""
+        if self._records is not None:
+            return self._records
+        records: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            recorded = self.recorded_types()
+            wanted = [t for t in self.resource_types if recorded is None or t in recorded]
+            if wanted:
+                in_list = ", ".join(f"'{CONFIG_RESOURCE_TYPES[t]}'" for t in wanted)
+                expression = f"SELECT {SELECT_FIELDS} WHERE resourceType IN ({in_list})"
+                found: Dict[str, List[Dict[str, Any]]] = {t: [] for t in wanted}
+                for item in self.select(expression):
+                    record = to_describe_record(item)
+                    if record is None:
+                        continue
+                    if self.aggregator and self.local_only and not self._is_local(record):
+                        continue
+                    found[SHORT_TYPES[item["resourceType"]]].append(record)
+                    self.stats["records"] += 1
+                # Avec un agrégateur, un type sans aucun résultat n'est sans doute pas enregistré
+                records = {t: r for t, r in found.items() if r or recorded is not None}
+        except Exception as e:  # noqa: BLE001 — repli sur le scan live
+            print(f"⚠️  Inventaire AWS Config indisponible, scan live : {e}")
+            records = {}
+        self.stats["fallbacks"] = [t for t in self.resource_types if t not in records]
+        self._records = records
+        return records
+
+    def _is_local(self, record: Dict[str, Any]) -> bool:
+        if self.account_id is None:
+            from shared.ratelimit import limited_client
+
+            self.account_id = limited_client("sts").get_caller_identity()["Account"]
+        return record["_account_id"] == self.account_id and record["_region"] in ("", self.region)
+
+    def records(self, resource_type: str) -> Optional[List[Dict[str, Any]]]:
+        """Enregistrements d'un type, None si Config ne le sert pas (repli sur le scan live)."""
+        return self.load().get(resource_type)
+
+
+config_inventory = ConfigInventory()
+
+
+def discover(resource_type: str, live: Callable[[], Iterable[Dict[str, Any]]],
+             inventory: Optional[ConfigInventory] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Enregistrements d'un type depuis la source configurée : l'inventaire Config si
+    INVENTORY_SOURCE=config et que le type y est enregistré, sinon live().
+    """
+    if INVENTORY_SOURCE != "config":
+        yield from live()
+        return
+    records = (inventory or config_inventory).records(resource_type)
+    if records is None:
+        yield from live()
+    else:
+        yield from records
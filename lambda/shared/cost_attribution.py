@@ -0,0 +1,203 @@
+"""
+Attribution des coûts du Cost and Usage Report (CUR) aux ressources de l'inventaire.
+
+Cost Explorer ne groupe les coûts que par tags présents : la dépense des
+ressources non conformes, celle qu'il faut justement relancer, n'y apparaît pas.
+Ici les lignes du CUR (fichiers Parquet, CUR 2.0 ou CUR historique) sont jointes
+à l'inventaire du scan sur line_item_resource_id :
+
+- EC2 et S3 : identifiant (i-..., nom du bucket)
+- RDS et Lambda : ARN
+
+Résultat : coût par ressource, dépense non conforme par compte (celui de la
+ligne de facturation) et type, par tag manquant (une ressource sans Owner ni
+CostCenter compte dans les deux), ressources non conformes les plus chères,
+et dépense non rattachée (ressources hors inventaire, par service).
+
+Les partitions CUR font plusieurs Go : seules les colonnes utiles sont lues, par
+lots (ParquetFile.iter_batches), et la jointure est vectorisée (pyarrow.compute
+index_in puis group_by) ; la mémoire reste bornée par la taille d'un lot.
+
+CUR_URI : répertoire local ou préfixe S3 des fichiers Parquet d'une période,
+avec {year}, {month} (1-12) et {billing_period} (AAAA-MM) remplacés par le mois
+en cours, ex. s3://cur/exports/gouvernance/data/BILLING_PERIOD={billing_period}/
+
+pyarrow n'est chargé qu'à l'appel (layer AWS SDK for pandas en production).
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+CUR_URI = os.environ.get("CUR_URI", "")
+# line_item_unblended_cost : coût facturé ; net_unblended_cost après remises
+CUR_COST_COLUMN = os.environ.get("CUR_COST_COLUMN", "line_item_unblended_cost")
+CUR_BATCH_ROWS = int(os.environ.get("CUR_BATCH_ROWS", "262144"))
+
+RESOURCE_COLUMN = "line_item_resource_id"
+ACCOUNT_COLUMN = "line_item_usage_account_id"
+PRODUCT_COLUMN = "line_item_product_code"
+# Types dont le CUR donne l'ARN plutôt que l'identifiant
+ARN_KEYED_TYPES = ("rds", "lambda")
+
+
+def join_key(resource_type: str, resource_id: str, arn: str = "") -> str:
+    """Valeur de line_item_resource_id pour une ressource de l'inventaire."""
+    if resource_type.lower() in ARN_KEYED_TYPES and arn:
+        return arn
+    return resource_id
+
+
+def resolve_uri(uri: str, now: Optional[datetime] = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    return uri.format(year=now.year, month=now.month, billing_period=now.strftime("%Y-%m"))
+
+
+def cur_files(uri: str):
+    """(système de fichiers pyarrow, chemins .parquet triés) d'un répertoire ou préfixe S3."""
+    from pyarrow import fs
+
+    filesystem, path = fs.FileSystem.from_uri(uri if "://" in uri else os.path.abspath(uri))
+    info = filesystem.get_file_info(path)
+    if info.type == fs.FileType.File:
+        return filesystem, [path]
+    found = filesystem.get_file_info(fs.FileSelector(path, recursive=True, allow_not_found=True))
+    return filesystem, sorted(f.path for f in found if f.type == fs.FileType.File and f.path.endswith(".parquet"))
+
+
+class Inventory:
+    """Ressources de l'inventaire indexées par clé de jointure, colonnes en listes."""
+
+    def __init__(self, resources: Iterable[Dict[str, Any]]):
+        self.keys: List[str] = []
+        self.types: List[str] = []
+        self.ids: List[str] = []
+        self.compliant: List[bool] = []
+        self.missing: List[List[str]] = []
+        seen = set()
+        for resource in resources:
+            resource_type = resource["type"].lower()
+            key = join_key(resource_type, resource["id"], resource.get("arn") or "")
+            if not key or key in seen:
+                continue  # même ressource vue par deux sources : la première compte
+            seen.add(key)
+            self.keys.append(key)
+            self.types.append(resource_type)
+            self.ids.append(resource["id"])
+            self.compliant.append(bool(resource["compliant"]))
+            self.missing.append(list(resource.get("missing_tags") or []))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def _sum(values) -> float:
+    import pyarrow.compute as pc
+
+    total = pc.sum(values).as_py()
+    return float(total or 0.0)
+
+
+def attribute_costs(resources: Iterable[Dict[str, Any]], uri: str = CUR_URI, now: Optional[datetime] = None,
+                    cost_column: str = CUR_COST_COLUMN, batch_rows: int = CUR_BATCH_ROWS,
+                    top: int = 20) -> Dict[str, Any]:
+    """
+    Joint l'inventaire (dicts type, id, arn, compliant, missing_tags : ressources
+    de metrics ou lignes d'un instantané Parquet) aux fichiers CUR de uri.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    inventory = Inventory(resources)
+    value_set = pa.array(inventory.keys, type=pa.string())
+    cost_by_resource: Dict[int, float] = defaultdict(float)
+    account_of: Dict[int, str] = {}
+    unmatched_by_product: Dict[str, float] = defaultdict(float)
+    totals = {"total": 0.0, "no_resource_id": 0.0, "unmatched": 0.0}
+    rows = 0
+
+    filesystem, paths = cur_files(resolve_uri(uri, now))
+    columns = [RESOURCE_COLUMN, ACCOUNT_COLUMN, PRODUCT_COLUMN, cost_column]
+    for path in paths:
+        with filesystem.open_input_file(path) as source:
+            parquet = pq.ParquetFile(source)
+            for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+                rows += batch.num_rows
+                resource_ids = batch.column(RESOURCE_COLUMN).cast(pa.string())
+                cost = pc.fill_null(batch.column(cost_column).cast(pa.float64()), 0.0)
+                totals["total"] += _sum(cost)
+
+                has_id = pc.fill_null(pc.not_equal(resource_ids, ""), False)
+                totals["no_resource_id"] += _sum(pc.filter(cost, pc.invert(has_id)))
+
+                positions = pc.index_in(resource_ids, value_set=value_set)
+                matched = pc.is_valid(positions)
+                unmatched = pc.and_(has_id, pc.invert(matched))
+                if pc.any(unmatched).as_py():
+                    lost = pa.table({
+                        "product": pc.fill_null(pc.filter(batch.column(PRODUCT_COLUMN).cast(pa.string()), unmatched), ""),
+                        "cost": pc.filter(cost, unmatched),
+                    }).group_by("product").aggregate([("cost", "sum")])
+                    for product, amount in zip(lost["product"].to_pylist(), lost["cost_sum"].to_pylist()):
+                        unmatched_by_product[product] += amount
+                        totals["unmatched"] += amount
+
+                if not pc.any(matched).as_py():
+                    continue
+                grouped = pa.table({
+                    "position": pc.filter(positions, matched),
+                    "account": pc.fill_null(pc.filter(batch.column(ACCOUNT_COLUMN).cast(pa.string()), matched), ""),
+                    "cost": pc.filter(cost, matched),
+                }).group_by(["position", "account"]).aggregate([("cost", "sum")])
+                for position, account, amount in zip(grouped["position"].to_pylist(), grouped["account"].to_pylist(),
+                                                     grouped["cost_sum"].to_pylist()):
+                    cost_by_resource[position] += amount
+                    account_of.setdefault(position, account)
+
+    return summarize(inventory, cost_by_resource, account_of, unmatched_by_product, totals,
+                     files=len(paths), rows=rows, top=top)
+
+
+def summarize(inventory: Inventory, cost_by_resource: Dict[int, float], account_of: Dict[int, str],
+              unmatched_by_product: Dict[str, float], totals: Dict[str, float], files: int = 0, rows: int = 0,
+              top: int = 20) -> Dict[str, Any]:
+    """Agrège les coûts par ressource en dépense non conforme (compte / type, tag manquant)."""
+    by_account_type: Dict[tuple, Dict[str, Any]] = {}
+    by_missing_tag: Dict[str, float] = defaultdict(float)
+    non_compliant = []
+    attributed = 0.0
+    for position, amount in cost_by_resource.items():
+        attributed += amount
+        if inventory.compliant[position]:
+            continue
+        key = (account_of.get(position, ""), inventory.types[position])
+        entry = by_account_type.setdefault(key, {"account": key[0], "type": key[1], "cost": 0.0, "resources": 0})
+        entry["cost"] += amount
+        entry["resources"] += 1
+        for tag in inventory.missing[position]:
+            by_missing_tag[tag] += amount
+        non_compliant.append(position)
+
+    non_compliant.sort(key=lambda position: -cost_by_resource[position])
+    return {
+        "files": files,
+        "rows": rows,
+        "resources": len(inventory),
+        "resources_with_cost": len(cost_by_resource),
+        "total_cost": round(totals["total"], 2),
+        "attributed_cost": round(attributed, 2),
+        "non_compliant_cost": round(sum(e["cost"] for e in by_account_type.values()), 2),
+        "unmatched_cost": round(totals["unmatched"], 2),
+        "no_resource_id_cost": round(totals["no_resource_id"], 2),
+        "by_account_type": sorted(({**e, "cost": round(e["cost"], 2)} for e in by_account_type.values()),
+                                  key=lambda e: -e["cost"]),
+        "by_missing_tag": {tag: round(cost, 2) for tag, cost in sorted(by_missing_tag.items(), key=lambda i: -i[1])},
+        "top_non_compliant": [{
+            "type": inventory.types[p], "id": inventory.ids[p], "account": account_of.get(p, ""),
+            "cost": round(cost_by_resource[p], 2), "missing_tags": inventory.missing[p],
+        } for p in non_compliant[:top]],
+        "unmatched_by_product": {product: round(cost, 2) for product, cost
+                                 in sorted(unmatched_by_product.items(), key=lambda i: -i[1])[:10]},
+    }
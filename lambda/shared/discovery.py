@@ -0,0 +1,72 @@
+"""
+Découverte live EC2 / RDS : filtres côté serveur et enregistrements compacts.
+
+Une réponse DescribeInstances complète porte, par instance, volumes, interfaces
+réseau, groupes de sécurité, placement… alors que les handlers n'en lisent que
+l'identifiant, l'état, la date de lancement et les tags. Ici :
+
+- les instances terminées sont écartées par AWS (filtre instance-state-name) au
+  lieu d'être transférées, désérialisées puis ignorées
+- pages de taille maximale (1000 instances EC2, 100 instances RDS) : moins
+  d'allers-retours
+- la page suivante est demandée en arrière-plan (prefetch) pendant le traitement
+  de la page courante, au plus PREFETCH_PAGES pages d'avance
+- chaque page est réduite, dès son arrivée, à des enregistrements compacts au
+  format de l'API (mêmes clés que ceux de l'inventaire Config) ; la réponse
+  complète est libérée avant la page suivante
+
+Les handlers gardent leurs propres contrôles d'état : ils servent encore pour les
+enregistrements issus d'AWS Config.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+from shared.workers import PREFETCH_PAGES, prefetch
+
+# Tous les états sauf "terminated" : le comportement des handlers est inchangé
+EC2_LIVE_STATES = ("pending", "running", "shutting-down", "stopping", "stopped")
+EC2_PAGE_SIZE = 1000  # MaxResults maximum de DescribeInstances
+RDS_PAGE_SIZE = 100   # MaxRecords maximum de DescribeDBInstances
+
+EC2_FIELDS = ("InstanceId", "InstanceType", "State", "LaunchTime", "Tags")
+RDS_FIELDS = ("DBInstanceIdentifier", "DBInstanceArn", "DBInstanceStatus", "InstanceCreateTime", "DbiResourceId",
+              "DBInstanceClass")
+
+
+def paginate(client, operation: str, depth: int = PREFETCH_PAGES, **kwargs) -> Iterator[Dict[str, Any]]:
+    """Pages de client.operation, la suivante lue en arrière-plan pendant le traitement de la courante."""
+    return prefetch(client.get_paginator(operation).paginate(**kwargs), depth)
+
+
+def project(record: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Copie réduite aux champs demandés (les champs absents sont omis)."""
+    return {field: record[field] for field in fields if field in record}
+
+
+def ec2_instances(client, states: Sequence[str] = EC2_LIVE_STATES,
+                  fields: Sequence[str] = EC2_FIELDS) -> Iterator[Dict[str, Any]]:
+    """Instances EC2 dans l'un des états demandés, réduites à fields."""
+    pages = paginate(
+        client, "describe_instances",
+        Filters=[{"Name": "instance-state-name", "Values": list(states)}],
+        PaginationConfig={"PageSize": EC2_PAGE_SIZE},
+    )
+    for page in pages:
+        compact = [project(instance, fields)
+                   for reservation in page["Reservations"] for instance in reservation["Instances"]]
+        del page
+        if "State" in fields:
+            for record in compact:
+                record["State"] = {"Name": record.get("State", {}).get("Name", "")}
+        yield from compact
+
+
+def rds_instances(client, fields: Sequence[str] = RDS_FIELDS) -> Iterator[Dict[str, Any]]:
+    """
+    Instances RDS réduites à fields. DescribeDBInstances n'a pas de filtre sur le
+    statut : seule la projection s'applique.
+    """
+    for page in paginate(client, "describe_db_instances", PaginationConfig={"PageSize": RDS_PAGE_SIZE}):
+        compact = [project(db, fields) for db in page["DBInstances"]]
+        del page
+        yield from compact
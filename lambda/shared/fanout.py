@@ -0,0 +1,275 @@
+"""
+Scan réparti coordinateur / workers (fan-out).
+
+Une seule invocation ne couvre pas un très gros compte en 15 minutes, même avec
+les threads. Le coordinateur découpe le travail en shards et invoque la même
+Lambda en asynchrone, une fois par shard ; chaque worker écrit son résultat
+partiel dans un store partagé. Le worker qui termine le dernier shard d'un run
+fait l'agrégation (compteur décrémenté atomiquement) : pas d'étape
+d'orchestration supplémentaire.
+
+Un shard = un service, éventuellement partagé en count parts : chaque worker
+liste le service (appels peu coûteux) mais ne traite que les ressources dont le
+hash stable de l'identifiant tombe dans sa part — ce sont les appels par
+ressource (tags, lancement du pipeline) qui sont répartis.
+
+Un shard rejoué (retry d'une invocation asynchrone) n'est compté qu'une fois.
+
+Stores disponibles (même logique que shared/idempotency.py) :
+- DynamoDBShardStore  : production (variable SCAN_SHARD_TABLE)
+- SQLiteShardStore    : local / tests (variable SCAN_SHARD_SQLITE_PATH)
+- InMemoryShardStore  : tests unitaires, ou repli si rien n'est configuré
+
+Invokers :
+- LambdaInvoker     : lambda:InvokeFunction, InvocationType=Event
+- InProcessInvoker  : tests / local, les événements sont exécutés par run_pending()
+"""
+
+import os
+import json
+import time
+import zlib
+import random
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+SCAN_SHARD_TABLE = os.environ.get("SCAN_SHARD_TABLE", "")
+SCAN_SHARD_SQLITE_PATH = os.environ.get("SCAN_SHARD_SQLITE_PATH", "")
+# Un run se termine en quelques minutes : les résultats partiels sont gardés 7 jours
+SCAN_SHARD_TTL_SECONDS = int(os.environ.get("SCAN_SHARD_TTL_SECONDS", str(7 * 24 * 3600)))
+
+RUN_ITEM = "#run"  # entrée technique d'un run : compteur de shards restants
+# DynamoDB : tentatives d'enregistrement d'un shard quand des workers terminent en même temps
+COMPLETE_ATTEMPTS = 8
+
+
+class Shard(NamedTuple):
+    service: str
+    index: int = 0
+    count: int = 1
+
+    @property
+    def shard_id(self) -> str:
+        return f"{self.service}-{self.index}-of-{self.count}"
+
+    def owns(self, key: str) -> bool:
+        """La ressource key appartient-elle à ce shard (hash stable, indépendant du processus) ?"""
+        return self.count <= 1 or zlib.crc32(key.encode()) % self.count == self.index
+
+
+def plan_shards(services: List[str], parts: Dict[str, int]) -> List[Shard]:
+    """Un shard par (service, part) ; parts[service] absent ou < 1 : une seule part."""
+    return [Shard(service, i, max(1, parts.get(service, 1)))
+            for service in services for i in range(max(1, parts.get(service, 1)))]
+
+
+class ShardStore:
+    """
+    Interface commune :
+    - start(run_id, shard_ids) : déclare les shards attendus
+    - complete(run_id, shard_id, result) : enregistre un résultat partiel, renvoie
+      le nombre de shards restants (None si ce shard était déjà enregistré)
+    - results(run_id) : {shard_id: résultat}
+    """
+
+    def start(self, run_id: str, shard_ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def complete(self, run_id: str, shard_id: str, result: Dict[str, Any]) -> Optional[int]:
+        raise NotImplementedError
+
+    def results(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class InMemoryShardStore(ShardStore):
+    def __init__(self):
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, run_id, shard_ids):
+        with self._lock:
+            self._runs[run_id] = {"remaining": len(shard_ids), "results": {}}
+
+    def complete(self, run_id, shard_id, result):
+        with self._lock:
+            run = self._runs.setdefault(run_id, {"remaining": 0, "results": {}})
+            if shard_id in run["results"]:
+                return None
+            run["results"][shard_id] = result
+            run["remaining"] -= 1
+            return run["remaining"]
+
+    def results(self, run_id):
+        with self._lock:
+            return dict(self._runs.get(run_id, {}).get("results", {}))
+
+
+class SQLiteShardStore(ShardStore):
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scan_shards ("
+            " run_id TEXT NOT NULL, shard_id TEXT NOT NULL, result TEXT, remaining INTEGER,"
+            " PRIMARY KEY (run_id, shard_id))"
+        )
+        self._conn.commit()
+
+    def start(self, run_id, shard_ids):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO scan_shards VALUES (?, ?, NULL, ?)",
+                               (run_id, RUN_ITEM, len(shard_ids)))
+            self._conn.commit()
+
+    def complete(self, run_id, shard_id, result):
+        with self._lock:
+            try:
+                self._conn.execute("INSERT INTO scan_shards VALUES (?, ?, ?, NULL)",
+                                   (run_id, shard_id, json.dumps(result, default=str)))
+            except sqlite3.IntegrityError:
+                return None
+            self._conn.execute("UPDATE scan_shards SET remaining = remaining - 1 WHERE run_id = ? AND shard_id = ?",
+                               (run_id, RUN_ITEM))
+            row = self._conn.execute("SELECT remaining FROM scan_shards WHERE run_id = ? AND shard_id = ?",
+                                     (run_id, RUN_ITEM)).fetchone()
+            self._conn.commit()
+        return row[0] if row else 0
+
+    def results(self, run_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT shard_id, result FROM scan_shards WHERE run_id = ? AND shard_id != ?",
+                                      (run_id, RUN_ITEM)).fetchall()
+        return {shard_id: json.loads(result) for shard_id, result in rows}
+
+
+class DynamoDBShardStore(ShardStore):
+    """
+    Table DynamoDB : clé de partition "run_id" (S), clé de tri "shard_id" (S),
+    attribut TTL "expires_at". L'entrée "#run" porte le compteur "remaining".
+    """
+
+    def __init__(self, table_name: str, client=None, ttl_seconds: int = SCAN_SHARD_TTL_SECONDS):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        if client is None:
+            from shared.ratelimit import limited_client
+
+            client = limited_client("dynamodb")
+        self.client = client
+
+    def _expires_at(self) -> Dict[str, str]:
+        return {"N": str(int(time.time()) + self.ttl_seconds)}
+
+    def start(self, run_id, shard_ids):
+        self.client.put_item(TableName=self.table_name, Item={
+            "run_id": {"S": run_id}, "shard_id": {"S": RUN_ITEM},
+            "remaining": {"N": str(len(shard_ids))}, "expires_at": self._expires_at(),
+        })
+
+    def complete(self, run_id, shard_id, result):
+        """
+        Résultat du shard et décrément du compteur dans une même transaction : un
+        worker interrompu entre les deux écritures bloquerait l'agrégation. Le
+        compteur est lu puis écrit sous condition (TransactWriteItems ne renvoie pas
+        la valeur mise à jour) : chaque worker obtient une valeur distincte, un seul
+        voit 0. Un compteur modifié entre-temps par un autre worker fait rejouer.
+        """
+        from botocore.exceptions import ClientError
+
+        run_key = {"run_id": {"S": run_id}, "shard_id": {"S": RUN_ITEM}}
+        shard_put = {
+            "TableName": self.table_name,
+            "Item": {"run_id": {"S": run_id}, "shard_id": {"S": shard_id},
+                     "result": {"S": json.dumps(result, default=str)}, "expires_at": self._expires_at()},
+            "ConditionExpression": "attribute_not_exists(shard_id)",
+        }
+        for attempt in range(COMPLETE_ATTEMPTS):
+            run = self.client.get_item(TableName=self.table_name, Key=run_key, ConsistentRead=True).get("Item")
+            if run is None:
+                seen, condition, values = 0, "attribute_not_exists(remaining)", {}
+            else:
+                seen = int(run["remaining"]["N"])
+                condition, values = "remaining = :seen", {":seen": {"N": str(seen)}}
+            try:
+                self.client.transact_write_items(TransactItems=[
+                    {"Put": shard_put},
+                    {"Update": {
+                        "TableName": self.table_name,
+                        "Key": run_key,
+                        "UpdateExpression": "SET remaining = :remaining",
+                        "ConditionExpression": condition,
+                        "ExpressionAttributeValues": {**values, ":remaining": {"N": str(seen - 1)}},
+                    }},
+                ])
+                return seen - 1
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    raise
+                reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+                if reasons and reasons[0] == "ConditionalCheckFailed":
+                    return None  # shard déjà enregistré
+            # Délai aléatoire : des workers terminés ensemble ne se rejouent pas en cadence
+            time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+        raise RuntimeError(f"compteur du run {run_id} modifié en continu, shard {shard_id} non enregistré")
+
+    def results(self, run_id):
+        found = {}
+        pages = self.client.get_paginator("query").paginate(
+            TableName=self.table_name,
+            KeyConditionExpression="run_id = :run_id",
+            ExpressionAttributeValues={":run_id": {"S": run_id}},
+            ConsistentRead=True,
+        )
+        for page in pages:
+            for item in page.get("Items", []):
+                if item["shard_id"]["S"] != RUN_ITEM:
+                    found[item["shard_id"]["S"]] = json.loads(item["result"]["S"])
+        return found
+
+
+def get_shard_store() -> ShardStore:
+    """Choisit le store selon l'environnement (DynamoDB > SQLite > mémoire)."""
+    if SCAN_SHARD_TABLE:
+        return DynamoDBShardStore(SCAN_SHARD_TABLE)
+    if SCAN_SHARD_SQLITE_PATH:
+        return SQLiteShardStore(SCAN_SHARD_SQLITE_PATH)
+    return InMemoryShardStore()
+
+
+class LambdaInvoker:
+    """Invocation asynchrone (InvocationType=Event) d'une fonction Lambda."""
+
+    def __init__(self, client, function_name: str):
+        self.client = client
+        self.function_name = function_name
+
+    def invoke(self, event: Dict[str, Any]) -> None:
+        self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType="Event",
+            Payload=json.dumps(event).encode(),
+        )
+
+
+class InProcessInvoker:
+    """
+    Stand-in local : les événements sont mis en file, puis run_pending() les passe
+    au handler dans l'ordre — le coordinateur a rendu la main, comme en asynchrone.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any], Any], Any], context: Any = None):
+        self.handler = handler
+        self.context = context
+        self.pending: List[Dict[str, Any]] = []
+
+    def invoke(self, event: Dict[str, Any]) -> None:
+        # Même sérialisation qu'une vraie invocation
+        self.pending.append(json.loads(json.dumps(event)))
+
+    def run_pending(self) -> List[Any]:
+        results = []
+        while self.pending:
+            results.append(self.handler(self.pending.pop(0), self.context))
+        return results
@@ -0,0 +1,176 @@
+"""
+Idempotence des tâches Step Functions.
+
+Step Functions rejoue une tâche en cas d'erreur Lambda (Retry, MaxAttempts: 3).
+Sans garde-fou, un retry de FreezeResource recrée un snapshot RDS et un retry
+de NotifyJ0 renvoie l'email + le message Slack.
+
+Chaque action est identifiée par (execution, state, resource, action) :
+le premier résultat réussi est stocké, les retries le relisent au lieu de
+refaire les appels AWS.
+
+Stores disponibles :
+- DynamoDBStore  : production (variable IDEMPOTENCY_TABLE)
+- SQLiteStore    : local / tests (variable IDEMPOTENCY_SQLITE_PATH)
+- InMemoryStore  : tests unitaires, ou repli si rien n'est configuré
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional
+
+IDEMPOTENCY_TABLE = os.environ.get("IDEMPOTENCY_TABLE", "")
+IDEMPOTENCY_SQLITE_PATH = os.environ.get("IDEMPOTENCY_SQLITE_PATH", "")
+# Une exécution dure ~4 jours (2 x Wait 48h) : on garde les résultats 7 jours
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def make_key(execution_id: str, state_name: str, resource_id: str, action: str) -> str:
+    return f"{execution_id}#{state_name}#{resource_id}#{action}"
+
+
+class IdempotencyStore:
+    """Interface commune : get() renvoie le résultat stocké ou None, save() l'enregistre."""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save(self, key: str, result: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class InMemoryStore(IdempotencyStore):
+    """Dict protégé par un verrou — vit le temps du conteneur Lambda."""
+
+    def __init__(self):
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._items.get(key)
+
+    def save(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            # Premier résultat gagnant, comme la condition DynamoDB
+            self._items.setdefault(key, result)
+
+
+class SQLiteStore(IdempotencyStore):
+    """Stand-in local persistant (fichier) ou éphémère (":memory:")."""
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            " key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM idempotency WHERE key = ? AND expires_at > ?",
+                (key, int(time.time())),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM idempotency WHERE key = ? AND expires_at <= ?", (key, int(time.time())))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO idempotency (key, result, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result, default=str), int(time.time()) + self.ttl_seconds),
+            )
+            self._conn.commit()
+
+
+class DynamoDBStore(IdempotencyStore):
+    """
+    Table DynamoDB : clé de partition "key" (S), attribut TTL "expires_at".
+    Écriture conditionnelle : un retry concurrent ne remplace jamais le premier résultat.
+    """
+
+    def __init__(self, table_name: str, client=None, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        if client is None:
+            from shared.ratelimit import limited_client
+
+            client = limited_client("dynamodb")
+        self.client = client
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        resp = self.client.get_item(
+            TableName=self.table_name,
+            Key={"key": {"S": key}},
+            ConsistentRead=True,
+        )
+        item = resp.get("Item")
+        if not item or int(item["expires_at"]["N"]) <= int(time.time()):
+            return None
+        return json.loads(item["result"]["S"])
+
+    def save(self, key: str, result: Dict[str, Any]) -> None:
+        from botocore.exceptions import ClientError
+
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "key": {"S": key},
+                    "result": {"S": json.dumps(result, default=str)},
+                    "expires_at": {"N": str(now + self.ttl_seconds)},
+                },
+                # Autorise l'écrasement d'un item expiré mais pas encore purgé par le TTL
+                ConditionExpression="attribute_not_exists(#k) OR expires_at <= :now",
+                ExpressionAttributeNames={"#k": "key"},
+                ExpressionAttributeValues={":now": {"N": str(now)}},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+def get_store() -> IdempotencyStore:
+    """Choisit le store selon l'environnement (DynamoDB > SQLite > mémoire)."""
+    if IDEMPOTENCY_TABLE:
+        return DynamoDBStore(IDEMPOTENCY_TABLE)
+    if IDEMPOTENCY_SQLITE_PATH:
+        return SQLiteStore(IDEMPOTENCY_SQLITE_PATH)
+    return InMemoryStore()
+
+
+def run_idempotent(store: IdempotencyStore, key: Optional[str], fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Exécute fn() une seule fois par clé.
+    Renvoie le résultat en cache (avec "idempotent_replay": True) si la clé est connue.
+    Sans clé (invocation directe, hors Step Functions), fn() est toujours exécutée.
+    Seuls les résultats réussis sont stockés : une exception laisse le retry rejouer l'action.
+    """
+    if not key:
+        return fn()
+    cached = store.get(key)
+    if cached is not None:
+        return {**cached, "idempotent_replay": True}
+    result = fn()
+    store.save(key, result)
+    return result
+
+
+def key_from_event(event: Dict[str, Any], resource_id: str, action: str) -> Optional[str]:
+    """
+    Construit la clé depuis les champs injectés par la state machine :
+    "execution_id.$": "$$.Execution.Id" et "state_name.$": "$$.State.Name".
+    """
+    execution_id = event.get("execution_id")
+    state_name = event.get("state_name")
+    if not execution_id or not state_name:
+        return None
+    return make_key(execution_id, state_name, resource_id, action)
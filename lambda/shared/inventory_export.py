@@ -0,0 +1,146 @@
+"""
+Export de l'inventaire en Parquet (Apache Arrow), un fichier par run.
+
+Les listes de ressources construites par le scanner et par metrics disparaissaient
+à la fin de l'invocation : l'équipe FinOps rescannait pour analyser les tags.
+Avec INVENTORY_EXPORT_URI, chaque run écrit un instantané en colonnes :
+
+    snapshot_at, source, policy_version, id, arn, type, region, account, compliant,
+    missing_tags, invalid_tags, tag_keys (listes), puis une colonne "tag.<clé>" par
+    clé de tag rencontrée (valeur, nulle si la ressource n'a pas la clé)
+
+Emplacement (une table par source, partitionnée par jour au format Hive pour
+Athena / pyarrow.dataset ; la source reste une colonne du fichier) :
+    <uri>/<source>/dt=<AAAA-MM-JJ>/<source>-<AAAAMMJJTHHMMSS><suffixe>.parquet
+
+L'URI est un préfixe S3 (s3://bucket/prefix) ou un répertoire local. Le suffixe
+distingue les shards du scan réparti. scripts/inventory_query.py lit ces
+fichiers en mémoire mappée pour filtrer et agréger sur l'historique.
+
+pyarrow n'est chargé qu'à l'écriture (layer AWS SDK for pandas en production) :
+sans lui, l'export est ignoré avec un avertissement, le scan n'est pas affecté.
+"""
+
+import os
+import io
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+INVENTORY_EXPORT_URI = os.environ.get("INVENTORY_EXPORT_URI", "").rstrip("/")
+TAG_COLUMN_PREFIX = "tag."
+BASE_COLUMNS = ("id", "arn", "type", "region", "account")
+LIST_COLUMNS = ("missing_tags", "invalid_tags", "tag_keys")
+
+
+def resource_arn(resource_type: str, resource_id: str, region: str, account: str) -> str:
+    """ARN des types dont le listing ne renvoie que l'identifiant (EC2, S3)."""
+    if resource_type == "ec2":
+        return f"arn:aws:ec2:{region}:{account}:instance/{resource_id}"
+    if resource_type == "s3":
+        return f"arn:aws:s3:::{resource_id}"
+    return ""
+
+
+def snapshot_key(source: str, snapshot_at: datetime, suffix: str = "") -> str:
+    return (f"{source}/dt={snapshot_at.strftime('%Y-%m-%d')}/"
+            f"{source}-{snapshot_at.strftime('%Y%m%dT%H%M%S')}{suffix}.parquet")
+
+
+class InventoryExport:
+    """
+    Lignes d'inventaire d'un run : begin() remet à zéro, add() ajoute une ressource
+    évaluée, write() écrit le fichier Parquet et renvoie son emplacement.
+    """
+
+    def __init__(self, source: str, uri: str = INVENTORY_EXPORT_URI, s3_client=None):
+        self.source = source
+        self.uri = uri
+        self._s3 = s3_client
+        self.rows: List[Dict[str, Any]] = []
+        self.account = ""
+        self.policy_version = ""
+        self.snapshot_at = datetime.now(timezone.utc)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.uri)
+
+    def begin(self, policy_version: str = "", account: str = "") -> None:
+        self.rows = []
+        self.policy_version = policy_version
+        self.account = account
+        self.snapshot_at = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def add(self, resource_type: str, resource_id: str, tags: Any, result: Any, arn: str = "",
+            region: str = "", account: str = "") -> None:
+        """result : PolicyResult (compliant, missing, invalid) de la ressource."""
+        if not self.enabled:
+            return
+        account = account or self.account
+        self.rows.append({
+            "id": resource_id,
+            "arn": arn or resource_arn(resource_type, resource_id, region, account),
+            "type": resource_type,
+            "region": region,
+            "account": account,
+            "compliant": bool(result[0]),
+            "missing_tags": list(result[1]),
+            "invalid_tags": list(result[2]),
+            "tags": dict(tags or {}),
+        })
+
+    def columns(self) -> Dict[str, list]:
+        """Lignes → colonnes (clés de tags aplaties, triées pour un schéma stable)."""
+        keys = sorted({key for row in self.rows for key in row["tags"]})
+        columns: Dict[str, list] = {
+            "snapshot_at": [self.snapshot_at] * len(self.rows),
+            "source": [self.source] * len(self.rows),
+            "policy_version": [self.policy_version] * len(self.rows),
+        }
+        for name in BASE_COLUMNS:
+            columns[name] = [row[name] for row in self.rows]
+        columns["compliant"] = [row["compliant"] for row in self.rows]
+        columns["missing_tags"] = [row["missing_tags"] for row in self.rows]
+        columns["invalid_tags"] = [row["invalid_tags"] for row in self.rows]
+        columns["tag_keys"] = [sorted(row["tags"]) for row in self.rows]
+        for key in keys:
+            columns[TAG_COLUMN_PREFIX + key] = [row["tags"].get(key) for row in self.rows]
+        return columns
+
+    def to_parquet(self) -> bytes:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = self.columns()
+        types = {"snapshot_at": pa.timestamp("s", tz="UTC"), "compliant": pa.bool_()}
+        types.update({name: pa.list_(pa.string()) for name in LIST_COLUMNS})
+        schema = pa.schema([(name, types.get(name, pa.string())) for name in columns])
+        table = pa.table(columns, schema=schema)
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression="zstd")
+        return buffer.getvalue()
+
+    def write(self, suffix: str = "") -> Optional[str]:
+        """Écrit l'instantané ; None si l'export est désactivé, vide ou impossible."""
+        if not self.enabled or not self.rows:
+            return None
+        try:
+            body = self.to_parquet()
+        except ImportError:
+            print("⚠️  pyarrow absent : export de l'inventaire ignoré")
+            return None
+        key = snapshot_key(self.source, self.snapshot_at, suffix)
+        if self.uri.startswith("s3://"):
+            bucket, _, prefix = self.uri[len("s3://"):].partition("/")
+            if self._s3 is None:
+                from shared.ratelimit import limited_client
+
+                self._s3 = limited_client("s3")
+            key = f"{prefix}/{key}" if prefix else key
+            self._s3.put_object(Bucket=bucket, Key=key, Body=body)
+            return f"s3://{bucket}/{key}"
+        path = os.path.join(self.uri, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            out.write(body)
+        return path
@@ -0,0 +1,305 @@
+"""
+Politique de tags déclarative, compilée une fois par cold start.
+
+Le fichier de politique (JSON, par défaut shared/tag_policy.json, surchargé par
+TAG_POLICY_FILE) décrit :
+
+- rules    : règle de valeur par tag — "format": "email", "pattern": regex
+             (fullmatch), "allowed": [valeurs] (+ "ignore_case")
+- required : tags obligatoires par défaut
+- scopes   : exigences par type de ressource et/ou environnement, ex.
+             {"resource_types": ["lambda"], "environments": ["dev"], "required": ["Owner", "Squad"]}
+- case_insensitive_keys : "owner" vaut "Owner"
+
+La compilation précalcule, pour chaque scope, le tuple (clé, clé minuscule,
+validateur) à vérifier : évaluer une ressource revient à choisir son scope
+(au plus 4 lookups, du plus précis au plus général) puis à faire un lookup par
+tag obligatoire dans le TagSet.
+"""
+
+import os
+import re
+import json
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from shared.tagset import TagSet
+
+DEFAULT_POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tag_policy.json")
+
+EMAIL_PATTERN = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+ANY = "*"
+
+Validator = Callable[[str], bool]
+
+
+class PolicyError(ValueError):
+    """Document de politique invalide (clé inconnue, regex incorrecte…)."""
+
+
+class PolicyResult(NamedTuple):
+    compliant: bool
+    missing: List[str]
+    invalid: List[str]
+
+
+def _compile_rule(key: str, rule: Dict[str, Any]) -> Optional[Validator]:
+    unknown = set(rule) - {"format", "pattern", "allowed", "ignore_case"}
+    if unknown:
+        raise PolicyError(f"Règle {key} : options inconnues {sorted(unknown)}")
+    ignore_case = bool(rule.get("ignore_case"))
+    if "allowed" in rule:
+        if ignore_case:
+            allowed = frozenset(str(v).lower() for v in rule["allowed"])
+            return lambda value: value.lower() in allowed
+        allowed = frozenset(str(v) for v in rule["allowed"])
+        return allowed.__contains__
+
+    if rule.get("format") == "email":
+        pattern = EMAIL_PATTERN
+    elif "format" in rule:
+        raise PolicyError(f"Règle {key} : format inconnu {rule['format']!r}")
+    else:
+        pattern = rule.get("pattern")
+    if pattern is None:
+        return None
+    try:
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    except re.error as e:
+        raise PolicyError(f"Règle {key} : regex invalide ({e})") from e
+    return lambda value: regex.fullmatch(value) is not None
+
+
+class CompiledPolicy:
+    """Politique prête à l'emploi : validateurs et exigences indexés par scope."""
+
+    def __init__(self, document: Dict[str, Any]):
+        if not isinstance(document.get("required"), list):
+            raise PolicyError("La politique doit définir 'required' (liste de tags)")
+        self.version = str(document.get("version", ""))
+        self.case_insensitive_keys = bool(document.get("case_insensitive_keys", False))
+        self.environment_key = document.get("environment_tag", "Environment")
+        self.required: Tuple[str, ...] = tuple(document["required"])
+
+        validators = {key: _compile_rule(key, rule or {}) for key, rule in document.get("rules", {}).items()}
+
+        def checks(required) -> Tuple[Tuple[str, str, Optional[Validator]], ...]:
+            return tuple((key, key.lower(), validators.get(key)) for key in required)
+
+        self._scopes: Dict[Tuple[str, str], tuple] = {(ANY, ANY): checks(self.required)}
+        for scope in document.get("scopes", []):
+            if not isinstance(scope.get("required"), list):
+                raise PolicyError(f"Scope sans 'required' : {scope}")
+            compiled = checks(scope["required"])
+            for resource_type in scope.get("resource_types") or [ANY]:
+                for environment in scope.get("environments") or [ANY]:
+                    self._scopes[(resource_type.lower(), environment.lower())] = compiled
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompiledPolicy":
+        try:
+            with open(path) as f:
+                document = json.load(f)
+        except json.JSONDecodeError as e:
+            raise PolicyError(f"{path} : JSON invalide ({e})") from e
+        return cls(document)
+
+    def required_for(self, resource_type: str = ANY, environment: str = "") -> Tuple[str, ...]:
+        return tuple(key for key, _, _ in self._scope(resource_type, environment))
+
+    def checks_for(self, resource_type: str = ANY, environment: str = "") -> Tuple[Tuple[str, str, Optional[Validator]], ...]:
+        """(clé, clé minuscule, validateur) vérifiés pour ce type et cet environnement."""
+        return self._scope(resource_type, environment)
+
+    def _scope(self, resource_type: str, environment: str) -> tuple:
+        scopes = self._scopes
+        resource_type = (resource_type or ANY).lower()
+        environment = (environment or ANY).lower()
+        return (scopes.get((resource_type, environment))
+                or scopes.get((resource_type, ANY))
+                or scopes.get((ANY, environment))
+                or scopes[(ANY, ANY)])
+
+    def evaluate(self, tags: Any, resource_type: str = ANY) -> PolicyResult:
+        tags = TagSet.of(tags)
+        case_insensitive = self.case_insensitive_keys
+        # Index des clés en minuscules, construit seulement si une clé exacte manque
+        lowered: Optional[Dict[str, str]] = None
+
+        environment = tags.get(self.environment_key, None)
+        if environment is None and case_insensitive:
+            lowered = {k.lower(): v for k, v in tags.items()}
+            environment = lowered.get(self.environment_key.lower())
+
+        missing, invalid = [], []
+        for key, lower_key, validator in self._scope(resource_type, environment or ""):
+            value = tags.get(key, None)
+            if value is None and case_insensitive:
+                if lowered is None:
+                    lowered = {k.lower(): v for k, v in tags.items()}
+                value = lowered.get(lower_key)
+            if value is None:
+                missing.append(key)
+            elif validator is not None and not validator(value):
+                invalid.append(key)
+        return PolicyResult(not missing and not invalid, missing, invalid)
+
+
+# ========================================
+# SOURCES DE POLITIQUE ET CACHE À CHAUD
+# ========================================
+
+class FilePolicySource:
+    """Fichier local (tests, politique embarquée dans le layer). Version : mtime + taille."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.description = path
+
+    def fetch(self, token: Optional[str]) -> Optional[Tuple[Dict[str, Any], str]]:
+        stat = os.stat(self.path)
+        current = f"{stat.st_mtime_ns}-{stat.st_size}"
+        if current == token:
+            return None
+        with open(self.path) as f:
+            return _parse(f.read(), self.path), current
+
+
+class S3PolicySource:
+    """Objet S3, relu seulement si son ETag a changé (GetObject conditionnel, 304 sinon)."""
+
+    def __init__(self, bucket: str, key: str, client=None):
+        self.bucket, self.key = bucket, key
+        self.description = f"s3://{bucket}/{key}"
+        self._client = client
+
+    def fetch(self, token: Optional[str]) -> Optional[Tuple[Dict[str, Any], str]]:
+        from botocore.exceptions import ClientError
+
+        params = {"Bucket": self.bucket, "Key": self.key}
+        if token:
+            params["IfNoneMatch"] = token
+        try:
+            resp = _client(self, "s3").get_object(**params)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("304", "NotModified"):
+                return None
+            raise
+        return _parse(resp["Body"].read(), self.description), resp["ETag"]
+
+
+class SsmPolicySource:
+    """Paramètre SSM (String) ; SSM n'a pas de lecture conditionnelle : recompilation seulement si Version change."""
+
+    def __init__(self, name: str, client=None):
+        self.name = name
+        self.description = f"ssm:{name}"
+        self._client = client
+
+    def fetch(self, token: Optional[str]) -> Optional[Tuple[Dict[str, Any], str]]:
+        parameter = _client(self, "ssm").get_parameter(Name=self.name)["Parameter"]
+        version = str(parameter["Version"])
+        if version == token:
+            return None
+        return _parse(parameter["Value"], self.description), version
+
+
+def _client(source, service: str):
+    if source._client is None:
+        from shared.ratelimit import limited_client
+
+        source._client = limited_client(service)
+    return source._client
+
+
+def _parse(raw, origin: str) -> Dict[str, Any]:
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise PolicyError(f"{origin} : JSON invalide ({e})") from e
+
+
+def source_from_env():
+    """
+    TAG_POLICY_SOURCE : "ssm:/governance/tag-policy", "s3://bucket/cle.json" ou chemin local.
+    Par défaut : TAG_POLICY_FILE, sinon la politique embarquée (shared/tag_policy.json).
+    """
+    spec = os.environ.get("TAG_POLICY_SOURCE") or os.environ.get("TAG_POLICY_FILE") or DEFAULT_POLICY_FILE
+    if spec.startswith("ssm:"):
+        return SsmPolicySource(spec[len("ssm:"):])
+    if spec.startswith("s3://"):
+        bucket, _, key = spec[len("s3://"):].partition("/")
+        return S3PolicySource(bucket, key)
+    return FilePolicySource(spec[len("file:"):] if spec.startswith("file:") else spec)
+
+
+class PolicyStore:
+    """
+    Politique compilée, gardée dans le conteneur chaud. Au plus une lecture de la
+    source par TTL (TAG_POLICY_TTL_SECONDS, 300 s par défaut) : lecture conditionnelle,
+    recompilation seulement si la version a changé. Si la source est injoignable ou
+    la nouvelle politique invalide, la dernière politique valide reste active.
+    """
+
+    def __init__(self, source=None, ttl_seconds: Optional[float] = None, clock=time.monotonic):
+        self.source = source
+        self.ttl_seconds = float(os.environ.get("TAG_POLICY_TTL_SECONDS", "300")) if ttl_seconds is None else ttl_seconds
+        self._clock = clock
+        self._policy: Optional[CompiledPolicy] = None
+        self._token: Optional[str] = None
+        self._checked_at = 0.0
+        self.stats = {"fetches": 0, "reloads": 0, "errors": 0}
+
+    def get(self) -> CompiledPolicy:
+        if self._policy is None:
+            if self.source is None:
+                self.source = source_from_env()
+            if not self._refresh() and self._policy is None:
+                # Cold start sans source joignable : politique embarquée plutôt qu'un échec
+                print(f"⚠️  Politique {self.source.description} indisponible, politique embarquée utilisée")
+                self._install(CompiledPolicy.from_file(DEFAULT_POLICY_FILE), "embedded")
+        elif self._clock() - self._checked_at >= self.ttl_seconds:
+            self._refresh()
+        return self._policy
+
+    def _refresh(self) -> bool:
+        self._checked_at = self._clock()
+        self.stats["fetches"] += 1
+        try:
+            fetched = self.source.fetch(self._token)
+            if fetched is None:
+                return True
+            document, token = fetched
+            self._install(CompiledPolicy(document), token)
+        except Exception as e:  # noqa: BLE001 — on garde la dernière politique valide
+            self.stats["errors"] += 1
+            print(f"⚠️  Rechargement de la politique {self.source.description} impossible : {e}")
+            return False
+        return True
+
+    def _install(self, policy: CompiledPolicy, token: str):
+        if not policy.version:
+            policy.version = token
+        if self._policy is not None:
+            print(f"🔄 Politique de tags : {self._policy.version} → {policy.version}")
+        self._policy, self._token = policy, token
+        self.stats["reloads"] += 1
+
+    def set(self, policy: Optional[CompiledPolicy]):
+        self._policy, self._token = policy, None
+        self._checked_at = self._clock()
+        if policy is None:
+            self.source = None
+
+
+policy_store = PolicyStore()
+
+
+def get_policy() -> CompiledPolicy:
+    """Politique active : compilée au cold start, rafraîchie au plus une fois par TTL."""
+    return policy_store.get()
+
+
+def set_policy(policy: Optional[CompiledPolicy]) -> None:
+    """Remplace la politique active (None : rechargée depuis la source au prochain get_policy)."""
+    policy_store.set(policy)
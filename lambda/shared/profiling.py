@@ -0,0 +1,151 @@
+"""
+Profilage échantillonné des Lambdas de gouvernance (cProfile + tracemalloc).
+
+Les segments X-Ray du Tracer s'arrêtent au niveau des méthodes : quand un scan
+prend soudain deux fois plus longtemps, ils ne disent pas quelle fonction a
+grossi. Le décorateur @sampled_profile enveloppe lambda_handler et, pour une
+fraction des invocations, enregistre :
+
+- <nom>.prof       : profil cProfile (format pstats, lisible par snakeviz/pstats)
+- <nom>.alloc.json : durée, pic mémoire et principaux sites d'allocation
+
+Configuration (désactivé par défaut) :
+    PROFILING_SAMPLE_RATE=0.05                 # 5 % des invocations
+    PROFILING_OUTPUT=s3://bucket/profiles      # ou un chemin local (défaut /tmp/profiles)
+    PROFILING_TOP_ALLOCATIONS=25               # sites d'allocation conservés
+
+Comparaison de deux profils hors ligne : scripts/profile_diff.py.
+"""
+
+import os
+import json
+import time
+import random
+import marshal
+import cProfile
+import functools
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_OUTPUT = "/tmp/profiles"
+
+
+def sample_rate() -> float:
+    try:
+        rate = float(os.environ.get("PROFILING_SAMPLE_RATE", "0") or 0)
+    except ValueError:
+        return 0.0
+    return min(max(rate, 0.0), 1.0)
+
+
+def should_profile(rate: Optional[float] = None, rand: Callable[[], float] = random.random) -> bool:
+    rate = sample_rate() if rate is None else rate
+    return rate > 0 and rand() < rate
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> List[Dict[str, Any]]:
+    """Sites d'allocation (fichier:ligne) triés par taille, fichiers de tracemalloc exclus."""
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    sites = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        sites.append({
+            "site": f"{frame.filename}:{frame.lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        })
+    return sites
+
+
+def split_s3_uri(uri: str) -> Tuple[str, str]:
+    bucket, _, prefix = uri[len("s3://"):].partition("/")
+    return bucket, prefix.strip("/")
+
+
+def write_profile(output: str, name: str, profile_data: bytes, allocations: Dict[str, Any]) -> str:
+    """Écrit le profil et le bilan d'allocations sous output (chemin local ou s3://). Renvoie la base du nom."""
+    body = json.dumps(allocations, indent=2, default=str).encode()
+    if output.startswith("s3://"):
+        import boto3
+
+        # Client boto3 direct : l'écriture du profil ne doit ni consommer le budget
+        # du limiteur partagé ni apparaître dans la comptabilité des appels API
+        bucket, prefix = split_s3_uri(output)
+        key = f"{prefix}/{name}" if prefix else name
+        s3 = boto3.client("s3")
+        s3.put_object(Bucket=bucket, Key=f"{key}.prof", Body=profile_data)
+        s3.put_object(Bucket=bucket, Key=f"{key}.alloc.json", Body=body, ContentType="application/json")
+        return f"s3://{bucket}/{key}"
+
+    path = os.path.join(output, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.prof", "wb") as f:
+        f.write(profile_data)
+    with open(f"{path}.alloc.json", "wb") as f:
+        f.write(body)
+    return path
+
+
+def _profile_bytes(profiler: cProfile.Profile) -> bytes:
+    # Même format que Profile.dump_stats, sans passer par un fichier
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+def sampled_profile(handler: Callable) -> Callable:
+    """
+    Décorateur de lambda_handler : profile une fraction des invocations.
+    À placer au-dessus des décorateurs powertools pour couvrir toute l'invocation.
+    Une erreur d'écriture du profil n'interrompt jamais l'invocation.
+    """
+
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME") or handler.__module__
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not should_profile():
+            return handler(event, context)
+
+        request_id = getattr(context, "aws_request_id", None) or f"local-{os.getpid()}"
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return handler(event, context)
+        finally:
+            profiler.disable()
+            wall_seconds = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            _save(profiler, snapshot, function_name, request_id, wall_seconds, current, peak)
+
+    return wrapper
+
+
+def _save(profiler, snapshot, function_name, request_id, wall_seconds, current, peak):
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    name = f"{function_name}/{timestamp}-{request_id}"
+    limit = int(os.environ.get("PROFILING_TOP_ALLOCATIONS", "25"))
+    allocations = {
+        "function": function_name,
+        "request_id": request_id,
+        "timestamp": timestamp,
+        "wall_seconds": round(wall_seconds, 3),
+        "current_mb": round(current / 1024 / 1024, 2),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "top_allocations": top_allocations(snapshot, limit),
+    }
+    try:
+        location = write_profile(os.environ.get("PROFILING_OUTPUT") or DEFAULT_OUTPUT, name,
+                                 _profile_bytes(profiler), allocations)
+        print(f"🔬 Profil écrit : {location}.prof ({wall_seconds:.2f}s, pic {allocations['peak_mb']} Mo)")
+    except Exception as e:  # noqa: BLE001 — le profilage ne doit jamais faire échouer la Lambda
+        print(f"⚠️  Profil non écrit : {e}")
+
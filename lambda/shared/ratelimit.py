@@ -0,0 +1,215 @@
+"""
+Limitation de débit côté client, branchée sur les événements botocore.
+
+Scanner, metrics et cleanup tournent souvent en même temps et consomment les
+mêmes quotas d'API EC2/RDS/Lambda du compte. Plutôt que d'échouer sur le premier
+Throttling, chaque client passe par un seau à jetons par opération :
+
+- before-call : attend un jeton (le temps d'attente est comptabilisé)
+- needs-retry : réponse de throttling → le débit de l'opération est divisé par 2
+- after-call  : succès → le débit remonte progressivement vers le quota (AIMD)
+
+Les quotas sont un budget par Lambda (req/s), configurables via API_RATE_LIMITS :
+    API_RATE_LIMITS='{"ec2": 20, "rds.ListTagsForResource": 5, "default": 10}'
+Une clé "service.Operation" est prioritaire sur la clé "service", puis "default".
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from botocore.config import Config
+
+# Budget par défaut (req/s) — une fraction des quotas AWS pour laisser de la marge
+# aux autres Lambdas de gouvernance qui tournent en parallèle
+DEFAULT_QUOTAS: Dict[str, float] = {
+    "default": 10.0,
+    "ec2": 20.0,
+    "rds": 8.0,
+    "lambda": 8.0,
+    "s3": 50.0,
+    "cloudwatch": 20.0,
+    "stepfunctions": 10.0,
+    "resourcegroupstaggingapi": 5.0,
+}
+
+THROTTLE_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "BandwidthLimitExceeded",
+    "SlowDown",
+    "PriorRequestNotComplete",
+    "EC2ThrottledException",
+}
+
+# Retries botocore : le mode standard réessaie les throttles avec backoff,
+# le limiteur évite d'en provoquer de nouveaux
+RETRY_CONFIG = Config(retries={"max_attempts": 8, "mode": "standard"})
+
+
+class TokenBucket:
+    """
+    Seau à jetons thread-safe. Les jetons peuvent passer en négatif :
+    chaque appelant réserve sa place puis dort hors du verrou.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 min_rate_factor: float = 0.05,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate * min_rate_factor
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """Prend un jeton, renvoie le temps attendu (s)."""
+        with self._lock:
+            self._refill(self._clock())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def slow_down(self, factor: float = 0.5):
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = max(self.min_rate, self.rate * factor)
+
+    def recover(self, step: float = 0.05):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(self._clock())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * step)
+
+
+class RateLimiter:
+    """Un TokenBucket par opération AWS, partagé par tous les clients installés."""
+
+    def __init__(self, quotas: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.quotas = {**DEFAULT_QUOTAS, **(quotas or {})}
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        raw = os.environ.get("API_RATE_LIMITS", "")
+        return cls({k: float(v) for k, v in json.loads(raw).items()} if raw else None)
+
+    def configure(self, quotas: Dict[str, float]):
+        """Remplace les quotas ; les seaux sont recréés au prochain appel."""
+        with self._lock:
+            self.quotas = {**DEFAULT_QUOTAS, **quotas}
+            self._buckets.clear()
+            self._stats.clear()
+
+    def quota_for(self, service: str, operation: str) -> float:
+        for key in (f"{service}.{operation}", service, "default"):
+            if key in self.quotas:
+                return self.quotas[key]
+        return DEFAULT_QUOTAS["default"]
+
+    def bucket(self, service: str, operation: str) -> TokenBucket:
+        key = f"{service}.{operation}"
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.quota_for(service, operation), clock=self._clock, sleep=self._sleep)
+                self._buckets[key] = bucket
+                self._stats[key] = {"calls": 0, "wait_seconds": 0.0, "throttles": 0}
+            return bucket
+
+    def _record(self, key: str, field: str, value: float):
+        with self._lock:
+            self._stats[key][field] += value
+
+    # --- Handlers botocore ---
+
+    def _before_call(self, model, **kwargs):
+        service, operation = model.service_model.service_name, model.name
+        waited = self.bucket(service, operation).acquire()
+        key = f"{service}.{operation}"
+        self._record(key, "calls", 1)
+        if waited:
+            self._record(key, "wait_seconds", waited)
+
+    def _needs_retry(self, operation, response=None, **kwargs):
+        if not response:
+            return None
+        code = response[1].get("Error", {}).get("Code", "")
+        if code in THROTTLE_CODES:
+            service = operation.service_model.service_name
+            self.bucket(service, operation.name).slow_down()
+            self._record(f"{service}.{operation.name}", "throttles", 1)
+        # None : la décision de retry reste au handler botocore
+        return None
+
+    def _after_call(self, model, http_response=None, **kwargs):
+        if http_response is not None and http_response.status_code < 400:
+            self.bucket(model.service_model.service_name, model.name).recover()
+
+    def install(self, client):
+        """Branche le limiteur sur un client boto3 et renvoie le client."""
+        events = client.meta.events
+        events.register("before-call.*.*", self._before_call, unique_id=f"ratelimit-before-{id(self)}")
+        events.register("needs-retry.*.*", self._needs_retry, unique_id=f"ratelimit-retry-{id(self)}")
+        events.register("after-call.*.*", self._after_call, unique_id=f"ratelimit-after-{id(self)}")
+        return client
+
+    # --- Métriques ---
+
+    def pop_stats(self) -> Dict[str, Any]:
+        """Résumé depuis le dernier appel (les compteurs survivent aux invocations à chaud)."""
+        with self._lock:
+            by_op = {k: dict(v) for k, v in self._stats.items() if v["calls"] or v["throttles"]}
+            for v in self._stats.values():
+                v.update(calls=0, wait_seconds=0.0, throttles=0)
+        return {
+            "wait_seconds": round(sum(v["wait_seconds"] for v in by_op.values()), 3),
+            "throttles": int(sum(v["throttles"] for v in by_op.values())),
+            "by_operation": by_op,
+        }
+
+
+# Instance partagée par tous les clients d'une même Lambda
+rate_limiter = RateLimiter.from_env()
+
+
+def limited_client(service: str, **kwargs):
+    """boto3.client() avec retries standard, le limiteur partagé et la comptabilité des appels installés."""
+    import boto3
+    from shared.api_accounting import api_accounting
+
+    kwargs.setdefault("config", RETRY_CONFIG)
+    return api_accounting.install(rate_limiter.install(boto3.client(service, **kwargs)))
+
+
+def add_rate_limit_metrics(metrics) -> Dict[str, Any]:
+    """Ajoute le temps d'attente et les throttles à un Metrics powertools (fin d'invocation)."""
+    stats = rate_limiter.pop_stats()
+    metrics.add_metric(name="ApiRateLimitWaitMs", unit="Milliseconds", value=stats["wait_seconds"] * 1000)
+    metrics.add_metric(name="ApiThrottles", unit="Count", value=stats["throttles"])
+    return stats
@@ -0,0 +1,328 @@
+"""
+File de remédiation entre le scanner et le pipeline d'escalade.
+
+Lancer toutes les exécutions depuis le scanner démarre un gros backlog dans un
+ordre arbitraire et sature les quotas en aval (StartExecution, API des
+executors). Avec LAUNCH_MODE=queue, le scanner met les payloads non conformes en
+file ; une invocation de vidage (planifiée) les reprend par ordre de priorité et
+lance les exécutions à débit contrôlé.
+
+Priorité, dans cet ordre :
+1. Environnement : la prod passe en dernier (REMEDIATION_PROD_POLICY=last, défaut)
+   ou en premier (first)
+2. Score = coût mensuel estimé ($) + REMEDIATION_AGE_WEIGHT × heures d'attente.
+   L'heure courante étant la même pour toutes les entrées, le score se calcule
+   une fois à la mise en file : coût - poids × enqueued_at / 3600. Une ressource
+   bon marché finit par passer devant les plus chères : pas de famine.
+
+Une ressource déjà en file n'est pas dupliquée par le scan suivant (stores
+locaux) : le payload est mis à jour, l'ancienneté conservée.
+
+Stores disponibles (même logique que shared/idempotency.py) :
+- SQSRemediationQueue       : production (variable REMEDIATION_QUEUE_URL)
+- SQLiteRemediationQueue    : local / tests (variable REMEDIATION_QUEUE_SQLITE_PATH)
+- InMemoryRemediationQueue  : tests unitaires, ou repli si rien n'est configuré
+
+SQS n'a pas de priorité : take() lit une fenêtre de REMEDIATION_QUEUE_WINDOW
+messages, les trie, garde les n meilleurs et rend les autres visibles tout de
+suite. L'ordre est exact dans la fenêtre, approché au-delà ; les doublons d'une
+même ressource dans la fenêtre ne donnent qu'un lancement.
+"""
+
+import os
+import json
+import time
+import heapq
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+REMEDIATION_QUEUE_URL = os.environ.get("REMEDIATION_QUEUE_URL", "")
+REMEDIATION_QUEUE_SQLITE_PATH = os.environ.get("REMEDIATION_QUEUE_SQLITE_PATH", "")
+REMEDIATION_PROD_POLICY = os.environ.get("REMEDIATION_PROD_POLICY", "last")
+# $ de coût mensuel équivalents à une heure d'attente
+REMEDIATION_AGE_WEIGHT = float(os.environ.get("REMEDIATION_AGE_WEIGHT", "1"))
+REMEDIATION_QUEUE_WINDOW = int(os.environ.get("REMEDIATION_QUEUE_WINDOW", "100"))
+# Durée pendant laquelle une entrée prise n'est pas resservie (lancement en cours)
+REMEDIATION_LEASE_SECONDS = int(os.environ.get("REMEDIATION_LEASE_SECONDS", "300"))
+
+PROD_ENVIRONMENTS = {"prod", "production", "prd"}
+HOURS_PER_MONTH = 730
+SQS_BATCH = 10  # limite de SendMessageBatch / ReceiveMessage / DeleteMessageBatch
+
+# Prix horaires approximatifs (on-demand, eu-west-1), comme le calcul
+# d'économies AutoShutdown du handler metrics
+HOURLY_PRICES = {
+    "t3.micro": 0.0104,
+    "t3.small": 0.0208,
+    "t3.medium": 0.0416,
+    "t3.large": 0.0832,
+    "m5.large": 0.107,
+    "db.t3.micro": 0.018,
+    "db.t3.small": 0.036,
+    "db.t3.medium": 0.072,
+    "db.m5.large": 0.19,
+}
+# Type inconnu : plus petit gabarit du service ; S3 / Lambda facturés à l'usage (0)
+DEFAULT_HOURLY = {"ec2": 0.0104, "rds": 0.018}
+
+
+def estimated_monthly_cost(payload: Dict[str, Any]) -> float:
+    hourly = HOURLY_PRICES.get(payload.get("instance_type") or "",
+                               DEFAULT_HOURLY.get(payload.get("resource_type", ""), 0.0))
+    return round(hourly * HOURS_PER_MONTH, 2)
+
+
+def environment_rank(payload: Dict[str, Any], prod_policy: str = REMEDIATION_PROD_POLICY) -> int:
+    """0 : servi en premier, 1 : ensuite."""
+    is_prod = (payload.get("environment") or "").lower() in PROD_ENVIRONMENTS
+    return 0 if is_prod == (prod_policy == "first") else 1
+
+
+def priority_key(payload: Dict[str, Any], enqueued_at: float, prod_policy: str = REMEDIATION_PROD_POLICY,
+                 age_weight: float = REMEDIATION_AGE_WEIGHT) -> Tuple[int, float]:
+    """Clé de tri croissante : rang d'environnement, puis score décroissant."""
+    score = estimated_monthly_cost(payload) - age_weight * enqueued_at / 3600
+    return environment_rank(payload, prod_policy), -score
+
+
+class QueuedItem(NamedTuple):
+    payload: Dict[str, Any]
+    enqueued_at: float
+    handle: Any  # resource_arn (stores locaux) ou receipt handles SQS
+
+
+class RemediationQueue:
+    """
+    Interface commune :
+    - put_many(payloads) : met en file, renvoie le nombre d'entrées écrites
+    - take(n) : jusqu'à n entrées par ordre de priorité, réservées REMEDIATION_LEASE_SECONDS
+    - ack(items) : entrées lancées, retirées de la file
+    - release(items) : entrées non lancées, rendues tout de suite
+    - depth() : entrées en attente (hors réservées)
+    """
+
+    def __init__(self, prod_policy: str = REMEDIATION_PROD_POLICY, age_weight: float = REMEDIATION_AGE_WEIGHT,
+                 lease_seconds: int = REMEDIATION_LEASE_SECONDS):
+        self.prod_policy = prod_policy
+        self.age_weight = age_weight
+        self.lease_seconds = lease_seconds
+
+    def key(self, payload: Dict[str, Any], enqueued_at: float) -> Tuple[int, float]:
+        return priority_key(payload, enqueued_at, self.prod_policy, self.age_weight)
+
+    def put_many(self, payloads: Iterable[Dict[str, Any]]) -> int:
+        raise NotImplementedError
+
+    def take(self, n: int) -> List[QueuedItem]:
+        raise NotImplementedError
+
+    def ack(self, items: List[QueuedItem]) -> None:
+        raise NotImplementedError
+
+    def release(self, items: List[QueuedItem]) -> None:
+        raise NotImplementedError
+
+    def depth(self) -> int:
+        raise NotImplementedError
+
+
+class InMemoryRemediationQueue(RemediationQueue):
+    def __init__(self, clock=time.time, **kwargs):
+        super().__init__(**kwargs)
+        self.clock = clock
+        # resource_arn → [payload, enqueued_at, leased_until]
+        self._items: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def put_many(self, payloads):
+        now, written = self.clock(), 0
+        with self._lock:
+            for payload in payloads:
+                entry = self._items.get(payload["resource_arn"])
+                if entry is None:
+                    self._items[payload["resource_arn"]] = [payload, now, 0.0]
+                elif entry[2] <= now:
+                    entry[0] = payload
+                else:
+                    continue  # entrée réservée : lancement en cours
+                written += 1
+        return written
+
+    def take(self, n):
+        now = self.clock()
+        with self._lock:
+            ready = [(self.key(p, at), arn) for arn, (p, at, leased) in self._items.items() if leased <= now]
+            taken = []
+            for _, arn in heapq.nsmallest(n, ready):
+                entry = self._items[arn]
+                entry[2] = now + self.lease_seconds
+                taken.append(QueuedItem(entry[0], entry[1], arn))
+        return taken
+
+    def ack(self, items):
+        with self._lock:
+            for item in items:
+                self._items.pop(item.handle, None)
+
+    def release(self, items):
+        with self._lock:
+            for item in items:
+                if item.handle in self._items:
+                    self._items[item.handle][2] = 0.0
+
+    def depth(self):
+        now = self.clock()
+        with self._lock:
+            return sum(1 for _, _, leased in self._items.values() if leased <= now)
+
+
+class SQLiteRemediationQueue(RemediationQueue):
+    def __init__(self, path: str = ":memory:", clock=time.time, **kwargs):
+        super().__init__(**kwargs)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS remediation_queue ("
+            " resource_arn TEXT PRIMARY KEY, payload TEXT NOT NULL, enqueued_at REAL NOT NULL,"
+            " env_rank INTEGER NOT NULL, score REAL NOT NULL, leased_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS remediation_priority"
+                           " ON remediation_queue (env_rank, score DESC)")
+        self._conn.commit()
+
+    def put_many(self, payloads):
+        now, written = self.clock(), 0
+        with self._lock:
+            for payload in payloads:
+                arn = payload["resource_arn"]
+                row = self._conn.execute("SELECT enqueued_at, leased_until FROM remediation_queue"
+                                         " WHERE resource_arn = ?", (arn,)).fetchone()
+                if row and row[1] > now:
+                    continue
+                enqueued_at = row[0] if row else now
+                rank, neg_score = self.key(payload, enqueued_at)
+                self._conn.execute("INSERT OR REPLACE INTO remediation_queue VALUES (?, ?, ?, ?, ?, 0)",
+                                   (arn, json.dumps(payload, default=str), enqueued_at, rank, -neg_score))
+                written += 1
+            self._conn.commit()
+        return written
+
+    def take(self, n):
+        now = self.clock()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource_arn, payload, enqueued_at FROM remediation_queue WHERE leased_until <= ?"
+                " ORDER BY env_rank, score DESC LIMIT ?", (now, n)).fetchall()
+            self._conn.executemany("UPDATE remediation_queue SET leased_until = ? WHERE resource_arn = ?",
+                                   [(now + self.lease_seconds, arn) for arn, _, _ in rows])
+            self._conn.commit()
+        return [QueuedItem(json.loads(payload), enqueued_at, arn) for arn, payload, enqueued_at in rows]
+
+    def ack(self, items):
+        with self._lock:
+            self._conn.executemany("DELETE FROM remediation_queue WHERE resource_arn = ?",
+                                   [(item.handle,) for item in items])
+            self._conn.commit()
+
+    def release(self, items):
+        with self._lock:
+            self._conn.executemany("UPDATE remediation_queue SET leased_until = 0 WHERE resource_arn = ?",
+                                   [(item.handle,) for item in items])
+            self._conn.commit()
+
+    def depth(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM remediation_queue WHERE leased_until <= ?",
+                                      (self.clock(),)).fetchone()[0]
+
+
+class SQSRemediationQueue(RemediationQueue):
+    """
+    File SQS standard. Corps du message : {"payload": ..., "enqueued_at": epoch}.
+    La réservation est la visibilité du message (lease_seconds).
+    """
+
+    def __init__(self, queue_url: str, client=None, window: int = REMEDIATION_QUEUE_WINDOW, **kwargs):
+        super().__init__(**kwargs)
+        self.queue_url = queue_url
+        self.window = window
+        if client is None:
+            from shared.ratelimit import limited_client
+
+            client = limited_client("sqs")
+        self.client = client
+
+    def put_many(self, payloads):
+        now, written = time.time(), 0
+        entries = [{"Id": str(i), "MessageBody": json.dumps({"payload": p, "enqueued_at": now}, default=str)}
+                   for i, p in enumerate(payloads)]
+        for start in range(0, len(entries), SQS_BATCH):
+            resp = self.client.send_message_batch(QueueUrl=self.queue_url, Entries=entries[start:start + SQS_BATCH])
+            written += len(resp.get("Successful", []))
+            for failed in resp.get("Failed", []):
+                print(f"⚠️  Mise en file SQS refusée : {failed.get('Code')} {failed.get('Message', '')}")
+        return written
+
+    def _receive_window(self, size: int) -> List[Dict[str, Any]]:
+        messages: List[Dict[str, Any]] = []
+        while len(messages) < size:
+            batch = self.client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=min(SQS_BATCH, size - len(messages)),
+                VisibilityTimeout=self.lease_seconds,
+                WaitTimeSeconds=0,
+            ).get("Messages", [])
+            if not batch:
+                break
+            messages += batch
+        return messages
+
+    def take(self, n):
+        # Doublons d'une même ressource (plusieurs scans) : la plus ancienne porte tous les handles
+        by_arn: Dict[str, Tuple[Dict[str, Any], float, List[str]]] = {}
+        for message in self._receive_window(max(n, self.window)):
+            body = json.loads(message["Body"])
+            arn = body["payload"]["resource_arn"]
+            if arn in by_arn:
+                payload, enqueued_at, handles = by_arn[arn]
+                handles.append(message["ReceiptHandle"])
+                if body["enqueued_at"] < enqueued_at:
+                    by_arn[arn] = (body["payload"], body["enqueued_at"], handles)
+            else:
+                by_arn[arn] = (body["payload"], body["enqueued_at"], [message["ReceiptHandle"]])
+        ordered = sorted((QueuedItem(payload, enqueued_at, handles) for payload, enqueued_at, handles in by_arn.values()),
+                         key=lambda item: self.key(item.payload, item.enqueued_at))
+        self.release(ordered[n:])
+        return ordered[:n]
+
+    def _each_batch(self, items: List[QueuedItem]):
+        handles = [handle for item in items for handle in item.handle]
+        for start in range(0, len(handles), SQS_BATCH):
+            yield [{"Id": str(i), "ReceiptHandle": h} for i, h in enumerate(handles[start:start + SQS_BATCH])]
+
+    def ack(self, items):
+        for entries in self._each_batch(items):
+            self.client.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+
+    def release(self, items):
+        for entries in self._each_batch(items):
+            self.client.change_message_visibility_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{**entry, "VisibilityTimeout": 0} for entry in entries],
+            )
+
+    def depth(self):
+        attributes = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url, AttributeNames=["ApproximateNumberOfMessages"])["Attributes"]
+        return int(attributes["ApproximateNumberOfMessages"])
+
+
+def get_remediation_queue() -> RemediationQueue:
+    """Choisit le store selon l'environnement (SQS > SQLite > mémoire)."""
+    if REMEDIATION_QUEUE_URL:
+        return SQSRemediationQueue(REMEDIATION_QUEUE_URL)
+    if REMEDIATION_QUEUE_SQLITE_PATH:
+        return SQLiteRemediationQueue(REMEDIATION_QUEUE_SQLITE_PATH)
+    return InMemoryRemediationQueue()
@@ -0,0 +1,159 @@
+"""
+Lecture des tags S3 par région de bucket.
+
+ListBuckets est global, mais GetBucketTagging doit viser la région du bucket :
+via un client figé sur REGION, un bucket d'une autre région coûte une redirection
+(301 + nouvel essai) ou échoue, et l'erreur était jusqu'ici confondue avec
+« pas de tags ». Ici :
+
+- la région de chaque bucket est résolue une fois (région connue de l'appelant,
+  BucketRegion de ListBuckets, sinon GetBucketLocation) puis gardée en cache
+  dans le conteneur chaud, entre les invocations
+- un client par région : celui du handler pour sa propre région, un client
+  limité créé à la demande pour les autres, partagés entre threads
+- les lectures d'un lot de buckets partent en parallèle (pool borné)
+- chaque lecture renvoie un statut explicite : "tagged", "no_tag_set" (bucket
+  sans tags, NoSuchTagSet), "not_found" (bucket supprimé entre-temps) ou
+  "error" (AccessDenied, throttling épuisé…) — une erreur n'est jamais
+  rapportée comme un bucket sans tags
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+from botocore.exceptions import ClientError
+
+from shared.tagset import EMPTY, TagSet
+from shared.workers import bounded_map
+
+DEFAULT_REGION = os.environ.get("AWS_REGION", "eu-west-1")
+S3_TAG_CONCURRENCY = int(os.environ.get("S3_TAG_CONCURRENCY", "8"))
+
+NO_TAG_SET_CODES = {"NoSuchTagSet"}
+NOT_FOUND_CODES = {"NoSuchBucket"}
+# Le cache de région est périmé (bucket recréé ailleurs) : résolution à refaire
+WRONG_REGION_CODES = {"PermanentRedirect", "AuthorizationHeaderMalformed", "IllegalLocationConstraintException"}
+
+# LocationConstraint historiques
+LEGACY_LOCATIONS = {None: "us-east-1", "": "us-east-1", "EU": "eu-west-1"}
+
+
+class BucketTags(NamedTuple):
+    bucket: str
+    region: str
+    status: str             # tagged | no_tag_set | not_found | error
+    tags: Optional[TagSet]  # None si status == "error"
+    error: str = ""         # code d'erreur AWS si status == "error"
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "error"
+
+
+def _error_code(error: ClientError) -> str:
+    return error.response.get("Error", {}).get("Code", "")
+
+
+class S3TagFetcher:
+    """Cache bucket → région et clients S3 par région ; lectures de tags en parallèle."""
+
+    def __init__(self, default_client=None, default_region: Optional[str] = None,
+                 client_factory: Optional[Callable[[str], Any]] = None, max_workers: int = S3_TAG_CONCURRENCY):
+        self._client_factory = client_factory
+        self.default_region = default_region or (default_client.meta.region_name if default_client else DEFAULT_REGION)
+        self.max_workers = max_workers
+        self.regions: Dict[str, str] = {}
+        self._clients: Dict[str, Any] = {self.default_region: default_client} if default_client else {}
+        self._lock = threading.Lock()
+        self.stats = {"location_lookups": 0, "cache_hits": 0, "redirect_retries": 0}
+
+    def client(self, region: Optional[str] = None):
+        region = region or self.default_region
+        client = self._clients.get(region)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(region)
+                if client is None:
+                    if self._client_factory is not None:
+                        client = self._client_factory(region)
+                    else:
+                        from shared.ratelimit import limited_client
+
+                        client = limited_client("s3", region_name=region)
+                    self._clients[region] = client
+        return client
+
+    # --- Régions ---
+
+    def region_of(self, bucket: str, hint: Optional[str] = None) -> str:
+        region = self.regions.get(bucket)
+        if region is not None:
+            self.stats["cache_hits"] += 1
+            return region
+        if hint:
+            region = hint
+        else:
+            self.stats["location_lookups"] += 1
+            try:
+                location = self.client().get_bucket_location(Bucket=bucket).get("LocationConstraint")
+                region = LEGACY_LOCATIONS.get(location, location)
+            except ClientError as e:
+                # Sans s3:GetBucketLocation, S3 indique souvent la région dans l'en-tête de l'erreur
+                headers = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+                region = headers.get("x-amz-bucket-region")
+                if region is None:
+                    return self.default_region  # pas mis en cache : nouvel essai au prochain appel
+        self.regions[bucket] = region
+        return region
+
+    def forget(self, bucket: str):
+        self.regions.pop(bucket, None)
+
+    # --- Tags ---
+
+    def fetch(self, bucket: str, region_hint: Optional[str] = None) -> BucketTags:
+        region = self.region_of(bucket, region_hint)
+        try:
+            return self._get(bucket, region)
+        except ClientError as e:
+            if _error_code(e) not in WRONG_REGION_CODES:
+                return self._classify(bucket, region, e)
+            # Région en cache périmée : une seule nouvelle résolution
+            self.stats["redirect_retries"] += 1
+            self.forget(bucket)
+            region = self.region_of(bucket)
+            try:
+                return self._get(bucket, region)
+            except ClientError as retry_error:
+                return self._classify(bucket, region, retry_error)
+
+    def _get(self, bucket: str, region: str) -> BucketTags:
+        resp = self.client(region).get_bucket_tagging(Bucket=bucket)
+        return BucketTags(bucket, region, "tagged", TagSet(resp.get("TagSet")))
+
+    def _classify(self, bucket: str, region: str, error: ClientError) -> BucketTags:
+        code = _error_code(error)
+        if code in NO_TAG_SET_CODES:
+            return BucketTags(bucket, region, "no_tag_set", EMPTY)
+        if code in NOT_FOUND_CODES:
+            self.forget(bucket)
+            return BucketTags(bucket, region, "not_found", EMPTY)
+        return BucketTags(bucket, region, "error", None, code or type(error).__name__)
+
+    def fetch_many(self, buckets: Iterable[Union[str, Dict[str, Any]]]) -> Iterator[BucketTags]:
+        """
+        Tags d'un lot de buckets (noms ou entrées ListBuckets), dans l'ordre de complétion.
+        Une exception inattendue devient un BucketTags "error" : le lot continue.
+        """
+        def fetch_one(item) -> BucketTags:
+            if isinstance(item, str):
+                return self.fetch(item)
+            return self.fetch(item["Name"], item.get("BucketRegion"))
+
+        for outcome in bounded_map(fetch_one, buckets, self.max_workers):
+            if outcome.error is None:
+                yield outcome.result
+            else:
+                name = outcome.item if isinstance(outcome.item, str) else outcome.item["Name"]
+                yield BucketTags(name, self.regions.get(name, ""), "error", None, type(outcome.error).__name__)
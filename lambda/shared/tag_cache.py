@@ -0,0 +1,262 @@
+"""
+Cache persistant des tags par ressource, invalidé par marqueur de changement.
+
+D'un scan à l'autre, la plupart des fonctions Lambda et instances RDS ne changent
+pas ; les handlers appelaient pourtant list_tags / list_tags_for_resource pour
+chacune. Ici chaque entrée garde les tags avec un marqueur déjà présent dans la
+réponse de listing (gratuit) :
+
+- Lambda : RevisionId + LastModified (redéploiement, fonction recréée)
+- RDS    : DbiResourceId + InstanceCreateTime (instance recréée sous le même nom)
+
+L'appel de tags n'est fait que si le marqueur a changé ou si l'entrée a dépassé
+TAG_CACHE_TTL_SECONDS. Les marqueurs ne bougent pas quand seuls les tags changent :
+le controller supprime l'entrée à chaque événement "Tag Change on Resource", et
+le TTL borne le retard si un événement est perdu. Un rafraîchissement complet
+(aucune entrée lue) est forcé toutes les TAG_CACHE_FULL_REFRESH_SECONDS.
+
+Le cache est lu en bloc au début du scan (un Scan DynamoDB paginé, bien moins
+d'appels qu'un ListTags par ressource) et les entrées modifiées sont écrites en
+fin de scan par lots de 25.
+
+Stores disponibles (même logique que shared/idempotency.py) :
+- DynamoDBTagCacheStore  : production (variable TAG_CACHE_TABLE)
+- SQLiteTagCacheStore    : local / tests (variable TAG_CACHE_SQLITE_PATH)
+- InMemoryTagCacheStore  : tests unitaires, ou repli (vit le temps du conteneur)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from shared.tagset import TagSet
+
+TAG_CACHE_TABLE = os.environ.get("TAG_CACHE_TABLE", "")
+TAG_CACHE_SQLITE_PATH = os.environ.get("TAG_CACHE_SQLITE_PATH", "")
+# 0 désactive le cache (un appel de tags par ressource, comme avant)
+TAG_CACHE_TTL_SECONDS = int(os.environ.get("TAG_CACHE_TTL_SECONDS", str(6 * 3600)))
+TAG_CACHE_FULL_REFRESH_SECONDS = int(os.environ.get("TAG_CACHE_FULL_REFRESH_SECONDS", str(24 * 3600)))
+
+# Entrée technique : date du dernier rafraîchissement complet, par handler
+FULL_REFRESH_KEY = "__full_refresh__#{name}"
+DYNAMODB_BATCH = 25  # limite de BatchWriteItem
+
+
+def lambda_marker(function: Dict[str, Any]) -> str:
+    return f"{function.get('RevisionId', '')}|{function.get('LastModified', '')}"
+
+
+def rds_marker(db: Dict[str, Any]) -> str:
+    return f"{db.get('DbiResourceId', '')}|{db.get('InstanceCreateTime', '')}"
+
+
+# Une entrée : {"marker": str, "tags": {clé: valeur}, "fetched_at": int}
+
+class TagCacheStore:
+    """Interface commune : lecture en bloc, écriture par lot, suppression unitaire."""
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def delete(self, resource_arn: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryTagCacheStore(TagCacheStore):
+    def __init__(self):
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            return dict(self._items)
+
+    def save_many(self, entries):
+        with self._lock:
+            self._items.update(entries)
+
+    def delete(self, resource_arn):
+        with self._lock:
+            self._items.pop(resource_arn, None)
+
+
+class SQLiteTagCacheStore(TagCacheStore):
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tag_cache ("
+            " resource_arn TEXT PRIMARY KEY, marker TEXT NOT NULL, tags TEXT NOT NULL, fetched_at INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT resource_arn, marker, tags, fetched_at FROM tag_cache").fetchall()
+        return {arn: {"marker": marker, "tags": json.loads(tags), "fetched_at": fetched_at}
+                for arn, marker, tags, fetched_at in rows}
+
+    def save_many(self, entries):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tag_cache VALUES (?, ?, ?, ?)",
+                [(arn, e["marker"], json.dumps(e["tags"]), e["fetched_at"]) for arn, e in entries.items()],
+            )
+            self._conn.commit()
+
+    def delete(self, resource_arn):
+        with self._lock:
+            self._conn.execute("DELETE FROM tag_cache WHERE resource_arn = ?", (resource_arn,))
+            self._conn.commit()
+
+
+class DynamoDBTagCacheStore(TagCacheStore):
+    """
+    Table DynamoDB : clé de partition "resource_arn" (S), attribut TTL "expires_at"
+    (les entrées des ressources supprimées disparaissent seules).
+    """
+
+    def __init__(self, table_name: str, client=None, ttl_seconds: int = TAG_CACHE_TTL_SECONDS):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        if client is None:
+            from shared.ratelimit import limited_client
+
+            client = limited_client("dynamodb")
+        self.client = client
+
+    def load(self):
+        entries = {}
+        for page in self.client.get_paginator("scan").paginate(TableName=self.table_name):
+            for item in page.get("Items", []):
+                entries[item["resource_arn"]["S"]] = {
+                    "marker": item["marker"]["S"],
+                    "tags": json.loads(item["tags"]["S"]),
+                    "fetched_at": int(item["fetched_at"]["N"]),
+                }
+        return entries
+
+    def save_many(self, entries):
+        requests = [{"PutRequest": {"Item": {
+            "resource_arn": {"S": arn},
+            "marker": {"S": e["marker"]},
+            "tags": {"S": json.dumps(e["tags"])},
+            "fetched_at": {"N": str(e["fetched_at"])},
+            "expires_at": {"N": str(e["fetched_at"] + 2 * self.ttl_seconds)},
+        }}} for arn, e in entries.items()]
+        for start in range(0, len(requests), DYNAMODB_BATCH):
+            pending = {self.table_name: requests[start:start + DYNAMODB_BATCH]}
+            # Les éléments non traités (throttling) sont renvoyés : quelques nouveaux essais
+            for attempt in range(5):
+                pending = self.client.batch_write_item(RequestItems=pending).get("UnprocessedItems") or {}
+                if not pending:
+                    break
+                time.sleep(0.05 * 2 ** attempt)
+
+    def delete(self, resource_arn):
+        self.client.delete_item(TableName=self.table_name, Key={"resource_arn": {"S": resource_arn}})
+
+
+def get_tag_cache_store() -> TagCacheStore:
+    """Choisit le store selon l'environnement (DynamoDB > SQLite > mémoire)."""
+    if TAG_CACHE_TABLE:
+        return DynamoDBTagCacheStore(TAG_CACHE_TABLE)
+    if TAG_CACHE_SQLITE_PATH:
+        return SQLiteTagCacheStore(TAG_CACHE_SQLITE_PATH)
+    return InMemoryTagCacheStore()
+
+
+class TagCache:
+    """
+    Cache de tags d'un handler pour une invocation : begin() charge les entrées,
+    get_or_fetch() sert ou rafraîchit une ressource, flush() écrit les changements.
+    """
+
+    def __init__(self, name: str, store: Optional[TagCacheStore] = None, ttl_seconds: int = TAG_CACHE_TTL_SECONDS,
+                 full_refresh_seconds: int = TAG_CACHE_FULL_REFRESH_SECONDS, clock: Callable[[], float] = time.time):
+        self.name = name
+        self._store = store
+        self.ttl_seconds = ttl_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.clock = clock
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.full_refresh = False
+        self.stats = {"hits": 0, "misses": 0}
+
+    @property
+    def store(self) -> TagCacheStore:
+        if self._store is None:
+            self._store = get_tag_cache_store()
+        return self._store
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def begin(self) -> None:
+        """Charge le cache (un appel par invocation) et décide d'un rafraîchissement complet."""
+        self._entries, self._dirty = {}, {}
+        self.stats = {"hits": 0, "misses": 0}
+        self.full_refresh = False
+        if not self.enabled:
+            return
+        now = int(self.clock())
+        try:
+            self._entries = self.store.load()
+        except Exception as e:  # noqa: BLE001 — sans cache, chaque ressource est relue
+            print(f"⚠️  Cache de tags illisible, lecture complète : {e}")
+            self._entries = {}
+        last_full = self._entries.pop(FULL_REFRESH_KEY.format(name=self.name), {}).get("fetched_at", 0)
+        if self.full_refresh_seconds > 0 and now - last_full >= self.full_refresh_seconds:
+            self.full_refresh = True
+            self._dirty[FULL_REFRESH_KEY.format(name=self.name)] = {"marker": "", "tags": {}, "fetched_at": now}
+
+    def get_or_fetch(self, resource_arn: str, marker: str, fetch: Callable[[], TagSet],
+                     accept: Optional[Callable[[TagSet], bool]] = None) -> TagSet:
+        """
+        Tags en cache si le marqueur est inchangé et l'entrée récente, sinon fetch().
+        accept(tags) : condition supplémentaire pour servir le cache (ex : le cleanup
+        relit toujours des tags non conformes avant de supprimer).
+        """
+        if self.enabled and not self.full_refresh:
+            entry = self._entries.get(resource_arn)
+            if (entry is not None and entry["marker"] == marker
+                    and self.clock() - entry["fetched_at"] < self.ttl_seconds):
+                tags = TagSet(entry["tags"])
+                if accept is None or accept(tags):
+                    with self._lock:
+                        self.stats["hits"] += 1
+                    return tags
+        tags = fetch()
+        with self._lock:
+            self.stats["misses"] += 1
+            if self.enabled:
+                self._dirty[resource_arn] = {"marker": marker, "tags": dict(tags), "fetched_at": int(self.clock())}
+        return tags
+
+    def flush(self) -> Dict[str, Any]:
+        """Écrit les entrées rafraîchies ; renvoie le bilan (hits, misses, hit_rate, full_refresh)."""
+        if self._dirty:
+            try:
+                self.store.save_many(self._dirty)
+            except Exception as e:  # noqa: BLE001 — le scan est fait, seul le cache est perdu
+                print(f"⚠️  Écriture du cache de tags impossible : {e}")
+            self._dirty = {}
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        looked_up = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(100 * self.stats["hits"] / looked_up, 1) if looked_up else 0.0,
+            "full_refresh": self.full_refresh,
+        }
+
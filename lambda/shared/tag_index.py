@@ -0,0 +1,517 @@
+"""
+Index inversé des tags de l'inventaire : clé → valeur → ressources, et clé
+manquante → ressources.
+
+"Tout ce qui appartient à la squad X" ou "les ressources sans CostCenter du
+compte Y" demandaient un rescan complet. Le scanner tient ici un index à jour
+à chaque passage, que le controller et les outils de reporting interrogent
+sans appel AWS.
+
+Structure d'un segment :
+- chaque ressource (ARN) reçoit un numéro de document (entier) ;
+- chaque terme a sa liste de documents (postings), triée, en array('I') :
+    t<sep>clé<sep>valeur    la ressource porte ce tag
+    m<sep>clé               tag requis manquant au sens de la politique (scopes compris)
+    a<sep>type|account|region<sep>valeur   attributs de la ressource
+- une requête intersecte les postings (les plus courtes d'abord).
+
+Mise à jour incrémentale : le segment précédent est rechargé, seules les
+ressources dont les termes ont changé sont repostées, celles qui n'ont pas été
+revues par un scan complet sont retirées. Les numéros libérés sont compactés
+quand ils dépassent le quart des documents.
+
+Stockage : un segment par shard du scan réparti ("scan" en mode single),
+chacun écrit par un seul worker, donc sans écriture concurrente. Format :
+en-tête JSON (ARN, termes, longueurs) puis postings en deltas, le tout
+compressé zlib (quelques octets par terme et par ressource).
+
+Stores disponibles (variable TAG_INDEX_URI) :
+- S3TagIndexStore      : production (s3://bucket/prefix)
+- FileTagIndexStore    : local / tests (répertoire)
+- InMemoryTagIndexStore: tests unitaires (injecté explicitement)
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+TAG_INDEX_URI = os.environ.get("TAG_INDEX_URI", "").rstrip("/")
+# Lecture (controller) : segments gardés en mémoire à chaud pendant ce délai
+TAG_INDEX_TTL_SECONDS = int(os.environ.get("TAG_INDEX_TTL_SECONDS", "300"))
+
+SEP = "\x1f"
+FORMAT_VERSION = 1
+SEGMENT_SUFFIX = ".tix"
+ATTRIBUTES = ("type", "account", "region")
+
+
+def tag_term(key: str, value: str) -> str:
+    return f"t{SEP}{key}{SEP}{value}"
+
+
+def missing_term(key: str) -> str:
+    return f"m{SEP}{key}"
+
+
+def attribute_term(name: str, value: str) -> str:
+    return f"a{SEP}{name}{SEP}{value}"
+
+
+def _postings() -> array:
+    return array("I")
+
+
+def _insert(postings: array, doc: int) -> None:
+    if not postings or postings[-1] < doc:
+        postings.append(doc)  # cas courant : nouveau document, numéro le plus grand
+        return
+    i = bisect_left(postings, doc)
+    if i == len(postings) or postings[i] != doc:
+        postings.insert(i, doc)
+
+
+def _discard(postings: array, doc: int) -> None:
+    i = bisect_left(postings, doc)
+    if i < len(postings) and postings[i] == doc:
+        del postings[i]
+
+
+class TagIndex:
+    """Un segment de l'index : documents (ARN), termes et postings triées."""
+
+    def __init__(self):
+        self.arns: List[Optional[str]] = []
+        self.terms: List[str] = []
+        self.postings: List[array] = []
+        self.updated_at = 0
+        self._docs: Dict[str, int] = {}
+        self._term_ids: Dict[str, int] = {}
+        # Termes de chaque document, reconstruits à la demande (mises à jour seulement)
+        self._forward: Optional[Dict[int, frozenset]] = None
+        self._free = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, arn: str) -> bool:
+        return arn in self._docs
+
+    # --- Mise à jour ---
+
+    def _forward_map(self) -> Dict[int, frozenset]:
+        if self._forward is None:
+            terms: Dict[int, list] = {doc: [] for doc in self._docs.values()}
+            for term_id, postings in enumerate(self.postings):
+                for doc in postings:
+                    terms[doc].append(term_id)
+            self._forward = {doc: frozenset(ids) for doc, ids in terms.items()}
+        return self._forward
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._term_ids[term] = len(self.terms)
+            self.terms.append(term)
+            self.postings.append(_postings())
+        return term_id
+
+    def upsert(self, arn: str, tags: Any, missing: Iterable[str] = (), **attributes: str) -> bool:
+        """
+        Indexe une ressource (tags, tags requis manquants, attributs type / account /
+        region). Renvoie True si ses termes ont changé.
+        """
+        terms = [tag_term(k, v) for k, v in dict(tags or {}).items()]
+        terms += [missing_term(k) for k in missing]
+        terms += [attribute_term(name, value) for name, value in attributes.items() if value]
+        new = frozenset(self._term_id(term) for term in terms)
+
+        forward = self._forward_map()
+        doc = self._docs.get(arn)
+        if doc is None:
+            doc = self._docs[arn] = len(self.arns)
+            self.arns.append(arn)
+            old = frozenset()
+        else:
+            old = forward[doc]
+            if old == new:
+                return False
+        for term_id in old - new:
+            _discard(self.postings[term_id], doc)
+        for term_id in new - old:
+            _insert(self.postings[term_id], doc)
+        forward[doc] = new
+        return True
+
+    def remove(self, arn: str) -> bool:
+        doc = self._docs.pop(arn, None)
+        if doc is None:
+            return False
+        for term_id in self._forward_map().pop(doc):
+            _discard(self.postings[term_id], doc)
+        self.arns[doc] = None
+        self._free += 1
+        return True
+
+    def retain(self, arns: Iterable[str]) -> int:
+        """Retire les ressources absentes de arns (disparues depuis le scan précédent)."""
+        keep = set(arns)
+        gone = [arn for arn in self._docs if arn not in keep]
+        for arn in gone:
+            self.remove(arn)
+        return len(gone)
+
+    def compact(self) -> None:
+        """Renumérote les documents sans trous et oublie les termes vides."""
+        remap = array("i", [-1]) * len(self.arns)
+        arns = []
+        for doc, arn in enumerate(self.arns):
+            if arn is not None:
+                remap[doc] = len(arns)
+                arns.append(arn)
+        terms, postings = [], []
+        for term, docs in zip(self.terms, self.postings):
+            if docs:
+                terms.append(term)
+                postings.append(array("I", [remap[doc] for doc in docs]))  # ordre conservé
+        self.arns, self.terms, self.postings = arns, terms, postings
+        self._docs = {arn: doc for doc, arn in enumerate(arns)}
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        self._forward, self._free = None, 0
+
+    # --- Requêtes ---
+
+    def _lookup(self, term: str) -> array:
+        term_id = self._term_ids.get(term)
+        return self.postings[term_id] if term_id is not None else _postings()
+
+    def match(self, tags: Optional[Dict[str, str]] = None, missing: Iterable[str] = (),
+              **attributes: Optional[str]) -> List[int]:
+        """Documents portant tous les tags, manquant toutes les clés et ayant les attributs donnés."""
+        lists = [self._lookup(tag_term(k, v)) for k, v in (tags or {}).items()]
+        lists += [self._lookup(missing_term(k)) for k in missing]
+        lists += [self._lookup(attribute_term(name, value)) for name, value in attributes.items() if value]
+        if not lists:
+            return sorted(self._docs.values())
+        lists.sort(key=len)
+        if not lists[0]:
+            return []
+        result = set(lists[0])
+        for postings in lists[1:]:
+            result.intersection_update(postings)
+            if not result:
+                break
+        return sorted(result)
+
+    def query(self, tags: Optional[Dict[str, str]] = None, missing: Iterable[str] = (),
+              **attributes: Optional[str]) -> List[str]:
+        return [self.arns[doc] for doc in self.match(tags, missing, **attributes)]
+
+    def values(self, key: str) -> Dict[str, int]:
+        """Valeurs du tag key et nombre de ressources pour chacune."""
+        prefix = tag_term(key, "")
+        return {term[len(prefix):]: len(docs) for term, docs in zip(self.terms, self.postings)
+                if docs and term.startswith(prefix)}
+
+    def missing_counts(self) -> Dict[str, int]:
+        prefix = f"m{SEP}"
+        return {term[len(prefix):]: len(docs) for term, docs in zip(self.terms, self.postings)
+                if docs and term.startswith(prefix)}
+
+    # --- Sérialisation ---
+
+    def to_bytes(self) -> bytes:
+        if self._free > len(self.arns) // 4:
+            self.compact()
+        live = [(term, docs) for term, docs in zip(self.terms, self.postings) if docs]
+        body = array("I")
+        for _, docs in live:
+            body.extend(docs[i] - docs[i - 1] if i else docs[0] for i in range(len(docs)))
+        if sys.byteorder != "little":
+            body.byteswap()
+        header = json.dumps({
+            "format": FORMAT_VERSION,
+            "updated_at": self.updated_at,
+            "arns": self.arns,
+            "terms": [term for term, _ in live],
+            "lengths": [len(docs) for _, docs in live],
+        }, separators=(",", ":")).encode()
+        return zlib.compress(struct.pack("<I", len(header)) + header + body.tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "TagIndex":
+        raw = zlib.decompress(blob)
+        (size,) = struct.unpack_from("<I", raw)
+        header = json.loads(raw[4:4 + size])
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Format d'index inconnu : {header.get('format')}")
+        body = array("I")
+        body.frombytes(raw[4 + size:])
+        if sys.byteorder != "little":
+            body.byteswap()
+
+        index = cls()
+        index.updated_at = header["updated_at"]
+        index.arns = header["arns"]
+        index._docs = {arn: doc for doc, arn in enumerate(index.arns) if arn is not None}
+        index._free = len(index.arns) - len(index._docs)
+        offset = 0
+        for term, length in zip(header["terms"], header["lengths"]):
+            index._term_ids[term] = len(index.terms)
+            index.terms.append(term)
+            index.postings.append(array("I", accumulate(body[offset:offset + length])))
+            offset += length
+        return index
+
+
+# --- Stores : un blob par segment ---
+
+class TagIndexStore:
+    """Interface commune : lecture / écriture d'un segment, liste et purge."""
+
+    def load(self, segment: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def save(self, segment: str, blob: bytes) -> None:
+        raise NotImplementedError
+
+    def segments(self) -> List[str]:
+        raise NotImplementedError
+
+    def delete(self, segment: str) -> None:
+        raise NotImplementedError
+
+    def prune(self, keep: Iterable[str]) -> List[str]:
+        """Supprime les segments d'un ancien découpage (shards renommés, changement de mode)."""
+        keep = set(keep)
+        stale = [segment for segment in self.segments() if segment not in keep]
+        for segment in stale:
+            self.delete(segment)
+        return stale
+
+
+class InMemoryTagIndexStore(TagIndexStore):
+    def __init__(self):
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def load(self, segment):
+        with self._lock:
+            return self._blobs.get(segment)
+
+    def save(self, segment, blob):
+        with self._lock:
+            self._blobs[segment] = blob
+
+    def segments(self):
+        with self._lock:
+            return sorted(self._blobs)
+
+    def delete(self, segment):
+        with self._lock:
+            self._blobs.pop(segment, None)
+
+
+class FileTagIndexStore(TagIndexStore):
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment + SEGMENT_SUFFIX)
+
+    def load(self, segment):
+        try:
+            with open(self._path(segment), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, segment, blob):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(segment) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, self._path(segment))
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(SEGMENT_SUFFIX)] for name in os.listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def delete(self, segment):
+        try:
+            os.remove(self._path(segment))
+        except FileNotFoundError:
+            pass
+
+
+class S3TagIndexStore(TagIndexStore):
+    """Objets <prefix>/<segment>.tix d'un bucket."""
+
+    def __init__(self, uri: str, client=None):
+        self.bucket, _, prefix = uri[len("s3://"):].partition("/")
+        self.prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+        if client is None:
+            from shared.ratelimit import limited_client
+
+            client = limited_client("s3")
+        self.client = client
+
+    def _key(self, segment: str) -> str:
+        return f"{self.prefix}{segment}{SEGMENT_SUFFIX}"
+
+    def load(self, segment):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(segment))["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def save(self, segment, blob):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(segment), Body=blob)
+
+    def segments(self):
+        names = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                name = item["Key"][len(self.prefix):]
+                if "/" not in name and name.endswith(SEGMENT_SUFFIX):
+                    names.append(name[:-len(SEGMENT_SUFFIX)])
+        return sorted(names)
+
+    def delete(self, segment):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(segment))
+
+
+def get_tag_index_store() -> Optional[TagIndexStore]:
+    """Store désigné par TAG_INDEX_URI (S3 ou répertoire) ; None si l'index est désactivé."""
+    if TAG_INDEX_URI.startswith("s3://"):
+        return S3TagIndexStore(TAG_INDEX_URI)
+    if TAG_INDEX_URI:
+        return FileTagIndexStore(TAG_INDEX_URI)
+    return None
+
+
+class TagIndexUpdater:
+    """
+    Mise à jour d'un segment pendant un scan : begin() recharge le segment,
+    add() indexe chaque ressource évaluée, flush() retire les ressources non
+    revues (scan complet seulement) et écrit le segment s'il a changé.
+    """
+
+    def __init__(self, store: Optional[TagIndexStore] = None, clock: Callable[[], float] = time.time):
+        self._store = store
+        self.clock = clock
+        self.segment = ""
+        self.index = TagIndex()
+        self.seen: set = set()
+        self.stats = {"changed": 0, "removed": 0}
+
+    @property
+    def store(self) -> Optional[TagIndexStore]:
+        if self._store is None:
+            self._store = get_tag_index_store()
+        return self._store
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def begin(self, segment: str) -> None:
+        self.segment = segment
+        self.seen = set()
+        self.stats = {"changed": 0, "removed": 0}
+        self.index = TagIndex()
+        if not self.enabled:
+            return
+        try:
+            blob = self.store.load(segment)
+            if blob:
+                self.index = TagIndex.from_bytes(blob)
+        except Exception as e:  # noqa: BLE001 — reconstruit entièrement par ce scan
+            print(f"⚠️  Index de tags illisible, reconstruction : {e}")
+
+    def add(self, arn: str, tags: Any, missing: Iterable[str] = (), **attributes: str) -> None:
+        if not self.enabled or not arn:
+            return
+        self.seen.add(arn)
+        self.stats["changed"] += self.index.upsert(arn, tags, missing, **attributes)
+
+    def flush(self, complete: bool = True) -> Dict[str, Any]:
+        """complete=False (scan interrompu) : les ressources non revues sont gardées."""
+        if not self.enabled:
+            return {}
+        if complete:
+            self.stats["removed"] = self.index.retain(self.seen)
+        if self.stats["changed"] or self.stats["removed"] or not self.index.updated_at:
+            self.index.updated_at = int(self.clock())
+            blob = self.index.to_bytes()
+            self.store.save(self.segment, blob)
+            self.stats["bytes"] = len(blob)
+        return {"segment": self.segment, "resources": len(self.index), **self.stats}
+
+
+class TagIndexReader:
+    """
+    Requêtes sur tous les segments, gardés en mémoire à chaud TAG_INDEX_TTL_SECONDS.
+    Les segments couvrent des ressources disjointes : les résultats s'additionnent.
+    """
+
+    def __init__(self, store: Optional[TagIndexStore] = None, ttl_seconds: int = TAG_INDEX_TTL_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        self._store = store
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._segments: Dict[str, TagIndex] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def store(self) -> Optional[TagIndexStore]:
+        if self._store is None:
+            self._store = get_tag_index_store()
+        return self._store
+
+    def segments(self) -> Dict[str, TagIndex]:
+        if self.store is None:
+            raise RuntimeError("Index de tags désactivé (TAG_INDEX_URI vide)")
+        if self._loaded_at is None or self.clock() - self._loaded_at >= self.ttl_seconds:
+            segments = {}
+            for name in self.store.segments():
+                blob = self.store.load(name)
+                if blob:
+                    segments[name] = TagIndex.from_bytes(blob)
+            self._segments, self._loaded_at = segments, self.clock()
+        return self._segments
+
+    def query(self, tags: Optional[Dict[str, str]] = None, missing: Iterable[str] = (),
+              resource_type: Optional[str] = None, account: Optional[str] = None,
+              region: Optional[str] = None) -> List[str]:
+        """ARN des ressources correspondantes, triés."""
+        missing = list(missing)
+        arns = []
+        for index in self.segments().values():
+            arns += index.query(tags, missing, type=resource_type, account=account, region=region)
+        return sorted(arns)
+
+    def values(self, key: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for index in self.segments().values():
+            for value, count in index.values(key).items():
+                counts[value] = counts.get(value, 0) + count
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def summary(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            "segments": len(segments),
+            "resources": sum(len(index) for index in segments.values()),
+            "updated_at": max((index.updated_at for index in segments.values()), default=0),
+        }
@@ -0,0 +1,131 @@
+"""
+Représentation normalisée et indexée des tags d'une ressource.
+
+Les API AWS renvoient les tags sous trois formes : liste [{"Key", "Value"}]
+(EC2, RDS, S3), dict {clé: valeur} (Lambda, événements aws.tag) ou paires.
+TagSet les ramène toutes à un mapping immuable, construit une seule fois par
+ressource :
+
+- recherche d'une clé en O(1) (dict interne) au lieu d'un parcours de liste
+- clés internées (sys.intern) : les mêmes chaînes "Owner", "Squad"… sont
+  partagées par toutes les ressources d'un scan
+- empreinte stable (blake2b, indépendante de l'ordre des tags et du processus)
+  pour détecter un changement de tags sans comparer les listes
+
+Les clés ne sont pas modifiées (les tags AWS sont sensibles à la casse) ; une
+clé vide ou absente est ignorée, une valeur absente devient "".
+"""
+
+import sys
+import hashlib
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+_intern = sys.intern
+_key_value = itemgetter("Key", "Value")
+
+
+class TagSet(Mapping):
+    """Mapping immuable clé → valeur des tags d'une ressource."""
+
+    __slots__ = ("_tags", "_fingerprint")
+
+    def __init__(self, tags: Any = None):
+        self._fingerprint: Optional[str] = None
+        kind = type(tags)
+        if not tags:
+            self._tags: Dict[str, str] = {}
+        elif kind is list and type(tags[0]) is dict:
+            # Forme la plus fréquente (EC2, RDS, S3) : itemgetter en C, repli si une
+            # entrée n'a pas de Value ou n'est pas un dict
+            try:
+                self._tags = {_intern(k): v for k, v in map(_key_value, tags) if k}
+            except (KeyError, TypeError):
+                self._tags = dict(_pairs(tags))
+        elif kind is dict:
+            self._tags = {_intern(k): v if v is not None else "" for k, v in tags.items() if k}
+        elif kind is TagSet:
+            self._tags = tags._tags
+        elif isinstance(tags, Mapping):
+            self._tags = {_intern(str(k)): "" if v is None else str(v) for k, v in tags.items() if k}
+        else:
+            self._tags = dict(_pairs(tags))
+
+    @classmethod
+    def of(cls, tags: Any) -> "TagSet":
+        """TagSet depuis n'importe quelle forme — sans copie si c'en est déjà un."""
+        return tags if isinstance(tags, TagSet) else cls(tags)
+
+    # --- Mapping ---
+
+    def __getitem__(self, key: str) -> str:
+        return self._tags[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._tags
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tags)
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def get(self, key: str, default: str = "") -> str:
+        return self._tags.get(key, default)
+
+    # --- Conformité ---
+
+    def missing(self, required: Iterable[str]) -> List[str]:
+        tags = self._tags
+        return [key for key in required if key not in tags]
+
+    def check(self, required: Iterable[str]) -> Tuple[bool, List[str]]:
+        tags = self._tags
+        missing = [key for key in required if key not in tags]
+        return not missing, missing
+
+    # --- Identité ---
+
+    @property
+    def fingerprint(self) -> str:
+        """Empreinte hexadécimale (16 caractères) des paires clé/valeur, calculée à la demande."""
+        if self._fingerprint is None:
+            tags = self._tags
+            payload = "\x01".join(f"{k}\x00{tags[k]}" for k in sorted(tags))
+            self._fingerprint = hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+        return self._fingerprint
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, TagSet):
+            return self._tags == other._tags
+        if isinstance(other, Mapping):
+            return self._tags == dict(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    def __repr__(self) -> str:
+        return f"TagSet({self._tags!r})"
+
+    # --- Conversions ---
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(self._tags)
+
+    def to_aws(self) -> List[Dict[str, str]]:
+        """Forme liste [{"Key", "Value"}] attendue par les API EC2/RDS/S3."""
+        return [{"Key": k, "Value": v} for k, v in self._tags.items()]
+
+
+def _pairs(tags: Iterable) -> Iterator[Tuple[str, str]]:
+    for tag in tags:
+        if isinstance(tag, Mapping):
+            key, value = tag.get("Key"), tag.get("Value")
+        else:
+            key, value = tag
+        if key:
+            yield _intern(str(key)), "" if value is None else str(value)
+
+
+EMPTY = TagSet()
@@ -0,0 +1,90 @@
+"""
+Tests unitaires de la comptabilité des appels API (shared/api_accounting.py).
+
+Les appels passent par moto ; un throttling est simulé en répondant à la place
+de moto sur la première tentative (événement before-send).
+"""
+
+import os
+import sys
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.api_accounting import ApiAccounting, ApiBudgetExceeded  # noqa: E402
+
+REGION = "eu-west-1"
+
+
+class RawBody:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    def stream(self, **kwargs):
+        yield self._body
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        accounting = ApiAccounting()
+        client = boto3.client("s3", region_name=REGION, config=Config(retries={"max_attempts": 3, "mode": "standard"}))
+        yield accounting.install(client), accounting
+
+
+def test_appels_erreurs_et_histogramme(s3):
+    client, accounting = s3
+    client.create_bucket(Bucket="bucket-1", CreateBucketConfiguration={"LocationConstraint": REGION})
+    client.list_buckets()
+    client.list_buckets()
+    with pytest.raises(client.exceptions.ClientError):
+        client.get_bucket_tagging(Bucket="bucket-1")
+
+    summary = accounting.pop_summary()
+    ops = summary["operations"]
+    assert summary["calls"] == 4 and summary["errors"] == 1
+    assert ops["s3.ListBuckets"]["calls"] == 2
+    assert ops["s3.GetBucketTagging"]["error_codes"] == {"NoSuchTagSet": 1}
+    assert all(sum(op["histogram"].values()) == op["calls"] for op in ops.values())
+    # Bilan remis à zéro après lecture
+    assert accounting.pop_summary()["calls"] == 0
+
+
+def test_throttle_et_retry(s3):
+    client, accounting = s3
+    throttled = []
+
+    def throttle_first_attempt(request, **kwargs):
+        if not throttled:
+            throttled.append(request.url)
+            body = b"<Error><Code>SlowDown</Code><Message>Reduce your request rate</Message></Error>"
+            return AWSResponse(request.url, 503, {}, RawBody(body))
+        return None
+
+    client.meta.events.register_first("before-send.s3.ListBuckets", throttle_first_attempt)
+    client.list_buckets()
+
+    op = accounting.pop_summary()["operations"]["s3.ListBuckets"]
+    assert op["calls"] == 1 and op["retries"] == 1 and op["throttles"] == 1 and op["errors"] == 0
+
+
+def test_budget(s3):
+    client, accounting = s3
+    with accounting.budget({"s3": 5, "total": 5}) as used:
+        client.list_buckets()
+        client.list_buckets()
+    assert used == {"s3.ListBuckets": 2}
+
+    with pytest.raises(ApiBudgetExceeded, match="s3.ListBuckets : 2 appels > budget 1"):
+        with accounting.budget({"s3.ListBuckets": 1}):
+            client.list_buckets()
+            client.list_buckets()
@@ -0,0 +1,154 @@
+"""
+Tests unitaires de l'inventaire AWS Config (shared/config_inventory.py).
+
+Les requêtes avancées ne sont pas exécutées par moto : un client de substitution
+rejoue des réponses enregistrées (test_config_inventory_responses.json), pages
+et NextToken compris.
+
+Vérifie que :
+- Les résultats Config sont convertis au format des API Describe/List, tags joints,
+  à partir des seules propriétés sélectionnées par la requête
+- Une seule requête paginée sert tous les types enregistrés
+- Les types non enregistrés, un recorder arrêté ou une requête en échec
+  repassent par le scan live
+- Avec un agrégateur, local_only ne garde que le compte / la région de la Lambda
+"""
+
+import os
+import sys
+import json
+import re
+import copy
+from datetime import datetime, timezone
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+import shared.config_inventory as config_inventory_module  # noqa: E402
+from shared.config_inventory import ConfigInventory, discover, embedded_tags  # noqa: E402
+
+RESPONSES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_config_inventory_responses.json")
+
+
+class RecordedConfigClient:
+    """Client Config de substitution : rejoue les réponses enregistrées, page par page."""
+
+    def __init__(self, responses=None, fail_select=False):
+        if responses is None:
+            with open(RESPONSES) as f:
+                responses = json.load(f)
+        self.responses = responses
+        self.fail_select = fail_select
+        self.calls = []
+
+    def describe_configuration_recorders(self):
+        return copy.deepcopy(self.responses["describe_configuration_recorders"])
+
+    def describe_configuration_recorder_status(self):
+        return copy.deepcopy(self.responses["describe_configuration_recorder_status"])
+
+    def select_resource_config(self, Expression, Limit, NextToken=None):
+        self.calls.append({"Expression": Expression, "NextToken": NextToken})
+        if self.fail_select:
+            raise RuntimeError("InvalidExpressionException")
+        pages = self.responses["select_resource_config"]
+        index = 0 if NextToken is None else int(NextToken.rsplit("-", 1)[1]) - 1
+        page = copy.deepcopy(pages[index])
+        page["Results"] = [json.dumps(select(json.loads(r), Expression)) for r in page["Results"]]
+        return page
+
+    def select_aggregate_resource_config(self, ConfigurationAggregatorName, **kwargs):
+        return self.select_resource_config(**kwargs)
+
+
+def select(item, expression):
+    """Comme Config, ne renvoie de configuration que les propriétés sélectionnées."""
+    selected = set(re.findall(r"configuration\.(\w+)", expression))
+    configuration = item.get("configuration") or {}
+    item["configuration"] = {key: value for key, value in configuration.items() if key in selected}
+    return item
+
+
+@pytest.fixture
+def config_source(monkeypatch):
+    monkeypatch.setattr(config_inventory_module, "INVENTORY_SOURCE", "config")
+
+
+def live_marker(resource_type):
+    return lambda: iter([{"live": resource_type}])
+
+
+def test_enregistrements_au_format_describe(config_source):
+    client = RecordedConfigClient()
+    inventory = ConfigInventory(client=client, aggregator="")
+
+    instances = list(discover("ec2", live_marker("ec2"), inventory))
+    assert [i["InstanceId"] for i in instances] == ["i-0a1b2c3d4e5f60001", "i-0a1b2c3d4e5f60002"]
+    assert instances[1]["State"] == {"Name": "stopped"}
+    assert instances[0]["LaunchTime"] == datetime(2026, 1, 5, 9, 12, 44, tzinfo=timezone.utc)
+    assert [i["InstanceType"] for i in instances] == ["m5.large", "t3.micro"]
+    assert embedded_tags(instances[0])["Owner"] == "alice@example.com"
+
+    (db,) = discover("rds", live_marker("rds"), inventory)
+    assert db["DBInstanceIdentifier"] == "orders-db"  # resourceName, pas le DbiResourceId
+    assert db["DBInstanceArn"] == "arn:aws:rds:eu-west-1:123456789012:db:orders-db"
+    assert db["DBInstanceStatus"] == "available"
+    assert db["DBInstanceClass"] == "db.r6g.large"
+    assert embedded_tags(db)["CostCenter"] == "1234"
+
+    (bucket,) = discover("s3", live_marker("s3"), inventory)
+    assert bucket["Name"] == "governance-logs-123456789012"
+    assert len(embedded_tags(bucket)) == 0  # sans tags : TagSet vide, pas d'appel GetBucketTagging
+
+    # Une requête, deux pages, pour tous les types enregistrés
+    assert [c["NextToken"] for c in client.calls] == [None, "page-2"]
+    assert "'AWS::Lambda::Function'" not in client.calls[0]["Expression"]
+    assert inventory.stats == {"queries": 1, "pages": 2, "records": 4, "fallbacks": ["lambda"]}
+
+
+def test_repli_sur_le_scan_live(config_source):
+    # Type non enregistré par le recorder
+    inventory = ConfigInventory(client=RecordedConfigClient(), aggregator="")
+    assert list(discover("lambda", live_marker("lambda"), inventory)) == [{"live": "lambda"}]
+
+    # Recorder arrêté : données potentiellement périmées
+    responses = json.load(open(RESPONSES))
+    responses["describe_configuration_recorder_status"]["ConfigurationRecordersStatus"][0]["recording"] = False
+    stopped = RecordedConfigClient(responses)
+    inventory = ConfigInventory(client=stopped, aggregator="")
+    assert list(discover("ec2", live_marker("ec2"), inventory)) == [{"live": "ec2"}]
+    assert stopped.calls == []
+
+    # Requête en échec
+    inventory = ConfigInventory(client=RecordedConfigClient(fail_select=True), aggregator="")
+    assert list(discover("s3", live_marker("s3"), inventory)) == [{"live": "s3"}]
+    assert inventory.stats["fallbacks"] == ["ec2", "rds", "s3", "lambda"]
+
+
+def test_source_live_par_defaut(monkeypatch):
+    monkeypatch.setattr(config_inventory_module, "INVENTORY_SOURCE", "live")
+    client = RecordedConfigClient()
+    inventory = ConfigInventory(client=client, aggregator="")
+
+    assert list(discover("ec2", live_marker("ec2"), inventory)) == [{"live": "ec2"}]
+    assert client.calls == []
+
+
+def test_agregateur_filtre_local(config_source):
+    responses = json.load(open(RESPONSES))
+    page = responses["select_resource_config"][0]
+    other = json.loads(page["Results"][1])
+    other["accountId"] = "210987654321"
+    page["Results"][1] = json.dumps(other)
+
+    local = ConfigInventory(client=RecordedConfigClient(responses), aggregator="org",
+                            account_id="123456789012", region="eu-west-1")
+    assert [i["InstanceId"] for i in local.records("ec2")] == ["i-0a1b2c3d4e5f60001"]
+    # Types absents des résultats de l'agrégateur : repli live
+    assert local.records("lambda") is None
+
+    organisation = ConfigInventory(client=RecordedConfigClient(responses), aggregator="org", local_only=False)
+    assert len(organisation.records("ec2")) == 2
@@ -0,0 +1,77 @@
+"""
+Tests unitaires de l'attribution des coûts CUR (shared/cost_attribution.py).
+
+Vérifie que :
+- La clé de jointure est l'identifiant (EC2, S3) ou l'ARN (RDS, Lambda)
+- Les coûts sont sommés par ressource sur plusieurs fichiers et plusieurs lots
+- La dépense non conforme est ventilée par compte / type et par tag manquant
+- Les lignes sans ressource ou hors inventaire sont comptées à part
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.cost_attribution import attribute_costs, join_key, resolve_uri  # noqa: E402
+
+DB_ARN = "arn:aws:rds:eu-west-1:111:db:orders"
+
+INVENTORY = [
+    {"type": "EC2", "id": "i-0abc", "compliant": False, "missing_tags": ["Owner", "CostCenter"]},
+    {"type": "S3", "id": "logs", "compliant": True, "missing_tags": []},
+    {"type": "rds", "id": "orders", "arn": DB_ARN, "compliant": False, "missing_tags": ["CostCenter"]},
+    {"type": "EC2", "id": "i-0abc", "compliant": True, "missing_tags": []},  # doublon ignoré
+]
+
+
+def write_cur(directory):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    lines = [
+        ("i-0abc", "111", "AmazonEC2", 10.0), ("i-0abc", "111", "AmazonEC2", 5.5),
+        ("logs", "111", "AmazonS3", 2.0), (DB_ARN, "111", "AmazonRDS", 30.0),
+        ("", "111", "AWSSupportBusiness", 100.0), (None, "111", "Tax", 7.0),
+        ("i-hors-inventaire", "222", "AmazonEC2", 4.0), ("vol-0def", "222", "AmazonEC2", 1.0),
+    ]
+    os.makedirs(directory / "BILLING_PERIOD=2026-10", exist_ok=True)
+    for part, chunk in enumerate((lines[:5], lines[5:])):
+        resource, account, product, cost = zip(*chunk)
+        pq.write_table(pa.table({
+            "line_item_resource_id": list(resource),
+            "line_item_usage_account_id": list(account),
+            "line_item_product_code": list(product),
+            "line_item_unblended_cost": list(cost),
+            "line_item_usage_type": ["x"] * len(chunk),
+        }), directory / "BILLING_PERIOD=2026-10" / f"part-{part}.parquet")
+
+
+def test_cle_de_jointure_et_periode():
+    assert join_key("ec2", "i-0abc", "arn:aws:ec2:eu-west-1:111:instance/i-0abc") == "i-0abc"
+    assert join_key("RDS", "orders", DB_ARN) == DB_ARN
+    now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    assert resolve_uri("s3://cur/data/BILLING_PERIOD={billing_period}/", now) == "s3://cur/data/BILLING_PERIOD=2026-10/"
+    assert resolve_uri("cur/year={year}/month={month}", now) == "cur/year=2026/month=10"
+
+
+def test_depense_non_conforme_par_compte_type_et_tag(tmp_path):
+    write_cur(tmp_path)
+    now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    data = attribute_costs(INVENTORY, str(tmp_path / "BILLING_PERIOD={billing_period}"), now=now, batch_rows=2)
+
+    assert (data["files"], data["rows"], data["resources"]) == (2, 8, 3)
+    assert data["total_cost"] == 159.5
+    assert data["attributed_cost"] == 47.5 and data["non_compliant_cost"] == 45.5
+    assert data["no_resource_id_cost"] == 107.0 and data["unmatched_cost"] == 5.0
+    assert data["unmatched_by_product"] == {"AmazonEC2": 5.0}
+    assert data["by_account_type"] == [
+        {"account": "111", "type": "rds", "cost": 30.0, "resources": 1},
+        {"account": "111", "type": "ec2", "cost": 15.5, "resources": 1},
+    ]
+    assert data["by_missing_tag"] == {"CostCenter": 45.5, "Owner": 15.5}
+    assert [r["id"] for r in data["top_non_compliant"]] == ["orders", "i-0abc"]
@@ -0,0 +1,64 @@
+"""
+Tests unitaires de la découverte live EC2 / RDS (shared/discovery.py).
+
+Vérifie que :
+- Les instances terminées sont filtrées côté serveur (instance-state-name)
+- Les pages sont demandées à la taille maximale
+- Les enregistrements ne gardent que les champs lus par les handlers
+"""
+
+import os
+import sys
+
+import boto3
+from moto import mock_aws
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.discovery import EC2_FIELDS, RDS_FIELDS, ec2_instances, rds_instances  # noqa: E402
+
+
+def spy(client, operation):
+    """Paramètres de chaque appel à operation."""
+    calls = []
+    client.meta.events.register(f"provide-client-params.*.{operation}", lambda params, **_: calls.append(dict(params)))
+    return calls
+
+
+@mock_aws
+def test_ec2_filtre_serveur_et_enregistrements_compacts():
+    ec2 = boto3.client("ec2", region_name="eu-west-1")
+    ids = [i["InstanceId"] for i in ec2.run_instances(
+        ImageId="ami-12345678", MinCount=3, MaxCount=3, InstanceType="t3.micro",
+        TagSpecifications=[{"ResourceType": "instance", "Tags": [{"Key": "Owner", "Value": "alice@example.com"}]}],
+    )["Instances"]]
+    ec2.terminate_instances(InstanceIds=[ids[0]])
+    calls = spy(ec2, "DescribeInstances")
+
+    records = list(ec2_instances(ec2))
+
+    assert sorted(r["InstanceId"] for r in records) == sorted(ids[1:])
+    assert all(set(r) <= set(EC2_FIELDS) for r in records)
+    assert records[0]["State"] == {"Name": "running"}
+    assert records[0]["Tags"] == [{"Key": "Owner", "Value": "alice@example.com"}]
+    assert calls[0]["MaxResults"] == 1000
+    assert "terminated" not in calls[0]["Filters"][0]["Values"]
+
+
+@mock_aws
+def test_rds_projection_et_taille_de_page():
+    rds = boto3.client("rds", region_name="eu-west-1")
+    rds.create_db_instance(DBInstanceIdentifier="orders-db", DBInstanceClass="db.t3.micro", Engine="postgres",
+                           MasterUsername="admin", MasterUserPassword="password123", AllocatedStorage=20)
+    calls = spy(rds, "DescribeDBInstances")
+
+    (db,) = rds_instances(rds)
+
+    assert set(db) <= set(RDS_FIELDS)
+    assert db["DBInstanceIdentifier"] == "orders-db"
+    assert db["DBInstanceArn"].endswith(":db:orders-db")
+    assert calls[0]["MaxRecords"] == 100
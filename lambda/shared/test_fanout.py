@@ -0,0 +1,109 @@
+"""
+Tests unitaires du scan réparti (shared/fanout.py).
+
+Vérifie que :
+- Les parts d'un service couvrent chaque ressource exactement une fois
+- Les stores SQLite et DynamoDB décomptent les shards et ignorent un shard rejoué
+- DynamoDB écrit résultat et compteur dans une seule transaction, relue si un
+  autre worker a modifié le compteur entre-temps
+"""
+
+import os
+import sys
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+import shared.fanout as fanout_module  # noqa: E402
+from shared.fanout import DynamoDBShardStore, SQLiteShardStore, plan_shards  # noqa: E402
+
+
+def test_parts_disjointes_et_completes():
+    shards = plan_shards(["ec2", "s3"], {"s3": 4, "ec2": 0})
+    assert [s.shard_id for s in shards] == ["ec2-0-of-1", "s3-0-of-4", "s3-1-of-4", "s3-2-of-4", "s3-3-of-4"]
+
+    buckets = [f"bucket-{i}" for i in range(200)]
+    owners = [[s.index for s in shards if s.service == "s3" and s.owns(b)] for b in buckets]
+    assert all(len(o) == 1 for o in owners)
+    assert len({o[0] for o in owners}) == 4  # toutes les parts reçoivent du travail
+
+
+def check_store(store):
+    store.start("run-1", ["ec2-0-of-1", "s3-0-of-2", "s3-1-of-2"])
+    assert store.complete("run-1", "s3-1-of-2", {"non_compliant": 3}) == 2
+    assert store.complete("run-1", "s3-1-of-2", {"non_compliant": 3}) is None  # rejoué
+    assert store.complete("run-1", "ec2-0-of-1", {"non_compliant": 1}) == 1
+    assert store.complete("run-1", "s3-0-of-2", {"error": "AccessDenied"}) == 0
+    assert store.results("run-1") == {
+        "ec2-0-of-1": {"non_compliant": 1},
+        "s3-0-of-2": {"error": "AccessDenied"},
+        "s3-1-of-2": {"non_compliant": 3},
+    }
+
+
+def test_store_sqlite(tmp_path):
+    check_store(SQLiteShardStore(str(tmp_path / "shards.db")))
+
+
+@pytest.fixture
+def dynamodb_store():
+    with mock_aws():
+        client = boto3.client("dynamodb", region_name="eu-west-1")
+        client.create_table(
+            TableName="scan-shards", BillingMode="PAY_PER_REQUEST",
+            KeySchema=[{"AttributeName": "run_id", "KeyType": "HASH"},
+                       {"AttributeName": "shard_id", "KeyType": "RANGE"}],
+            AttributeDefinitions=[{"AttributeName": "run_id", "AttributeType": "S"},
+                                  {"AttributeName": "shard_id", "AttributeType": "S"}],
+        )
+        yield DynamoDBShardStore("scan-shards", client=client)
+
+
+def test_store_dynamodb(dynamodb_store):
+    check_store(dynamodb_store)
+
+
+def test_dynamodb_transaction_resultat_et_compteur(monkeypatch):
+    monkeypatch.setattr(fanout_module.time, "sleep", lambda seconds: None)
+    client = boto3.client("dynamodb", region_name="eu-west-1",
+                          aws_access_key_id="testing", aws_secret_access_key="testing")
+    store = DynamoDBShardStore("scan-shards", client=client)
+    run_key = {"run_id": {"S": "run-1"}, "shard_id": {"S": "#run"}}
+
+    def transaction(seen):
+        return {"TransactItems": [
+            {"Put": {"TableName": "scan-shards", "Item": ANY, "ConditionExpression": "attribute_not_exists(shard_id)"}},
+            {"Update": {"TableName": "scan-shards", "Key": run_key, "UpdateExpression": "SET remaining = :remaining",
+                        "ConditionExpression": "remaining = :seen",
+                        "ExpressionAttributeValues": {":seen": {"N": str(seen)}, ":remaining": {"N": str(seen - 1)}}}},
+        ]}
+
+    def cancelled(*codes):
+        return {"service_error_code": "TransactionCanceledException",
+                "modeled_fields": {"CancellationReasons": [{"Code": code} for code in codes]}}
+
+    def run_item(remaining):
+        return {"Item": {**run_key, "remaining": {"N": str(remaining)}}}
+
+    get_run = {"TableName": "scan-shards", "Key": run_key, "ConsistentRead": True}
+    with Stubber(client) as stub:
+        # Un autre worker a décrémenté le compteur entre la lecture et la transaction : on relit
+        stub.add_response("get_item", run_item(2), get_run)
+        stub.add_client_error("transact_write_items", expected_params=transaction(2),
+                              **cancelled("None", "ConditionalCheckFailed"))
+        stub.add_response("get_item", run_item(1), get_run)
+        stub.add_response("transact_write_items", {}, transaction(1))
+        assert store.complete("run-1", "s3-0-of-2", {"non_compliant": 3}) == 0
+
+        # Shard rejoué : rien n'est écrit, pas d'agrégation
+        stub.add_response("get_item", run_item(0), get_run)
+        stub.add_client_error("transact_write_items", expected_params=transaction(0),
+                              **cancelled("ConditionalCheckFailed", "None"))
+        assert store.complete("run-1", "s3-0-of-2", {"non_compliant": 3}) is None
+        stub.assert_no_pending_responses()
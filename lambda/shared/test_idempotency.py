@@ -0,0 +1,142 @@
+"""
+Tests unitaires du store d'idempotence (shared/idempotency.py).
+
+Verifie que :
+- Un retry avec la meme cle relit le resultat au lieu de rejouer l'action
+- Une exception n'est pas mise en cache (le retry rejoue l'action)
+- Les trois stores (memoire, SQLite, DynamoDB via moto) se comportent pareil
+- Le client DynamoDB par defaut passe par le limiteur et la comptabilite des appels
+"""
+
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+# Le layer Lambda expose "shared" a la racine : on ajoute lambda/ au path
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.api_accounting import api_budget  # noqa: E402
+from shared.idempotency import (  # noqa: E402
+    DynamoDBStore,
+    InMemoryStore,
+    SQLiteStore,
+    key_from_event,
+    make_key,
+    run_idempotent,
+)
+
+REGION = "eu-west-1"
+TABLE = "governance-idempotency"
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+
+
+def create_table():
+    client = boto3.client("dynamodb", region_name=REGION)
+    client.create_table(
+        TableName=TABLE,
+        KeySchema=[{"AttributeName": "key", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "key", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return client
+
+
+def assert_replay(store):
+    calls = []
+
+    def action():
+        calls.append(1)
+        return {"status": "ok", "snapshot": f"snap-{len(calls)}"}
+
+    key = make_key("exec-1", "FreezeResource", "db-1", "freeze")
+    first = run_idempotent(store, key, action)
+    second = run_idempotent(store, key, action)
+
+    assert len(calls) == 1
+    assert first == {"status": "ok", "snapshot": "snap-1"}
+    assert second["snapshot"] == "snap-1"
+    assert second["idempotent_replay"] is True
+
+
+def test_in_memory_store_rejoue_le_resultat():
+    assert_replay(InMemoryStore())
+
+
+def test_sqlite_store_rejoue_le_resultat():
+    assert_replay(SQLiteStore(":memory:"))
+
+
+def test_sqlite_store_ignore_les_entrees_expirees():
+    store = SQLiteStore(":memory:", ttl_seconds=-1)
+    store.save("k", {"status": "ok"})
+    assert store.get("k") is None
+
+
+@mock_aws
+def test_dynamodb_store_rejoue_le_resultat():
+    client = create_table()
+    assert_replay(DynamoDBStore(TABLE, client=client))
+
+
+@mock_aws
+def test_dynamodb_store_garde_le_premier_resultat():
+    """Deux ecritures concurrentes : la condition DynamoDB conserve la premiere."""
+    client = create_table()
+    store = DynamoDBStore(TABLE, client=client)
+    store.save("k", {"snapshot": "snap-1"})
+    store.save("k", {"snapshot": "snap-2"})
+    assert store.get("k") == {"snapshot": "snap-1"}
+
+
+@mock_aws
+def test_dynamodb_store_client_limite_par_defaut():
+    create_table()
+    store = DynamoDBStore(TABLE)
+    with api_budget({}) as used:
+        store.save("k", {"snapshot": "snap-1"})
+        store.get("k")
+    assert used == {"dynamodb.PutItem": 1, "dynamodb.GetItem": 1}
+
+
+def test_exception_non_mise_en_cache():
+    store = InMemoryStore()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("Lambda.ServiceException")
+        return {"notified": True}
+
+    with pytest.raises(RuntimeError):
+        run_idempotent(store, "k", flaky)
+    assert run_idempotent(store, "k", flaky) == {"notified": True}
+    assert len(attempts) == 2
+
+
+def test_sans_contexte_step_functions_pas_de_cache():
+    """Invocation directe (pas d'execution_id) : l'action est toujours executee."""
+    store = InMemoryStore()
+    calls = []
+    key = key_from_event({"action": "freeze"}, "i-123", "freeze")
+    assert key is None
+    run_idempotent(store, key, lambda: calls.append(1) or {})
+    run_idempotent(store, key, lambda: calls.append(1) or {})
+    assert len(calls) == 2
+
+
+def test_key_from_event_distingue_etat_et_action():
+    event = {"execution_id": "arn:exec", "state_name": "NotifyJ0"}
+    assert key_from_event(event, "i-123", "notify:J0") == "arn:exec#NotifyJ0#i-123#notify:J0"
+    assert key_from_event(event, "i-123", "notify:J0") != key_from_event(event, "i-456", "notify:J0")
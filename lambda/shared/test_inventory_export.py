@@ -0,0 +1,70 @@
+"""
+Tests unitaires de l'export d'inventaire en colonnes (shared/inventory_export.py).
+
+Vérifie que :
+- Les lignes deviennent des colonnes, une colonne "tag.<clé>" par clé rencontrée
+- L'ARN est reconstruit pour EC2 / S3, le compte par défaut est celui du run
+- Le fichier Parquet est partitionné par source / date et relisible (si pyarrow)
+- L'export désactivé ou vide n'écrit rien
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.inventory_export import InventoryExport, snapshot_key  # noqa: E402
+
+
+def export(uri="/tmp/inventaire"):
+    exp = InventoryExport("scanner", uri=uri)
+    exp.begin(policy_version="3", account="111122223333")
+    exp.add("ec2", "i-0abc", {"Owner": "a@example.com", "Squad": "Data"}, (True, [], []), region="eu-west-1")
+    exp.add("s3", "logs", {"Owner": "b@example.com"}, (False, ["Squad"], []), region="eu-west-3")
+    exp.add("rds", "db-1", {}, (False, ["Owner", "Squad"], ["Environment"]),
+            arn="arn:aws:rds:eu-west-1:444455556666:db:db-1", account="444455556666")
+    return exp
+
+
+def test_colonnes_et_arn():
+    columns = export().columns()
+    assert columns["arn"] == ["arn:aws:ec2:eu-west-1:111122223333:instance/i-0abc", "arn:aws:s3:::logs",
+                              "arn:aws:rds:eu-west-1:444455556666:db:db-1"]
+    assert columns["account"] == ["111122223333", "111122223333", "444455556666"]
+    assert columns["tag.Owner"] == ["a@example.com", "b@example.com", None]
+    assert columns["tag.Squad"] == ["Data", None, None]
+    assert columns["compliant"] == [True, False, False]
+    assert columns["invalid_tags"][2] == ["Environment"]
+    assert columns["tag_keys"][0] == ["Owner", "Squad"]
+    assert set(columns["policy_version"]) == {"3"}
+
+
+def test_desactive_ou_vide():
+    disabled = InventoryExport("scanner", uri="")
+    disabled.add("ec2", "i-1", {}, (False, ["Owner"], []))
+    assert disabled.rows == [] and disabled.write() is None
+    assert InventoryExport("scanner", uri="/tmp/inventaire").write() is None
+
+
+def test_parquet_partitionne_et_relisible(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    exp = export(uri=str(tmp_path))
+    path = exp.write(suffix="-2")
+
+    assert path == os.path.join(str(tmp_path), snapshot_key("scanner", exp.snapshot_at, "-2"))
+    assert "/scanner/dt=" in path and path.endswith("-2.parquet")
+    table = pq.read_table(path)
+    assert table.num_rows == 3
+    assert table.schema.field("compliant").type == "bool"
+    assert table.column("tag.Squad").to_pylist() == ["Data", None, None]
+    assert table.column("missing_tags").to_pylist()[1] == ["Squad"]
+
+
+def test_cle_de_snapshot():
+    at = datetime(2026, 10, 19, 8, 30, 5, tzinfo=timezone.utc)
+    assert snapshot_key("metrics", at) == "metrics/dt=2026-10-19/metrics-20261019T083005.parquet"
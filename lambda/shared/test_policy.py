@@ -0,0 +1,160 @@
+"""
+Tests unitaires du moteur de politique de tags (shared/policy.py).
+
+Vérifie que :
+- La politique par défaut ne vérifie que la présence des tags (comme avant les
+  règles de valeur) : les tags de la stack elle-même restent conformes
+- L'exemple strict valide les valeurs (email, regex CostCenter, Environment),
+  clés insensibles à la casse
+- Les exigences suivent le scope le plus précis (type de ressource × environnement)
+- Un document invalide est refusé à la compilation
+- La politique distante (fichier, S3, SSM) n'est relue qu'une fois par TTL,
+  recompilée seulement si sa version change, et survit à une source en erreur
+"""
+
+import os
+import sys
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.policy import (  # noqa: E402
+    CompiledPolicy, FilePolicySource, PolicyError, PolicyResult, PolicyStore,
+    S3PolicySource, SsmPolicySource, get_policy, set_policy, source_from_env,
+)
+
+REGION = "eu-west-1"
+STRICT_POLICY_FILE = os.path.join(os.path.dirname(LAMBDA_DIR), "docs", "tag_policy.strict.example.json")
+
+VALID = {"Owner": "alice@entreprise.com", "Squad": "Data", "CostCenter": "CC-123", "Environment": "prod"}
+
+
+def test_politique_par_defaut():
+    policy = get_policy()
+    assert policy.evaluate(VALID) == PolicyResult(True, [], [])
+    # common_tags des modules Terraform de gouvernance
+    stack = {"Owner": "CloudGovernance", "Squad": "Platform", "CostCenter": "INFRA", "Environment": "prod"}
+    assert policy.evaluate(stack) == PolicyResult(True, [], [])
+    assert policy.evaluate({**VALID, "owner": "x"}).compliant
+    assert policy.evaluate({"owner": "alice", "Squad": "Data"}) == PolicyResult(
+        False, ["Owner", "CostCenter", "Environment"], [])
+    assert policy.evaluate(None) == PolicyResult(False, list(policy.required), [])
+
+
+def test_exemple_strict():
+    policy = CompiledPolicy.from_file(STRICT_POLICY_FILE)
+    assert policy.evaluate(VALID) == PolicyResult(True, [], [])
+    assert policy.evaluate({**VALID, "Environment": "Prod"}).compliant  # valeur insensible à la casse
+
+    result = policy.evaluate({"owner": "alice", "SQUAD": "Data", "CostCenter": "123", "Environment": "qa"})
+    assert result == PolicyResult(False, [], ["Owner", "CostCenter", "Environment"])
+    assert policy.evaluate(None) == PolicyResult(False, list(policy.required), [])
+
+
+def test_scopes_du_plus_precis_au_plus_general():
+    policy = CompiledPolicy({
+        "required": ["Owner", "Squad", "CostCenter", "Environment"],
+        "rules": {"Owner": {"format": "email"}},
+        "scopes": [
+            {"environments": ["dev"], "required": ["Owner", "Environment"]},
+            {"resource_types": ["lambda"], "required": ["Owner", "Squad", "Environment"]},
+            {"resource_types": ["lambda"], "environments": ["dev"], "required": ["Environment"]},
+        ],
+    })
+    dev = {"Environment": "dev"}
+
+    assert policy.evaluate(dev, "ec2").missing == ["Owner"]
+    assert policy.evaluate(dev, "lambda").compliant
+    assert policy.evaluate({"Environment": "prod"}, "lambda").missing == ["Owner", "Squad"]
+    assert policy.evaluate({"Environment": "prod"}, "s3").missing == ["Owner", "Squad", "CostCenter"]
+    # Sans case_insensitive_keys, "environment" n'est pas le tag Environment
+    assert policy.evaluate({"environment": "dev"}, "lambda").missing == ["Owner", "Squad", "Environment"]
+    assert policy.required_for("LAMBDA", "DEV") == ("Environment",)
+
+
+@pytest.mark.parametrize("document, message", [
+    ({"rules": {}}, "required"),
+    ({"required": ["CostCenter"], "rules": {"CostCenter": {"pattern": "CC-("}}}, "regex invalide"),
+    ({"required": ["Owner"], "rules": {"Owner": {"format": "phone"}}}, "format inconnu"),
+    ({"required": ["Owner"], "rules": {"Owner": {"regex": ".*"}}}, "options inconnues"),
+    ({"required": ["Owner"], "scopes": [{"resource_types": ["s3"]}]}, "Scope sans"),
+])
+def test_document_invalide(document, message):
+    with pytest.raises(PolicyError, match=message):
+        CompiledPolicy(document)
+
+
+@pytest.fixture
+def restore_policy():
+    yield
+    set_policy(None)
+
+
+def test_fichier_de_politique(monkeypatch, tmp_path, restore_policy):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({"version": "v2", "required": ["Owner"]}))
+    monkeypatch.setenv("TAG_POLICY_FILE", str(path))
+    set_policy(None)
+
+    assert get_policy().version == "v2"
+    assert get_policy() is get_policy()  # compilée une seule fois
+    assert get_policy().evaluate({"Owner": "x"}).compliant
+
+
+def test_rafraichissement_par_ttl(tmp_path):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({"required": ["Owner"]}))
+    now = [0.0]
+    store = PolicyStore(FilePolicySource(str(path)), ttl_seconds=300, clock=lambda: now[0])
+
+    first = store.get()
+    assert first.version  # sans "version" dans le document : jeton de la source
+    path.write_text(json.dumps({"version": "v3", "required": ["Owner", "Squad"]}))
+    assert store.get() is first  # TTL non écoulé : aucune relecture
+
+    now[0] = 301
+    assert store.get().version == "v3"
+    now[0] = 602
+    assert store.get().version == "v3" and store.stats == {"fetches": 3, "reloads": 2, "errors": 0}
+
+    # Politique invalide publiée : la dernière politique valide reste active
+    path.write_text("{pas du json")
+    now[0] = 903
+    assert store.get().version == "v3" and store.stats["errors"] == 1
+
+
+def test_sources_s3_et_ssm(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        s3 = boto3.client("s3", region_name=REGION)
+        s3.create_bucket(Bucket="policies", CreateBucketConfiguration={"LocationConstraint": REGION})
+        s3.put_object(Bucket="policies", Key="tags.json", Body=json.dumps({"required": ["Owner"]}))
+        source = S3PolicySource("policies", "tags.json", client=s3)
+        document, etag = source.fetch(None)
+        assert document == {"required": ["Owner"]}
+        assert source.fetch(etag) is None  # 304 : rien à recompiler
+
+        ssm = boto3.client("ssm", region_name=REGION)
+        ssm.put_parameter(Name="/governance/tag-policy", Type="String",
+                          Value=json.dumps({"version": "ssm-v1", "required": ["Owner"]}))
+        store = PolicyStore(SsmPolicySource("/governance/tag-policy", client=ssm), ttl_seconds=0)
+        assert store.get().version == "ssm-v1"
+        ssm.put_parameter(Name="/governance/tag-policy", Type="String", Overwrite=True,
+                          Value=json.dumps({"version": "ssm-v2", "required": ["Squad"]}))
+        assert store.get().required == ("Squad",)
+        assert store.get().version == "ssm-v2" and store.stats["reloads"] == 2
+
+
+def test_source_depuis_l_environnement(monkeypatch):
+    monkeypatch.setenv("TAG_POLICY_SOURCE", "ssm:/governance/tag-policy")
+    assert isinstance(source_from_env(), SsmPolicySource)
+    monkeypatch.setenv("TAG_POLICY_SOURCE", "s3://policies/tags.json")
+    source = source_from_env()
+    assert (source.bucket, source.key) == ("policies", "tags.json")
@@ -0,0 +1,78 @@
+"""
+Tests unitaires du profilage échantillonné (shared/profiling.py).
+
+Vérifie que :
+- Sans PROFILING_SAMPLE_RATE, le handler est appelé tel quel, sans rien écrire
+- Un profil pstats et le bilan d'allocations sont écrits en local ou sur S3
+- Une erreur d'écriture n'interrompt pas l'invocation
+"""
+
+import os
+import sys
+import json
+import pstats
+
+import boto3
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.profiling import sampled_profile, should_profile  # noqa: E402
+
+REGION = "eu-west-1"
+
+
+class Context:
+    aws_request_id = "req-123"
+
+
+@sampled_profile
+def handler(event, context):
+    data = [str(i) * 10 for i in range(event["n"])]
+    return {"count": len(data)}
+
+
+def test_desactive_par_defaut(monkeypatch, tmp_path):
+    monkeypatch.delenv("PROFILING_SAMPLE_RATE", raising=False)
+    monkeypatch.setenv("PROFILING_OUTPUT", str(tmp_path))
+
+    assert handler({"n": 10}, Context()) == {"count": 10}
+    assert not list(tmp_path.iterdir())
+    assert not should_profile(0.5, rand=lambda: 0.7) and should_profile(0.5, rand=lambda: 0.3)
+
+
+def test_profil_local(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILING_OUTPUT", str(tmp_path))
+
+    assert handler({"n": 20000}, Context()) == {"count": 20000}
+
+    (profile,) = tmp_path.rglob("*.prof")
+    assert profile.name.endswith("-req-123.prof")
+    functions = {name for _, _, name in pstats.Stats(str(profile)).stats}
+    assert "handler" in functions
+    allocations = json.loads(profile.with_name(profile.name.replace(".prof", ".alloc.json")).read_text())
+    assert allocations["request_id"] == "req-123" and allocations["peak_mb"] > 0
+    assert any("test_profiling.py" in site["site"] for site in allocations["top_allocations"])
+
+
+def test_profil_s3_et_erreur_d_ecriture(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "1")
+    with mock_aws():
+        s3 = boto3.client("s3", region_name=REGION)
+        s3.create_bucket(Bucket="profiles", CreateBucketConfiguration={"LocationConstraint": REGION})
+
+        monkeypatch.setenv("PROFILING_OUTPUT", "s3://profiles/lambda")
+        handler({"n": 10}, Context())
+        keys = sorted(o["Key"] for o in s3.list_objects_v2(Bucket="profiles")["Contents"])
+        assert len(keys) == 2 and all(k.startswith("lambda/") for k in keys)
+        assert keys[0].endswith(".alloc.json") and keys[1].endswith(".prof")
+
+        # Bucket inexistant : le profil est perdu, pas l'invocation
+        monkeypatch.setenv("PROFILING_OUTPUT", "s3://absent/lambda")
+        assert handler({"n": 10}, Context()) == {"count": 10}
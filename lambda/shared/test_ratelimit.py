@@ -0,0 +1,106 @@
+"""
+Tests unitaires du rate limiter (shared/ratelimit.py).
+
+Horloge et sleep sont simules : aucun test ne dort reellement.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.ratelimit import RateLimiter, TokenBucket  # noqa: E402
+
+REGION = "eu-west-1"
+
+
+class FakeClock:
+    """Horloge virtuelle : sleep() fait avancer le temps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+
+
+def fake_operation(service="ec2", name="DescribeInstances"):
+    return SimpleNamespace(name=name, service_model=SimpleNamespace(service_name=service))
+
+
+def test_token_bucket_respecte_le_debit():
+    """10 req/s, burst 10 : 30 appels prennent ~2s (les 10 premiers sont immediats)."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, clock=clock, sleep=clock.sleep)
+    for _ in range(30):
+        bucket.acquire()
+    assert clock.now == pytest.approx(2.0, rel=0.01)
+
+
+def test_throttle_divise_le_debit_puis_recupere():
+    clock = FakeClock()
+    limiter = RateLimiter({"ec2": 20}, clock=clock, sleep=clock.sleep)
+    op = fake_operation()
+
+    limiter._needs_retry(operation=op, response=(None, {"Error": {"Code": "RequestLimitExceeded"}}))
+    bucket = limiter.bucket("ec2", "DescribeInstances")
+    assert bucket.rate == 10
+
+    for _ in range(30):
+        limiter._after_call(model=op, http_response=SimpleNamespace(status_code=200))
+    assert bucket.rate == 20
+    assert limiter.pop_stats()["throttles"] == 1
+
+
+def test_erreur_non_throttle_ne_ralentit_pas():
+    limiter = RateLimiter({"ec2": 20})
+    limiter._needs_retry(operation=fake_operation(), response=(None, {"Error": {"Code": "InvalidInstanceID.NotFound"}}))
+    assert limiter.bucket("ec2", "DescribeInstances").rate == 20
+
+
+def test_quota_operation_prioritaire_sur_service():
+    limiter = RateLimiter({"rds": 8, "rds.ListTagsForResource": 2, "default": 3})
+    assert limiter.quota_for("rds", "ListTagsForResource") == 2
+    assert limiter.quota_for("rds", "DescribeDBInstances") == 8
+    assert limiter.quota_for("sqs", "SendMessage") == 3
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("API_RATE_LIMITS", '{"lambda.ListTags": 4}')
+    assert RateLimiter.from_env().quota_for("lambda", "ListTags") == 4
+
+
+@mock_aws
+def test_install_sur_client_boto3_compte_les_appels():
+    clock = FakeClock()
+    limiter = RateLimiter({"ec2.DescribeInstances": 1}, clock=clock, sleep=clock.sleep)
+    ec2 = limiter.install(boto3.client("ec2", region_name=REGION))
+
+    for _ in range(3):
+        ec2.describe_instances()
+
+    stats = limiter.pop_stats()
+    assert stats["by_operation"]["ec2.DescribeInstances"]["calls"] == 3
+    # burst de 1 jeton a 1 req/s : les 2 appels suivants attendent 1s chacun
+    assert stats["wait_seconds"] == pytest.approx(2.0, rel=0.01)
+    # pop_stats remet les compteurs a zero (Lambda a chaud)
+    assert limiter.pop_stats()["by_operation"] == {}
@@ -0,0 +1,109 @@
+"""
+Tests unitaires de la file de remédiation priorisée (shared/remediation_queue.py).
+
+Vérifie que :
+- La prod passe en dernier ou en premier selon la politique, puis le coût estimé
+- L'ancienneté finit par faire passer une ressource bon marché
+- Une ressource déjà en file n'est pas dupliquée ; une entrée rendue est resservie
+- La file SQS trie sa fenêtre et ne lance qu'une fois les doublons
+"""
+
+import os
+import sys
+import json
+
+import boto3
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.remediation_queue import (  # noqa: E402
+    InMemoryRemediationQueue, SQLiteRemediationQueue, SQSRemediationQueue, estimated_monthly_cost,
+)
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def payload(name, resource_type="ec2", environment="dev", instance_type=""):
+    return {"resource_id": name, "resource_type": resource_type, "resource_arn": f"arn:{name}",
+            "environment": environment, "instance_type": instance_type}
+
+
+FLEET = [
+    payload("bucket", "s3"),
+    payload("small-prod", environment="prod", instance_type="t3.micro"),
+    payload("big-dev", instance_type="m5.large"),
+    payload("db-dev", "rds", instance_type="db.t3.small"),
+]
+
+
+def names(items):
+    return [item.payload["resource_id"] for item in items]
+
+
+def test_ordre_environnement_puis_cout():
+    assert estimated_monthly_cost(FLEET[2]) == 78.11
+    assert estimated_monthly_cost(FLEET[0]) == 0.0
+
+    last = InMemoryRemediationQueue(clock=Clock(), prod_policy="last")
+    last.put_many(FLEET)
+    assert names(last.take(10)) == ["big-dev", "db-dev", "bucket", "small-prod"]
+
+    first = InMemoryRemediationQueue(clock=Clock(), prod_policy="first")
+    first.put_many(FLEET)
+    assert names(first.take(10)) == ["small-prod", "big-dev", "db-dev", "bucket"]
+
+
+def test_anciennete_evite_la_famine(tmp_path):
+    clock = Clock()
+    queue = SQLiteRemediationQueue(str(tmp_path / "queue.db"), clock=clock, age_weight=1)
+    queue.put_many([FLEET[0]])
+    clock.now += 100 * 3600  # 100 h d'attente > 78 $ de coût mensuel
+    queue.put_many([FLEET[2]])
+    assert names(queue.take(2)) == ["bucket", "big-dev"]
+
+
+def test_sqlite_dedoublonne_et_rend_les_entrees(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "queue.db")
+    queue = SQLiteRemediationQueue(path, clock=clock, lease_seconds=300)
+    assert queue.put_many(FLEET) == 4
+
+    clock.now += 3600
+    queue.put_many(FLEET)  # scan suivant : mise à jour, ancienneté conservée
+    assert queue.depth() == 4
+
+    taken = queue.take(2)
+    assert queue.depth() == 2
+    assert all(item.enqueued_at == clock.now - 3600 for item in taken)
+    assert queue.put_many([taken[0].payload]) == 0  # réservée : lancement en cours
+
+    queue.ack(taken[:1])
+    queue.release(taken[1:])
+    # Nouveau conteneur : même fichier
+    assert names(SQLiteRemediationQueue(path, clock=clock).take(10)) == ["db-dev", "bucket", "small-prod"]
+
+
+@mock_aws
+def test_sqs_fenetre_triee_et_doublons():
+    client = boto3.client("sqs", region_name="eu-west-1")
+    url = client.create_queue(QueueName="remediation")["QueueUrl"]
+    queue = SQSRemediationQueue(url, client=client, window=20)
+    assert queue.put_many(FLEET + [FLEET[2]]) == 5
+
+    taken = queue.take(2)
+    assert names(taken) == ["big-dev", "db-dev"]
+    assert len(taken[0].handle) == 2  # doublon rattaché au même lancement
+    assert queue.depth() == 2  # les autres sont rendus visibles tout de suite
+
+    queue.ack(taken)
+    rest = client.receive_message(QueueUrl=url, MaxNumberOfMessages=10)["Messages"]
+    assert sorted(json.loads(m["Body"])["payload"]["resource_id"] for m in rest) == ["bucket", "small-prod"]
@@ -0,0 +1,114 @@
+"""
+Tests unitaires de la lecture des tags S3 par région (shared/s3_tags.py).
+
+Moto n'impose pas la région des buckets : un client de substitution joue le
+rôle de S3 (un par région) et rejette les appels adressés à la mauvaise région.
+
+Vérifie que :
+- La région d'un bucket est résolue une seule fois puis servie par le cache
+- Chaque lecture part sur le client de la région du bucket
+- Un bucket sans tags (NoSuchTagSet) n'est pas confondu avec un accès refusé
+- Une région en cache périmée provoque une seule nouvelle résolution
+"""
+
+import os
+import sys
+
+from botocore.exceptions import ClientError
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.s3_tags import S3TagFetcher  # noqa: E402
+
+BUCKETS = {
+    # nom : (LocationConstraint, tags, code d'erreur GetBucketTagging)
+    "logs-paris": ("eu-west-3", [{"Key": "Owner", "Value": "alice@example.com"}], None),
+    "legacy-virginia": (None, [{"Key": "Squad", "Value": "data"}], None),
+    "empty-ireland": ("EU", None, "NoSuchTagSet"),
+    "locked-ireland": ("EU", None, "AccessDenied"),
+}
+
+
+def client_error(code, operation):
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class RegionalS3:
+    """Client S3 de substitution lié à une région."""
+
+    def __init__(self, region, buckets, calls):
+        self.region = region
+        self.buckets = buckets
+        self.calls = calls
+
+    def get_bucket_location(self, Bucket):
+        self.calls.append(("GetBucketLocation", self.region, Bucket))
+        return {"LocationConstraint": self.buckets[Bucket][0]}
+
+    def get_bucket_tagging(self, Bucket):
+        self.calls.append(("GetBucketTagging", self.region, Bucket))
+        location, tags, error = self.buckets[Bucket]
+        if {None: "us-east-1", "EU": "eu-west-1"}.get(location, location) != self.region:
+            raise client_error("PermanentRedirect", "GetBucketTagging")
+        if error:
+            raise client_error(error, "GetBucketTagging")
+        return {"TagSet": tags}
+
+
+def make_fetcher(buckets=None):
+    buckets = dict(BUCKETS if buckets is None else buckets)
+    calls = []
+    fetcher = S3TagFetcher(default_region="eu-west-1", max_workers=4,
+                           client_factory=lambda region: RegionalS3(region, buckets, calls))
+    return fetcher, buckets, calls
+
+
+def test_region_resolue_une_fois_et_client_par_region():
+    fetcher, _, calls = make_fetcher()
+
+    results = {r.bucket: r for r in fetcher.fetch_many(["logs-paris", "legacy-virginia"])}
+    assert results["logs-paris"].region == "eu-west-3"
+    assert results["logs-paris"].tags["Owner"] == "alice@example.com"
+    assert results["legacy-virginia"].region == "us-east-1"  # LocationConstraint null
+    assert ("GetBucketTagging", "eu-west-3", "logs-paris") in calls
+    assert ("GetBucketTagging", "us-east-1", "legacy-virginia") in calls
+
+    # Invocation suivante (conteneur chaud) : plus aucun GetBucketLocation
+    calls.clear()
+    fetcher.fetch("logs-paris")
+    assert [c[0] for c in calls] == ["GetBucketTagging"]
+    assert fetcher.stats["location_lookups"] == 2 and fetcher.stats["cache_hits"] == 1
+
+
+def test_region_fournie_par_l_appelant():
+    fetcher, _, calls = make_fetcher()
+    assert fetcher.fetch("logs-paris", "eu-west-3").status == "tagged"
+    assert calls == [("GetBucketTagging", "eu-west-3", "logs-paris")]
+
+
+def test_sans_tags_distinct_d_acces_refuse():
+    fetcher, _, _ = make_fetcher()
+
+    empty = fetcher.fetch("empty-ireland")
+    assert empty.status == "no_tag_set" and empty.ok and len(empty.tags) == 0
+
+    locked = fetcher.fetch("locked-ireland")
+    assert locked.status == "error" and not locked.ok
+    assert locked.tags is None and locked.error == "AccessDenied"
+
+
+def test_region_perimee_resolue_a_nouveau():
+    fetcher, buckets, calls = make_fetcher()
+    fetcher.fetch("logs-paris")
+
+    # Bucket supprimé puis recréé dans une autre région
+    buckets["logs-paris"] = ("eu-central-1", [{"Key": "Owner", "Value": "bob@example.com"}], None)
+    calls.clear()
+    fetched = fetcher.fetch("logs-paris")
+
+    assert fetched.region == "eu-central-1" and fetched.tags["Owner"] == "bob@example.com"
+    assert [c[0] for c in calls] == ["GetBucketTagging", "GetBucketLocation", "GetBucketTagging"]
+    assert fetcher.stats["redirect_retries"] == 1
+    assert fetcher.regions["logs-paris"] == "eu-central-1"
@@ -0,0 +1,145 @@
+"""
+Tests unitaires du cache de tags par marqueur de changement (shared/tag_cache.py).
+
+Vérifie que :
+- Un marqueur inchangé évite l'appel de tags, un marqueur modifié le refait
+- Le TTL et le rafraîchissement complet forcent la relecture
+- accept() permet de ne servir que des tags conformes (cleanup)
+- Les stores SQLite et DynamoDB persistent les entrées d'une invocation à l'autre
+"""
+
+import os
+import sys
+
+import boto3
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.tag_cache import (  # noqa: E402
+    DynamoDBTagCacheStore, InMemoryTagCacheStore, SQLiteTagCacheStore, TagCache, lambda_marker,
+)
+from shared.tagset import TagSet  # noqa: E402
+
+ARN = "arn:aws:lambda:eu-west-1:123456789012:function:orders"
+FUNCTION = {"FunctionArn": ARN, "RevisionId": "r-1", "LastModified": "2026-10-01T08:00:00.000+0000"}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Fetcher:
+    def __init__(self, tags):
+        self.tags = tags
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return TagSet(self.tags)
+
+
+def run(cache, fetcher, function=FUNCTION, **kwargs):
+    """Une invocation : chargement, une ressource, écriture."""
+    cache.begin()
+    tags = cache.get_or_fetch(function["FunctionArn"], lambda_marker(function), fetcher, **kwargs)
+    return tags, cache.flush()
+
+
+def test_marqueur_inchange_evite_l_appel():
+    clock, store = Clock(), InMemoryTagCacheStore()
+    cache = TagCache("scanner", store, ttl_seconds=3600, full_refresh_seconds=86400, clock=clock)
+    fetcher = Fetcher({"Owner": "alice@example.com"})
+
+    _, first = run(cache, fetcher)
+    assert first["full_refresh"] is True  # premier passage : rien en cache
+    clock.now += 60
+    tags, second = run(cache, fetcher)
+
+    assert fetcher.calls == 1
+    assert tags["Owner"] == "alice@example.com"
+    assert second == {"hits": 1, "misses": 0, "hit_rate": 100.0, "full_refresh": False}
+
+    # Redéploiement : nouveau RevisionId
+    run(cache, fetcher, {**FUNCTION, "RevisionId": "r-2"})
+    assert fetcher.calls == 2
+
+
+def test_ttl_et_rafraichissement_complet():
+    clock, store = Clock(), InMemoryTagCacheStore()
+    cache = TagCache("scanner", store, ttl_seconds=3600, full_refresh_seconds=86400, clock=clock)
+    fetcher = Fetcher({"Owner": "alice@example.com"})
+    run(cache, fetcher)
+
+    clock.now += 3600  # entrée expirée
+    run(cache, fetcher)
+    assert fetcher.calls == 2
+
+    clock.now += 86400 - 3600  # cadence de rafraîchissement complet atteinte
+    _, stats = run(cache, fetcher)
+    assert stats["full_refresh"] is True and fetcher.calls == 3
+
+    # Le rafraîchissement est suivi par handler : le cleanup a sa propre cadence
+    other = TagCache("cleanup", store, ttl_seconds=3600, full_refresh_seconds=86400, clock=clock)
+    _, stats = run(other, fetcher)
+    assert stats["full_refresh"] is True
+
+
+def test_accept_relit_les_tags_non_conformes():
+    clock, store = Clock(), InMemoryTagCacheStore()
+    cache = TagCache("cleanup", store, ttl_seconds=3600, full_refresh_seconds=0, clock=clock)
+    fetcher = Fetcher({})
+    run(cache, fetcher)
+
+    # Tags vides en cache : refusés par accept(), relus avant une éventuelle suppression
+    fetcher.tags = {"Owner": "alice@example.com"}
+    tags, stats = run(cache, fetcher, accept=lambda cached: "Owner" in cached)
+    assert fetcher.calls == 2 and tags["Owner"] == "alice@example.com"
+    assert stats["misses"] == 1
+
+    _, stats = run(cache, fetcher, accept=lambda cached: "Owner" in cached)
+    assert fetcher.calls == 2 and stats["hits"] == 1
+
+
+def test_cache_desactive():
+    cache = TagCache("scanner", InMemoryTagCacheStore(), ttl_seconds=0)
+    fetcher = Fetcher({"Owner": "alice@example.com"})
+    run(cache, fetcher)
+    run(cache, fetcher)
+    assert fetcher.calls == 2
+
+
+def test_sqlite_persiste_entre_instances(tmp_path):
+    path = str(tmp_path / "tag_cache.db")
+    clock, fetcher = Clock(), Fetcher({"Squad": "data"})
+    run(TagCache("scanner", SQLiteTagCacheStore(path), ttl_seconds=3600, clock=clock), fetcher)
+
+    # Nouveau conteneur : même fichier
+    tags, stats = run(TagCache("scanner", SQLiteTagCacheStore(path), ttl_seconds=3600, clock=clock), fetcher)
+    assert fetcher.calls == 1 and tags["Squad"] == "data" and stats["hits"] == 1
+
+
+@mock_aws
+def test_dynamodb_lots_et_invalidation():
+    client = boto3.client("dynamodb", region_name="eu-west-1")
+    client.create_table(
+        TableName="tag-cache", BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "resource_arn", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "resource_arn", "AttributeType": "S"}],
+    )
+    store = DynamoDBTagCacheStore("tag-cache", client=client, ttl_seconds=3600)
+    entries = {f"{ARN}-{i}": {"marker": "r-1|t", "tags": {"Owner": f"user{i}@example.com"}, "fetched_at": 1000}
+               for i in range(60)}
+    store.save_many(entries)  # 3 lots de 25 au plus
+
+    loaded = store.load()
+    assert loaded == entries
+
+    store.delete(f"{ARN}-0")
+    assert f"{ARN}-0" not in store.load()
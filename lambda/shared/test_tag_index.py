@@ -0,0 +1,133 @@
+"""
+Tests unitaires de l'index inversé des tags (shared/tag_index.py).
+
+Vérifie que :
+- Les requêtes croisent tags, tags manquants et attributs (type, compte)
+- La mise à jour est incrémentale : seules les ressources modifiées comptent,
+  les ressources non revues sont retirées sauf scan interrompu
+- Les postings restent triées ; la sérialisation (deltas + zlib) et le
+  compactage conservent les résultats
+- Le lecteur additionne les segments (store S3) et garde le cache pendant le TTL
+"""
+
+import os
+import sys
+import random
+
+import boto3
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.tag_index import (  # noqa: E402
+    FileTagIndexStore, InMemoryTagIndexStore, S3TagIndexStore, TagIndex, TagIndexReader, TagIndexUpdater,
+)
+
+
+def arn(i):
+    return f"arn:aws:ec2:eu-west-1:111:instance/i-{i:05d}"
+
+
+def fleet(size=200, seed=3):
+    rng = random.Random(seed)
+    resources = {}
+    for i in range(size):
+        tags = {"Squad": rng.choice(["data", "growth", "platform"])}
+        if rng.random() < 0.7:
+            tags["CostCenter"] = f"CC-{rng.randint(1, 3)}"
+        resources[arn(i)] = (tags, [] if "CostCenter" in tags else ["CostCenter"], rng.choice(["111", "222"]))
+    return resources
+
+
+def build(resources):
+    index = TagIndex()
+    for resource_arn, (tags, missing, account) in resources.items():
+        index.upsert(resource_arn, tags, missing, type="ec2", account=account)
+    return index
+
+
+def expected(resources, squad=None, missing=None, account=None):
+    return sorted(a for a, (tags, miss, acc) in resources.items()
+                  if (squad is None or tags.get("Squad") == squad) and (missing is None or missing in miss)
+                  and (account is None or acc == account))
+
+
+def test_requetes_croisees():
+    resources = fleet()
+    index = build(resources)
+
+    assert index.query({"Squad": "data"}) == expected(resources, squad="data")
+    assert index.query(missing=["CostCenter"], account="222") == expected(resources, missing="CostCenter", account="222")
+    assert index.query({"Squad": "growth"}, ["CostCenter"], type="ec2") == expected(resources, "growth", "CostCenter")
+    assert index.query({"Squad": "inconnue"}) == [] and len(index.query()) == 200
+    assert sum(index.values("Squad").values()) == 200
+    assert index.missing_counts() == {"CostCenter": len(expected(resources, missing="CostCenter"))}
+
+
+def test_mise_a_jour_incrementale_et_postings_triees():
+    resources = fleet()
+    store = InMemoryTagIndexStore()
+    updater = TagIndexUpdater(store, clock=lambda: 1_800_000_000)
+    updater.begin("ec2-0-of-1")
+    for resource_arn, (tags, missing, account) in resources.items():
+        updater.add(resource_arn, tags, missing, type="ec2", account=account)
+    assert updater.flush()["changed"] == 200
+
+    # Scan suivant : une ressource retaguée, une disparue, le reste inchangé
+    del resources[arn(7)]
+    resources[arn(3)] = ({"Squad": "data", "CostCenter": "CC-9"}, [], "111")
+    updater.begin("ec2-0-of-1")
+    for resource_arn, (tags, missing, account) in resources.items():
+        updater.add(resource_arn, tags, missing, type="ec2", account=account)
+    stats = updater.flush()
+    assert (stats["changed"], stats["removed"], stats["resources"]) == (1, 1, 199)
+
+    index = TagIndex.from_bytes(store.load("ec2-0-of-1"))
+    assert index.query({"CostCenter": "CC-9"}) == [arn(3)]
+    assert arn(7) not in index and index.query({"Squad": "data"}) == expected(resources, squad="data")
+    assert all(list(p) == sorted(set(p)) for p in index.postings)
+
+    # Scan interrompu : rien n'est retiré
+    updater.begin("ec2-0-of-1")
+    updater.add(arn(0), *resources[arn(0)][:2], type="ec2", account=resources[arn(0)][2])
+    assert updater.flush(complete=False)["removed"] == 0
+    assert len(TagIndex.from_bytes(store.load("ec2-0-of-1"))) == 199
+
+
+def test_compactage_et_serialisation(tmp_path):
+    resources = fleet()
+    index = build(resources)
+    for i in range(0, 200, 2):
+        index.remove(arn(i))
+        del resources[arn(i)]
+    store = FileTagIndexStore(str(tmp_path))
+    store.save("scan", index.to_bytes())  # plus d'un quart de trous : compacté
+
+    loaded = TagIndex.from_bytes(store.load("scan"))
+    assert len(loaded.arns) == len(loaded) == 100
+    assert loaded.query({"Squad": "platform"}, account="111") == expected(resources, "platform", account="111")
+    assert store.segments() == ["scan"] and store.load("absent") is None
+
+
+def test_lecteur_multi_segments_s3():
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="governance")
+        store = S3TagIndexStore("s3://governance/tag-index", client=boto3.client("s3", region_name="us-east-1"))
+        first, second = TagIndex(), TagIndex()
+        first.upsert("arn:aws:s3:::logs", {"Squad": "data"}, ["Owner"], type="s3", account="111")
+        second.upsert("arn:aws:lambda:eu-west-1:111:function:job", {"Squad": "data"}, [], type="lambda", account="111")
+        store.save("s3-0-of-1", first.to_bytes())
+        store.save("lambda-0-of-1", second.to_bytes())
+
+        now = [0.0]
+        reader = TagIndexReader(store, ttl_seconds=60, clock=lambda: now[0])
+        assert reader.query({"Squad": "data"}) == ["arn:aws:lambda:eu-west-1:111:function:job", "arn:aws:s3:::logs"]
+        assert reader.query(missing=["Owner"], resource_type="s3") == ["arn:aws:s3:::logs"]
+
+        assert store.prune(["lambda-0-of-1"]) == ["s3-0-of-1"]
+        assert reader.summary()["resources"] == 2  # cache encore valide
+        now[0] = 61.0
+        assert reader.summary()["resources"] == 1
+        assert reader.values("Squad") == {"data": 1}
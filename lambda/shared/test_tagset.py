@@ -0,0 +1,55 @@
+"""
+Tests unitaires de TagSet (shared/tagset.py) et des helpers de shared/config.py.
+"""
+
+import os
+import sys
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.config import check_tags, get_tag_value  # noqa: E402
+from shared.tagset import TagSet  # noqa: E402
+
+AWS_TAGS = [
+    {"Key": "Owner", "Value": "alice@entreprise.com"},
+    {"Key": "Squad", "Value": "Data"},
+    {"Key": "CostCenter", "Value": "CC-123"},
+]
+
+
+def test_formes_aws_equivalentes():
+    from_list = TagSet(AWS_TAGS)
+    from_dict = TagSet({t["Key"]: t["Value"] for t in AWS_TAGS})
+    from_pairs = TagSet(reversed([(t["Key"], t["Value"]) for t in AWS_TAGS]))
+
+    assert from_list == from_dict == from_pairs
+    assert from_list.fingerprint == from_pairs.fingerprint and len(from_list.fingerprint) == 16
+    assert from_list["Owner"] == "alice@entreprise.com" and from_list.get("Absent") == ""
+    assert TagSet.of(from_list) is from_list
+    assert from_list.to_aws() == AWS_TAGS
+
+
+def test_normalisation_et_immutabilite():
+    tags = TagSet([{"Key": "Owner"}, {"Key": "", "Value": "x"}, {"Value": "sans cle"}, ("Squad", None)])
+    assert tags.to_dict() == {"Owner": "", "Squad": ""}
+    assert TagSet(None) == TagSet([]) == {}
+
+    # Clés internées : une seule chaîne "Owner" partagée entre ressources
+    key = "".join(["Own", "er"])
+    assert next(iter(TagSet({key: "a"}))) is next(iter(TagSet([{"Key": "".join(["Ow", "ner"]), "Value": "b"}])))
+
+    with pytest.raises(TypeError):
+        tags["Owner"] = "bob"
+    assert TagSet({"Owner": "a"}).fingerprint != TagSet({"Owner": "b"}).fingerprint
+    assert len({TagSet(AWS_TAGS), TagSet(list(reversed(AWS_TAGS)))}) == 1
+
+
+@pytest.mark.parametrize("tags", [AWS_TAGS, {t["Key"]: t["Value"] for t in AWS_TAGS}, TagSet(AWS_TAGS)])
+def test_check_tags_toutes_formes(tags):
+    assert check_tags(tags) == (False, ["Environment"])
+    assert get_tag_value(tags, "Squad") == "Data"
+    assert check_tags(None) == (False, ["Owner", "Squad", "CostCenter", "Environment"])
@@ -0,0 +1,92 @@
+"""
+Tests unitaires du store de jetons d'attente (shared/wait_tokens.py).
+
+Verifie que les trois stores (memoire, SQLite, DynamoDB via moto) :
+- Gardent un seul jeton par ressource (J2 remplace J0)
+- Ne suppriment un jeton que s'il n'a pas ete remplace entre-temps
+Le client DynamoDB par defaut passe par le limiteur et la comptabilite des appels.
+"""
+
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.api_accounting import api_budget  # noqa: E402
+from shared.wait_tokens import DynamoDBWaitStore, InMemoryWaitStore, SQLiteWaitStore  # noqa: E402
+
+REGION = "eu-west-1"
+TABLE = "governance-wait-tokens"
+ARN = "arn:aws:ec2:eu-west-1:123456789012:instance/i-123"
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request):
+    if request.param == "memory":
+        yield InMemoryWaitStore()
+    elif request.param == "sqlite":
+        yield SQLiteWaitStore()
+    else:
+        with mock_aws():
+            yield DynamoDBWaitStore(TABLE, client=create_table())
+
+
+def create_table():
+    client = boto3.client("dynamodb", region_name=REGION)
+    client.create_table(
+        TableName=TABLE,
+        KeySchema=[{"AttributeName": "resource_arn", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "resource_arn", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return client
+
+
+def test_un_jeton_par_ressource(store):
+    assert store.get(ARN) is None
+    store.put(ARN, "token-j0", "exec-1", "AwaitTagFixJ0")
+    store.put(ARN, "token-j2", "exec-1", "AwaitTagFixJ2")
+
+    waiter = store.get(ARN)
+    assert waiter["token"] == "token-j2"
+    assert waiter["state_name"] == "AwaitTagFixJ2"
+
+
+def test_suppression_conditionnelle(store):
+    store.put(ARN, "token-j2")
+    # Un reveil tardif sur l'ancien jeton ne doit pas effacer le nouveau
+    store.delete(ARN, "token-j0")
+    assert store.get(ARN)["token"] == "token-j2"
+
+    store.delete(ARN, "token-j2")
+    assert store.get(ARN) is None
+
+
+def test_jeton_expire_ignore():
+    store = InMemoryWaitStore(ttl_seconds=-1)
+    store.put(ARN, "token")
+    assert store.get(ARN) is None
+
+
+@mock_aws
+def test_dynamodb_client_limite_par_defaut():
+    create_table()
+    store = DynamoDBWaitStore(TABLE)
+    with api_budget({}) as used:
+        store.put(ARN, "token-j0")
+        store.get(ARN)
+        store.delete(ARN, "token-j0")
+    assert used == {"dynamodb.PutItem": 1, "dynamodb.GetItem": 1, "dynamodb.DeleteItem": 1}
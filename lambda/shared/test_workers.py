@@ -0,0 +1,103 @@
+"""
+Tests unitaires du pool borne (shared/workers.py).
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+from shared.workers import bounded_map, prefetch  # noqa: E402
+
+
+def test_erreurs_isolees_par_element():
+    def fn(x):
+        if x == 3:
+            raise ValueError("boom")
+        return x * 10
+
+    outcomes = list(bounded_map(fn, range(6), max_workers=3))
+    assert sorted(o.result for o in outcomes if not o.error) == [0, 10, 20, 40, 50]
+    errors = [o for o in outcomes if o.error]
+    assert len(errors) == 1 and errors[0].item == 3
+
+
+def test_source_consommee_au_fil_de_l_eau():
+    """Jamais plus de max_pending elements tires de la source en avance."""
+    pulled = []
+    lock = threading.Lock()
+    in_flight_max = []
+
+    def source():
+        for i in range(50):
+            with lock:
+                pulled.append(i)
+            yield i
+
+    consumed = 0
+
+    def fn(x):
+        time.sleep(0.001)
+        return x
+
+    for _ in bounded_map(fn, source(), max_workers=2, max_pending=4):
+        consumed += 1
+        in_flight_max.append(len(pulled) - consumed)
+
+    assert consumed == 50
+    assert max(in_flight_max) <= 4
+
+
+def test_prefetch_lit_en_avance_dans_la_limite():
+    """La page suivante est lue pendant le traitement, jamais plus de depth pages d'avance."""
+    pulled = []
+
+    def pages():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+
+    seen, ahead = [], []
+    for page in prefetch(pages(), depth=2):
+        time.sleep(0.01)  # traitement de la page
+        seen.append(page)
+        ahead.append(len(pulled) - len(seen))
+
+    assert seen == list(range(10))
+    assert max(ahead) >= 1  # lecture et traitement se chevauchent
+    assert max(ahead) <= 3  # depth en attente + une en cours de lecture
+
+
+def test_prefetch_relance_l_erreur_et_s_arrete_avec_le_consommateur():
+    def failing():
+        yield 1
+        raise RuntimeError("ThrottlingException")
+
+    received = []
+    with pytest.raises(RuntimeError, match="ThrottlingException"):
+        for page in prefetch(failing()):
+            received.append(page)
+    assert received == [1]
+
+    pulled = []
+
+    def endless():
+        i = 0
+        while True:
+            pulled.append(i)
+            yield i
+            i += 1
+
+    pages = prefetch(endless(), depth=2)
+    assert next(pages) == 0
+    pages.close()
+    time.sleep(0.3)
+    stopped_at = len(pulled)
+    time.sleep(0.2)
+    assert len(pulled) == stopped_at <= 5
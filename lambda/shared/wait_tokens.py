@@ -0,0 +1,169 @@
+"""
+Jetons d'attente Step Functions (réveil anticipé sur correction des tags).
+
+Les états AwaitTagFixJ0 / AwaitTagFixJ2 du pipeline sont des tâches
+waitForTaskToken avec un timeout de 48h : le controller enregistre le jeton
+de l'exécution sous l'ARN de la ressource gelée. Quand un événement de
+changement de tags arrive pour cet ARN et que la ressource est conforme,
+le controller relit le jeton et appelle SendTaskSuccess — l'exécution
+reprend en quelques secondes au lieu d'attendre la fin du timer.
+
+Un seul jeton par ressource : l'enregistrement J2 remplace celui de J0.
+
+Stores disponibles (même logique que shared/idempotency.py) :
+- DynamoDBWaitStore  : production (variable WAIT_TOKEN_TABLE)
+- SQLiteWaitStore    : local / tests (variable WAIT_TOKEN_SQLITE_PATH)
+- InMemoryWaitStore  : tests unitaires, ou repli si rien n'est configuré
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+WAIT_TOKEN_TABLE = os.environ.get("WAIT_TOKEN_TABLE", "")
+WAIT_TOKEN_SQLITE_PATH = os.environ.get("WAIT_TOKEN_SQLITE_PATH", "")
+# Attente de 48h + marge : un jeton plus vieux a forcément expiré côté Step Functions
+WAIT_TOKEN_TTL_SECONDS = int(os.environ.get("WAIT_TOKEN_TTL_SECONDS", str(3 * 24 * 3600)))
+
+
+class WaitTokenStore:
+    """Interface commune : un enregistrement {token, execution_id, state_name} par ARN."""
+
+    def put(self, resource_arn: str, token: str, execution_id: str = "", state_name: str = "") -> None:
+        raise NotImplementedError
+
+    def get(self, resource_arn: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, resource_arn: str, token: str) -> None:
+        """Supprime l'enregistrement seulement s'il porte encore ce jeton (pas un plus récent)."""
+        raise NotImplementedError
+
+
+class InMemoryWaitStore(WaitTokenStore):
+    def __init__(self, ttl_seconds: int = WAIT_TOKEN_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, resource_arn, token, execution_id="", state_name=""):
+        with self._lock:
+            self._items[resource_arn] = {
+                "token": token, "execution_id": execution_id, "state_name": state_name,
+                "expires_at": int(time.time()) + self.ttl_seconds,
+            }
+
+    def get(self, resource_arn):
+        with self._lock:
+            item = self._items.get(resource_arn)
+        if not item or item["expires_at"] <= int(time.time()):
+            return None
+        return item
+
+    def delete(self, resource_arn, token):
+        with self._lock:
+            if self._items.get(resource_arn, {}).get("token") == token:
+                del self._items[resource_arn]
+
+
+class SQLiteWaitStore(WaitTokenStore):
+    def __init__(self, path: str = ":memory:", ttl_seconds: int = WAIT_TOKEN_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS wait_tokens ("
+            " resource_arn TEXT PRIMARY KEY, token TEXT NOT NULL, execution_id TEXT,"
+            " state_name TEXT, expires_at INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, resource_arn, token, execution_id="", state_name=""):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO wait_tokens VALUES (?, ?, ?, ?, ?)",
+                (resource_arn, token, execution_id, state_name, int(time.time()) + self.ttl_seconds),
+            )
+            self._conn.commit()
+
+    def get(self, resource_arn):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token, execution_id, state_name, expires_at FROM wait_tokens"
+                " WHERE resource_arn = ? AND expires_at > ?",
+                (resource_arn, int(time.time())),
+            ).fetchone()
+        if not row:
+            return None
+        return {"token": row[0], "execution_id": row[1], "state_name": row[2], "expires_at": row[3]}
+
+    def delete(self, resource_arn, token):
+        with self._lock:
+            self._conn.execute("DELETE FROM wait_tokens WHERE resource_arn = ? AND token = ?", (resource_arn, token))
+            self._conn.commit()
+
+
+class DynamoDBWaitStore(WaitTokenStore):
+    """Table DynamoDB : clé de partition "resource_arn" (S), attribut TTL "expires_at"."""
+
+    def __init__(self, table_name: str, client=None, ttl_seconds: int = WAIT_TOKEN_TTL_SECONDS):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        if client is None:
+            from shared.ratelimit import limited_client
+
+            client = limited_client("dynamodb")
+        self.client = client
+
+    def put(self, resource_arn, token, execution_id="", state_name=""):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "resource_arn": {"S": resource_arn},
+                "token": {"S": token},
+                "execution_id": {"S": execution_id},
+                "state_name": {"S": state_name},
+                "expires_at": {"N": str(int(time.time()) + self.ttl_seconds)},
+            },
+        )
+
+    def get(self, resource_arn):
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={"resource_arn": {"S": resource_arn}},
+            ConsistentRead=True,
+        ).get("Item")
+        if not item or int(item["expires_at"]["N"]) <= int(time.time()):
+            return None
+        return {
+            "token": item["token"]["S"],
+            "execution_id": item.get("execution_id", {}).get("S", ""),
+            "state_name": item.get("state_name", {}).get("S", ""),
+            "expires_at": int(item["expires_at"]["N"]),
+        }
+
+    def delete(self, resource_arn, token):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.delete_item(
+                TableName=self.table_name,
+                Key={"resource_arn": {"S": resource_arn}},
+                ConditionExpression="#t = :token",
+                ExpressionAttributeNames={"#t": "token"},
+                ExpressionAttributeValues={":token": {"S": token}},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+def get_wait_store() -> WaitTokenStore:
+    """Choisit le store selon l'environnement (DynamoDB > SQLite > mémoire)."""
+    if WAIT_TOKEN_TABLE:
+        return DynamoDBWaitStore(WAIT_TOKEN_TABLE)
+    if WAIT_TOKEN_SQLITE_PATH:
+        return SQLiteWaitStore(WAIT_TOKEN_SQLITE_PATH)
+    return InMemoryWaitStore()
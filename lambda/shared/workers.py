@@ -0,0 +1,117 @@
+"""
+Pool de workers borné pour les traitements par ressource.
+
+bounded_map() consomme un itérable au fil de l'eau (ex: un paginator) et ne garde
+jamais plus de max_pending ressources en vol : la mémoire reste constante même
+sur un compte de plusieurs dizaines de milliers de ressources.
+
+Chaque ressource est isolée : une exception est capturée et renvoyée avec
+l'élément au lieu d'interrompre le traitement des autres.
+
+prefetch() lit un itérable (typiquement les pages d'un paginator) dans un thread
+d'arrière-plan, au plus depth éléments d'avance : la page N+1 est demandée
+pendant que la page N est traitée.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+PREFETCH_PAGES = int(os.environ.get("PREFETCH_PAGES", "2"))
+
+
+class Outcome(NamedTuple):
+    item: Any
+    result: Any
+    error: Optional[BaseException]
+
+
+def bounded_map(fn: Callable[[Any], Any], items: Iterable[Any], max_workers: int,
+                max_pending: Optional[int] = None) -> Iterator[Outcome]:
+    """
+    Applique fn à chaque élément avec au plus max_workers threads.
+    Les résultats sont produits dans l'ordre de complétion.
+    """
+    max_workers = max(1, max_workers)
+    max_pending = max_pending or max_workers * 2
+    source = iter(items)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[pool.submit(fn, item)] = item
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield Outcome(item, None if error else future.result(), error)
+
+
+_DONE = object()
+
+
+class _Failure(NamedTuple):
+    error: BaseException
+
+
+def prefetch(items: Iterable[Any], depth: int = PREFETCH_PAGES) -> Iterator[Any]:
+    """
+    Produit les éléments de items dans l'ordre, lus à l'avance par un thread
+    d'arrière-plan (au plus depth éléments en attente). Une exception de la source
+    est relancée côté consommateur, à sa position. depth <= 0 : lecture directe.
+
+    Si le consommateur s'arrête avant la fin, le thread cesse de lire la source
+    (au plus un élément de plus est demandé).
+    """
+    if depth <= 0:
+        yield from items
+        return
+
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(value) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:  # noqa: BLE001 — relancée dans le thread consommateur
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
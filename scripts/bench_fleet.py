@@ -0,0 +1,273 @@
+"""
+Benchmark de montée en charge des handlers sur une flotte synthétique (moto).
+
+Génère une flotte (scripts/synthetic_fleet.py) de taille et de taux de conformité
+configurables, puis exécute tour à tour les handlers scanner, metrics, cleanup
+(DRY_RUN) et controller (check_compliance par lots sur les ressources non
+conformes). Pour chacun : temps d'import (cold start), durée de l'invocation,
+pic mémoire Python (tracemalloc) et appels API AWS par opération.
+
+Les résultats sont écrits en JSON ; --baseline compare à un run précédent et sort
+en erreur si un handler régresse (durée ou mémoire au-delà de --tolerance, ou
+davantage d'appels API) sur une flotte identique.
+
+Le limiteur de débit est relevé (lift_rate_limits) et les sorties des handlers
+sont jetées : on mesure le travail des handlers, pas le rythme des quotas ni
+l'affichage. tracemalloc ralentit l'exécution : --no-memory pour des durées
+plus proches de la production.
+
+Usage :
+    python scripts/bench_fleet.py --ec2 10000 --s3 5000 --lambda 3000 --json results.json
+    python scripts/bench_fleet.py --ec2 10000 --s3 5000 --lambda 3000 --baseline results.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import contextlib
+from collections import Counter
+from datetime import datetime, timezone
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SCRIPTS_DIR)
+LAMBDA_DIR = os.path.join(ROOT, "lambda")
+for path in (os.path.join(LAMBDA_DIR, "cleanup"), LAMBDA_DIR, SCRIPTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import boto3  # noqa: E402
+import botocore  # noqa: E402
+import moto  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from bench_pipeline import BENCH_ENV, LambdaContext, lift_rate_limits, load_handler  # noqa: E402
+from sfn_simulator import count_api_calls  # noqa: E402
+from synthetic_fleet import REGION, generate_fleet, speed_up_moto  # noqa: E402
+
+ACCOUNT_ID = "123456789012"
+HANDLERS = ["scanner", "metrics", "cleanup", "controller"]
+CONTROLLER_BATCH_SIZE = 25
+
+
+def resource_arn(resource_type: str, resource_id: str) -> str:
+    return {
+        "ec2": f"arn:aws:ec2:{REGION}:{ACCOUNT_ID}:instance/{resource_id}",
+        "s3": f"arn:aws:s3:::{resource_id}",
+        "lambda": f"arn:aws:lambda:{REGION}:{ACCOUNT_ID}:function:{resource_id}",
+        "rds": f"arn:aws:rds:{REGION}:{ACCOUNT_ID}:db:{resource_id}",
+    }[resource_type]
+
+
+def setup_environment(pipeline_mode: str):
+    """Ressources d'infrastructure attendues par les handlers (à appeler sous mock_aws)."""
+    topic = boto3.client("sns", region_name=REGION).create_topic(Name="governance")["TopicArn"]
+    sfn = boto3.client("stepfunctions", region_name=REGION)
+    role = f"arn:aws:iam::{ACCOUNT_ID}:role/sfn"
+    definition = json.dumps({"StartAt": "Done", "States": {"Done": {"Type": "Succeed"}}})
+    machines = {
+        name: sfn.create_state_machine(name=name, definition=definition, roleArn=role)["stateMachineArn"]
+        for name in ("governance-pipeline", "governance-pipeline-batch")
+    }
+    os.environ.update({
+        "SNS_TOPIC_ARN": topic,
+        "STATE_MACHINE_ARN": machines["governance-pipeline"],
+        "BATCH_STATE_MACHINE_ARN": machines["governance-pipeline-batch"],
+        "PIPELINE_MODE": pipeline_mode,
+    })
+
+
+def controller_events(fleet) -> list:
+    """Lots check_compliance sur les ressources non conformes (comme le pipeline par lots)."""
+    resources = [
+        {
+            "resource_id": rid,
+            "resource_type": rtype,
+            "resource_arn": resource_arn(rtype, rid),
+            "region": REGION,
+            "missing_tags": [],
+        }
+        for rtype, items in sorted(fleet.resources.items())
+        for rid, compliant in items if not compliant
+    ]
+    return [
+        {"action": "check_compliance", "resources": resources[i:i + CONTROLLER_BATCH_SIZE]}
+        for i in range(0, len(resources), CONTROLLER_BATCH_SIZE)
+    ]
+
+
+def measure(name: str, events: list, track_memory: bool) -> dict:
+    """Importe le handler puis l'invoque sur chaque événement, sorties jetées."""
+    api_calls: Counter = Counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        module = load_handler(name)
+        import_seconds = time.perf_counter() - start
+        lift_rate_limits()
+
+        count_api_calls(api_calls, [module])
+        context = LambdaContext(f"arn:aws:lambda:{REGION}:{ACCOUNT_ID}:function:governance-{name}")
+        if track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        results = [module.lambda_handler(event, context) for event in events]
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+        if track_memory:
+            tracemalloc.stop()
+        if hasattr(module, "metrics") and hasattr(module.metrics, "clear_metrics"):
+            module.metrics.clear_metrics()
+
+    return {
+        "invocations": len(events),
+        "import_seconds": round(import_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "peak_memory_mb": round(peak / 2 ** 20, 2) if peak is not None else None,
+        "api_calls_total": sum(api_calls.values()),
+        "api_calls": dict(sorted(api_calls.items())),
+        "result": summarize_result(name, results),
+    }
+
+
+def summarize_result(name: str, results: list):
+    """Extrait compact du retour du handler (pour vérifier que le run a bien tout vu)."""
+    if name == "controller":
+        return {
+            "items": sum(len(r["items"]) for r in results),
+            "compliant": sum(1 for r in results for item in r["items"] if item["compliance"]["compliant"]),
+            "failed": sum(len(r["failed"]) for r in results),
+        }
+    result = results[0]
+    if name == "cleanup":
+        body = json.loads(result["body"])
+        return {k: v for k, v in body.items() if k.endswith(("_scanned", "_non_compliant")) or k == "errors"}
+    if name == "metrics":
+        body = json.loads(result["body"]) if isinstance(result, dict) and "body" in result else result
+        return body.get("tag_compliance", body) if isinstance(body, dict) else body
+    return result
+
+
+def run_suite(ec2: int = 0, s3: int = 0, lambda_functions: int = 0, rds: int = 0,
+              compliance_ratio: float = 0.7, seed: int = 42, handlers=None,
+              pipeline_mode: str = "per_resource", track_memory: bool = True) -> dict:
+    """Crée la flotte dans un mock_aws neuf et mesure chaque handler. Renvoie le document JSON."""
+    os.environ.update(BENCH_ENV)
+    os.environ.update({"GRACE_PERIOD_HOURS": "0", "AWS_LAMBDA_FUNCTION_NAME": "governance-bench"})
+    fleet_params = {
+        "ec2": ec2, "s3": s3, "lambda": lambda_functions, "rds": rds,
+        "compliance_ratio": compliance_ratio, "seed": seed, "pipeline_mode": pipeline_mode,
+    }
+    document = {"meta": environment_meta(fleet_params), "handlers": {}}
+
+    with mock_aws():
+        setup_environment(pipeline_mode)
+        start = time.perf_counter()
+        fleet = generate_fleet(ec2, s3, lambda_functions, rds, compliance_ratio, seed)
+        document["meta"]["fleet_seconds"] = round(time.perf_counter() - start, 2)
+        document["meta"]["fleet"] = fleet.to_dict()
+
+        for name in handlers or HANDLERS:
+            events = controller_events(fleet) if name == "controller" else [{}]
+            document["handlers"][name] = measure(name, events, track_memory)
+    return document
+
+
+def environment_meta(fleet_params: dict) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "boto3": boto3.__version__,
+        "botocore": botocore.__version__,
+        "moto": moto.__version__,
+        "params": fleet_params,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    """
+    Liste des régressions par rapport à un run de référence sur la même flotte.
+    Durée et mémoire : au-delà de (1 + tolerance) × référence. Appels API : toute hausse.
+    """
+    if current["meta"]["params"] != baseline["meta"]["params"]:
+        raise ValueError("Flottes différentes : comparaison impossible "
+                         f"({current['meta']['params']} != {baseline['meta']['params']})")
+    regressions = []
+    for name, cur in current["handlers"].items():
+        base = baseline["handlers"].get(name)
+        if not base:
+            continue
+        for metric in ("wall_seconds", "peak_memory_mb"):
+            if cur.get(metric) is not None and base.get(metric) and cur[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric} : {base[metric]} → {cur[metric]}")
+        if cur["api_calls_total"] > base["api_calls_total"]:
+            regressions.append(f"{name}.api_calls_total : {base['api_calls_total']} → {cur['api_calls_total']}")
+    return regressions
+
+
+def print_report(document: dict, baseline: dict = None):
+    meta = document["meta"]
+    print(f"Flotte : {meta['fleet']} (creee en {meta['fleet_seconds']} s)")
+    print(f"{'handler':<12} {'import s':>9} {'duree s':>9} {'pic Mo':>8} {'appels API':>11}  {'ref. duree':>10}")
+    for name, stats in document["handlers"].items():
+        ref = (baseline or {}).get("handlers", {}).get(name, {}).get("wall_seconds", "")
+        memory = "-" if stats["peak_memory_mb"] is None else f"{stats['peak_memory_mb']:.1f}"
+        print(f"{name:<12} {stats['import_seconds']:>9.2f} {stats['wall_seconds']:>9.2f} {memory:>8} "
+              f"{stats['api_calls_total']:>11}  {ref:>10}")
+        for op, n in Counter(stats["api_calls"]).most_common(4):
+            print(f"    {op:<44} {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ec2", type=int, default=10_000)
+    parser.add_argument("--s3", type=int, default=5_000)
+    parser.add_argument("--lambda", dest="lambda_functions", type=int, default=3_000)
+    parser.add_argument("--rds", type=int, default=0)
+    parser.add_argument("--compliance-ratio", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--handlers", default=",".join(HANDLERS), help="Liste separee par des virgules")
+    parser.add_argument("--pipeline-mode", choices=["per_resource", "batch"], default="per_resource")
+    parser.add_argument("--no-memory", action="store_true", help="Sans tracemalloc (durees plus fideles)")
+    parser.add_argument("--json", help="Ecrit les resultats dans ce fichier")
+    parser.add_argument("--baseline", help="Resultats d'un run precedent a comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    speed_up_moto()
+    document = run_suite(
+        args.ec2, args.s3, args.lambda_functions, args.rds, args.compliance_ratio, args.seed,
+        handlers=[h for h in args.handlers.split(",") if h], pipeline_mode=args.pipeline_mode,
+        track_memory=not args.no_memory,
+    )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(document, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Resultats ecrits dans {args.json}")
+
+    if baseline:
+        regressions = compare(document, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Benchmark de bout en bout du pipeline d'escalade, sans AWS.
+
+Les definitions ASL de terraform/modules/step-function sont executees par le
+simulateur en process (scripts/sfn_simulator.py), qui invoque les vrais handlers
+controller et executor contre moto. Une flotte de N ressources non conformes
+(instances EC2 et buckets S3) est creee ; une fraction des owners corrige ses tags
+apres --fix-after-hours, ce qui declenche un evenement aws.tag vers le controller.
+
+Rapporte, par mode (per_resource / batch) :
+- duree virtuelle des executions (Wait et timeouts de 48h ne coutent rien en temps reel)
+- latence reelle par etat (temps passe dans les handlers)
+- nombre d'invocations Lambda et de transitions d'etat
+- nombre d'appels API AWS par operation
+
+Le limiteur de debit des handlers est releve (lift_rate_limits) : on mesure le
+travail des handlers, pas le rythme impose par les quotas.
+
+Usage :
+    python scripts/bench_pipeline.py                          # 200 ressources, deux modes
+    python scripts/bench_pipeline.py --resources 1000 --mode batch --json out.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(ROOT, "lambda")
+ASL_DIR = os.path.join(ROOT, "terraform", "modules", "step-function")
+sys.path.insert(0, LAMBDA_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from sfn_simulator import Simulator, count_api_calls, load_definition  # noqa: E402
+
+REGION = "eu-west-1"
+CONTROLLER_ARN = "arn:aws:lambda:eu-west-1:123456789012:function:governance-controller"
+EXECUTOR_ARN = "arn:aws:lambda:eu-west-1:123456789012:function:governance-executor"
+
+BENCH_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": REGION,
+    "AWS_REGION": REGION,
+    "ADMIN_EMAIL": "admin@entreprise.com",
+    "DRY_RUN": "true",
+    "POWERTOOLS_TRACE_DISABLED": "1",
+    "POWERTOOLS_METRICS_DISABLED": "1",
+    "POWERTOOLS_LOG_LEVEL": "ERROR",
+}
+
+COMPLIANT_TAGS = {
+    "Owner": "owner@entreprise.com",
+    "Squad": "Data",
+    "CostCenter": "CC-123",
+    "Environment": "dev",
+}
+
+
+class LambdaContext:
+    """Contexte minimal attendu par inject_lambda_context de powertools."""
+
+    def __init__(self, function_arn: str):
+        self.function_name = function_arn.rsplit(":", 1)[-1]
+        self.function_version = "$LATEST"
+        self.invoked_function_arn = function_arn
+        self.memory_limit_in_mb = 256
+        self.aws_request_id = "sim"
+        self.log_group_name = f"/aws/lambda/{self.function_name}"
+        self.log_stream_name = "sim"
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 300_000
+
+
+def lift_rate_limits():
+    """
+    Quotas du limiteur partagé portés à 100k req/s. Le limiteur est un singleton créé à
+    l'import de shared.ratelimit : API_RATE_LIMITS n'a plus d'effet s'il est déjà importé.
+    """
+    from shared.ratelimit import DEFAULT_QUOTAS, rate_limiter
+
+    rate_limiter.configure({service: 100_000 for service in DEFAULT_QUOTAS})
+
+
+def load_handler(name: str):
+    """Charge un handler sous un nom unique (plusieurs Lambdas ont un handler.py)."""
+    spec = importlib.util.spec_from_file_location(f"{name}_handler", os.path.join(LAMBDA_DIR, name, "handler.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_fleet(size: int) -> list:
+    """Moitie EC2, moitie S3, toutes sans tags (payload au format build_payload du scanner)."""
+    ec2 = boto3.client("ec2", region_name=REGION)
+    s3 = boto3.client("s3", region_name=REGION)
+    resources = []
+
+    instances = ec2.run_instances(ImageId="ami-12345678", MinCount=size // 2, MaxCount=size // 2)["Instances"] if size // 2 else []
+    for instance in instances:
+        resources.append({
+            "resource_id": instance["InstanceId"],
+            "resource_type": "ec2",
+            "resource_arn": f"arn:aws:ec2:{REGION}:123456789012:instance/{instance['InstanceId']}",
+        })
+    for i in range(size - len(instances)):
+        name = f"bench-pipeline-{i:06d}"
+        s3.create_bucket(Bucket=name, CreateBucketConfiguration={"LocationConstraint": REGION})
+        resources.append({"resource_id": name, "resource_type": "s3", "resource_arn": f"arn:aws:s3:::{name}"})
+
+    for resource in resources:
+        resource.update({
+            "owner": None,
+            "squad": None,
+            "missing_tags": sorted(COMPLIANT_TAGS),
+            "account_id": "123456789012",
+            "region": REGION,
+        })
+    return resources
+
+
+def fix_tags(resource: dict):
+    """L'owner ajoute les tags manquants (appel direct à moto, hors comptage)."""
+    if resource["resource_type"] == "ec2":
+        boto3.client("ec2", region_name=REGION).create_tags(
+            Resources=[resource["resource_id"]],
+            Tags=[{"Key": k, "Value": v} for k, v in COMPLIANT_TAGS.items()],
+        )
+    else:
+        boto3.client("s3", region_name=REGION).put_bucket_tagging(
+            Bucket=resource["resource_id"],
+            Tagging={"TagSet": [{"Key": k, "Value": v} for k, v in COMPLIANT_TAGS.items()]},
+        )
+
+
+def tag_change_event(resource: dict) -> dict:
+    return {
+        "source": "aws.tag",
+        "detail-type": "Tag Change on Resource",
+        "account": "123456789012",
+        "region": REGION,
+        "resources": [resource["resource_arn"]],
+        "detail": {"service": resource["resource_type"], "tags": dict(COMPLIANT_TAGS)},
+    }
+
+
+def simulate(mode: str, resources: list, fixed_ratio: float = 0.3, fix_after_hours: float = 6.0,
+             batch_size: int = 25, max_concurrency: int = 10, execution_size: int = 400) -> dict:
+    """
+    Exécute le pipeline sur la flotte (à appeler sous mock_aws, flotte déjà créée).
+    Renvoie le résumé du simulateur enrichi des paramètres et du temps réel total.
+    """
+    controller = load_handler("controller")
+    executor = load_handler("executor")
+    lift_rate_limits()
+    contexts = {CONTROLLER_ARN: LambdaContext(CONTROLLER_ARN), EXECUTOR_ARN: LambdaContext(EXECUTOR_ARN)}
+
+    asl = "state_machine.asl.json" if mode == "per_resource" else "state_machine_batch.asl.json"
+    definition = load_definition(
+        os.path.join(ASL_DIR, asl),
+        controller_lambda_arn=CONTROLLER_ARN,
+        executor_lambda_arn=EXECUTOR_ARN,
+    )
+
+    def invoker(module, arn):
+        def invoke(payload):
+            try:
+                return module.lambda_handler(payload, contexts[arn])
+            finally:
+                # Métriques désactivées : powertools ne vide plus son tampon au flush
+                module.metrics.clear_metrics()
+        return invoke
+
+    sim = Simulator(definition, {
+        CONTROLLER_ARN: invoker(controller, CONTROLLER_ARN),
+        EXECUTOR_ARN: invoker(executor, EXECUTOR_ARN),
+    }, state_machine=f"governance-{mode}")
+    controller.sfn = sim  # SendTaskSuccess → simulateur
+    count_api_calls(sim.api_calls, [controller, executor])
+
+    fixed = resources[: int(len(resources) * fixed_ratio)]
+    for resource in fixed:
+        def owner_fixes(resource=resource):
+            fix_tags(resource)
+            sim.invoke(CONTROLLER_ARN, tag_change_event(resource))
+        sim.schedule(fix_after_hours * 3600, owner_fixes)
+
+    start = time.perf_counter()
+    if mode == "per_resource":
+        for resource in resources:
+            sim.start_execution(resource)
+    else:
+        for i in range(0, len(resources), execution_size):
+            sim.start_execution({
+                "resources": resources[i:i + execution_size],
+                "batch_size": batch_size,
+                "max_concurrency": max_concurrency,
+            })
+    sim.run()
+    wall = time.perf_counter() - start
+
+    summary = sim.summary()
+    summary.update({
+        "mode": mode,
+        "resources": len(resources),
+        "fixed_by_owner": len(fixed),
+        "wall_seconds": round(wall, 2),
+        "invocations_total": sum(summary["invocations"].values()),
+        "invocations": {arn.rsplit(":", 1)[-1]: n for arn, n in summary["invocations"].items()},
+    })
+    return summary
+
+
+def print_summary(summary: dict):
+    hours = {k: (v / 3600 if v is not None else None) for k, v in summary["virtual_duration_seconds"].items()}
+    print(f"\n=== {summary['mode']} : {summary['resources']} ressources, "
+          f"{summary['fixed_by_owner']} corrigees par leur owner ===")
+    print(f"  Executions        : {summary['executions']} (+{summary['child_executions']} enfants) {summary['status']}")
+    print(f"  Duree virtuelle   : min {hours['min']:.1f} h, p50 {hours['p50']:.1f} h, p90 {hours['p90']:.1f} h, max {hours['max']:.1f} h")
+    print(f"  Temps reel        : {summary['wall_seconds']} s, {summary['state_transitions']} transitions")
+    print(f"  Invocations       : {summary['invocations_total']} {summary['invocations']}")
+    print(f"  Reveils anticipes : {summary['early_wakeups']}")
+    print(f"  Appels API        : {summary['api_calls_total']}")
+    for op, n in Counter(summary["api_calls"]).most_common():
+        print(f"    {op:<40} {n}")
+    print("  Etats (entrees, ms reelles cumulees / max) :")
+    for name, stats in summary["states"].items():
+        print(f"    {name:<28} {stats['entries']:>6} {stats['wall_ms_total']:>10.1f} {stats['wall_ms_max']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--resources", type=int, default=200)
+    parser.add_argument("--mode", choices=["per_resource", "batch", "both"], default="both")
+    parser.add_argument("--fixed-ratio", type=float, default=0.3, help="Part des owners qui corrigent leurs tags")
+    parser.add_argument("--fix-after-hours", type=float, default=6.0)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--execution-size", type=int, default=400)
+    parser.add_argument("--json", help="Ecrit les resultats dans ce fichier")
+    args = parser.parse_args()
+
+    os.environ.update(BENCH_ENV)
+    results = []
+    for mode in (["per_resource", "batch"] if args.mode == "both" else [args.mode]):
+        with mock_aws():
+            topic = boto3.client("sns", region_name=REGION).create_topic(Name="governance")["TopicArn"]
+            os.environ["SNS_TOPIC_ARN"] = topic
+            resources = create_fleet(args.resources)
+            summary = simulate(mode, resources, args.fixed_ratio, args.fix_after_hours,
+                               args.batch_size, execution_size=args.execution_size)
+        print_summary(summary)
+        results.append(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultats ecrits dans {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark : purge d'un bucket versionne contre moto.
+
+Compare l'ancienne boucle sequentielle (list_object_versions + delete_objects page
+par page) au moteur de purge parallele de lambda/cleanup/s3_purge.py.
+
+moto ne simule pas le reseau : une latence (--latency-ms, injectee sur chaque appel
+via l'evenement botocore before-send) rapproche le benchmark du comportement reel
+de S3, ou c'est l'attente reseau qui domine. Le temps CPU de moto (serialisation XML
+d'environ 0,3 s par page de 1000 versions) reste, lui, incompressible : l'acceleration
+mesuree ici est un minorant de celle obtenue contre S3.
+Le backend moto n'etant pas thread-safe, le traitement des requetes est serialise
+(la latence simulee, elle, s'ecoule en parallele). moto copie en profondeur toutes
+les versions du bucket a chaque list_object_versions : le benchmark remplace cette
+copie par une copie superficielle, sans quoi c'est moto qui est mesure.
+
+Usage :
+    python scripts/bench_s3_purge.py                       # 100k versions, 100 ms/appel
+    python scripts/bench_s3_purge.py --versions 20000 --latency-ms 0
+"""
+
+import os
+import sys
+import time
+import copy
+import argparse
+import threading
+from types import SimpleNamespace
+
+import boto3
+from moto import mock_aws
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.core.botocore_stubber import BotocoreStubber
+from moto.s3 import models as s3_models
+from moto.s3.models import s3_backends
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+sys.path.insert(0, os.path.join(ROOT, "lambda", "cleanup"))
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("API_RATE_LIMITS", '{"s3": 100000}')
+
+import s3_purge  # noqa: E402
+
+REGION = "eu-west-1"
+
+
+def populate(s3, bucket: str, versions: int, prefixes: int):
+    """Remplit le bucket directement via le backend moto (bien plus rapide que put_object)."""
+    s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_versioning(Bucket=bucket, VersioningConfiguration={"Status": "Enabled"})
+    backend = s3_backends[DEFAULT_ACCOUNT_ID]["aws"]
+    keys = versions // 2
+    for i in range(keys):
+        key = f"team-{i % prefixes:03d}/2026/{i % 12:02d}/object-{i:07d}.json"
+        backend.put_object(bucket, key, b"v1")
+        backend.put_object(bucket, key, b"v2")
+
+
+def serialize_moto():
+    lock = threading.Lock()
+    process_request = BotocoreStubber.process_request
+
+    def locked(self, request):
+        with lock:
+            return process_request(self, request)
+
+    BotocoreStubber.process_request = locked
+    s3_models.copy = SimpleNamespace(deepcopy=copy.copy, copy=copy.copy)
+
+
+def add_latency(client, latency_ms: float):
+    if latency_ms <= 0:
+        return
+
+    def sleep_before_send(**kwargs):
+        time.sleep(latency_ms / 1000)
+
+    client.meta.events.register("before-send.s3.*", sleep_before_send)
+
+
+def legacy_purge(s3, bucket: str) -> int:
+    """
+    Ancienne implementation (delete_all_objects_in_bucket) : une page apres l'autre.
+    moto arrete la pagination quand le marqueur vient d'etre supprime : on relance
+    le parcours jusqu'a ce que le bucket soit vide, comme le ferait S3.
+    """
+    deleted = -1
+    total = 0
+    while deleted:
+        deleted = 0
+        paginator = s3.get_paginator("list_object_versions")
+        for page in paginator.paginate(Bucket=bucket):
+            objs = [
+                {"Key": v["Key"], "VersionId": v["VersionId"]}
+                for v in page.get("Versions", []) + page.get("DeleteMarkers", [])
+            ]
+            if objs:
+                s3.delete_objects(Bucket=bucket, Delete={"Objects": objs})
+                deleted += len(objs)
+        total += deleted
+    return total
+
+
+def run(name: str, fn, s3, args) -> float:
+    bucket = f"bench-{name}"
+    print(f"  Remplissage de {bucket} ({args.versions} versions)...")
+    populate(s3, bucket, args.versions, args.prefixes)
+    start = time.perf_counter()
+    deleted = fn(s3, bucket)
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<10} : {deleted} versions supprimees en {elapsed:.1f}s ({deleted / elapsed:,.0f} versions/s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--versions", type=int, default=100_000)
+    parser.add_argument("--prefixes", type=int, default=64, help="Nombre de prefixes de premier niveau")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--list-workers", type=int, default=s3_purge.PURGE_LIST_WORKERS)
+    parser.add_argument("--delete-workers", type=int, default=s3_purge.PURGE_DELETE_WORKERS)
+    parser.add_argument("--shard-depth", type=int, default=s3_purge.PURGE_SHARD_DEPTH)
+    args = parser.parse_args()
+
+    def engine(s3, bucket):
+        result = s3_purge.purge_bucket(
+            s3, bucket, store=s3_purge.InMemoryCheckpointStore(),
+            cloudwatch_client=boto3.client("cloudwatch", region_name=REGION),
+            list_workers=args.list_workers, delete_workers=args.delete_workers,
+            shard_depth=args.shard_depth,
+        )
+        assert result["status"] == "complete", result
+        return result["deleted"]
+
+    serialize_moto()
+    with mock_aws():
+        s3 = boto3.client("s3", region_name=REGION)
+        add_latency(s3, args.latency_ms)
+        print(f"Benchmark purge S3 (moto, latence simulee {args.latency_ms} ms/appel)")
+        print("-" * 60)
+        legacy = run("legacy", legacy_purge, s3, args)
+        parallel = run("parallel", engine, s3, args)
+        print("-" * 60)
+        print(f"Acceleration : x{legacy / parallel:.1f}")
+
+
+if __name__ == "__main__":
+    main()
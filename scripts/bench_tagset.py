@@ -0,0 +1,127 @@
+"""
+Micro-benchmark : tags en listes [{"Key", "Value"}] contre TagSet (shared/tagset.py).
+
+Pour N ressources (100k par defaut), simule le travail des handlers sur des tags
+tels que les renvoie botocore (chaque reponse contient ses propres chaines) :
+
+- legacy : conversion dict -> liste pour Lambda, check_tags par appartenance a une
+  liste, get_tag_value par parcours lineaire (Owner, Squad, Name)
+- tagset : construction du TagSet, check, trois lookups O(1)
+- empreinte : calcul de l'empreinte des TagSet deja construits (a la demande)
+
+Mesure la duree de chaque passe et la memoire retenue par les N jeux de tags
+(tracemalloc) : l'internement des cles partage "Owner", "Squad"... entre ressources.
+
+Usage :
+    python scripts/bench_tagset.py
+    python scripts/bench_tagset.py --resources 200000 --extra-tags 10
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+
+from shared.policy import get_policy  # noqa: E402
+from shared.tagset import TagSet  # noqa: E402
+
+LOOKUPS = ("Owner", "Squad", "Name")
+
+
+def fresh(text: str) -> str:
+    # Nouvelle chaine a chaque appel, comme apres le parsing d'une reponse AWS
+    return "".join(list(text))
+
+
+def generate(resources: int, extra_tags: int, seed: int = 42) -> list:
+    """Reponses simulees : 3/4 en liste (EC2/RDS/S3), 1/4 en dict (Lambda)."""
+    rng = random.Random(seed)
+    required = list(get_policy().required)
+    keys = required + ["Name"] + [f"Extra{i}" for i in range(extra_tags)]
+    responses = []
+    for i in range(resources):
+        present = [k for k in keys if k not in required or rng.random() < 0.9]
+        tags = {fresh(k): fresh(f"{k}-{i % 97}") for k in present}
+        if i % 4 == 3:
+            responses.append(tags)
+        else:
+            responses.append([{"Key": k, "Value": v} for k, v in tags.items()])
+    return responses
+
+
+def legacy_pass(responses: list) -> list:
+    required = list(get_policy().required)
+    kept = []
+    for resp in responses:
+        tags = [{"Key": k, "Value": v} for k, v in resp.items()] if isinstance(resp, dict) else resp
+        keys = [t.get("Key") for t in tags]
+        missing = [t for t in required if t not in keys]
+        for key in LOOKUPS:
+            next((t.get("Value", "") for t in tags if t.get("Key") == key), "")
+        kept.append((tags, missing))
+    return kept
+
+
+def tagset_pass(responses: list) -> list:
+    required = list(get_policy().required)
+    kept = []
+    for resp in responses:
+        tags = TagSet(resp)
+        _, missing = tags.check(required)
+        for key in LOOKUPS:
+            tags.get(key)
+        kept.append((tags, missing))
+    return kept
+
+
+def fingerprint_pass(tagsets: list) -> list:
+    return [tags.fingerprint for tags in tagsets]
+
+
+def measure(name: str, fn, responses: list, extra_tags: int, repeat: int) -> dict:
+    best = min(_timed(fn, responses) for _ in range(repeat))
+    # Memoire retenue : les reponses brutes sont liberees, seuls les resultats restent
+    copies = generate(len(responses), extra_tags)
+    tracemalloc.start()
+    kept = fn(copies)
+    del copies
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(f"{name:<10} {best:>7.3f} s   {best / len(responses) * 1e6:>7.2f} us/ressource   {retained / 1024 / 1024:>8.1f} Mo")
+    return {"seconds": best, "retained_mb": retained / 1024 / 1024}
+
+
+def _timed(fn, responses) -> float:
+    started = time.perf_counter()
+    fn(responses)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--resources", type=int, default=100_000)
+    parser.add_argument("--extra-tags", type=int, default=4, help="Tags non obligatoires par ressource")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    responses = generate(args.resources, args.extra_tags)
+    print(f"Benchmark tags : {args.resources} ressources, {len(get_policy().required) + 1 + args.extra_tags} tags max")
+    print("-" * 70)
+    legacy = measure("legacy", legacy_pass, responses, args.extra_tags, args.repeat)
+    tagset = measure("tagset", tagset_pass, responses, args.extra_tags, args.repeat)
+    # TagSet neufs a chaque passe : l'empreinte est mise en cache apres le premier calcul
+    fingerprint = min(_timed(fingerprint_pass, [TagSet(resp) for resp in responses]) for _ in range(args.repeat))
+    print(f"{'empreinte':<10} {fingerprint:>7.3f} s   {fingerprint / len(responses) * 1e6:>7.2f} us/ressource")
+    print("-" * 70)
+    print(f"Acceleration : x{legacy['seconds'] / tagset['seconds']:.1f}, "
+          f"memoire retenue : {tagset['retained_mb'] / legacy['retained_mb']:.0%} de legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Dépense des ressources non conformes : jointure d'un instantané d'inventaire
+(shared/inventory_export.py) avec les fichiers Parquet du Cost and Usage Report.
+
+Même calcul que la Lambda metrics avec CUR_URI (shared/cost_attribution.py), sur
+des fichiers locaux ou S3, pour une période passée ou une analyse ponctuelle.
+Le CUR est lu colonne par colonne et par lots : une partition de plusieurs Go
+ne tient jamais entière en mémoire.
+
+Prérequis : pip install "pyarrow>=14".
+
+Usage :
+    python scripts/cost_attribution.py --inventory ./inventory --cur ./cur/BILLING_PERIOD=2026-09
+    python scripts/cost_attribution.py --inventory ./inventory --source metrics \\
+        --cur s3://cur-exports/gouvernance/data/BILLING_PERIOD=2026-09/ --json depense.json
+"""
+
+import os
+import sys
+import json
+import argparse
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SCRIPTS_DIR)
+for path in (os.path.join(ROOT, "lambda"), SCRIPTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from inventory_query import query  # noqa: E402
+from shared.cost_attribution import CUR_COST_COLUMN, attribute_costs  # noqa: E402
+
+INVENTORY_COLUMNS = ["id", "arn", "type", "compliant", "missing_tags"]
+
+
+def load_inventory(paths, source: str):
+    """Ressources du dernier instantané de la source."""
+    table = query(paths, where={"source": source}, latest=True)
+    return table.select(INVENTORY_COLUMNS).to_pylist()
+
+
+def print_report(data, out=None):
+    out = out or sys.stdout
+    print(f"💰 {data['files']} fichiers CUR, {data['rows']:,} lignes, {data['resources']} ressources inventoriées",
+          file=out)
+    print(f"   Total facturé        : {data['total_cost']:>12,.2f} $", file=out)
+    print(f"   Attribué             : {data['attributed_cost']:>12,.2f} $", file=out)
+    print(f"   ❌ Non conforme      : {data['non_compliant_cost']:>12,.2f} $", file=out)
+    print(f"   Hors inventaire      : {data['unmatched_cost']:>12,.2f} $", file=out)
+    print(f"   Sans ressource       : {data['no_resource_id_cost']:>12,.2f} $", file=out)
+    if data["by_account_type"]:
+        print("\nNon conforme par compte / type :", file=out)
+        for item in data["by_account_type"]:
+            print(f"   {item['account'] or '?':<14} {item['type']:<8} {item['cost']:>12,.2f} $"
+                  f"  ({item['resources']} ressources)", file=out)
+    if data["by_missing_tag"]:
+        print("\nPar tag manquant (une ressource compte pour chacun de ses tags manquants) :", file=out)
+        for tag, cost in data["by_missing_tag"].items():
+            print(f"   {tag:<20} {cost:>12,.2f} $", file=out)
+    if data["top_non_compliant"]:
+        print("\nRessources non conformes les plus chères :", file=out)
+        for item in data["top_non_compliant"]:
+            print(f"   {item['cost']:>10,.2f} $  {item['type']:<7} {item['id']}  "
+                  f"manque : {', '.join(item['missing_tags']) or '-'}", file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--inventory", nargs="+", required=True, help="Instantanés Parquet (fichiers ou répertoires)")
+    parser.add_argument("--source", default="scanner", help="Source de l'instantané : scanner ou metrics")
+    parser.add_argument("--cur", required=True, help="Répertoire local ou préfixe s3:// des fichiers CUR")
+    parser.add_argument("--cost-column", default=CUR_COST_COLUMN, help="Colonne de coût du CUR")
+    parser.add_argument("--top", type=int, default=20, help="Ressources non conformes listées")
+    parser.add_argument("--json", help="Rapport complet en JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    resources = load_inventory(args.inventory, args.source)
+    data = attribute_costs(resources, args.cur, cost_column=args.cost_column, top=args.top)
+    print_report(data)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
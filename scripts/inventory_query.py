@@ -0,0 +1,182 @@
+"""
+Requêtes sur l'historique des instantanés d'inventaire (shared/inventory_export.py).
+
+Les fichiers Parquet écrits par le scanner et par metrics (INVENTORY_EXPORT_URI)
+sont lus en mémoire mappée, seules les colonnes utiles à la requête sont
+chargées, puis filtrés et agrégés avec pyarrow.compute.
+
+Parquet est compressé : le mapping évite une copie de lecture mais chaque
+requête décompresse. Avec --cache-dir, chaque instantané est converti une fois en
+Arrow IPC non compressé ; les requêtes suivantes mappent ces fichiers sans copie
+ni décodage (le système ne charge que les pages des colonnes lues), ce qui rend
+les agrégations sur des centaines d'instantanés quasi instantanées.
+
+Les colonnes "tag.<clé>" varient d'un instantané à l'autre : les tables sont
+unifiées, une clé absente d'un fichier y vaut null.
+
+Prérequis : pip install "pyarrow>=14". Les fichiers S3 sont d'abord synchronisés
+localement (aws s3 sync s3://bucket/prefix ./inventory).
+
+Usage :
+    python scripts/inventory_query.py ./inventory --where compliant=false --group-by type account
+    python scripts/inventory_query.py ./inventory --missing Owner --group-by snapshot_at --cache-dir ~/.cache/inventory
+    python scripts/inventory_query.py ./inventory --where source=metrics --latest --group-by tag.Squad --csv squads.csv
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+TAG_COLUMN_PREFIX = "tag."
+
+
+def snapshot_files(paths: Sequence[str]) -> List[str]:
+    """Fichiers .parquet des chemins donnés (répertoires parcourus récursivement), triés."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in names if name.endswith(".parquet")]
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def _cached_ipc(path: str, cache_dir: str) -> str:
+    """Copie Arrow IPC non compressée d'un instantané, créée à la première lecture."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stat = os.stat(path)
+    digest = hashlib.blake2b(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode(),
+                             digest_size=12).hexdigest()
+    target = os.path.join(cache_dir, f"{digest}.arrow")
+    if not os.path.exists(target):
+        os.makedirs(cache_dir, exist_ok=True)
+        table = pq.read_table(path)
+        tmp = f"{target}.tmp"
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, target)
+    return target
+
+
+def read_snapshot(path: str, columns: Optional[Sequence[str]] = None, cache_dir: Optional[str] = None):
+    """Un instantané en table Arrow, réduit aux colonnes demandées (celles qu'il possède)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if cache_dir:
+        table = pa.ipc.open_file(pa.memory_map(_cached_ipc(path, cache_dir))).read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in available]
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def load(paths: Sequence[str], columns: Optional[Sequence[str]] = None, cache_dir: Optional[str] = None):
+    """Tous les instantanés en une table (schémas unifiés, colonnes manquantes à null)."""
+    import pyarrow as pa
+
+    tables = [read_snapshot(path, columns, cache_dir) for path in snapshot_files(paths)]
+    if not tables:
+        raise FileNotFoundError(f"Aucun instantané .parquet dans {list(paths)}")
+    table = pa.concat_tables(tables, promote_options="default")
+    if columns is not None:
+        for name in columns:
+            if name not in table.column_names:
+                table = table.append_column(name, pa.nulls(table.num_rows, pa.string()))
+    return table
+
+
+def _parse_where(expressions: Sequence[str]) -> Dict[str, str]:
+    where = {}
+    for expression in expressions:
+        column, sep, value = expression.partition("=")
+        if not sep:
+            raise ValueError(f"Filtre invalide {expression!r} (attendu colonne=valeur)")
+        where[column] = value
+    return where
+
+
+def query(paths: Sequence[str], where: Optional[Dict[str, str]] = None, missing: Sequence[str] = (),
+          group_by: Sequence[str] = (), latest: bool = False, cache_dir: Optional[str] = None):
+    """
+    Filtre (égalité, tags manquants) puis compte par group_by.
+    latest : ne garde que le dernier instantané de chaque source.
+    Sans group_by, renvoie les lignes filtrées.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    where = dict(where or {})
+    needed = {"id", "source", "snapshot_at", *where, *group_by, *(TAG_COLUMN_PREFIX + key for key in missing)}
+    table = load(paths, None if not group_by else sorted(needed), cache_dir)
+
+    if latest:
+        mask = None
+        for source in pc.unique(table["source"]).to_pylist():
+            in_source = pc.equal(table["source"], source)
+            newest = pc.max(pc.filter(table["snapshot_at"], in_source))
+            keep = pc.and_(in_source, pc.equal(table["snapshot_at"], newest))
+            mask = keep if mask is None else pc.or_(mask, keep)
+        table = table.filter(mask)
+    for column, value in where.items():
+        if pa.types.is_boolean(table.schema.field(column).type):
+            table = table.filter(pc.equal(table[column], value.lower() == "true"))
+        else:
+            table = table.filter(pc.equal(table[column], value))
+    for key in missing:
+        table = table.filter(pc.is_null(table[TAG_COLUMN_PREFIX + key]))
+
+    if not group_by:
+        return table
+    counts = table.group_by(list(group_by)).aggregate([("id", "count")]).rename_columns([*group_by, "count"])
+    return counts.sort_by([("count", "descending")] + [(name, "ascending") for name in group_by])
+
+
+def print_table(table, limit: int = 50, out=None):
+    out = out or sys.stdout
+    names = table.column_names
+    rows = table.slice(0, limit).to_pylist()
+    widths = {n: max([len(n)] + [len(str(r[n])) for r in rows]) for n in names}
+    print("  ".join(n.ljust(widths[n]) for n in names), file=out)
+    for row in rows:
+        print("  ".join(str(row[n]).ljust(widths[n]) for n in names), file=out)
+    if table.num_rows > limit:
+        print(f"... {table.num_rows - limit} lignes de plus", file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="+", help="Fichiers .parquet ou répertoires d'instantanés")
+    parser.add_argument("--where", action="append", default=[], help="Filtre colonne=valeur (répétable)")
+    parser.add_argument("--missing", action="append", default=[], help="Ressources sans ce tag (répétable)")
+    parser.add_argument("--group-by", nargs="+", default=[], help="Colonnes d'agrégation (compte)")
+    parser.add_argument("--latest", action="store_true", help="Dernier instantané de chaque source seulement")
+    parser.add_argument("--cache-dir", help="Cache Arrow IPC non compressé, mappé sans copie")
+    parser.add_argument("--limit", type=int, default=50, help="Lignes affichées")
+    parser.add_argument("--csv", help="Résultat complet en CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    result = query(args.paths, _parse_where(args.where), args.missing, args.group_by, args.latest, args.cache_dir)
+    print_table(result, args.limit)
+    if args.csv:
+        import pyarrow.csv as pcsv
+
+        flat = result.select([n for n in result.column_names
+                              if not str(result.schema.field(n).type).startswith("list")])
+        pcsv.write_csv(flat, args.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+Simulation hors ligne d'une politique de tags candidate sur un instantané d'inventaire.
+
+Avant de changer les tags obligatoires ou la période de grâce, on veut savoir
+combien de ressources seraient gelées (pipeline d'escalade) ou supprimées
+(cleanup) — sans lancer un vrai scan en DRY_RUN. Le simulateur charge un
+instantané, évalue une ou plusieurs politiques et compte les ressources touchées
+par type, squad et compte. Aucun appel AWS.
+
+Évaluation en colonnes : l'inventaire est stocké clé de tag par clé de tag, chaque
+colonne encodée en dictionnaire (codes entiers + valeurs distinctes). Un
+validateur (regex, email, liste de valeurs) n'est appelé qu'une fois par valeur
+distincte, et les ressources sont regroupées par scope (type, environnement)
+avant d'être évaluées colonne par colonne. Même résultat que
+CompiledPolicy.evaluate() ressource par ressource, en une fraction du temps
+(100k ressources en moins d'une seconde).
+
+Sémantique, identique aux Lambdas :
+- gelée    : non conforme (le pipeline gèle après sa propre période de grâce)
+- supprimée : non conforme et créée depuis plus de grace_period_hours (cleanup) ;
+  une ressource sans date de création est considérée hors période de grâce
+
+Instantané (--snapshot, répétable) :
+- NDJSON, un enregistrement par ligne :
+  {"id", "arn", "type", "region", "account", "created_at" (epoch ou ISO 8601), "tags": {clé: valeur}}
+- ou résultat JSON d'une requête avancée AWS Config ({"Results": [...]}, types EC2,
+  RDS, S3, Lambda), ex. aws configservice select-aggregate-resource-config
+
+Politique candidate (--policy, répétable) : document au format shared/tag_policy.json,
+avec en option "grace_period_hours" (défaut : --grace-hours). Les écarts sont
+calculés par rapport à --baseline (défaut : la politique courante).
+
+Usage :
+    python scripts/policy_simulator.py --snapshot inventaire.ndjson --policy candidate.json
+    python scripts/policy_simulator.py --synthetic 100000 --policy a.json --policy b.json --json rapport.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SCRIPTS_DIR)
+for path in (os.path.join(ROOT, "lambda"), SCRIPTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from shared.config_inventory import SHORT_TYPES  # noqa: E402
+from shared.policy import DEFAULT_POLICY_FILE, CompiledPolicy  # noqa: E402
+
+GRACE_PERIOD_HOURS = int(os.environ.get("GRACE_PERIOD_HOURS", "24"))
+SQUAD_KEY = "Squad"
+UNKNOWN = "(aucun)"
+
+# Statut par ressource
+COMPLIANT, FROZEN, DELETED = 0, 1, 2
+
+
+# ========================================
+# INSTANTANÉ
+# ========================================
+
+def _epoch(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _from_config(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    resource_type = SHORT_TYPES.get(item.get("resourceType"))
+    if resource_type is None:
+        return None
+    tags = item.get("tags") or []
+    if isinstance(tags, list):
+        tags = {t.get("key"): t.get("value") for t in tags}
+    return {
+        "id": item.get("resourceName") or item.get("resourceId", ""),
+        "arn": item.get("arn", ""),
+        "type": resource_type,
+        "region": item.get("awsRegion", ""),
+        "account": item.get("accountId", ""),
+        "created_at": item.get("resourceCreationTime"),
+        "tags": tags,
+    }
+
+
+def read_snapshot(path: str) -> Iterator[Dict[str, Any]]:
+    """Enregistrements d'un fichier NDJSON, ou d'un résultat de requête Config."""
+    with open(path) as f:
+        first = f.readline()
+        try:
+            head = json.loads(first) if first.strip() else None
+        except json.JSONDecodeError:
+            head = None  # document JSON sur plusieurs lignes
+        if head is None or "Results" in head:
+            f.seek(0)
+            for raw in json.load(f).get("Results", []):
+                record = _from_config(json.loads(raw) if isinstance(raw, str) else raw)
+                if record is not None:
+                    yield record
+            return
+        yield head
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Column:
+    """Colonne de tag encodée en dictionnaire : codes[i] = -1 si la ressource n'a pas la clé."""
+
+    __slots__ = ("codes", "values", "_index")
+
+    def __init__(self, size: int):
+        self.codes = array("i", [-1]) * size
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def set(self, row: int, value: str):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes[row] = code
+
+    def value(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return self.values[code] if code >= 0 else None
+
+
+class Inventory:
+    """Inventaire en colonnes : attributs par ressource + une colonne par clé de tag."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        records = list(records)
+        self.size = len(records)
+        self.ids = [r.get("id", "") for r in records]
+        self.types = [(r.get("type") or "").lower() for r in records]
+        self.accounts = [r.get("account") or "" for r in records]
+        self.created = [_epoch(r.get("created_at")) for r in records]
+        self.columns: Dict[str, Column] = {}
+        for row, record in enumerate(records):
+            for key, value in (record.get("tags") or {}).items():
+                if not key:
+                    continue
+                column = self.columns.get(key)
+                if column is None:
+                    column = self.columns[key] = Column(self.size)
+                column.set(row, "" if value is None else str(value))
+        self._merged: Dict[str, Column] = {}
+
+    @classmethod
+    def load(cls, paths: List[str]) -> "Inventory":
+        return cls(record for path in paths for record in read_snapshot(path))
+
+    def column(self, key: str, case_insensitive: bool = False) -> Optional[Column]:
+        """
+        Colonne d'une clé. Clés insensibles à la casse : la clé exacte d'abord, puis
+        les variantes ("owner", "OWNER"…) pour les ressources qui ne l'ont pas.
+        """
+        exact = self.columns.get(key)
+        if not case_insensitive:
+            return exact
+        lower = key.lower()
+        if lower in self._merged:
+            return self._merged[lower]
+        variants = [c for k, c in self.columns.items() if k.lower() == lower and k != key]
+        if not variants:
+            merged = exact
+        else:
+            merged = Column(self.size)
+            for source in ([exact] if exact else []) + variants:
+                for row, code in enumerate(source.codes):
+                    if code >= 0 and merged.codes[row] < 0:
+                        merged.set(row, source.values[code])
+        self._merged[lower] = merged
+        return merged
+
+
+# ========================================
+# ÉVALUATION EN COLONNES
+# ========================================
+
+class Candidate:
+    def __init__(self, name: str, document: Dict[str, Any], grace_hours: float):
+        self.name = name
+        self.policy = CompiledPolicy(document)
+        self.grace_hours = float(document.get("grace_period_hours", grace_hours))
+
+    @classmethod
+    def from_file(cls, path: str, grace_hours: float) -> "Candidate":
+        with open(path) as f:
+            return cls(os.path.basename(path), json.load(f), grace_hours)
+
+
+def evaluate(inventory: Inventory, candidate: Candidate, now: Optional[float] = None) -> Tuple[bytearray, Counter]:
+    """Statut par ressource (COMPLIANT / FROZEN / DELETED) et décompte des tags manquants."""
+    policy = candidate.policy
+    ci = policy.case_insensitive_keys
+    now = time.time() if now is None else now
+    size = inventory.size
+    non_compliant = bytearray(size)
+    missing_counts: Counter = Counter()
+
+    # Regroupement par scope : (type, environnement) → lignes
+    environment = inventory.column(policy.environment_key, ci)
+    env_codes = environment.codes if environment else array("i", [-1]) * size
+    groups: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+    for row, key in enumerate(zip(inventory.types, env_codes)):
+        groups[key].append(row)
+
+    valid_cache: Dict[Tuple[str, int], List[bool]] = {}
+    for (resource_type, env_code), rows in groups.items():
+        env_value = environment.values[env_code] if env_code >= 0 else ""
+        for key, _, validator in policy.checks_for(resource_type, env_value):
+            column = inventory.column(key, ci)
+            if column is None:
+                missing_counts[key] += len(rows)
+                for row in rows:
+                    non_compliant[row] = 1
+                continue
+            codes = column.codes
+            if validator is None:
+                bad = [row for row in rows if codes[row] < 0]
+                missing_counts[key] += len(bad)
+            else:
+                # Un appel du validateur par valeur distincte, pas par ressource
+                cache_key = (key, id(validator))
+                valid = valid_cache.get(cache_key)
+                if valid is None:
+                    valid = valid_cache[cache_key] = [validator(v) for v in column.values]
+                bad = [row for row in rows if codes[row] < 0 or not valid[codes[row]]]
+                missing_counts[key] += sum(1 for row in bad if codes[row] < 0)
+            for row in bad:
+                non_compliant[row] = 1
+
+    status = bytearray(size)
+    grace_seconds = candidate.grace_hours * 3600
+    for row, created in enumerate(inventory.created):
+        if non_compliant[row]:
+            status[row] = DELETED if created is None or now - created >= grace_seconds else FROZEN
+    return status, missing_counts
+
+
+# ========================================
+# RAPPORT
+# ========================================
+
+def _counts(status: bytearray, labels: List[str], baseline: Optional[bytearray]) -> Dict[str, Dict[str, int]]:
+    out: Dict[str, Dict[str, int]] = defaultdict(lambda: {"frozen": 0, "deleted": 0, "newly_frozen": 0, "newly_deleted": 0})
+    for row, state in enumerate(status):
+        if not state:
+            continue
+        entry = out[labels[row] or UNKNOWN]
+        entry["frozen"] += 1  # toute ressource supprimée est d'abord gelée
+        if state == DELETED:
+            entry["deleted"] += 1
+        if baseline is not None:
+            if not baseline[row]:
+                entry["newly_frozen"] += 1
+            if state == DELETED and baseline[row] != DELETED:
+                entry["newly_deleted"] += 1
+    return dict(sorted(out.items(), key=lambda item: (-item[1]["frozen"], item[0])))
+
+
+def simulate(inventory: Inventory, candidates: List[Candidate], baseline: Candidate,
+             now: Optional[float] = None) -> Dict[str, Any]:
+    now = time.time() if now is None else now
+    squad_column = inventory.column(SQUAD_KEY, baseline.policy.case_insensitive_keys)
+    squads = [squad_column.value(row) or "" for row in range(inventory.size)] if squad_column else [""] * inventory.size
+    base_status, _ = evaluate(inventory, baseline, now)
+
+    reports = []
+    for candidate in [baseline] + candidates:
+        started = time.perf_counter()
+        status, missing = evaluate(inventory, candidate, now)
+        reference = None if candidate is baseline else base_status
+        frozen = sum(1 for s in status if s)
+        deleted = sum(1 for s in status if s == DELETED)
+        report = {
+            "policy": candidate.name,
+            "version": candidate.policy.version,
+            "grace_period_hours": candidate.grace_hours,
+            "resources": inventory.size,
+            "frozen": frozen,
+            "deleted": deleted,
+            "missing_tags": dict(missing.most_common()),
+            "by_type": _counts(status, inventory.types, reference),
+            "by_squad": _counts(status, squads, reference),
+            "by_account": _counts(status, inventory.accounts, reference),
+        }
+        if reference is not None:
+            report["newly_frozen"] = sum(1 for s, b in zip(status, reference) if s and not b)
+            report["newly_deleted"] = sum(1 for s, b in zip(status, reference) if s == DELETED and b != DELETED)
+            report["released"] = sum(1 for s, b in zip(status, reference) if b and not s)
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        reports.append(report)
+    return {"baseline": reports[0], "candidates": reports[1:]}
+
+
+def print_report(result: Dict[str, Any], top: int = 5, out=None):
+    out = out or sys.stdout
+    base = result["baseline"]
+    print(f"Simulation de politique sur {base['resources']} ressources", file=out)
+    print(f"Référence {base['policy']} (v{base['version']}) : {base['frozen']} gelées, "
+          f"{base['deleted']} supprimées", file=out)
+    for report in result["candidates"]:
+        print("-" * 60, file=out)
+        print(f"{report['policy']} (v{report['version']}, grâce {report['grace_period_hours']:g} h) "
+              f"- {report['elapsed_seconds']} s", file=out)
+        print(f"Gelées      : {report['frozen']} (+{report['newly_frozen']}, {report['released']} libérées)", file=out)
+        print(f"Supprimées  : {report['deleted']} (+{report['newly_deleted']})", file=out)
+        if report["missing_tags"]:
+            print("Tags manquants : " + ", ".join(f"{t}={n}" for t, n in report["missing_tags"].items()), file=out)
+        for label, key in (("Par type", "by_type"), ("Par squad", "by_squad"), ("Par compte", "by_account")):
+            rows = list(report[key].items())[:top]
+            if rows:
+                print(f"{label} : " + ", ".join(
+                    f"{name}={c['frozen']}/{c['deleted']} (+{c['newly_frozen']})" for name, c in rows), file=out)
+
+
+# ========================================
+# CLI
+# ========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshot", action="append", help="Instantané NDJSON ou résultat Config (répétable)")
+    source.add_argument("--synthetic", type=int, help="Instantané synthétique de N ressources")
+    parser.add_argument("--policy", action="append", required=True, help="Politique candidate (répétable)")
+    parser.add_argument("--baseline", default=os.environ.get("TAG_POLICY_FILE", DEFAULT_POLICY_FILE),
+                        help="Politique de référence (défaut : politique courante)")
+    parser.add_argument("--grace-hours", type=float, default=GRACE_PERIOD_HOURS,
+                        help="Période de grâce du cleanup si la politique n'en fixe pas")
+    parser.add_argument("--top", type=int, default=5, help="Lignes affichées par regroupement")
+    parser.add_argument("--json", help="Rapport JSON complet")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    started = time.perf_counter()
+    if args.synthetic:
+        from synthetic_fleet import synthetic_records
+
+        inventory = Inventory(synthetic_records(args.synthetic, now=time.time()))
+    else:
+        inventory = Inventory.load(args.snapshot)
+    loaded = time.perf_counter() - started
+
+    baseline = Candidate.from_file(args.baseline, args.grace_hours)
+    candidates = [Candidate.from_file(path, args.grace_hours) for path in args.policy]
+    result = simulate(inventory, candidates, baseline)
+    result["load_seconds"] = round(loaded, 3)
+
+    print_report(result, args.top)
+    print(f"Chargement : {result['load_seconds']} s, total : {time.perf_counter() - started:.2f} s")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(result, out, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
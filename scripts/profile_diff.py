@@ -0,0 +1,124 @@
+"""
+Compare deux profils écrits par le mode profilage des Lambdas (shared/profiling.py).
+
+Pour chaque fonction : temps propre (tottime), temps cumulé (cumtime) et nombre
+d'appels dans la référence et dans le profil courant, triés par écart de temps.
+Si les fichiers .alloc.json voisins existent, compare aussi durée, pic mémoire et
+sites d'allocation.
+
+Les profils S3 se récupèrent d'abord en local :
+    aws s3 cp s3://bucket/profiles/governance-scanner/ ./profiles --recursive
+
+Usage :
+    python scripts/profile_diff.py base.prof courant.prof
+    python scripts/profile_diff.py base.prof courant.prof --sort tottime --limit 30 --json diff.json
+"""
+
+import os
+import sys
+import json
+import pstats
+import argparse
+from typing import Any, Dict, List, Optional
+
+
+def function_label(func) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name  # fonction C intégrée, ex. <built-in method time.sleep>
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+def load_functions(path: str) -> Dict[str, Dict[str, float]]:
+    """{fonction: {calls, tottime, cumtime}} d'un fichier .prof"""
+    functions = {}
+    for func, (_, ncalls, tottime, cumtime, _) in pstats.Stats(path).stats.items():
+        entry = functions.setdefault(function_label(func), {"calls": 0, "tottime": 0.0, "cumtime": 0.0})
+        entry["calls"] += ncalls
+        entry["tottime"] += tottime
+        entry["cumtime"] += cumtime
+    return functions
+
+
+def load_allocations(profile_path: str) -> Optional[Dict[str, Any]]:
+    path = profile_path[:-len(".prof")] + ".alloc.json" if profile_path.endswith(".prof") else None
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def diff_functions(base: Dict[str, Dict], current: Dict[str, Dict], sort: str = "cumtime",
+                   limit: int = 20) -> List[Dict[str, Any]]:
+    rows = []
+    for name in set(base) | set(current):
+        before = base.get(name, {"calls": 0, "tottime": 0.0, "cumtime": 0.0})
+        after = current.get(name, {"calls": 0, "tottime": 0.0, "cumtime": 0.0})
+        rows.append({
+            "function": name,
+            "calls": [before["calls"], after["calls"]],
+            "tottime": [round(before["tottime"], 4), round(after["tottime"], 4)],
+            "cumtime": [round(before["cumtime"], 4), round(after["cumtime"], 4)],
+            "delta": round(after[sort] - before[sort], 4),
+        })
+    rows.sort(key=lambda r: abs(r["delta"]), reverse=True)
+    return rows[:limit]
+
+
+def diff_allocations(base: Dict[str, Any], current: Dict[str, Any], limit: int = 10) -> Dict[str, Any]:
+    before = {a["site"]: a["size_kb"] for a in base.get("top_allocations", [])}
+    after = {a["site"]: a["size_kb"] for a in current.get("top_allocations", [])}
+    sites = [
+        {"site": site, "size_kb": [before.get(site, 0.0), after.get(site, 0.0)],
+         "delta_kb": round(after.get(site, 0.0) - before.get(site, 0.0), 1)}
+        for site in set(before) | set(after)
+    ]
+    sites.sort(key=lambda s: abs(s["delta_kb"]), reverse=True)
+    return {
+        "wall_seconds": [base.get("wall_seconds"), current.get("wall_seconds")],
+        "peak_mb": [base.get("peak_mb"), current.get("peak_mb")],
+        "sites": sites[:limit],
+    }
+
+
+def print_report(functions: List[Dict[str, Any]], allocations: Optional[Dict[str, Any]], sort: str):
+    print(f"{'fonction':<60} {'appels':>15} {sort + ' (s)':>21} {'ecart':>9}")
+    for row in functions:
+        calls = f"{row['calls'][0]} -> {row['calls'][1]}"
+        times = f"{row[sort][0]:.3f} -> {row[sort][1]:.3f}"
+        print(f"{row['function'][:60]:<60} {calls:>15} {times:>21} {row['delta']:>+9.3f}")
+    if allocations:
+        print(f"\nDuree : {allocations['wall_seconds'][0]} s -> {allocations['wall_seconds'][1]} s, "
+              f"pic memoire : {allocations['peak_mb'][0]} Mo -> {allocations['peak_mb'][1]} Mo")
+        for site in allocations["sites"]:
+            print(f"    {site['site'][-70:]:<70} {site['size_kb'][0]:>9} -> {site['size_kb'][1]:>9} Ko "
+                  f"({site['delta_kb']:+})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base", help="Profil de reference (.prof)")
+    parser.add_argument("current", help="Profil a comparer (.prof)")
+    parser.add_argument("--sort", choices=["cumtime", "tottime"], default="cumtime")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", help="Ecrit la comparaison dans ce fichier")
+    args = parser.parse_args()
+
+    for path in (args.base, args.current):
+        if not os.path.exists(path):
+            print(f"Profil introuvable : {path}", file=sys.stderr)
+            sys.exit(2)
+
+    functions = diff_functions(load_functions(args.base), load_functions(args.current), args.sort, args.limit)
+    base_alloc, current_alloc = load_allocations(args.base), load_allocations(args.current)
+    allocations = diff_allocations(base_alloc, current_alloc) if base_alloc and current_alloc else None
+
+    print_report(functions, allocations, args.sort)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"functions": functions, "allocations": allocations}, f, indent=2)
+        print(f"Comparaison ecrite dans {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,600 @@
+"""
+Simulateur Step Functions en process, à horloge virtuelle.
+
+Interprète le sous-ensemble d'ASL utilisé par nos pipelines
+(terraform/modules/step-function/*.asl.json) :
+- Task : ARN Lambda direct, lambda:invoke et lambda:invoke.waitForTaskToken (+ TimeoutSeconds)
+- Choice (BooleanEquals, StringEquals, Numeric*, IsPresent, IsNull, And/Or/Not), Wait, Pass,
+  Succeed, Fail
+- Map INLINE et DISTRIBUTED (ItemsPath, ItemBatcher, ToleratedFailurePercentage) :
+  les exécutions enfants avancent en parallèle sur l'horloge virtuelle
+- Retry / Catch, InputPath, Parameters, ResultSelector, ResultPath, OutputPath
+- JSONPath : $.a.b, [n], filtres [?(@.a.b == true)], contexte $$.Execution.Id,
+  $$.State.Name, $$.Task.Token
+
+Chaque exécution est un générateur ; un ordonnanceur à événements discrets les fait
+avancer dans l'ordre de l'horloge virtuelle. Les Wait et backoffs de Retry ne coûtent
+donc rien en temps réel, et des événements extérieurs (un owner qui corrige ses tags
+à J+1h) peuvent être programmés avec schedule().
+
+Le simulateur expose send_task_success / send_task_failure avec la signature du
+client boto3 "stepfunctions" : on peut le substituer au client du controller.
+
+Mesures : latence réelle par état (temps passé dans les handlers), nombre
+d'invocations par fonction, durée virtuelle de chaque exécution, et appels API AWS
+si les clients boto3 des handlers sont instrumentés avec count_api_calls().
+"""
+
+import re
+import json
+import copy
+import heapq
+import itertools
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+LAMBDA_INVOKE = "arn:aws:states:::lambda:invoke"
+LAMBDA_INVOKE_TOKEN = "arn:aws:states:::lambda:invoke.waitForTaskToken"
+
+
+class SimulationError(Exception):
+    """Définition hors du sous-ensemble supporté."""
+
+
+class TaskFailed(Exception):
+    """Erreur Step Functions nommée (ex: Lambda.ServiceException, States.Timeout)."""
+
+    def __init__(self, error: str, cause: str = ""):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+
+class VirtualClock:
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+
+def load_definition(path: str, **substitutions: str) -> Dict:
+    """Charge un fichier ASL en remplaçant les variables templatefile ${...} de Terraform."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    for name, value in substitutions.items():
+        text = text.replace("${" + name + "}", value)
+    return json.loads(text)
+
+
+# ========================================
+# JSONPATH
+# ========================================
+
+_MISSING = object()
+_SEGMENT = re.compile(
+    r"\.([A-Za-z0-9_\-]+)"                       # .name
+    r"|\[(\d+)\]"                                # [0]
+    r"|\[\?\(@\.([A-Za-z0-9_.\-]+)\s*(==|!=)\s*([^)]+)\)\]"  # [?(@.a.b == literal)]
+)
+
+
+def _parse_literal(text: str) -> Any:
+    text = text.strip()
+    if text[0] == "'" and text[-1] == "'":
+        return text[1:-1]
+    return json.loads(text)
+
+
+def _walk(value: Any, path: str) -> Any:
+    pos = 0
+    while pos < len(path):
+        m = _SEGMENT.match(path, pos)
+        if not m:
+            raise SimulationError(f"JSONPath non supporté : {path!r}")
+        name, index, filter_path, op, literal = m.groups()
+        if name is not None:
+            value = value.get(name, _MISSING) if isinstance(value, dict) else _MISSING
+        elif index is not None:
+            i = int(index)
+            value = value[i] if isinstance(value, list) and i < len(value) else _MISSING
+        else:
+            if not isinstance(value, list):
+                return _MISSING
+            expected = _parse_literal(literal)
+            value = [
+                item for item in value
+                if (_walk(item, "." + filter_path) == expected) == (op == "==")
+            ]
+        if value is _MISSING:
+            return _MISSING
+        pos = m.end()
+    return value
+
+
+def get_path(data: Any, path: str, context: Optional[Dict] = None) -> Any:
+    """Évalue un chemin ; lève States.Runtime si le chemin n'existe pas (comme Step Functions)."""
+    value = _walk(context or {}, path[2:]) if path.startswith("$$") else _walk(data, path[1:])
+    if value is _MISSING:
+        raise TaskFailed("States.Runtime", f"Chemin introuvable : {path}")
+    return value
+
+
+def path_exists(data: Any, path: str) -> bool:
+    return _walk(data, path[1:]) is not _MISSING
+
+
+def set_path(data: Any, path: Optional[str], value: Any) -> Any:
+    """Applique un ResultPath : "$" remplace, None ignore le résultat, "$.a.b" fusionne."""
+    if path is None:
+        return data
+    if path == "$":
+        return value
+    keys = re.findall(r"\.([A-Za-z0-9_\-]+)", path)
+    result = copy.deepcopy(data) if isinstance(data, dict) else {}
+    target = result
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    target[keys[-1]] = value
+    return result
+
+
+def resolve_parameters(template: Any, data: Any, context: Dict) -> Any:
+    if isinstance(template, dict):
+        out = {}
+        for key, value in template.items():
+            if key.endswith(".$"):
+                if not isinstance(value, str) or not value.startswith("$"):
+                    raise SimulationError(f"Fonction intrinsèque non supportée : {value!r}")
+                out[key[:-2]] = get_path(data, value, context)
+            else:
+                out[key] = resolve_parameters(value, data, context)
+        return out
+    if isinstance(template, list):
+        return [resolve_parameters(v, data, context) for v in template]
+    return template
+
+
+# ========================================
+# CHOICE
+# ========================================
+
+_COMPARATORS = {
+    "BooleanEquals": lambda a, b: a is b or a == b,
+    "StringEquals": lambda a, b: a == b,
+    "NumericEquals": lambda a, b: a == b,
+    "NumericLessThan": lambda a, b: a < b,
+    "NumericLessThanEquals": lambda a, b: a <= b,
+    "NumericGreaterThan": lambda a, b: a > b,
+    "NumericGreaterThanEquals": lambda a, b: a >= b,
+}
+
+
+def evaluate_rule(rule: Dict, data: Any) -> bool:
+    if "And" in rule:
+        return all(evaluate_rule(r, data) for r in rule["And"])
+    if "Or" in rule:
+        return any(evaluate_rule(r, data) for r in rule["Or"])
+    if "Not" in rule:
+        return not evaluate_rule(rule["Not"], data)
+
+    variable = rule["Variable"]
+    if "IsPresent" in rule:
+        return path_exists(data, variable) == rule["IsPresent"]
+    value = _walk(data, variable[1:])
+    if "IsNull" in rule:
+        return (value is None) == rule["IsNull"]
+    for op, compare in _COMPARATORS.items():
+        if op in rule:
+            if value is _MISSING:
+                raise TaskFailed("States.Runtime", f"Variable introuvable : {variable}")
+            return compare(value, rule[op])
+    raise SimulationError(f"Règle Choice non supportée : {rule}")
+
+
+def _error_matches(patterns: Iterable[str], error: str) -> bool:
+    for pattern in patterns:
+        if pattern == "States.ALL" or pattern == error:
+            return True
+        # States.TaskFailed couvre toutes les erreurs de tâche sauf le timeout
+        if pattern == "States.TaskFailed" and error != "States.Timeout":
+            return True
+    return False
+
+
+# ========================================
+# EXÉCUTIONS
+# ========================================
+
+class Execution:
+    def __init__(self, sim: "Simulator", definition: Dict, name: str, input_data: Any,
+                 parent: Optional["Execution"] = None, state_machine: str = "sim"):
+        self.sim = sim
+        self.definition = definition
+        self.name = name
+        self.id = f"arn:aws:states:sim:000000000000:execution:{state_machine}:{name}"
+        self.input = input_data
+        self.parent = parent
+        self.started_at = sim.clock.now
+        self.stopped_at: Optional[float] = None
+        self.status = "RUNNING"
+        self.output: Any = None
+        self.error: Optional[str] = None
+        self.cause: Optional[str] = None
+        self.history: List[str] = []
+        # Map distribué : enfants en cours et leurs résultats
+        self.pending_children = 0
+        self.children: List["Execution"] = []
+        self._gen = self._run()
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.stopped_at is None else self.stopped_at - self.started_at
+
+    def _context(self, state_name: str, token: Optional[str] = None) -> Dict:
+        ctx = {
+            "Execution": {"Id": self.id, "Name": self.name, "Input": self.input},
+            "State": {"Name": state_name},
+        }
+        if token:
+            ctx["Task"] = {"Token": token}
+        return ctx
+
+    def _run(self):
+        try:
+            self.output = yield from run_states(self, self.definition, self.input)
+            self.status = "SUCCEEDED"
+        except TaskFailed as e:
+            self.status = "FAILED"
+            self.error, self.cause = e.error, e.cause
+
+
+def run_states(execution: Execution, definition: Dict, data: Any):
+    """Générateur : parcourt les états d'une définition (ou d'un ItemProcessor)."""
+    states = definition["States"]
+    name = definition["StartAt"]
+    sim = execution.sim
+    while True:
+        state = states[name]
+        execution.history.append(name)
+        sim.state_entries[name] += 1
+        kind = state["Type"]
+
+        if kind == "Succeed":
+            return data
+        if kind == "Fail":
+            raise TaskFailed(state.get("Error", "States.Fail"), state.get("Cause", ""))
+
+        effective = get_path(data, state["InputPath"]) if state.get("InputPath") else data
+
+        if kind == "Choice":
+            name = next(
+                (c["Next"] for c in state["Choices"] if evaluate_rule(c, effective)),
+                state.get("Default"),
+            )
+            if name is None:
+                raise TaskFailed("States.NoChoiceMatched", execution.history[-1])
+            continue
+
+        if kind == "Wait":
+            seconds = state.get("Seconds")
+            if seconds is None:
+                seconds = get_path(effective, state["SecondsPath"])
+            yield ("sleep", seconds)
+            result, result_path = effective, None
+
+        elif kind == "Pass":
+            if "Parameters" in state:
+                result = resolve_parameters(state["Parameters"], effective, execution._context(name))
+            else:
+                result = state.get("Result", effective)
+            result_path = state.get("ResultPath", "$")
+
+        elif kind in ("Task", "Map"):
+            try:
+                result = yield from run_with_retry(execution, name, state, effective)
+            except TaskFailed as e:
+                catcher = next((c for c in state.get("Catch", []) if _error_matches(c["ErrorEquals"], e.error)), None)
+                if not catcher:
+                    raise
+                data = set_path(data, catcher.get("ResultPath", "$"), {"Error": e.error, "Cause": e.cause})
+                name = catcher["Next"]
+                continue
+            if "ResultSelector" in state:
+                result = resolve_parameters(state["ResultSelector"], result, execution._context(name))
+            result_path = state.get("ResultPath", "$")
+
+        else:
+            raise SimulationError(f"Type d'état non supporté : {kind}")
+
+        data = set_path(data, result_path, result) if kind != "Wait" else data
+        if state.get("OutputPath"):
+            data = get_path(data, state["OutputPath"])
+        if state.get("End"):
+            return data
+        name = state["Next"]
+
+
+def run_with_retry(execution: Execution, name: str, state: Dict, data: Any):
+    attempts = defaultdict(int)
+    while True:
+        try:
+            if state["Type"] == "Map":
+                return (yield from run_map(execution, name, state, data))
+            return (yield from run_task(execution, name, state, data))
+        except TaskFailed as e:
+            retrier = next(
+                (i for i, r in enumerate(state.get("Retry", [])) if _error_matches(r["ErrorEquals"], e.error)),
+                None,
+            )
+            if retrier is None:
+                raise
+            rule = state["Retry"][retrier]
+            if attempts[retrier] >= rule.get("MaxAttempts", 3):
+                raise
+            delay = rule.get("IntervalSeconds", 1) * rule.get("BackoffRate", 2.0) ** attempts[retrier]
+            attempts[retrier] += 1
+            execution.sim.retries[name] += 1
+            yield ("sleep", delay)
+
+
+def run_task(execution: Execution, name: str, state: Dict, data: Any):
+    sim = execution.sim
+    resource = state["Resource"]
+    token = None
+    if resource == LAMBDA_INVOKE_TOKEN:
+        token = sim._new_token(execution)
+    context = execution._context(name, token)
+    payload = resolve_parameters(state["Parameters"], data, context) if "Parameters" in state else data
+
+    if resource in (LAMBDA_INVOKE, LAMBDA_INVOKE_TOKEN):
+        function = payload["FunctionName"]
+        payload = payload.get("Payload", data)
+    else:
+        function = resource
+
+    result = sim.invoke(function, payload, state_name=name)
+
+    if resource == LAMBDA_INVOKE_TOKEN:
+        outcome = yield ("token", token, state.get("TimeoutSeconds", 365 * 24 * 3600))
+        if outcome[0] == "success":
+            return outcome[1]
+        raise TaskFailed(outcome[1], outcome[2])
+    if resource == LAMBDA_INVOKE:
+        return {"Payload": result, "StatusCode": 200}
+    return result
+
+
+def run_map(execution: Execution, name: str, state: Dict, data: Any):
+    sim = execution.sim
+    items = get_path(data, state.get("ItemsPath", "$"))
+    if not isinstance(items, list):
+        raise TaskFailed("States.Runtime", f"{name} : ItemsPath ne désigne pas une liste")
+
+    batcher = state.get("ItemBatcher")
+    if batcher:
+        size = batcher.get("MaxItemsPerBatch") or get_path(data, batcher["MaxItemsPerBatchPath"])
+        items = [{"Items": items[i:i + size]} for i in range(0, len(items), size)]
+    selector = state.get("ItemSelector") or state.get("Parameters")
+    if selector:
+        items = [resolve_parameters(selector, data, {**execution._context(name), "Map": {"Item": {"Value": item}}})
+                 for item in items]
+
+    processor = state.get("ItemProcessor") or state.get("Iterator")
+    distributed = processor.get("ProcessorConfig", {}).get("Mode") == "DISTRIBUTED"
+    children = [
+        Execution(sim, processor, f"{execution.name}-{name}-{i}" if distributed else execution.name,
+                  item, parent=execution)
+        for i, item in enumerate(items)
+    ]
+    if distributed:
+        sim.child_executions += len(children)
+    yield ("join", children)
+
+    failed = [c for c in children if c.status != "SUCCEEDED"]
+    tolerated = state.get("ToleratedFailurePercentage", 0)
+    if failed and (not distributed or 100.0 * len(failed) / len(children) > tolerated):
+        first = failed[0]
+        if distributed:
+            raise TaskFailed("States.ExceedToleratedFailureThreshold", f"{len(failed)}/{len(children)} lots en échec")
+        raise TaskFailed(first.error, first.cause)
+    return [c.output for c in children]
+
+
+# ========================================
+# ORDONNANCEUR
+# ========================================
+
+class Simulator:
+    """
+    functions : ARN (ou nom) de fonction → callable(payload) → résultat.
+    Une exception levée par le callable est une erreur de tâche nommée d'après sa classe
+    (comme errorType côté Lambda) ; TaskFailed permet de choisir le nom (Lambda.ServiceException…).
+    """
+
+    def __init__(self, definition: Dict, functions: Dict[str, Callable[[Any], Any]],
+                 clock: Optional[VirtualClock] = None, state_machine: str = "sim"):
+        self.definition = definition
+        self.functions = functions
+        self.clock = clock or VirtualClock()
+        self.state_machine = state_machine
+        self.executions: List[Execution] = []
+        self.child_executions = 0
+
+        self.state_entries: Counter = Counter()
+        self.state_wall: Dict[str, float] = defaultdict(float)
+        self.state_wall_max: Dict[str, float] = defaultdict(float)
+        self.invocations: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.api_calls: Counter = Counter()
+        self.early_wakeups = 0
+
+        self._queue: List = []
+        self._seq = itertools.count()
+        self._tokens: Dict[str, Dict] = {}
+
+    # ---- API publique ----
+
+    def start_execution(self, input_data: Any, name: Optional[str] = None) -> Execution:
+        execution = Execution(self, self.definition, name or uuid.uuid4().hex[:12], input_data,
+                              state_machine=self.state_machine)
+        self.executions.append(execution)
+        self._push(self.clock.now, "resume", execution, None)
+        return execution
+
+    def schedule(self, at: float, fn: Callable[[], Any]):
+        """Programme un événement extérieur à l'instant virtuel `at` (secondes)."""
+        self._push(at, "event", fn, None)
+
+    def run(self, until: Optional[float] = None):
+        """Fait avancer toutes les exécutions jusqu'à ce qu'il n'y ait plus rien à faire."""
+        while self._queue:
+            at, _, kind, target, value = self._queue[0]
+            if until is not None and at > until:
+                self.clock.now = until
+                return
+            heapq.heappop(self._queue)
+            self.clock.now = max(self.clock.now, at)
+            if kind == "event":
+                target()
+            elif kind == "timeout":
+                entry = self._tokens.get(value)
+                if entry and entry["waiting"]:
+                    del self._tokens[value]
+                    self._step(target, ("failure", "States.Timeout", "Délai de la tâche dépassé"))
+            else:
+                self._step(target, value)
+
+    def invoke(self, function: str, payload: Any, state_name: str = "") -> Any:
+        fn = self.functions.get(function)
+        if fn is None:
+            raise SimulationError(f"Fonction inconnue : {function}")
+        self.invocations[function] += 1
+        payload = json.loads(json.dumps(payload))  # sérialisation comme un vrai invoke
+        start = time.perf_counter()
+        try:
+            result = fn(payload)
+        except TaskFailed:
+            raise
+        except Exception as e:
+            raise TaskFailed(type(e).__name__, str(e)) from e
+        finally:
+            elapsed = time.perf_counter() - start
+            if state_name:
+                self.state_wall[state_name] += elapsed
+                self.state_wall_max[state_name] = max(self.state_wall_max[state_name], elapsed)
+        return json.loads(json.dumps(result, default=str))
+
+    # Même signature que le client boto3 "stepfunctions"
+    def send_task_success(self, taskToken: str, output: str):
+        self._resolve(taskToken, ("success", json.loads(output)))
+        return {}
+
+    def send_task_failure(self, taskToken: str, error: str = "", cause: str = ""):
+        self._resolve(taskToken, ("failure", error, cause))
+        return {}
+
+    def summary(self) -> Dict[str, Any]:
+        durations = sorted(e.duration for e in self.executions if e.duration is not None)
+
+        def pct(p):
+            return durations[min(len(durations) - 1, int(p * len(durations)))] if durations else None
+
+        return {
+            "executions": len(self.executions),
+            "child_executions": self.child_executions,
+            "status": dict(Counter(e.status for e in self.executions)),
+            "virtual_duration_seconds": {"min": durations[0] if durations else None, "p50": pct(0.5), "p90": pct(0.9), "max": durations[-1] if durations else None},
+            "state_transitions": sum(self.state_entries.values()),
+            "states": {
+                name: {
+                    "entries": count,
+                    "wall_ms_total": round(self.state_wall.get(name, 0.0) * 1000, 2),
+                    "wall_ms_max": round(self.state_wall_max.get(name, 0.0) * 1000, 2),
+                }
+                for name, count in sorted(self.state_entries.items())
+            },
+            "invocations": dict(self.invocations),
+            "retries": dict(self.retries),
+            "early_wakeups": self.early_wakeups,
+            "api_calls": dict(self.api_calls),
+            "api_calls_total": sum(self.api_calls.values()),
+        }
+
+    # ---- interne ----
+
+    def _push(self, at, kind, target, value):
+        heapq.heappush(self._queue, (at, next(self._seq), kind, target, value))
+
+    def _new_token(self, execution: Execution) -> str:
+        token = uuid.uuid4().hex
+        self._tokens[token] = {"execution": execution, "waiting": False, "outcome": None}
+        return token
+
+    def _resolve(self, token: str, outcome):
+        entry = self._tokens.get(token)
+        if entry is None or entry["outcome"] is not None:
+            raise ClientError({"Error": {"Code": "TaskTimedOut", "Message": "Task Timed Out"}}, "SendTaskSuccess")
+        entry["outcome"] = outcome
+        self.early_wakeups += 1
+        if entry["waiting"]:
+            del self._tokens[token]
+            self._push(self.clock.now, "resume", entry["execution"], outcome)
+
+    def _step(self, execution: Execution, value):
+        try:
+            command = execution._gen.send(value)
+        except StopIteration:
+            self._finish(execution)
+            return
+        op = command[0]
+        if op == "sleep":
+            self._push(self.clock.now + command[1], "resume", execution, None)
+        elif op == "token":
+            _, token, timeout = command
+            entry = self._tokens[token]
+            if entry["outcome"] is not None:
+                # Réveil pendant l'invocation elle-même (ex: tags déjà corrigés)
+                del self._tokens[token]
+                self._push(self.clock.now, "resume", execution, entry["outcome"])
+            else:
+                entry["waiting"] = True
+                self._push(self.clock.now + timeout, "timeout", execution, token)
+        elif op == "join":
+            children = command[1]
+            execution.children = children
+            execution.pending_children = len(children)
+            if not children:
+                self._push(self.clock.now, "resume", execution, None)
+            for child in children:
+                child.started_at = self.clock.now
+                self._push(self.clock.now, "resume", child, None)
+
+    def _finish(self, execution: Execution):
+        execution.stopped_at = self.clock.now
+        parent = execution.parent
+        if parent is not None:
+            parent.pending_children -= 1
+            if parent.pending_children == 0:
+                self._push(self.clock.now, "resume", parent, None)
+
+
+def count_api_calls(counter: Counter, modules: Iterable[Any]):
+    """
+    Compte les appels AWS des clients boto3 trouvés dans les modules donnés
+    (attributs de module : ec2, s3, sns...), par "service.Operation".
+    """
+    from botocore.client import BaseClient
+
+    seen = set()
+    for module in modules:
+        for value in vars(module).values():
+            if isinstance(value, BaseClient) and id(value) not in seen:
+                seen.add(id(value))
+                service = value.meta.service_model.service_name
+
+                def before_call(model, service=service, **kwargs):
+                    counter[f"{service}.{model.name}"] += 1
+
+                value.meta.events.register("before-call.*.*", before_call, unique_id=f"sim-count-{id(value)}")
@@ -0,0 +1,219 @@
+"""
+Générateur de flotte synthétique pour moto (benchmarks et tests de montée en charge).
+
+Crée des instances EC2, buckets S3, fonctions Lambda et instances RDS dans le
+backend moto courant (à appeler sous mock_aws). Une part `compliance_ratio` des
+ressources porte les 4 tags obligatoires ; les autres en ont un sous-ensemble
+incomplet, tiré de façon déterministe à partir de `seed` pour que deux runs
+produisent la même flotte.
+
+Les créations passent par l'API boto3 (moto valide les paramètres comme AWS) ;
+les instances EC2 sont créées puis taguées par lots.
+
+Au-delà de quelques milliers d'instances, appeler speed_up_moto() avant mock_aws :
+sinon le coût quadratique de moto domine (voir sa docstring).
+"""
+
+import io
+import os
+import random
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import boto3
+
+from shared.policy import get_policy
+
+REGION = "eu-west-1"
+
+TAG_VALUES = {
+    "Owner": ["alice@entreprise.com", "bob@entreprise.com", "carol@entreprise.com"],
+    "Squad": ["Data", "Platform", "Payments", "Growth"],
+    "CostCenter": ["CC-101", "CC-202", "CC-303"],
+    "Environment": ["dev", "staging", "prod"],
+}
+
+
+@dataclass
+class Fleet:
+    """Inventaire de ce qui a été créé : {type: [(resource_id, compliant)]}."""
+    resources: Dict[str, List[tuple]] = field(default_factory=lambda: defaultdict(list))
+
+    def count(self, resource_type: Optional[str] = None, compliant: Optional[bool] = None) -> int:
+        types = [resource_type] if resource_type else list(self.resources)
+        return sum(
+            1 for t in types for _, ok in self.resources[t]
+            if compliant is None or ok == compliant
+        )
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        return {
+            t: {"total": self.count(t), "compliant": self.count(t, True)}
+            for t in sorted(self.resources)
+        }
+
+
+def speed_up_moto():
+    """
+    Retire deux coûts propres à moto qui fausseraient les mesures à grande échelle :
+    - chaque instance créée filtre le catalogue d'AMI par défaut (~1300 images)
+    - chaque lecture des tags d'une ressource EC2 parcourt toute la table des tags
+      (describe_instances devient quadratique : ~3 min pour 10k instances)
+    Les tags sont relus directement par identifiant, au même format que describe_tags.
+    """
+    from moto.ec2.models.core import TaggedEC2Resource
+    from moto.ec2.utils import EC2_PREFIX_TO_RESOURCE, get_prefix
+
+    os.environ["MOTO_EC2_LOAD_DEFAULT_AMIS"] = "false"
+
+    def get_tags(self):
+        if not self.id:
+            return []
+        tags = self.ec2_backend.tags.get(self.id, {})
+        resource_type = EC2_PREFIX_TO_RESOURCE.get(get_prefix(self.id), "")
+        return [
+            {"resource_id": self.id, "key": k, "value": v, "resource_type": resource_type}
+            for k, v in tags.items()
+        ]
+
+    TaggedEC2Resource.get_tags = get_tags
+
+
+def tag_set(rng: random.Random, compliant: bool) -> Dict[str, str]:
+    """Tags complets, ou sous-ensemble strict (au moins un tag obligatoire manquant)."""
+    required = list(get_policy().required)
+    tags = {key: rng.choice(TAG_VALUES[key]) for key in required}
+    if not compliant:
+        missing = rng.sample(required, rng.randint(1, len(required)))
+        for key in missing:
+            del tags[key]
+    return tags
+
+
+def _plan(rng: random.Random, size: int, compliance_ratio: float) -> List[Dict[str, str]]:
+    compliant = int(round(size * compliance_ratio))
+    flags = [True] * compliant + [False] * (size - compliant)
+    rng.shuffle(flags)
+    return [tag_set(rng, ok) for ok in flags]
+
+
+def _is_compliant(tags: Dict[str, str]) -> bool:
+    return all(key in tags for key in get_policy().required)
+
+
+def create_ec2(fleet: Fleet, rng: random.Random, size: int, compliance_ratio: float, chunk: int = 1000):
+    """
+    Toutes les instances sont créées avant d'être taguées (par lots de create_tags,
+    regroupées par jeu de clés, valeurs du premier de chaque groupe) : à la création,
+    moto relit tous les tags du backend pour chaque instance.
+    """
+    ec2 = boto3.client("ec2", region_name=REGION)
+    ids: List[str] = []
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        instances = ec2.run_instances(ImageId="ami-12345678", InstanceType="t3.micro", MinCount=n, MaxCount=n)["Instances"]
+        ids.extend(i["InstanceId"] for i in instances)
+
+    groups: Dict[tuple, List[str]] = defaultdict(list)
+    values: Dict[tuple, Dict[str, str]] = {}
+    for instance_id, tags in zip(ids, _plan(rng, size, compliance_ratio)):
+        keys = tuple(sorted(tags))
+        groups[keys].append(instance_id)
+        values.setdefault(keys, tags)
+    for keys, group in groups.items():
+        tags = values[keys]
+        for start in range(0, len(group), chunk):
+            if tags:
+                ec2.create_tags(Resources=group[start:start + chunk], Tags=[{"Key": k, "Value": v} for k, v in tags.items()])
+        fleet.resources["ec2"].extend((instance_id, _is_compliant(tags)) for instance_id in group)
+
+
+def create_s3(fleet: Fleet, rng: random.Random, size: int, compliance_ratio: float, prefix: str = "fleet"):
+    s3 = boto3.client("s3", region_name=REGION)
+    for i, tags in enumerate(_plan(rng, size, compliance_ratio)):
+        name = f"{prefix}-bucket-{i:06d}"
+        s3.create_bucket(Bucket=name, CreateBucketConfiguration={"LocationConstraint": REGION})
+        if tags:
+            s3.put_bucket_tagging(Bucket=name, Tagging={"TagSet": [{"Key": k, "Value": v} for k, v in tags.items()]})
+        fleet.resources["s3"].append((name, _is_compliant(tags)))
+
+
+def _lambda_role() -> str:
+    iam = boto3.client("iam", region_name=REGION)
+    try:
+        return iam.get_role(RoleName="fleet-lambda-role")["Role"]["Arn"]
+    except iam.exceptions.NoSuchEntityException:
+        return iam.create_role(
+            RoleName="fleet-lambda-role",
+            AssumeRolePolicyDocument='{"Version": "2012-10-17", "Statement": []}',
+        )["Role"]["Arn"]
+
+
+def _lambda_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("index.py", "def handler(event, context):\n    return event\n")
+    return buffer.getvalue()
+
+
+def create_lambda(fleet: Fleet, rng: random.Random, size: int, compliance_ratio: float, prefix: str = "fleet"):
+    lmb = boto3.client("lambda", region_name=REGION)
+    role, code = _lambda_role(), _lambda_zip()
+    for i, tags in enumerate(_plan(rng, size, compliance_ratio)):
+        name = f"{prefix}-function-{i:06d}"
+        lmb.create_function(
+            FunctionName=name, Runtime="python3.11", Role=role, Handler="index.handler",
+            Code={"ZipFile": code}, Tags=tags,
+        )
+        fleet.resources["lambda"].append((name, _is_compliant(tags)))
+
+
+def create_rds(fleet: Fleet, rng: random.Random, size: int, compliance_ratio: float, prefix: str = "fleet"):
+    rds = boto3.client("rds", region_name=REGION)
+    for i, tags in enumerate(_plan(rng, size, compliance_ratio)):
+        name = f"{prefix}-db-{i:05d}"
+        rds.create_db_instance(
+            DBInstanceIdentifier=name, DBInstanceClass="db.t3.micro", Engine="postgres",
+            MasterUsername="admin", MasterUserPassword="password123", AllocatedStorage=20,
+            Tags=[{"Key": k, "Value": v} for k, v in tags.items()],
+        )
+        fleet.resources["rds"].append((name, _is_compliant(tags)))
+
+
+def generate_fleet(ec2: int = 0, s3: int = 0, lambda_functions: int = 0, rds: int = 0,
+                   compliance_ratio: float = 0.7, seed: int = 42) -> Fleet:
+    """Crée la flotte dans moto (sous mock_aws) et renvoie l'inventaire attendu."""
+    rng = random.Random(seed)
+    fleet = Fleet()
+    create_ec2(fleet, rng, ec2, compliance_ratio)
+    create_s3(fleet, rng, s3, compliance_ratio)
+    create_lambda(fleet, rng, lambda_functions, compliance_ratio)
+    create_rds(fleet, rng, rds, compliance_ratio)
+    return fleet
+
+
+def synthetic_records(size: int, compliance_ratio: float = 0.7, seed: int = 42, accounts: int = 3,
+                      now: float = 1_800_000_000.0, max_age_days: int = 30) -> List[Dict]:
+    """
+    Instantané d'inventaire synthétique, sans moto (format de scripts/policy_simulator.py) :
+    types en alternance, comptes et dates de création tirés de façon déterministe.
+    """
+    rng = random.Random(seed)
+    types = ("ec2", "s3", "lambda", "rds")
+    records = []
+    for i, tags in enumerate(_plan(rng, size, compliance_ratio)):
+        resource_type = types[i % len(types)]
+        account = f"{100000000000 + i % accounts:012d}"
+        resource_id = f"{resource_type}-{i:07d}"
+        records.append({
+            "id": resource_id,
+            "arn": f"arn:aws:{resource_type}:{REGION}:{account}:{resource_id}",
+            "type": resource_type,
+            "region": REGION,
+            "account": account,
+            "created_at": now - rng.uniform(0, max_age_days * 86400),
+            "tags": tags,
+        })
+    return records
@@ -0,0 +1,84 @@
+"""
+Tests du générateur de flotte et de la suite de benchmark (petite flotte).
+
+Vérifie que :
+- La flotte est déterministe et respecte le taux de conformité demandé
+- Chaque handler voit toute la flotte et le résumé JSON est cohérent
+- La comparaison à une référence signale durée, mémoire et appels API en hausse
+"""
+
+import os
+import sys
+import copy
+
+import pytest
+from moto import mock_aws
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), "lambda"))
+
+import bench_fleet  # noqa: E402
+from synthetic_fleet import generate_fleet  # noqa: E402
+
+
+@pytest.fixture
+def isolated_env():
+    """run_suite modifie os.environ et le limiteur partagé : état restauré après le test."""
+    from shared.ratelimit import rate_limiter
+
+    saved = dict(os.environ)
+    yield
+    os.environ.clear()
+    os.environ.update(saved)
+    rate_limiter.configure({})
+
+
+def test_flotte_deterministe(monkeypatch):
+    for name, value in bench_fleet.BENCH_ENV.items():
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        first = generate_fleet(ec2=20, s3=10, lambda_functions=4, compliance_ratio=0.5, seed=7)
+    with mock_aws():
+        second = generate_fleet(ec2=20, s3=10, lambda_functions=4, compliance_ratio=0.5, seed=7)
+
+    assert first.to_dict() == {
+        "ec2": {"total": 20, "compliant": 10},
+        "lambda": {"total": 4, "compliant": 2},
+        "s3": {"total": 10, "compliant": 5},
+    }
+    assert [ok for _, ok in first.resources["s3"]] == [ok for _, ok in second.resources["s3"]]
+
+
+def test_suite_sur_petite_flotte(isolated_env):
+    document = bench_fleet.run_suite(ec2=12, s3=6, lambda_functions=4, rds=2, compliance_ratio=0.5)
+    handlers = document["handlers"]
+    non_compliant = 6 + 3 + 2 + 1
+
+    assert document["meta"]["params"]["ec2"] == 12
+    assert handlers["scanner"]["result"]["non_compliant"] == non_compliant
+    assert handlers["metrics"]["result"]["total"] == 24
+    assert handlers["controller"]["result"] == {"items": non_compliant, "compliant": 0, "failed": 0}
+    assert not handlers["cleanup"]["result"]["errors"]
+    for stats in handlers.values():
+        assert stats["wall_seconds"] > 0 and stats["peak_memory_mb"] > 0
+    # Une seule page describe_instances pour le cleanup, une lecture de tags par bucket
+    assert handlers["cleanup"]["api_calls"]["ec2.DescribeInstances"] == 1
+    assert handlers["cleanup"]["api_calls"]["s3.GetBucketTagging"] == 6
+
+
+def test_comparaison_a_la_reference():
+    baseline = {
+        "meta": {"params": {"ec2": 10}},
+        "handlers": {"scanner": {"wall_seconds": 1.0, "peak_memory_mb": 10.0, "api_calls_total": 50}},
+    }
+    current = copy.deepcopy(baseline)
+    current["handlers"]["scanner"].update(wall_seconds=1.1, api_calls_total=51)
+    assert bench_fleet.compare(current, baseline, tolerance=0.2) == ["scanner.api_calls_total : 50 → 51"]
+
+    current["handlers"]["scanner"]["peak_memory_mb"] = 15.0
+    assert len(bench_fleet.compare(current, baseline, tolerance=0.2)) == 2
+
+    current["meta"]["params"]["ec2"] = 20
+    with pytest.raises(ValueError):
+        bench_fleet.compare(current, baseline)
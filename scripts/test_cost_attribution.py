@@ -0,0 +1,49 @@
+"""
+Tests de la jointure inventaire / CUR en ligne de commande (scripts/cost_attribution.py).
+
+Vérifie que :
+- Seul le dernier instantané de la source est joint au CUR
+- Le rapport texte et le JSON donnent la dépense non conforme
+"""
+
+import os
+import sys
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), "lambda"))
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from cost_attribution import main  # noqa: E402
+from shared.inventory_export import InventoryExport  # noqa: E402
+
+
+def test_dernier_instantane_joint_au_cur(tmp_path, capsys):
+    for day, compliant in ((1, False), (2, True)):
+        snapshot = InventoryExport("scanner", uri=str(tmp_path / "inventaire"))
+        snapshot.begin(account="111")
+        snapshot.add("s3", "logs", {}, (compliant, [] if compliant else ["Owner"], []))
+        snapshot.add("ec2", "i-0abc", {}, (False, ["Owner", "Squad"], []), region="eu-west-1")
+        snapshot.snapshot_at = datetime(2026, 10, day, tzinfo=timezone.utc)
+        snapshot.write()
+    os.makedirs(tmp_path / "cur")
+    pq.write_table(pa.table({
+        "line_item_resource_id": ["logs", "i-0abc", "i-0abc"],
+        "line_item_usage_account_id": ["111"] * 3,
+        "line_item_product_code": ["AmazonS3", "AmazonEC2", "AmazonEC2"],
+        "line_item_unblended_cost": [40.0, 8.0, 2.0],
+    }), tmp_path / "cur" / "part-0.parquet")
+
+    report = tmp_path / "depense.json"
+    assert main(["--inventory", str(tmp_path / "inventaire"), "--cur", str(tmp_path / "cur"),
+                 "--json", str(report)]) == 0
+    data = json.loads(report.read_text())
+    assert data["resources"] == 2  # le bucket n'est plus non conforme au dernier instantané
+    assert data["non_compliant_cost"] == 10.0 and data["by_missing_tag"] == {"Owner": 10.0, "Squad": 10.0}
+    assert "i-0abc" in capsys.readouterr().out
@@ -0,0 +1,74 @@
+"""
+Tests des requêtes sur l'historique d'inventaire (scripts/inventory_query.py).
+
+Vérifie que :
+- Les instantanés aux colonnes de tags différentes sont unifiés (null si absent)
+- Filtres, tags manquants et regroupements donnent les bons comptes
+- --latest ne garde que le dernier instantané de chaque source
+- Le cache Arrow IPC donne le même résultat que la lecture Parquet directe
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), "lambda"))
+
+pytest.importorskip("pyarrow")
+
+from inventory_query import load, main, query  # noqa: E402
+from shared.inventory_export import InventoryExport  # noqa: E402
+
+
+def write_snapshots(root):
+    first = InventoryExport("scanner", uri=str(root))
+    first.begin(policy_version="1", account="111")
+    first.add("ec2", "i-1", {"Owner": "a@example.com"}, (False, ["Squad"], []))
+    first.add("ec2", "i-2", {}, (False, ["Owner", "Squad"], []))
+    first.snapshot_at = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    first.write()
+
+    second = InventoryExport("scanner", uri=str(root))
+    second.begin(policy_version="2", account="111")
+    second.add("ec2", "i-1", {"Owner": "a@example.com", "Squad": "Data"}, (True, [], []))
+    second.add("s3", "logs", {"Squad": "Data"}, (False, ["Owner"], []))
+    second.add("ec2", "i-2", {}, (False, ["Owner", "Squad"], []))
+    second.snapshot_at = datetime(2026, 10, 2, tzinfo=timezone.utc)
+    second.write()
+
+
+def test_schemas_unifies(tmp_path):
+    write_snapshots(tmp_path)
+    table = load([str(tmp_path)])
+    assert table.num_rows == 5
+    assert table.column("tag.Squad").to_pylist().count(None) == 3
+
+
+def test_filtres_regroupements_et_latest(tmp_path):
+    write_snapshots(tmp_path)
+    counts = query([str(tmp_path)], where={"compliant": "false"}, group_by=["type"])
+    assert counts.to_pylist() == [{"type": "ec2", "count": 3}, {"type": "s3", "count": 1}]
+
+    missing = query([str(tmp_path)], missing=["Owner"], group_by=["policy_version"])
+    assert missing.to_pylist() == [{"policy_version": "2", "count": 2}, {"policy_version": "1", "count": 1}]
+
+    latest = query([str(tmp_path)], latest=True, missing=["Squad"])
+    assert latest.column("id").to_pylist() == ["i-2"]
+
+
+def test_cache_ipc(tmp_path, capsys):
+    write_snapshots(tmp_path / "inventaire")
+    cache = tmp_path / "cache"
+    direct = query([str(tmp_path / "inventaire")], group_by=["type", "compliant"])
+    cached = query([str(tmp_path / "inventaire")], group_by=["type", "compliant"], cache_dir=str(cache))
+    assert cached.equals(direct)
+    assert len(os.listdir(cache)) == 2
+
+    assert main([str(tmp_path / "inventaire"), "--where", "type=ec2", "--group-by", "compliant",
+                 "--cache-dir", str(cache), "--csv", str(tmp_path / "out.csv")]) == 0
+    assert "count" in capsys.readouterr().out
+    assert (tmp_path / "out.csv").read_text().splitlines()[0] == '"compliant","count"'
@@ -0,0 +1,104 @@
+"""
+Tests du simulateur de politique hors ligne (scripts/policy_simulator.py).
+
+Vérifie que :
+- L'évaluation en colonnes donne le même verdict que CompiledPolicy.evaluate()
+  (scopes par type / environnement, clés insensibles à la casse, règles de valeur)
+- La période de grâce sépare gelées et supprimées ; les écarts sont comptés par
+  rapport à la référence
+- Les instantanés NDJSON et les résultats de requête Config sont lus
+"""
+
+import os
+import sys
+import json
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), "lambda"))
+
+from policy_simulator import COMPLIANT, Candidate, Inventory, evaluate, main, read_snapshot, simulate  # noqa: E402
+from synthetic_fleet import synthetic_records  # noqa: E402
+from shared.policy import CompiledPolicy  # noqa: E402
+
+NOW = 1_800_000_000.0
+
+POLICY = {
+    "version": "candidate",
+    "case_insensitive_keys": True,
+    "rules": {
+        "Owner": {"format": "email"},
+        "Environment": {"allowed": ["dev", "staging", "prod"], "ignore_case": True},
+    },
+    "required": ["Owner", "Squad", "CostCenter", "Environment"],
+    "scopes": [
+        {"resource_types": ["lambda"], "environments": ["dev"], "required": ["Owner"]},
+        {"resource_types": ["s3"], "required": ["Owner", "Squad"]},
+    ],
+}
+
+
+def records():
+    fleet = synthetic_records(400, compliance_ratio=0.5, seed=7, now=NOW)
+    # Variantes de casse, valeurs invalides, ressource sans tags
+    fleet[0]["tags"] = {"owner": "alice@example.com", "SQUAD": "Data", "CostCenter": "CC-1", "environment": "PROD"}
+    fleet[1]["tags"] = {"Owner": "pas-un-email", "Squad": "Data", "CostCenter": "CC-1", "Environment": "dev"}
+    fleet[2]["tags"] = {}
+    return fleet
+
+
+def test_meme_verdict_que_l_evaluation_unitaire():
+    fleet = records()
+    policy = CompiledPolicy(POLICY)
+    status, missing = evaluate(Inventory(fleet), Candidate("candidate", POLICY, grace_hours=24), NOW)
+
+    expected = [policy.evaluate(r["tags"], r["type"]) for r in fleet]
+    assert [s != COMPLIANT for s in status] == [not e.compliant for e in expected]
+    assert sum(missing.values()) == sum(len(e.missing) for e in expected)
+    assert status[0] == COMPLIANT and status[1] != COMPLIANT
+
+
+def test_grace_et_ecarts_par_rapport_a_la_reference():
+    fleet = [
+        {"id": "old", "type": "ec2", "account": "111", "created_at": NOW - 48 * 3600,
+         "tags": {"Owner": "a@example.com", "Squad": "Data"}},
+        {"id": "new", "type": "ec2", "account": "222", "created_at": NOW - 3600,
+         "tags": {"Owner": "a@example.com", "Squad": "Data"}},
+        {"id": "unknown", "type": "s3", "account": "222", "tags": {"Squad": "Growth"}},
+    ]
+    baseline = Candidate("current", {"version": "1", "required": ["Owner"]}, grace_hours=24)
+    stricter = Candidate("strict", {"version": "2", "required": ["Owner", "CostCenter"], "grace_period_hours": 72},
+                         grace_hours=24)
+
+    result = simulate(Inventory(fleet), [stricter], baseline, now=NOW)
+    assert result["baseline"]["frozen"] == 1 and result["baseline"]["deleted"] == 1  # sans date : supprimable
+    report = result["candidates"][0]
+    assert report["grace_period_hours"] == 72
+    assert (report["frozen"], report["deleted"]) == (3, 1)  # 48 h < 72 h de grâce
+    assert (report["newly_frozen"], report["newly_deleted"], report["released"]) == (2, 0, 0)
+    assert report["by_squad"]["Data"] == {"frozen": 2, "deleted": 0, "newly_frozen": 2, "newly_deleted": 0}
+    assert report["by_account"]["222"]["frozen"] == 2
+    assert report["missing_tags"] == {"CostCenter": 3, "Owner": 1}
+
+
+def test_instantanes_ndjson_et_config(tmp_path, capsys):
+    ndjson = tmp_path / "inventaire.ndjson"
+    ndjson.write_text("\n".join(json.dumps(r) for r in records()[:10]) + "\n")
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"Results": [json.dumps({
+        "resourceId": "i-0abc", "resourceType": "AWS::EC2::Instance", "arn": "arn:aws:ec2:eu-west-1:111:instance/i-0abc",
+        "accountId": "111", "awsRegion": "eu-west-1", "resourceCreationTime": "2026-01-01T00:00:00Z",
+        "tags": [{"key": "Owner", "value": "a@example.com"}],
+    }), json.dumps({"resourceId": "vpc-1", "resourceType": "AWS::EC2::VPC"})]}, indent=2))
+
+    assert len(list(read_snapshot(str(ndjson)))) == 10
+    (record,) = read_snapshot(str(config))
+    assert record["type"] == "ec2" and record["tags"] == {"Owner": "a@example.com"}
+
+    policy = tmp_path / "candidate.json"
+    policy.write_text(json.dumps(POLICY))
+    report = tmp_path / "rapport.json"
+    assert main(["--snapshot", str(ndjson), "--snapshot", str(config), "--policy", str(policy),
+                 "--json", str(report)]) == 0
+    assert json.loads(report.read_text())["candidates"][0]["resources"] == 11
+    assert "candidate.json" in capsys.readouterr().out
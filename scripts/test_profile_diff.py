@@ -0,0 +1,43 @@
+"""
+Tests de la comparaison de profils (scripts/profile_diff.py).
+"""
+
+import os
+import sys
+import json
+import cProfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import profile_diff  # noqa: E402
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def write_profile(path, n, peak_mb):
+    profiler = cProfile.Profile()
+    profiler.runcall(busy, n)
+    profiler.dump_stats(str(path))
+    alloc = {"wall_seconds": 0.1, "peak_mb": peak_mb,
+             "top_allocations": [{"site": "handler.py:10", "size_kb": peak_mb * 1024, "count": 1}]}
+    path.with_name(path.name.replace(".prof", ".alloc.json")).write_text(json.dumps(alloc))
+
+
+def test_diff_de_profils(tmp_path):
+    base, current = tmp_path / "base.prof", tmp_path / "current.prof"
+    write_profile(base, 1_000, 1.0)
+    write_profile(current, 300_000, 3.0)
+
+    rows = profile_diff.diff_functions(profile_diff.load_functions(str(base)),
+                                       profile_diff.load_functions(str(current)), sort="cumtime")
+    busy_row = next(r for r in rows if r["function"].endswith("(busy)"))
+    assert busy_row["calls"] == [1, 1] and busy_row["delta"] > 0
+    assert [abs(r["delta"]) for r in rows] == sorted((abs(r["delta"]) for r in rows), reverse=True)
+
+    allocations = profile_diff.diff_allocations(profile_diff.load_allocations(str(base)),
+                                                profile_diff.load_allocations(str(current)))
+    assert allocations["peak_mb"] == [1.0, 3.0]
+    assert allocations["sites"][0] == {"site": "handler.py:10", "size_kb": [1024.0, 3072.0], "delta_kb": 2048.0}
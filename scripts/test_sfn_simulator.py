@@ -0,0 +1,140 @@
+"""
+Tests du simulateur Step Functions (scripts/sfn_simulator.py).
+
+Vérifie que :
+- Retry avance l'horloge virtuelle selon le backoff, puis Catch prend le relais
+- Map distribué + ItemBatcher + filtre JSONPath reproduisent le pipeline par lots
+- waitForTaskToken reprend sur SendTaskSuccess ou échoue en States.Timeout
+- Le vrai pipeline par ressource tourne de bout en bout contre moto
+"""
+
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sfn_simulator import LAMBDA_INVOKE_TOKEN, Simulator, TaskFailed, get_path  # noqa: E402
+
+
+def test_retry_backoff_puis_catch():
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        raise TaskFailed("Lambda.ServiceException", "indisponible")
+
+    definition = {
+        "StartAt": "Appel",
+        "States": {
+            "Appel": {
+                "Type": "Task",
+                "Resource": "flaky",
+                "Parameters": {"id.$": "$.id", "etat.$": "$$.State.Name"},
+                "Retry": [{"ErrorEquals": ["Lambda.ServiceException"], "IntervalSeconds": 30, "MaxAttempts": 3, "BackoffRate": 2}],
+                "Catch": [{"ErrorEquals": ["States.ALL"], "ResultPath": "$.error", "Next": "Echec"}],
+                "End": True,
+            },
+            "Echec": {"Type": "Pass", "End": True},
+        },
+    }
+    sim = Simulator(definition, {"flaky": flaky})
+    execution = sim.start_execution({"id": "r-1"})
+    sim.run()
+
+    assert len(calls) == 4 and calls[0] == {"id": "r-1", "etat": "Appel"}
+    assert execution.status == "SUCCEEDED"
+    assert execution.duration == 30 + 60 + 120
+    assert execution.output["error"]["Error"] == "Lambda.ServiceException"
+
+
+def test_map_distribue_par_lots_et_filtre():
+    def check(payload):
+        return {"items": [{**r, "ok": r["n"] % 2 == 0} for r in payload["resources"]]}
+
+    definition = {
+        "StartAt": "Lots",
+        "States": {
+            "Lots": {
+                "Type": "Map",
+                "ItemsPath": "$.resources",
+                "ItemBatcher": {"MaxItemsPerBatchPath": "$.batch_size"},
+                "ItemProcessor": {
+                    "ProcessorConfig": {"Mode": "DISTRIBUTED"},
+                    "StartAt": "Check",
+                    "States": {
+                        "Check": {"Type": "Task", "Resource": "check", "Parameters": {"resources.$": "$.Items"}, "Next": "Pause"},
+                        "Pause": {"Type": "Wait", "Seconds": 100, "Next": "Garder"},
+                        "Garder": {"Type": "Pass", "Parameters": {"ok.$": "$.items[?(@.ok == true)]"}, "End": True},
+                    },
+                },
+                "End": True,
+            },
+        },
+    }
+    sim = Simulator(definition, {"check": check})
+    execution = sim.start_execution({"resources": [{"n": i} for i in range(10)], "batch_size": 4})
+    sim.run()
+
+    assert sim.child_executions == 3 and sim.invocations["check"] == 3
+    # Les lots attendent en parallèle sur l'horloge virtuelle
+    assert execution.duration == 100
+    kept = [r["n"] for batch in execution.output for r in batch["ok"]]
+    assert kept == [0, 2, 4, 6, 8]
+
+
+@pytest.mark.parametrize("wake_at,status,duration", [(3600, "SUCCEEDED", 3600), (None, "FAILED", 7200)])
+def test_attente_par_jeton(wake_at, status, duration):
+    tokens = []
+    definition = {
+        "StartAt": "Attente",
+        "States": {
+            "Attente": {
+                "Type": "Task",
+                "Resource": LAMBDA_INVOKE_TOKEN,
+                "Parameters": {"FunctionName": "register", "Payload": {"token.$": "$$.Task.Token"}},
+                "TimeoutSeconds": 7200,
+                "ResultPath": "$.wake",
+                "End": True,
+            },
+        },
+    }
+    sim = Simulator(definition, {"register": lambda payload: tokens.append(payload["token"])})
+    execution = sim.start_execution({})
+    if wake_at:
+        sim.schedule(wake_at, lambda: sim.send_task_success(taskToken=tokens[0], output='{"woken": true}'))
+    sim.run()
+
+    assert execution.status == status and execution.duration == duration
+    if wake_at:
+        assert get_path(execution.output, "$.wake.woken") is True
+    else:
+        assert execution.error == "States.Timeout"
+
+
+def test_pipeline_par_ressource_de_bout_en_bout(monkeypatch):
+    import bench_pipeline
+
+    for name, value in bench_pipeline.BENCH_ENV.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("IDEMPOTENCY_TABLE", raising=False)
+    monkeypatch.delenv("WAIT_TOKEN_TABLE", raising=False)
+    with mock_aws():
+        topic = boto3.client("sns", region_name=bench_pipeline.REGION).create_topic(Name="governance")["TopicArn"]
+        monkeypatch.setenv("SNS_TOPIC_ARN", topic)
+        resources = bench_pipeline.create_fleet(4)
+        summary = bench_pipeline.simulate("per_resource", resources, fixed_ratio=0.25, fix_after_hours=6)
+
+    assert summary["status"] == {"SUCCEEDED": 4}
+    assert summary["early_wakeups"] == 1
+    # Corrigée à H+6 : réveil immédiat ; les autres vont jusqu'à la suppression (J+4)
+    assert summary["virtual_duration_seconds"]["min"] == 6 * 3600
+    assert summary["virtual_duration_seconds"]["max"] == 96 * 3600
+    assert summary["states"]["DeleteResource"]["entries"] == 3
+    assert summary["states"]["ResumeResource"]["entries"] == 1
+    # Budget d'appels AWS : non corrigée = 4 lectures de tags (AwaitTagFix + CheckCompliance
+    # à J0 et J2) + 2 notifications ; corrigée = 2 lectures + notification J0
+    assert summary["api_calls_total"] == 3 * 6 + 3
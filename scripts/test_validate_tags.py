@@ -0,0 +1,126 @@
+"""
+Tests de la validation en masse des tags (scripts/validate_tags.py) sur moto.
+
+Vérifie que :
+- Les ARN sont regroupés par région en lots de 100 (un appel GetResources par lot)
+- Un ARN absent de la réponse est rapporté "untagged", une valeur hors règle "invalid"
+- Les trois formats de rapport et les codes de sortie pour le gating
+"""
+
+import os
+import sys
+import csv
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), "lambda"))
+
+import validate_tags  # noqa: E402
+from shared.policy import CompiledPolicy  # noqa: E402
+
+REGION = "us-east-1"
+# Règles de valeur : la politique par défaut ne vérifie que la présence
+STRICT_POLICY = os.path.join(os.path.dirname(SCRIPTS_DIR), "docs", "tag_policy.strict.example.json")
+COMPLIANT = {"Owner": "alice@example.com", "Squad": "data", "CostCenter": "CC-1234", "Environment": "dev"}
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+    with mock_aws():
+        yield boto3.client("s3", region_name=REGION)
+
+
+def create_bucket(s3, name, tags=None):
+    s3.create_bucket(Bucket=name)
+    if tags:
+        s3.put_bucket_tagging(Bucket=name, Tagging={"TagSet": [{"Key": k, "Value": v} for k, v in tags.items()]})
+    return f"arn:aws:s3:::{name}"
+
+
+def test_lots_par_region():
+    arns = [f"arn:aws:ec2:eu-west-1:123456789012:instance/i-{i:08x}" for i in range(250)]
+    arns += ["arn:aws:s3:::bucket-global"]
+
+    jobs = validate_tags.batches(arns, default_region=REGION)
+
+    assert [(j["region"], len(j["arns"])) for j in jobs] == [("eu-west-1", 100), ("eu-west-1", 100),
+                                                             ("eu-west-1", 50), (REGION, 1)]
+
+
+def test_validation_par_lots(aws, tmp_path):
+    arns = [create_bucket(aws, f"ok-{i}", COMPLIANT) for i in range(150)]
+    invalid = create_bucket(aws, "invalid", {**COMPLIANT, "CostCenter": "1234"})
+    untagged = create_bucket(aws, "untagged")
+    arns_file = tmp_path / "arns.txt"
+    arns_file.write_text("\n".join(arns + [invalid, untagged, arns[0]]) + "\n")
+    report = tmp_path / "report.json"
+
+    requested = []
+
+    def spying_client(region):
+        client = boto3.client("resourcegroupstaggingapi", region_name=region)
+        client.meta.events.register("provide-client-params.*.GetResources",
+                                    lambda params, **kw: requested.append(tuple(params["ResourceARNList"])))
+        return client
+
+    validator = validate_tags.Validator(policy=CompiledPolicy.from_file(STRICT_POLICY), client_factory=spying_client)
+    code = validate_tags.main(["--arns-file", str(arns_file), "--output", str(report), "--quiet"], validator=validator)
+
+    # 152 ARN uniques → 2 lots (moto pagine en plus sur tout le compte, d'où des pages répétées)
+    assert len(set(requested)) == 2
+    assert max(len(batch) for batch in requested) == 100
+    assert code == validate_tags.EXIT_NON_COMPLIANT
+    data = json.loads(report.read_text())
+    assert data["summary"]["total"] == 152
+    assert data["summary"]["non_compliant"] == 2
+    assert data["summary"]["untagged"] == 1
+    by_arn = {r["arn"]: r for r in data["resources"]}
+    assert by_arn[invalid]["invalid_tags"] == ["CostCenter"]
+    assert by_arn[untagged]["status"] == "untagged"
+    assert by_arn[untagged]["missing_tags"] == ["Owner", "Squad", "CostCenter", "Environment"]
+
+    assert validate_tags.main(["--arns-file", str(arns_file), "--max-non-compliant", "2", "--quiet",
+                               "--output", str(report)]) == validate_tags.EXIT_OK
+
+
+def test_enumeration_et_formats(aws, tmp_path):
+    create_bucket(aws, "conforme", COMPLIANT)
+    create_bucket(aws, "sans-squad", {k: v for k, v in COMPLIANT.items() if k != "Squad"})
+
+    csv_report = tmp_path / "report.csv"
+    assert validate_tags.main(["--all", "--format", "csv", "--output", str(csv_report), "--quiet"]) == 1
+    rows = list(csv.DictReader(csv_report.open()))
+    assert [(r["arn"], r["missing_tags"]) for r in rows] == [("arn:aws:s3:::conforme", ""),
+                                                           ("arn:aws:s3:::sans-squad", "Squad")]
+
+    ndjson_report = tmp_path / "report.ndjson"
+    validate_tags.main(["--all", "--resource-type", "s3", "--format", "ndjson", "--output", str(ndjson_report), "--quiet"])
+    records = [json.loads(line) for line in ndjson_report.read_text().splitlines()]
+    assert {r["status"] for r in records} == {"compliant", "non_compliant"}
+    assert all(r["policy_version"] for r in records)
+
+
+def test_erreur_api_code_de_sortie(aws, tmp_path):
+    class Failing:
+        def get_resources(self, **kwargs):
+            raise RuntimeError("AccessDenied")
+
+    validator = validate_tags.Validator(client_factory=lambda region: Failing())
+    code = validate_tags.main(["--arn", "arn:aws:s3:::x", "--output", str(tmp_path / "r.json"), "--quiet"],
+                              validator=validator)
+
+    assert code == validate_tags.EXIT_API_ERROR
+    assert json.loads((tmp_path / "r.json").read_text())["summary"]["errors"][0]["error"] == "AccessDenied"
+
+
+def test_usage_incorrect():
+    with pytest.raises(SystemExit) as exc:
+        validate_tags.parse_args([])
+    assert exc.value.code == validate_tags.EXIT_USAGE
@@ -0,0 +1,283 @@
+"""
+Validation en masse des tags de ressources AWS existantes (remplace validate-tags.sh).
+
+Même politique que les Lambdas (shared/policy.py : tags obligatoires, règles de
+valeur, scopes par type), deux modes d'entrée :
+
+- liste d'ARN (--arn, --arns-file, stdin) : regroupés par région puis par lots
+  de 100 (maximum de GetResources), lots traités en parallèle
+- énumération (--all) : pagination complète de GetResources, régions en parallèle,
+  filtrable par type (--resource-type ec2:instance)
+
+L'API de tagging ne renvoie que les ressources qui ont (ou ont eu) des tags : un
+ARN demandé mais absent de la réponse est rapporté "untagged" (tous les tags
+manquants). En mode --all, les ressources jamais taguées n'apparaissent pas.
+
+Codes de sortie (gating de pipeline) :
+    0  toutes les ressources sont conformes (ou au plus --max-non-compliant)
+    1  ressources non conformes au-delà du seuil
+    2  usage incorrect
+    3  erreurs API (rapport partiel, prioritaire sur 1)
+
+Usage :
+    python scripts/validate_tags.py --all --regions eu-west-1 us-east-1
+    python scripts/validate_tags.py --arns-file arns.txt --format csv --output rapport.csv
+    aws ... --output text | python scripts/validate_tags.py --arns-file - --format ndjson
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+
+from shared.policy import get_policy  # noqa: E402
+from shared.ratelimit import limited_client  # noqa: E402
+from shared.workers import bounded_map  # noqa: E402
+
+BATCH_SIZE = 100  # maximum de ResourceARNList par appel GetResources
+FIELDS = ["arn", "resource_type", "region", "status", "compliant", "missing_tags", "invalid_tags", "policy_version"]
+
+EXIT_OK, EXIT_NON_COMPLIANT, EXIT_USAGE, EXIT_API_ERROR = 0, 1, 2, 3
+
+
+# ========================================
+# ARN
+# ========================================
+
+def arn_region(arn: str) -> str:
+    parts = arn.split(":", 5)
+    return parts[3] if len(parts) == 6 else ""
+
+
+def arn_resource_type(arn: str) -> str:
+    """Type au sens de la politique (ec2, rds, s3, lambda…) — le service de l'ARN."""
+    parts = arn.split(":", 5)
+    return parts[2] if len(parts) == 6 else ""
+
+
+def read_arns(paths: Iterable[str], arns: Iterable[str]) -> List[str]:
+    """ARN uniques, dans l'ordre : arguments --arn puis fichiers ("-" = stdin), un ou plusieurs par ligne."""
+    seen = dict.fromkeys(a for a in arns if a)
+    for path in paths:
+        with nullcontext(sys.stdin) if path == "-" else open(path) as f:
+            for line in f:
+                for arn in line.split():
+                    if not arn.startswith("#"):
+                        seen.setdefault(arn, None)
+    return list(seen)
+
+
+def batches(arns: List[str], default_region: str, size: int = BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Lots de GetResources : un lot ne mélange jamais deux régions (l'API est régionale)."""
+    by_region: Dict[str, List[str]] = defaultdict(list)
+    for arn in arns:
+        by_region[arn_region(arn) or default_region].append(arn)
+    return [
+        {"region": region, "arns": region_arns[i:i + size]}
+        for region, region_arns in by_region.items()
+        for i in range(0, len(region_arns), size)
+    ]
+
+
+# ========================================
+# ÉVALUATION
+# ========================================
+
+def evaluate(arn: str, tags: Optional[List[Dict[str, str]]], region: str, policy) -> Dict[str, Any]:
+    resource_type = arn_resource_type(arn)
+    result = policy.evaluate(tags, resource_type)
+    if tags is None:
+        status = "untagged"
+    else:
+        status = "compliant" if result.compliant else "non_compliant"
+    return {
+        "arn": arn,
+        "resource_type": resource_type,
+        "region": region,
+        "status": status,
+        "compliant": result.compliant,
+        "missing_tags": result.missing,
+        "invalid_tags": result.invalid,
+        "policy_version": policy.version,
+    }
+
+
+class Validator:
+    """Appels GetResources (un client limité par région, partagé entre threads) et évaluation."""
+
+    def __init__(self, policy=None, client_factory=None):
+        self.policy = policy or get_policy()
+        self._client_factory = client_factory or (lambda region: limited_client("resourcegroupstaggingapi", region_name=region))
+        self._clients: Dict[str, Any] = {}
+
+    def client(self, region: str):
+        # Clients créés par prepare() dans le thread principal : les workers ne font que lire
+        if region not in self._clients:
+            self._clients[region] = self._client_factory(region)
+        return self._clients[region]
+
+    def prepare(self, regions: Iterable[str]):
+        for region in regions:
+            self.client(region)
+
+    def validate_batch(self, batch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        region, arns = batch["region"], batch["arns"]
+        # Même avec ResourceARNList, la réponse peut être paginée (PaginationToken)
+        found = {}
+        params = {"ResourceARNList": arns}
+        while True:
+            resp = self.client(region).get_resources(**params)
+            found.update((m["ResourceARN"], m.get("Tags", [])) for m in resp.get("ResourceTagMappingList", []))
+            if not resp.get("PaginationToken"):
+                break
+            params["PaginationToken"] = resp["PaginationToken"]
+        return [evaluate(arn, found.get(arn), region, self.policy) for arn in arns]
+
+    def enumerate_region(self, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        region = job["region"]
+        params = {"ResourcesPerPage": BATCH_SIZE}
+        if job.get("resource_types"):
+            params["ResourceTypeFilters"] = job["resource_types"]
+        records = []
+        for page in self.client(region).get_paginator("get_resources").paginate(**params):
+            for mapping in page.get("ResourceTagMappingList", []):
+                records.append(evaluate(mapping["ResourceARN"], mapping.get("Tags", []), region, self.policy))
+        return records
+
+
+def validate(validator: Validator, jobs: List[Dict[str, Any]], fn, workers: int):
+    """Exécute fn (validate_batch ou enumerate_region) sur chaque job ; un job en échec n'arrête pas les autres."""
+    validator.prepare({job["region"] for job in jobs})
+    records, errors = [], []
+    for outcome in bounded_map(fn, jobs, max_workers=workers):
+        if outcome.error is not None:
+            errors.append({"region": outcome.item["region"], "arns": len(outcome.item.get("arns", [])),
+                           "error": str(outcome.error)})
+        else:
+            records.extend(outcome.result)
+    records.sort(key=lambda r: r["arn"])
+    return records, errors
+
+
+# ========================================
+# RAPPORTS
+# ========================================
+
+def write_report(records: List[Dict[str, Any]], fmt: str, out, summary: Dict[str, Any]):
+    if fmt == "json":
+        json.dump({"summary": summary, "resources": records}, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+    elif fmt == "ndjson":
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        writer = csv.DictWriter(out, fieldnames=FIELDS, lineterminator="\n")
+        writer.writeheader()
+        for record in records:
+            writer.writerow({**record,
+                             "missing_tags": " ".join(record["missing_tags"]),
+                             "invalid_tags": " ".join(record["invalid_tags"])})
+
+
+def summarize(records: List[Dict[str, Any]], errors: List[Dict[str, Any]], policy_version: str) -> Dict[str, Any]:
+    statuses = Counter(r["status"] for r in records)
+    missing = Counter(tag for r in records for tag in r["missing_tags"])
+    invalid = Counter(tag for r in records for tag in r["invalid_tags"])
+    return {
+        "policy_version": policy_version,
+        "total": len(records),
+        "compliant": statuses["compliant"],
+        "non_compliant": len(records) - statuses["compliant"],
+        "untagged": statuses["untagged"],
+        "missing_tags": dict(missing.most_common()),
+        "invalid_tags": dict(invalid.most_common()),
+        "errors": errors,
+    }
+
+
+def print_summary(summary: Dict[str, Any], out=sys.stderr):
+    print(f"Validation des tags (politique {summary['policy_version']})", file=out)
+    print("-" * 60, file=out)
+    print(f"Ressources     : {summary['total']}", file=out)
+    print(f"Conformes      : {summary['compliant']}", file=out)
+    print(f"Non conformes  : {summary['non_compliant']} (dont {summary['untagged']} sans aucun tag)", file=out)
+    for label, key in (("Tags manquants", "missing_tags"), ("Tags invalides", "invalid_tags")):
+        if summary[key]:
+            print(f"{label} : " + ", ".join(f"{t}={n}" for t, n in summary[key].items()), file=out)
+    for error in summary["errors"]:
+        print(f"ERREUR {error['region']} : {error['error']}", file=out)
+
+
+def exit_code(summary: Dict[str, Any], max_non_compliant: int) -> int:
+    if summary["errors"]:
+        return EXIT_API_ERROR
+    if summary["non_compliant"] > max_non_compliant:
+        return EXIT_NON_COMPLIANT
+    return EXIT_OK
+
+
+# ========================================
+# CLI
+# ========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_argument_group("ressources")
+    source.add_argument("--arn", action="append", default=[], help="ARN à valider (répétable)")
+    source.add_argument("--arns-file", action="append", default=[], help="Fichier d'ARN, '-' pour stdin")
+    source.add_argument("--all", action="store_true", help="Énumère toutes les ressources taguées")
+    source.add_argument("--resource-type", action="append", default=[],
+                        help="Filtre --all, ex. ec2:instance, s3, lambda:function (répétable)")
+    parser.add_argument("--regions", nargs="+", help="Régions pour --all (défaut : région courante)")
+    parser.add_argument("--workers", type=int, default=8, help="Appels GetResources en parallèle")
+    parser.add_argument("--format", choices=["json", "csv", "ndjson"], default="json")
+    parser.add_argument("--output", help="Fichier de rapport (défaut : stdout)")
+    parser.add_argument("--max-non-compliant", type=int, default=0,
+                        help="Nombre de ressources non conformes toléré avant un code de sortie 1")
+    parser.add_argument("--quiet", action="store_true", help="Pas de résumé sur stderr")
+    args = parser.parse_args(argv)
+    if not args.all and not args.arn and not args.arns_file:
+        parser.error("indiquer --all, --arn ou --arns-file")
+    if args.all and (args.arn or args.arns_file):
+        parser.error("--all est incompatible avec --arn/--arns-file")
+    return args
+
+
+def default_region() -> str:
+    import boto3
+
+    return boto3.session.Session().region_name or os.environ.get("AWS_REGION", "us-east-1")
+
+
+def main(argv=None, validator: Optional[Validator] = None) -> int:
+    args = parse_args(argv)
+    validator = validator or Validator()
+    region = default_region()
+
+    if args.all:
+        jobs = [{"region": r, "resource_types": args.resource_type} for r in (args.regions or [region])]
+        records, errors = validate(validator, jobs, validator.enumerate_region, args.workers)
+    else:
+        jobs = batches(read_arns(args.arns_file, args.arn), region)
+        records, errors = validate(validator, jobs, validator.validate_batch, args.workers)
+
+    summary = summarize(records, errors, validator.policy.version)
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            write_report(records, args.format, out, summary)
+    else:
+        write_report(records, args.format, sys.stdout, summary)
+    if not args.quiet:
+        print_summary(summary)
+    return exit_code(summary, args.max_non_compliant)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,15 @@ module "cleanup_lambda" {
 
   environment = "prod"
 
+  # Module shared/ (config, rate limiter...) fourni par le pipeline de gouvernance
+  shared_layer_arn = module.governance_pipeline.shared_layer_arn
+
+  # Politique de tags centralisée (SSM), relue à chaud
+  tag_policy_parameter = module.governance_pipeline.tag_policy_parameter_name
+
+  # Cache de tags partagé avec le scanner, invalidé par le controller
+  tag_cache_table = module.governance_pipeline.tag_cache_table_name
+
   # Grace period étendue en prod (48h)
   grace_period_hours = 48
 
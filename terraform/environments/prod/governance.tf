@@ -17,6 +17,9 @@ module "governance_pipeline" {
 
   # Logs 30 jours en prod
   log_retention_days = 30
+
+  # "batch" : une exécution Step Functions par lot de ressources au lieu d'une par ressource
+  pipeline_mode = "per_resource"
 }
 
 output "governance_state_machine_arn" {
@@ -24,6 +27,11 @@ output "governance_state_machine_arn" {
   value       = module.governance_pipeline.state_machine_arn
 }
 
+output "governance_batch_state_machine_arn" {
+  description = "ARN de la state machine du pipeline par lots"
+  value       = module.governance_pipeline.batch_state_machine_arn
+}
+
 output "governance_mode" {
   description = "Mode de fonctionnement actuel"
   value       = module.governance_pipeline.dry_run_mode
@@ -72,7 +72,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         Effect = "Allow"
         Action = [
@@ -82,11 +82,13 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "rds:ListTagsForResource",
           "s3:ListAllMyBuckets",
           "s3:GetBucketTagging",
+          "s3:GetBucketLocation",
           "lambda:ListFunctions",
           "lambda:ListTags",
           "tag:GetResources",
           "tag:GetTagKeys",
-          "tag:GetTagValues"
+          "tag:GetTagValues",
+          "cloudwatch:GetMetricStatistics"
         ]
         Resource = "*" # Ces actions de lecture nécessitent souvent "*"
       },
@@ -97,7 +99,11 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "rds:DeleteDBInstance",
           "s3:DeleteBucket",
           "s3:DeleteObject",
+          "s3:DeleteObjectVersion",
           "s3:ListBucket",
+          "s3:ListBucketVersions",
+          "s3:GetLifecycleConfiguration",
+          "s3:PutLifecycleConfiguration",
           "lambda:DeleteFunction",
           "sns:Publish"
         ]
@@ -109,7 +115,44 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "arn:aws:sns:${var.aws_region}:${data.aws_caller_identity.current.account_id}:${local.lambda_name}-notifications"
         ]
       }
-    ]
+      ], var.purge_checkpoint_bucket == "" ? [] : [
+      {
+        # Checkpoints de purge S3 (reprise des gros buckets entre deux invocations)
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+          "s3:DeleteObject"
+        ]
+        Resource = "arn:aws:s3:::${var.purge_checkpoint_bucket}/governance/purge-checkpoints/*"
+      }
+      ], var.inventory_source != "config" ? [] : [
+      {
+        # Inventaire AWS Config (INVENTORY_SOURCE=config) — lecture seule
+        Effect = "Allow"
+        Action = [
+          "config:SelectResourceConfig",
+          "config:SelectAggregateResourceConfig",
+          "config:DescribeConfigurationRecorders",
+          "config:DescribeConfigurationRecorderStatus"
+        ]
+        Resource = "*"
+      }
+      ], var.tag_policy_parameter == "" ? [] : [
+      {
+        # Politique de tags partagée (paramètre SSM du pipeline de gouvernance)
+        Effect   = "Allow"
+        Action   = ["ssm:GetParameter"]
+        Resource = "arn:aws:ssm:${var.aws_region}:${data.aws_caller_identity.current.account_id}:parameter${var.tag_policy_parameter}"
+      }
+      ], var.tag_cache_table == "" ? [] : [
+      {
+        # Cache de tags partagé (table DynamoDB du pipeline de gouvernance)
+        Effect   = "Allow"
+        Action   = ["dynamodb:Scan", "dynamodb:BatchWriteItem"]
+        Resource = "arn:aws:dynamodb:${var.aws_region}:${data.aws_caller_identity.current.account_id}:table/${var.tag_cache_table}"
+      }
+    ])
   })
 }
 
@@ -134,12 +177,31 @@ resource "aws_lambda_function" "cleanup" {
   runtime          = "python3.11"
   timeout          = 300 # 5 minutes
   memory_size      = 256
+  layers           = [var.shared_layer_arn]
 
   environment {
     variables = {
-      GRACE_PERIOD_HOURS = var.grace_period_hours
-      DRY_RUN            = var.dry_run ? "true" : "false"
-      SNS_TOPIC_ARN      = aws_sns_topic.cleanup_notifications.arn
+      GRACE_PERIOD_HOURS        = var.grace_period_hours
+      DRY_RUN                   = var.dry_run ? "true" : "false"
+      SNS_TOPIC_ARN             = aws_sns_topic.cleanup_notifications.arn
+      API_RATE_LIMITS           = jsonencode(var.api_rate_limits)
+      PROFILING_SAMPLE_RATE     = tostring(var.profiling_sample_rate)
+      PROFILING_OUTPUT          = var.profiling_output
+      TAG_CHECK_CONCURRENCY     = tostring(var.tag_check_concurrency)
+      DELETE_CONCURRENCY        = jsonencode(var.delete_concurrency)
+      PURGE_LIST_WORKERS        = tostring(var.purge_list_workers)
+      PURGE_DELETE_WORKERS      = tostring(var.purge_delete_workers)
+      PURGE_LIFECYCLE_THRESHOLD = tostring(var.purge_lifecycle_threshold)
+      PURGE_CHECKPOINT_BUCKET   = var.purge_checkpoint_bucket
+      # Vide : politique embarquée dans le layer shared/
+      TAG_POLICY_SOURCE      = var.tag_policy_parameter == "" ? "" : "ssm:${var.tag_policy_parameter}"
+      TAG_POLICY_TTL_SECONDS = tostring(var.tag_policy_ttl_seconds)
+      INVENTORY_SOURCE       = var.inventory_source
+      CONFIG_AGGREGATOR_NAME = var.config_aggregator_name
+      # Vide : cache en mémoire du conteneur
+      TAG_CACHE_TABLE                = var.tag_cache_table
+      TAG_CACHE_TTL_SECONDS          = tostring(var.tag_cache_ttl_seconds)
+      TAG_CACHE_FULL_REFRESH_SECONDS = tostring(var.tag_cache_full_refresh_seconds)
     }
   }
 
@@ -45,3 +45,109 @@ variable "log_retention_days" {
   type        = number
   default     = 7
 }
+
+variable "shared_layer_arn" {
+  description = "ARN du layer Lambda contenant le module shared/ (output shared_layer_arn du module governance-pipeline)"
+  type        = string
+}
+
+variable "api_rate_limits" {
+  description = "Budget d'appels API par seconde pour cette Lambda (clés \"service\" ou \"service.Operation\", ex: { ec2 = 20 })"
+  type        = map(number)
+  default     = {}
+}
+
+variable "tag_check_concurrency" {
+  description = "Nombre de vérifications de tags (list_tags) menées en parallèle"
+  type        = number
+  default     = 8
+}
+
+variable "delete_concurrency" {
+  description = "Suppressions parallèles max par service, surcharge les défauts (ex: { ec2 = 8, rds = 2, s3 = 2, lambda = 4 })"
+  type        = map(number)
+  default     = {}
+}
+
+variable "purge_list_workers" {
+  description = "Purge S3 : nombre de shards (préfixes) listés en parallèle"
+  type        = number
+  default     = 4
+}
+
+variable "purge_delete_workers" {
+  description = "Purge S3 : nombre de lots delete_objects (1000 clés) envoyés en parallèle"
+  type        = number
+  default     = 8
+}
+
+variable "purge_lifecycle_threshold" {
+  description = "Purge S3 : au-delà de ce nombre d'objets, une règle lifecycle d'expiration remplace la suppression clé par clé"
+  type        = number
+  default     = 5000000
+}
+
+variable "purge_checkpoint_bucket" {
+  description = "Bucket où sauvegarder les checkpoints de purge (vide = checkpoints en mémoire, perdus entre deux démarrages à froid)"
+  type        = string
+  default     = ""
+}
+
+variable "profiling_sample_rate" {
+  description = "Fraction des invocations profilées (cProfile + tracemalloc), 0 = désactivé"
+  type        = number
+  default     = 0
+}
+
+variable "profiling_output" {
+  description = "Destination des profils : chemin local (défaut /tmp/profiles) ou s3://bucket/prefix (s3:PutObject requis)"
+  type        = string
+  default     = ""
+}
+
+variable "tag_policy_parameter" {
+  description = "Paramètre SSM de la politique de tags (output tag_policy_parameter_name du pipeline), vide = politique embarquée"
+  type        = string
+  default     = ""
+}
+
+variable "tag_policy_ttl_seconds" {
+  description = "Intervalle minimal (secondes) entre deux relectures de la politique de tags dans un conteneur chaud"
+  type        = number
+  default     = 300
+}
+
+variable "inventory_source" {
+  description = "Source de l'inventaire : live (Describe/List) ou config (requêtes avancées AWS Config, repli live par type)"
+  type        = string
+  default     = "live"
+
+  validation {
+    condition     = contains(["live", "config"], var.inventory_source)
+    error_message = "inventory_source doit valoir live ou config."
+  }
+}
+
+variable "config_aggregator_name" {
+  description = "Agrégateur AWS Config multi-comptes / multi-régions (vide = Config du compte courant)"
+  type        = string
+  default     = ""
+}
+
+variable "tag_cache_table" {
+  description = "Table DynamoDB du cache de tags (output tag_cache_table_name du pipeline), vide = cache en mémoire du conteneur"
+  type        = string
+  default     = ""
+}
+
+variable "tag_cache_ttl_seconds" {
+  description = "Durée de validité (secondes) d'une entrée du cache de tags RDS / Lambda, 0 = cache désactivé"
+  type        = number
+  default     = 21600
+}
+
+variable "tag_cache_full_refresh_seconds" {
+  description = "Intervalle (secondes) entre deux relectures complètes des tags, sans cache (0 = jamais)"
+  type        = number
+  default     = 86400
+}
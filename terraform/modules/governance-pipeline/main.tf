@@ -8,6 +8,10 @@ locals {
     Squad       = "Platform"
     CostCenter  = "INFRA"
   }
+
+  # Index de tags (tag_index_uri = s3://bucket/prefix) : bucket et objets des segments
+  tag_index_path   = trimsuffix(trimprefix(var.tag_index_uri, "s3://"), "/")
+  tag_index_bucket = split("/", local.tag_index_path)[0]
 }
 
 data "aws_caller_identity" "current" {}
@@ -47,6 +51,125 @@ resource "aws_sns_topic_subscription" "admin_email" {
   endpoint  = var.admin_email
 }
 
+# ========================================
+# DYNAMODB — idempotence des tâches Step Functions
+# Un retry relit le résultat stocké au lieu de rejouer l'action
+# ========================================
+
+resource "aws_dynamodb_table" "idempotency" {
+  name         = "${local.prefix}-idempotency"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "key"
+
+  attribute {
+    name = "key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = local.common_tags
+}
+
+# Jetons waitForTaskToken des exécutions en attente de correction des tags
+resource "aws_dynamodb_table" "wait_tokens" {
+  name         = "${local.prefix}-wait-tokens"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "resource_arn"
+
+  attribute {
+    name = "resource_arn"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = local.common_tags
+}
+
+# Cache des tags RDS / Lambda par marqueur de changement (scanner, metrics, cleanup)
+# Le controller supprime l'entrée à chaque événement de changement de tags
+resource "aws_dynamodb_table" "tag_cache" {
+  name         = "${local.prefix}-tag-cache"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "resource_arn"
+
+  attribute {
+    name = "resource_arn"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = local.common_tags
+}
+
+# Scan réparti (scan_mode = "fanout") : résultats partiels des workers par run
+resource "aws_dynamodb_table" "scan_shards" {
+  name         = "${local.prefix}-scan-shards"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "run_id"
+  range_key    = "shard_id"
+
+  attribute {
+    name = "run_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "shard_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = local.common_tags
+}
+
+# ========================================
+# FILE DE REMÉDIATION (launch_mode = "queue")
+# ========================================
+# Le scanner y met les payloads non conformes, le vidage planifié les lance par
+# priorité. Pas de redrive : le vidage lit une fenêtre de messages et rend ceux
+# qu'il ne lance pas, le compteur de réceptions ne signifie pas un échec.
+
+resource "aws_sqs_queue" "remediation" {
+  name                       = "${local.prefix}-remediation"
+  message_retention_seconds  = 172800 # un backlog plus vieux est remis en file par les scans suivants
+  visibility_timeout_seconds = 300
+  sqs_managed_sse_enabled    = true
+
+  tags = local.common_tags
+}
+
+# ========================================
+# POLITIQUE DE TAGS (SSM)
+# ========================================
+# Relue par les Lambdas au plus une fois par TTL : modifier la politique ne
+# demande pas de redéployer le layer.
+
+resource "aws_ssm_parameter" "tag_policy" {
+  name        = "/${local.prefix}/tag-policy"
+  description = "Politique de tags (format shared/tag_policy.json)"
+  type        = "String"
+  tier        = "Intelligent-Tiering"
+  value       = file("${path.module}/../../../lambda/shared/tag_policy.json")
+
+  tags = local.common_tags
+}
+
 # ========================================
 # CLOUDWATCH LOG GROUPS
 # ========================================
@@ -100,7 +223,7 @@ resource "aws_iam_role_policy" "scanner" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         # Lecture des ressources — AWS impose Resource = "*" sur les Describe/List
         Sid    = "ReadResources"
@@ -111,6 +234,7 @@ resource "aws_iam_role_policy" "scanner" {
           "rds:ListTagsForResource",
           "s3:ListAllMyBuckets",
           "s3:GetBucketTagging",
+          "s3:GetBucketLocation",
           "lambda:ListFunctions",
         ]
         Resource = "*"
@@ -127,7 +251,60 @@ resource "aws_iam_role_policy" "scanner" {
         Sid      = "StartStateMachine"
         Effect   = "Allow"
         Action   = ["states:StartExecution"]
-        Resource = aws_sfn_state_machine.governance.arn
+        Resource = [aws_sfn_state_machine.governance.arn, aws_sfn_state_machine.governance_batch.arn]
+      },
+      {
+        # Politique de tags — restreint au paramètre de gouvernance
+        Sid      = "ReadTagPolicy"
+        Effect   = "Allow"
+        Action   = ["ssm:GetParameter"]
+        Resource = aws_ssm_parameter.tag_policy.arn
+      },
+      {
+        # Cache de tags — lecture en bloc au début du scan, écriture par lots à la fin
+        Sid      = "TagCache"
+        Effect   = "Allow"
+        Action   = ["dynamodb:Scan", "dynamodb:BatchWriteItem"]
+        Resource = aws_dynamodb_table.tag_cache.arn
+      },
+      {
+        # Scan réparti — le coordinateur réinvoque le scanner, un worker par shard
+        Sid      = "InvokeScanWorkers"
+        Effect   = "Allow"
+        Action   = ["lambda:InvokeFunction"]
+        Resource = "arn:aws:lambda:${var.aws_region}:${data.aws_caller_identity.current.account_id}:function:${local.prefix}-scanner"
+      },
+      {
+        # Scan réparti — résultats partiels et décompte des shards restants
+        Sid      = "ScanShards"
+        Effect   = "Allow"
+        Action   = ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:UpdateItem", "dynamodb:Query"]
+        Resource = aws_dynamodb_table.scan_shards.arn
+      },
+      {
+        # File de remédiation — mise en file par le scan, lecture priorisée par le vidage
+        Sid    = "RemediationQueue"
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:ChangeMessageVisibility",
+          "sqs:GetQueueAttributes",
+        ]
+        Resource = aws_sqs_queue.remediation.arn
+      },
+      {
+        # Inventaire AWS Config (INVENTORY_SOURCE=config) — lecture seule
+        Sid    = "ConfigInventory"
+        Effect = "Allow"
+        Action = [
+          "config:SelectResourceConfig",
+          "config:SelectAggregateResourceConfig",
+          "config:DescribeConfigurationRecorders",
+          "config:DescribeConfigurationRecorderStatus",
+        ]
+        Resource = "*"
       },
       {
         # X-Ray tracing
@@ -136,7 +313,29 @@ resource "aws_iam_role_policy" "scanner" {
         Action   = ["xray:PutTraceSegments", "xray:PutTelemetryRecords"]
         Resource = "*"
       }
-    ]
+      ], !startswith(var.inventory_export_uri, "s3://") ? [] : [
+      {
+        # Instantanés Parquet de l'inventaire (INVENTORY_EXPORT_URI)
+        Sid      = "InventoryExport"
+        Effect   = "Allow"
+        Action   = ["s3:PutObject"]
+        Resource = "arn:aws:s3:::${trimsuffix(trimprefix(var.inventory_export_uri, "s3://"), "/")}/*"
+      }
+      ], var.tag_index_uri == "" ? [] : [
+      {
+        # Index de tags — segments relus, réécrits et purgés à chaque scan
+        Sid      = "TagIndexSegments"
+        Effect   = "Allow"
+        Action   = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject"]
+        Resource = "arn:aws:s3:::${local.tag_index_path}/*"
+      },
+      {
+        Sid      = "TagIndexList"
+        Effect   = "Allow"
+        Action   = ["s3:ListBucket"]
+        Resource = "arn:aws:s3:::${local.tag_index_bucket}"
+      }
+    ])
   })
 }
 
@@ -171,7 +370,7 @@ resource "aws_iam_role_policy" "controller" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         # Re-vérification des tags — AWS impose Resource = "*" sur Describe
         Sid    = "ReadTags"
@@ -180,6 +379,7 @@ resource "aws_iam_role_policy" "controller" {
           "ec2:DescribeInstances",
           "rds:ListTagsForResource",
           "s3:GetBucketTagging",
+          "s3:GetBucketLocation",
         ]
         Resource = "*"
       },
@@ -189,6 +389,33 @@ resource "aws_iam_role_policy" "controller" {
         Action   = ["lambda:ListTags"]
         Resource = "arn:aws:lambda:${var.aws_region}:${data.aws_caller_identity.current.account_id}:function:*"
       },
+      {
+        # Idempotence — restreint à la table de gouvernance
+        Sid      = "IdempotencyStore"
+        Effect   = "Allow"
+        Action   = ["dynamodb:GetItem", "dynamodb:PutItem"]
+        Resource = aws_dynamodb_table.idempotency.arn
+      },
+      {
+        # Réveil anticipé — jetons d'attente + reprise de l'exécution en pause
+        Sid      = "WaitTokens"
+        Effect   = "Allow"
+        Action   = ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:DeleteItem"]
+        Resource = aws_dynamodb_table.wait_tokens.arn
+      },
+      {
+        # Invalidation du cache de tags sur événement de changement de tags
+        Sid      = "InvalidateTagCache"
+        Effect   = "Allow"
+        Action   = ["dynamodb:DeleteItem"]
+        Resource = aws_dynamodb_table.tag_cache.arn
+      },
+      {
+        Sid      = "ResumeWaitingExecution"
+        Effect   = "Allow"
+        Action   = ["states:SendTaskSuccess"]
+        Resource = "arn:aws:states:${var.aws_region}:${data.aws_caller_identity.current.account_id}:stateMachine:${local.prefix}-pipeline"
+      },
       {
         # Notifications — restreint au topic de gouvernance uniquement
         Sid      = "PublishSNS"
@@ -205,13 +432,34 @@ resource "aws_iam_role_policy" "controller" {
           aws_secretsmanager_secret.slack_webhook[0].arn
         ] : ["arn:aws:secretsmanager:${var.aws_region}:${data.aws_caller_identity.current.account_id}:secret:none"]
       },
+      {
+        # Politique de tags — restreint au paramètre de gouvernance
+        Sid      = "ReadTagPolicy"
+        Effect   = "Allow"
+        Action   = ["ssm:GetParameter"]
+        Resource = aws_ssm_parameter.tag_policy.arn
+      },
       {
         Sid      = "XRayTracing"
         Effect   = "Allow"
         Action   = ["xray:PutTraceSegments", "xray:PutTelemetryRecords"]
         Resource = "*"
       }
-    ]
+      ], var.tag_index_uri == "" ? [] : [
+      {
+        # Index de tags — lecture seule (action query_tag_index)
+        Sid      = "TagIndexRead"
+        Effect   = "Allow"
+        Action   = ["s3:GetObject"]
+        Resource = "arn:aws:s3:::${local.tag_index_path}/*"
+      },
+      {
+        Sid      = "TagIndexList"
+        Effect   = "Allow"
+        Action   = ["s3:ListBucket"]
+        Resource = "arn:aws:s3:::${local.tag_index_bucket}"
+      }
+    ])
   })
 }
 
@@ -288,6 +536,13 @@ resource "aws_iam_role_policy" "executor" {
         ]
         Resource = "arn:aws:s3:::*"
       },
+      {
+        # Idempotence — restreint à la table de gouvernance
+        Sid      = "IdempotencyStore"
+        Effect   = "Allow"
+        Action   = ["dynamodb:GetItem", "dynamodb:PutItem"]
+        Resource = aws_dynamodb_table.idempotency.arn
+      },
       {
         # Lambda — freeze/resume/delete restreint au compte
         Sid    = "LambdaActions"
@@ -317,7 +572,7 @@ resource "aws_iam_role_policy" "executor" {
 # On copie shared/ dans un dossier temporaire avec ce chemin
 resource "null_resource" "shared_layer_build" {
   triggers = {
-    config_hash = filemd5("${path.module}/../../../lambda/shared/config.py")
+    shared_hash = sha1(join("", [for f in sort(fileset("${path.module}/../../../lambda/shared", "*.py")) : filemd5("${path.module}/../../../lambda/shared/${f}")]))
   }
 
   provisioner "local-exec" {
@@ -337,7 +592,7 @@ resource "aws_lambda_layer_version" "shared" {
   layer_name          = "${local.prefix}-shared"
   filename            = data.archive_file.shared_layer.output_path
   source_code_hash    = data.archive_file.shared_layer.output_base64sha256
-  compatible_runtimes = ["python3.12"]
+  compatible_runtimes = ["python3.11", "python3.12"]
 }
 
 # ========================================
@@ -379,13 +634,39 @@ resource "aws_lambda_function" "scanner" {
   memory_size      = 256
   filename         = data.archive_file.scanner.output_path
   source_code_hash = data.archive_file.scanner.output_base64sha256
-  layers           = [aws_lambda_layer_version.shared.arn]
+  # pyarrow (export Parquet de l'inventaire) vient d'un layer séparé, AWS SDK for pandas
+  layers = concat([aws_lambda_layer_version.shared.arn], var.inventory_export_layer_arn == "" ? [] : [var.inventory_export_layer_arn])
 
   environment {
     variables = {
-      STATE_MACHINE_ARN       = aws_sfn_state_machine.governance.arn
-      POWERTOOLS_SERVICE_NAME = "${local.prefix}-scanner"
-      LOG_LEVEL               = "INFO"
+      STATE_MACHINE_ARN              = aws_sfn_state_machine.governance.arn
+      BATCH_STATE_MACHINE_ARN        = aws_sfn_state_machine.governance_batch.arn
+      PIPELINE_MODE                  = var.pipeline_mode
+      PIPELINE_BATCH_SIZE            = tostring(var.pipeline_batch_size)
+      PIPELINE_MAX_CONCURRENCY       = tostring(var.pipeline_max_concurrency)
+      API_RATE_LIMITS                = jsonencode(var.api_rate_limits)
+      PROFILING_SAMPLE_RATE          = tostring(var.profiling_sample_rate)
+      PROFILING_OUTPUT               = var.profiling_output
+      API_CALL_METRICS               = tostring(var.api_call_metrics)
+      TAG_POLICY_SOURCE              = "ssm:${aws_ssm_parameter.tag_policy.name}"
+      TAG_POLICY_TTL_SECONDS         = tostring(var.tag_policy_ttl_seconds)
+      INVENTORY_SOURCE               = var.inventory_source
+      CONFIG_AGGREGATOR_NAME         = var.config_aggregator_name
+      TAG_CACHE_TABLE                = aws_dynamodb_table.tag_cache.name
+      TAG_CACHE_TTL_SECONDS          = tostring(var.tag_cache_ttl_seconds)
+      TAG_CACHE_FULL_REFRESH_SECONDS = tostring(var.tag_cache_full_refresh_seconds)
+      SCAN_MODE                      = var.scan_mode
+      SCAN_SHARDS                    = jsonencode(var.scan_shards)
+      SCAN_SHARD_TABLE               = aws_dynamodb_table.scan_shards.name
+      LAUNCH_MODE                    = var.launch_mode
+      REMEDIATION_QUEUE_URL          = aws_sqs_queue.remediation.url
+      REMEDIATION_PROD_POLICY        = var.remediation_prod_policy
+      REMEDIATION_LAUNCH_RATE        = tostring(var.remediation_launch_rate)
+      REMEDIATION_DRAIN_MAX          = tostring(var.remediation_drain_max)
+      INVENTORY_EXPORT_URI           = var.inventory_export_uri
+      TAG_INDEX_URI                  = var.tag_index_uri
+      POWERTOOLS_SERVICE_NAME        = "${local.prefix}-scanner"
+      LOG_LEVEL                      = "INFO"
     }
   }
 
@@ -403,7 +684,7 @@ resource "aws_lambda_function" "controller" {
   handler          = "handler.lambda_handler"
   runtime          = "python3.12"
   architectures    = ["arm64"]
-  timeout          = 60
+  timeout          = 300 # mode batch : jusqu'à PIPELINE_BATCH_SIZE ressources par invocation
   memory_size      = 128
   filename         = data.archive_file.controller.output_path
   source_code_hash = data.archive_file.controller.output_base64sha256
@@ -414,6 +695,17 @@ resource "aws_lambda_function" "controller" {
       SNS_TOPIC_ARN           = aws_sns_topic.governance.arn
       ADMIN_EMAIL             = var.admin_email
       SLACK_SECRET_NAME       = var.slack_webhook_url != "" ? aws_secretsmanager_secret.slack_webhook[0].name : ""
+      IDEMPOTENCY_TABLE       = aws_dynamodb_table.idempotency.name
+      WAIT_TOKEN_TABLE        = aws_dynamodb_table.wait_tokens.name
+      TAG_CACHE_TABLE         = aws_dynamodb_table.tag_cache.name
+      API_RATE_LIMITS         = jsonencode(var.api_rate_limits)
+      PROFILING_SAMPLE_RATE   = tostring(var.profiling_sample_rate)
+      PROFILING_OUTPUT        = var.profiling_output
+      API_CALL_METRICS        = tostring(var.api_call_metrics)
+      TAG_POLICY_SOURCE       = "ssm:${aws_ssm_parameter.tag_policy.name}"
+      TAG_POLICY_TTL_SECONDS  = tostring(var.tag_policy_ttl_seconds)
+      TAG_INDEX_URI           = var.tag_index_uri
+      TAG_INDEX_TTL_SECONDS   = tostring(var.tag_index_ttl_seconds)
       POWERTOOLS_SERVICE_NAME = "${local.prefix}-controller"
       LOG_LEVEL               = "INFO"
     }
@@ -433,14 +725,20 @@ resource "aws_lambda_function" "executor" {
   handler          = "handler.lambda_handler"
   runtime          = "python3.12"
   architectures    = ["arm64"]
-  timeout          = 120
+  timeout          = 300 # mode batch
   memory_size      = 128
   filename         = data.archive_file.executor.output_path
   source_code_hash = data.archive_file.executor.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared.arn]
 
   environment {
     variables = {
       DRY_RUN                 = tostring(var.dry_run)
+      IDEMPOTENCY_TABLE       = aws_dynamodb_table.idempotency.name
+      API_RATE_LIMITS         = jsonencode(var.api_rate_limits)
+      PROFILING_SAMPLE_RATE   = tostring(var.profiling_sample_rate)
+      PROFILING_OUTPUT        = var.profiling_output
+      API_CALL_METRICS        = tostring(var.api_call_metrics)
       POWERTOOLS_SERVICE_NAME = "${local.prefix}-executor"
       LOG_LEVEL               = "INFO"
     }
@@ -490,6 +788,17 @@ resource "aws_iam_role_policy" "step_functions" {
           aws_lambda_function.executor.arn,
         ]
       },
+      {
+        # Distributed Map — le pipeline par lots lance ses exécutions enfants
+        Sid    = "DistributedMapChildExecutions"
+        Effect = "Allow"
+        Action = ["states:StartExecution", "states:DescribeExecution", "states:StopExecution"]
+        Resource = [
+          "arn:aws:states:${var.aws_region}:${data.aws_caller_identity.current.account_id}:stateMachine:${local.prefix}-pipeline-batch",
+          "arn:aws:states:${var.aws_region}:${data.aws_caller_identity.current.account_id}:execution:${local.prefix}-pipeline-batch/*",
+          "arn:aws:states:${var.aws_region}:${data.aws_caller_identity.current.account_id}:execution:${local.prefix}-pipeline-batch:*",
+        ]
+      },
       {
         Sid      = "XRayTracing"
         Effect   = "Allow"
@@ -547,6 +856,31 @@ resource "aws_sfn_state_machine" "governance" {
   tags = local.common_tags
 }
 
+# Variante par lots : une exécution traite jusqu'à plusieurs centaines de ressources,
+# découpées en lots par un Distributed Map (exécutions enfants STANDARD, compatibles
+# avec les attentes de 48h). Le pipeline par ressource ci-dessus reste disponible.
+resource "aws_sfn_state_machine" "governance_batch" {
+  name     = "${local.prefix}-pipeline-batch"
+  role_arn = aws_iam_role.step_functions.arn
+
+  definition = templatefile("${path.module}/../../../terraform/modules/step-function/state_machine_batch.asl.json", {
+    controller_lambda_arn = aws_lambda_function.controller.arn
+    executor_lambda_arn   = aws_lambda_function.executor.arn
+  })
+
+  logging_configuration {
+    log_destination        = "${aws_cloudwatch_log_group.sfn.arn}:*"
+    include_execution_data = true
+    level                  = "ERROR"
+  }
+
+  tracing_configuration {
+    enabled = true
+  }
+
+  tags = local.common_tags
+}
+
 # ========================================
 # EVENTBRIDGE — déclenche le scanner
 # ========================================
@@ -571,3 +905,92 @@ resource "aws_lambda_permission" "eventbridge_scanner" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.scanner_schedule.arn
 }
+
+# Mode queue : vidage de la file de remédiation, même Lambda avec un événement dédié
+resource "aws_cloudwatch_event_rule" "remediation_drain" {
+  count = var.launch_mode == "queue" ? 1 : 0
+
+  name                = "${local.prefix}-remediation-drain"
+  description         = "Lance les exécutions en file par priorité, à débit contrôlé"
+  schedule_expression = var.remediation_drain_schedule
+  tags                = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "remediation_drain" {
+  count = var.launch_mode == "queue" ? 1 : 0
+
+  rule      = aws_cloudwatch_event_rule.remediation_drain[0].name
+  target_id = "governance-remediation-drain"
+  arn       = aws_lambda_function.scanner.arn
+  input     = jsonencode({ remediation_drain = true })
+}
+
+resource "aws_lambda_permission" "eventbridge_remediation_drain" {
+  count = var.launch_mode == "queue" ? 1 : 0
+
+  statement_id  = "AllowEventBridgeInvokeRemediationDrain"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.scanner.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.remediation_drain[0].arn
+}
+
+# ========================================
+# EVENTBRIDGE — réveil anticipé sur correction des tags
+# ========================================
+
+# "Tag Change on Resource" : émis par Resource Groups Tagging, porte les tags complets
+resource "aws_cloudwatch_event_rule" "tag_change" {
+  name        = "${local.prefix}-tag-change"
+  description = "Réveille l'exécution en attente dès que les tags d'une ressource gelée changent"
+
+  event_pattern = jsonencode({
+    source      = ["aws.tag"]
+    detail-type = ["Tag Change on Resource"]
+    detail = {
+      service = ["ec2", "rds", "s3", "lambda"]
+    }
+  })
+
+  tags = local.common_tags
+}
+
+# Repli : appels de tagging journalisés par CloudTrail (nécessite un trail actif)
+resource "aws_cloudwatch_event_rule" "tag_api_calls" {
+  name        = "${local.prefix}-tag-api-calls"
+  description = "Appels API de tagging (CloudTrail) sur EC2, RDS, S3 et Lambda"
+
+  event_pattern = jsonencode({
+    source      = ["aws.ec2", "aws.rds", "aws.s3", "aws.lambda"]
+    detail-type = ["AWS API Call via CloudTrail"]
+    detail = {
+      eventName = ["CreateTags", "AddTagsToResource", "PutBucketTagging", "TagResource"]
+    }
+  })
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "tag_change" {
+  for_each = {
+    tag_change    = aws_cloudwatch_event_rule.tag_change.name
+    tag_api_calls = aws_cloudwatch_event_rule.tag_api_calls.name
+  }
+
+  rule      = each.value
+  target_id = "governance-controller"
+  arn       = aws_lambda_function.controller.arn
+}
+
+resource "aws_lambda_permission" "eventbridge_controller" {
+  for_each = {
+    tag_change    = aws_cloudwatch_event_rule.tag_change.arn
+    tag_api_calls = aws_cloudwatch_event_rule.tag_api_calls.arn
+  }
+
+  statement_id  = "AllowEventBridgeInvokeController-${each.key}"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.controller.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = each.value
+}
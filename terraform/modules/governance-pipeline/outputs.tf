@@ -18,6 +18,21 @@ output "state_machine_arn" {
   value       = aws_sfn_state_machine.governance.arn
 }
 
+output "batch_state_machine_arn" {
+  description = "ARN de la state machine du pipeline par lots (Distributed Map)"
+  value       = aws_sfn_state_machine.governance_batch.arn
+}
+
+output "idempotency_table_name" {
+  description = "Nom de la table DynamoDB d'idempotence des tâches"
+  value       = aws_dynamodb_table.idempotency.name
+}
+
+output "shared_layer_arn" {
+  description = "ARN du layer Lambda shared/ (réutilisé par les modules cleanup-lambda et metrics-lambda)"
+  value       = aws_lambda_layer_version.shared.arn
+}
+
 output "sns_topic_arn" {
   description = "ARN du topic SNS de gouvernance"
   value       = aws_sns_topic.governance.arn
@@ -27,3 +42,18 @@ output "dry_run_mode" {
   description = "Mode DRY_RUN actif ou non"
   value       = var.dry_run ? "SIMULATION (aucune action destructive)" : "PRODUCTION (actions réelles)"
 }
+
+output "tag_policy_parameter_name" {
+  description = "Paramètre SSM de la politique de tags (réutilisé par les modules cleanup-lambda et metrics-lambda)"
+  value       = aws_ssm_parameter.tag_policy.name
+}
+
+output "tag_cache_table_name" {
+  description = "Table DynamoDB du cache de tags (réutilisée par les modules cleanup-lambda et metrics-lambda)"
+  value       = aws_dynamodb_table.tag_cache.name
+}
+
+output "remediation_queue_url" {
+  description = "File SQS de remédiation (launch_mode = queue)"
+  value       = aws_sqs_queue.remediation.url
+}
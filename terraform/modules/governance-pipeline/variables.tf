@@ -42,3 +42,171 @@ variable "slack_webhook_url" {
   sensitive   = true
   default     = ""
 }
+
+variable "api_rate_limits" {
+  description = "Budget d'appels API par seconde par Lambda (clés \"service\" ou \"service.Operation\", ex: { ec2 = 20 })"
+  type        = map(number)
+  default     = {}
+
+variable "api_call_metrics" {
+  description = "Publier le bilan des appels API de chaque invocation (ApiCalls, ApiCallErrors, ApiCallRetries, ApiCallLatencyMs)"
+  type        = bool
+  default     = false
+}
+}
+
+variable "pipeline_mode" {
+  description = "Pipeline lancé par le scanner : per_resource (une exécution par ressource) ou batch (Distributed Map par lots)"
+  type        = string
+  default     = "per_resource"
+
+  validation {
+    condition     = contains(["per_resource", "batch"], var.pipeline_mode)
+    error_message = "pipeline_mode doit valoir per_resource ou batch."
+  }
+}
+
+variable "pipeline_batch_size" {
+  description = "Mode batch : nombre de ressources par exécution enfant du Distributed Map"
+  type        = number
+  default     = 25
+}
+
+variable "pipeline_max_concurrency" {
+  description = "Mode batch : nombre max d'exécutions enfants (lots) en parallèle"
+  type        = number
+  default     = 10
+}
+
+variable "profiling_sample_rate" {
+  description = "Fraction des invocations profilées (cProfile + tracemalloc), 0 = désactivé"
+  type        = number
+  default     = 0
+}
+
+variable "profiling_output" {
+  description = "Destination des profils : chemin local (défaut /tmp/profiles) ou s3://bucket/prefix (s3:PutObject requis)"
+  type        = string
+  default     = ""
+}
+
+variable "tag_policy_ttl_seconds" {
+  description = "Intervalle minimal (secondes) entre deux relectures de la politique de tags dans un conteneur chaud"
+  type        = number
+  default     = 300
+}
+
+variable "inventory_source" {
+  description = "Source de l'inventaire : live (Describe/List) ou config (requêtes avancées AWS Config, repli live par type)"
+  type        = string
+  default     = "live"
+
+  validation {
+    condition     = contains(["live", "config"], var.inventory_source)
+    error_message = "inventory_source doit valoir live ou config."
+  }
+}
+
+variable "config_aggregator_name" {
+  description = "Agrégateur AWS Config multi-comptes / multi-régions (vide = Config du compte courant)"
+  type        = string
+  default     = ""
+}
+
+variable "tag_cache_ttl_seconds" {
+  description = "Durée de validité (secondes) d'une entrée du cache de tags RDS / Lambda, 0 = cache désactivé"
+  type        = number
+  default     = 21600
+}
+
+variable "tag_cache_full_refresh_seconds" {
+  description = "Intervalle (secondes) entre deux relectures complètes des tags, sans cache (0 = jamais)"
+  type        = number
+  default     = 86400
+}
+
+variable "scan_mode" {
+  description = "single : une invocation scanne tout ; fanout : coordinateur + un worker asynchrone par shard"
+  type        = string
+  default     = "single"
+
+  validation {
+    condition     = contains(["single", "fanout"], var.scan_mode)
+    error_message = "scan_mode doit valoir single ou fanout."
+  }
+}
+
+variable "scan_shards" {
+  description = "Mode fanout : nombre de parts par service, ex. { s3 = 4, lambda = 2 } (défaut : 1 par service)"
+  type        = map(number)
+  default     = {}
+}
+
+variable "launch_mode" {
+  description = "direct : le scanner lance le pipeline ; queue : il met en file SQS, un vidage planifié lance par priorité"
+  type        = string
+  default     = "direct"
+
+  validation {
+    condition     = contains(["direct", "queue"], var.launch_mode)
+    error_message = "launch_mode doit valoir direct ou queue."
+  }
+}
+
+variable "remediation_prod_policy" {
+  description = "Mode queue : ressources de prod remédiées en premier (first) ou en dernier (last)"
+  type        = string
+  default     = "last"
+
+  validation {
+    condition     = contains(["first", "last"], var.remediation_prod_policy)
+    error_message = "remediation_prod_policy doit valoir first ou last."
+  }
+}
+
+variable "remediation_launch_rate" {
+  description = "Mode queue : exécutions Step Functions lancées par seconde lors du vidage"
+  type        = number
+  default     = 2
+}
+
+variable "remediation_drain_max" {
+  description = "Mode queue : exécutions lancées au plus par invocation de vidage"
+  type        = number
+  default     = 200
+}
+
+variable "remediation_drain_schedule" {
+  description = "Mode queue : cadence du vidage de la file de remédiation"
+  type        = string
+  default     = "rate(5 minutes)"
+}
+
+variable "inventory_export_uri" {
+  description = "Préfixe S3 (s3://bucket/prefix) des instantanés Parquet de l'inventaire écrits à chaque scan, vide = pas d'export"
+  type        = string
+  default     = ""
+}
+
+variable "inventory_export_layer_arn" {
+  description = "ARN du layer fournissant pyarrow (AWS SDK for pandas, arm64 / python3.12), requis par l'export"
+  type        = string
+  default     = ""
+}
+
+variable "tag_index_uri" {
+  description = "Préfixe S3 (s3://bucket/prefix) de l'index inversé des tags tenu par le scanner, vide = pas d'index"
+  type        = string
+  default     = ""
+
+  validation {
+    condition     = var.tag_index_uri == "" || startswith(var.tag_index_uri, "s3://")
+    error_message = "tag_index_uri doit commencer par s3:// (ou être vide)."
+  }
+}
+
+variable "tag_index_ttl_seconds" {
+  description = "Durée (secondes) pendant laquelle le controller garde l'index en mémoire à chaud"
+  type        = number
+  default     = 300
+}
@@ -9,6 +9,8 @@ locals {
   lambda_zip  = "${path.module}/lambda_function.zip"
 }
 
+data "aws_caller_identity" "current" {}
+
 # ========================================
 # ROLE IAM POUR LA LAMBDA
 # ========================================
@@ -52,7 +54,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         Effect = "Allow"
         Action = [
@@ -65,6 +67,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
           # Lecture S3
           "s3:ListAllMyBuckets",
           "s3:GetBucketTagging",
+          "s3:GetBucketLocation",
           # Lecture Lambda
           "lambda:ListFunctions",
           "lambda:ListTags",
@@ -83,7 +86,52 @@ resource "aws_iam_role_policy" "lambda_policy" {
         # Cost Explorer, CloudWatch et les Describe imposent Resource = "*".
         # Risque limité car aucun droit de suppression dans cette politique
       }
-    ]
+      ], var.inventory_source != "config" ? [] : [
+      {
+        # Inventaire AWS Config (INVENTORY_SOURCE=config) — lecture seule
+        Effect = "Allow"
+        Action = [
+          "config:SelectResourceConfig",
+          "config:SelectAggregateResourceConfig",
+          "config:DescribeConfigurationRecorders",
+          "config:DescribeConfigurationRecorderStatus"
+        ]
+        Resource = "*"
+      }
+      ], var.tag_policy_parameter == "" ? [] : [
+      {
+        # Politique de tags partagée (paramètre SSM du pipeline de gouvernance)
+        Effect   = "Allow"
+        Action   = ["ssm:GetParameter"]
+        Resource = "arn:aws:ssm:${var.aws_region}:${data.aws_caller_identity.current.account_id}:parameter${var.tag_policy_parameter}"
+      }
+      ], var.tag_cache_table == "" ? [] : [
+      {
+        # Cache de tags partagé (table DynamoDB du pipeline de gouvernance)
+        Effect   = "Allow"
+        Action   = ["dynamodb:Scan", "dynamodb:BatchWriteItem"]
+        Resource = "arn:aws:dynamodb:${var.aws_region}:${data.aws_caller_identity.current.account_id}:table/${var.tag_cache_table}"
+      }
+      ], !startswith(var.inventory_export_uri, "s3://") ? [] : [
+      {
+        # Instantanés Parquet de l'inventaire (INVENTORY_EXPORT_URI)
+        Effect   = "Allow"
+        Action   = ["s3:PutObject"]
+        Resource = "arn:aws:s3:::${trimsuffix(trimprefix(var.inventory_export_uri, "s3://"), "/")}/*"
+      }
+      ], !startswith(var.cur_uri, "s3://") ? [] : [
+      {
+        # Fichiers Parquet du Cost and Usage Report (CUR_URI), lecture seule
+        Effect   = "Allow"
+        Action   = ["s3:GetObject"]
+        Resource = "arn:aws:s3:::${split("/", trimprefix(var.cur_uri, "s3://"))[0]}/*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["s3:ListBucket"]
+        Resource = "arn:aws:s3:::${split("/", trimprefix(var.cur_uri, "s3://"))[0]}"
+      }
+    ])
   })
 }
 
@@ -107,12 +155,32 @@ resource "aws_lambda_function" "metrics" {
   source_code_hash = data.archive_file.lambda_zip.output_base64sha256
   runtime          = "python3.12"
   architectures    = ["arm64"]
-  timeout          = 120
-  memory_size      = 256
+  timeout          = var.cur_uri == "" ? 120 : 600 # jointure CUR : partitions de plusieurs Go
+  memory_size      = var.cur_uri == "" ? 256 : 1024
+  # pyarrow (export Parquet de l'inventaire, jointure CUR) vient d'un layer séparé, AWS SDK for pandas
+  layers = concat([var.shared_layer_arn], var.inventory_export_layer_arn == "" ? [] : [var.inventory_export_layer_arn])
 
   environment {
     variables = {
-      ENVIRONMENT = var.environment
+      ENVIRONMENT      = var.environment
+      API_RATE_LIMITS  = jsonencode(var.api_rate_limits)
+      PROFILING_SAMPLE_RATE = tostring(var.profiling_sample_rate)
+      PROFILING_OUTPUT = var.profiling_output
+      API_CALL_METRICS = tostring(var.api_call_metrics)
+      # Vide : politique embarquée dans le layer shared/
+      TAG_POLICY_SOURCE      = var.tag_policy_parameter == "" ? "" : "ssm:${var.tag_policy_parameter}"
+      TAG_POLICY_TTL_SECONDS = tostring(var.tag_policy_ttl_seconds)
+      INVENTORY_SOURCE       = var.inventory_source
+      CONFIG_AGGREGATOR_NAME = var.config_aggregator_name
+      # Vide : cache en mémoire du conteneur
+      TAG_CACHE_TABLE                = var.tag_cache_table
+      TAG_CACHE_TTL_SECONDS          = tostring(var.tag_cache_ttl_seconds)
+      TAG_CACHE_FULL_REFRESH_SECONDS = tostring(var.tag_cache_full_refresh_seconds)
+      # Vide : pas d'instantané Parquet
+      INVENTORY_EXPORT_URI = var.inventory_export_uri
+      # Vide : pas d'attribution des coûts CUR
+      CUR_URI         = var.cur_uri
+      CUR_COST_COLUMN = var.cur_cost_column
     }
   }
 
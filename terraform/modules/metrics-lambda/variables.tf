@@ -35,3 +35,103 @@ variable "log_retention_days" {
   type        = number
   default     = 7
 }
+
+variable "shared_layer_arn" {
+  description = "ARN du layer Lambda contenant le module shared/ (output shared_layer_arn du module governance-pipeline)"
+  type        = string
+}
+
+variable "api_rate_limits" {
+  description = "Budget d'appels API par seconde pour cette Lambda (clés \"service\" ou \"service.Operation\", ex: { ec2 = 20 })"
+  type        = map(number)
+  default     = {}
+
+variable "api_call_metrics" {
+  description = "Publier le bilan des appels API de chaque invocation (ApiCalls, ApiCallErrors, ApiCallRetries, ApiCallLatencyMs)"
+  type        = bool
+  default     = false
+}
+}
+
+variable "profiling_sample_rate" {
+  description = "Fraction des invocations profilées (cProfile + tracemalloc), 0 = désactivé"
+  type        = number
+  default     = 0
+}
+
+variable "profiling_output" {
+  description = "Destination des profils : chemin local (défaut /tmp/profiles) ou s3://bucket/prefix (s3:PutObject requis)"
+  type        = string
+  default     = ""
+}
+
+variable "tag_policy_parameter" {
+  description = "Paramètre SSM de la politique de tags (output tag_policy_parameter_name du pipeline), vide = politique embarquée"
+  type        = string
+  default     = ""
+}
+
+variable "tag_policy_ttl_seconds" {
+  description = "Intervalle minimal (secondes) entre deux relectures de la politique de tags dans un conteneur chaud"
+  type        = number
+  default     = 300
+}
+
+variable "inventory_source" {
+  description = "Source de l'inventaire : live (Describe/List) ou config (requêtes avancées AWS Config, repli live par type)"
+  type        = string
+  default     = "live"
+
+  validation {
+    condition     = contains(["live", "config"], var.inventory_source)
+    error_message = "inventory_source doit valoir live ou config."
+  }
+}
+
+variable "config_aggregator_name" {
+  description = "Agrégateur AWS Config multi-comptes / multi-régions (vide = Config du compte courant)"
+  type        = string
+  default     = ""
+}
+
+variable "tag_cache_table" {
+  description = "Table DynamoDB du cache de tags (output tag_cache_table_name du pipeline), vide = cache en mémoire du conteneur"
+  type        = string
+  default     = ""
+}
+
+variable "tag_cache_ttl_seconds" {
+  description = "Durée de validité (secondes) d'une entrée du cache de tags RDS / Lambda, 0 = cache désactivé"
+  type        = number
+  default     = 21600
+}
+
+variable "tag_cache_full_refresh_seconds" {
+  description = "Intervalle (secondes) entre deux relectures complètes des tags, sans cache (0 = jamais)"
+  type        = number
+  default     = 86400
+}
+
+variable "inventory_export_uri" {
+  description = "Préfixe S3 (s3://bucket/prefix) des instantanés Parquet de l'inventaire, vide = pas d'export"
+  type        = string
+  default     = ""
+}
+
+variable "inventory_export_layer_arn" {
+  description = "ARN du layer fournissant pyarrow (AWS SDK for pandas, arm64 / python3.12), requis par l'export et la jointure CUR"
+  type        = string
+  default     = ""
+}
+
+variable "cur_uri" {
+  description = "Fichiers Parquet du CUR de la période (s3://bucket/prefix, {billing_period} = AAAA-MM du mois en cours), vide = pas d'attribution"
+  type        = string
+  default     = ""
+}
+
+variable "cur_cost_column" {
+  description = "Colonne de coût du CUR sommée par ressource (line_item_unblended_cost, line_item_net_unblended_cost...)"
+  type        = string
+  default     = "line_item_unblended_cost"
+}